@@ -0,0 +1 @@
+from .appearance_embedder import AppearanceEmbedder, EmbeddingCache, get_crop, load_clip_model, CLIP_MODEL_NAME
\ No newline at end of file
@@ -0,0 +1,294 @@
+"""
+A module for embedding the appearance of the players once per run.
+
+The team classifier and the re-identification of DeepSORT both describe a player by an
+embedding of its crop. AppearanceEmbedder cuts, preprocesses and embeds the crops with
+one CLIP model, in batches, and keeps the embeddings keyed by frame and track id. They
+are stored as float16 rows of one preallocated array, and the least recently used rows
+are reused once it is full, so the memory stays bounded on long videos while a crop
+asked for by both consumers within a window is embedded once.
+"""
+
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+import sys
+sys.path.append('../')
+from configs import APPEARANCE_BATCH_SIZE, APPEARANCE_CACHE_SIZE
+from instrumentation import traced
+
+CLIP_MODEL_NAME = "patrickjohncyh/fashion-clip"
+
+
+def load_clip_model(model_name):
+    """
+    Load a CLIP model and its processor.
+
+    transformers and torch take seconds to import, so they are only imported once crops
+    actually have to be embedded.
+
+    Args:
+        model_name (str): Hugging Face name of the model.
+
+    Returns:
+        tuple: (model in eval mode, processor).
+    """
+    from transformers import CLIPProcessor, CLIPModel
+    model = CLIPModel.from_pretrained(model_name)
+    model.eval()
+    return model, CLIPProcessor.from_pretrained(model_name)
+
+
+def get_crop(frame, bbox):
+    """
+    Cut a bounding box out of a frame.
+
+    Args:
+        frame (numpy.ndarray): The video frame.
+        bbox (tuple): Bounding box coordinates.
+
+    Returns:
+        numpy.ndarray or None: The crop, a view of the frame, or None if the box is empty
+            once clipped to the frame.
+    """
+    height, width = frame.shape[:2]
+    x1, y1 = max(0, int(bbox[0])), max(0, int(bbox[1]))
+    x2, y2 = min(width, int(bbox[2])), min(height, int(bbox[3]))
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return frame[y1:y2, x1:x2]
+
+
+class EmbeddingCache:
+    """
+    Embeddings in the rows of a float16 array, the least recently used evicted first.
+
+    Attributes:
+        capacity (int): Most embeddings kept.
+        embeddings (numpy.ndarray): (capacity, dim) storage, allocated with the first embedding.
+        rows (OrderedDict): Key -> row of its embedding, least recently used first.
+    """
+    def __init__(self, capacity=APPEARANCE_CACHE_SIZE):
+        self.capacity = capacity
+        self.embeddings = None
+        self.rows = OrderedDict()
+        self.free_rows = list(range(capacity - 1, -1, -1))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def get(self, key):
+        """
+        Read an embedding and mark it as recently used.
+
+        Returns:
+            numpy.ndarray: The float16 embedding, a view of the storage, or None if absent.
+        """
+        row = self.rows.get(key)
+        if row is None:
+            return None
+        self.rows.move_to_end(key)
+        return self.embeddings[row]
+
+    def put(self, key, embedding):
+        """
+        Store an embedding, evicting the least recently used one when full.
+        """
+        if self.capacity <= 0:
+            return
+        if self.embeddings is None:
+            self.embeddings = np.empty((self.capacity, len(embedding)), dtype=np.float16)
+        row = self.rows.pop(key, None)
+        if row is None:
+            row = self.free_rows.pop() if self.free_rows else self.rows.popitem(last=False)[1]
+        self.embeddings[row] = embedding
+        self.rows[key] = row
+
+    def rename(self, key, new_key):
+        """
+        Move an embedding to another key, replacing the embedding stored there.
+        """
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        replaced = self.rows.pop(new_key, None)
+        if replaced is not None:
+            self.free_rows.append(replaced)
+        self.rows[new_key] = row
+
+
+class AppearanceEmbedder:
+    """
+    Embeds player crops with CLIP, each crop at most once while it stays cached.
+
+    Attributes:
+        model_name (str): Hugging Face name of the CLIP model.
+        batch_size (int): Number of crops sent to the model at once.
+        cache (EmbeddingCache): Embeddings keyed by (frame index, track id).
+        hits (int): Embeddings served from the cache.
+        misses (int): Crops embedded.
+    """
+    def __init__(self, model_name=None, batch_size=APPEARANCE_BATCH_SIZE, capacity=APPEARANCE_CACHE_SIZE):
+        """
+        Args:
+            model_name (str, optional): Hugging Face name of the CLIP model, CLIP_MODEL_NAME by default.
+            batch_size (int): Number of crops sent to the model at once.
+            capacity (int): Most embeddings kept in the cache.
+        """
+        self.model_name = model_name or CLIP_MODEL_NAME
+        self.batch_size = batch_size
+        self.model = None
+        self.processor = None
+        self.pixel_buffer = None
+        self.cache = EmbeddingCache(capacity)
+        self.hits = 0
+        self.misses = 0
+
+    def load_model(self):
+        """
+        Load the CLIP model and read its image preprocessing settings, once.
+        """
+        if self.model is not None:
+            return
+        self.model, self.processor = load_clip_model(self.model_name)
+
+        image_processor = self.processor.image_processor
+        self.crop_size = (image_processor.crop_size["height"], image_processor.crop_size["width"])
+        self.resize_edge = image_processor.size["shortest_edge"]
+        self.image_mean = np.array(image_processor.image_mean, dtype=np.float32).reshape(3, 1, 1)
+        self.image_std = np.array(image_processor.image_std, dtype=np.float32).reshape(3, 1, 1)
+
+    @property
+    def logit_scale(self):
+        """
+        Temperature of the model, scaling the similarities of image and text embeddings.
+        """
+        import torch
+
+        self.load_model()
+        with torch.no_grad():
+            return float(self.model.logit_scale.exp())
+
+    def embed_texts(self, texts):
+        """
+        Embed text prompts.
+
+        Args:
+            texts (list of str): The prompts.
+
+        Returns:
+            numpy.ndarray: Normalised float32 embeddings of shape (len(texts), dim).
+        """
+        import torch
+
+        self.load_model()
+        inputs = self.processor(text=texts, return_tensors="pt", padding=True)
+        with torch.no_grad():
+            embeddings = self.model.get_text_features(**inputs)
+        return (embeddings / embeddings.norm(dim=-1, keepdim=True)).numpy().astype(np.float32)
+
+    def preprocess_crops(self, crops):
+        """
+        Resize, center crop and normalise BGR crops into the reusable pixel buffer.
+
+        Follows the CLIP image processor (shortest edge resize, center crop, mean/std
+        normalisation) with OpenCV, without converting each crop to a PIL image.
+
+        Args:
+            crops (list of numpy.ndarray): BGR crops, at most batch_size of them.
+
+        Returns:
+            torch.Tensor: Pixel values of shape (len(crops), 3, height, width), a view of the buffer.
+        """
+        import torch
+
+        crop_height, crop_width = self.crop_size
+        if self.pixel_buffer is None:
+            self.pixel_buffer = np.empty((self.batch_size, 3, crop_height, crop_width), dtype=np.float32)
+
+        for i, crop in enumerate(crops):
+            height, width = crop.shape[:2]
+            scale = self.resize_edge / min(height, width)
+            new_width, new_height = max(crop_width, round(width * scale)), max(crop_height, round(height * scale))
+            image = cv2.resize(crop, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
+            top, left = (new_height - crop_height) // 2, (new_width - crop_width) // 2
+            image = cv2.cvtColor(image[top:top + crop_height, left:left + crop_width], cv2.COLOR_BGR2RGB)
+            self.pixel_buffer[i] = image.transpose(2, 0, 1)
+        pixels = self.pixel_buffer[:len(crops)]
+        pixels *= 1.0 / 255.0
+        pixels -= self.image_mean
+        pixels /= self.image_std
+        return torch.from_numpy(pixels)
+
+    @traced()
+    def embed_crops(self, crops):
+        """
+        Embed crops in batches, without the cache.
+
+        Args:
+            crops (list of numpy.ndarray): BGR crops.
+
+        Returns:
+            numpy.ndarray: Normalised float16 embeddings of shape (len(crops), dim).
+        """
+        import torch
+
+        self.load_model()
+        embeddings = []
+        for i in range(0, len(crops), self.batch_size):
+            pixel_values = self.preprocess_crops(crops[i:i + self.batch_size])
+            with torch.no_grad():
+                image_embeddings = self.model.get_image_features(pixel_values=pixel_values)
+                image_embeddings = image_embeddings / image_embeddings.norm(dim=-1, keepdim=True)
+            embeddings.append(image_embeddings.numpy().astype(np.float16))
+        if not embeddings:
+            return np.zeros((0, 0), dtype=np.float16)
+        return np.concatenate(embeddings)
+
+    def embed(self, samples):
+        """
+        Embed the crops of players, reading the cache first.
+
+        Args:
+            samples (list of tuple): (frame index, key, frame, bbox) of each crop. The key
+                is the track id, or a provisional key for detections not tracked yet.
+
+        Returns:
+            numpy.ndarray: Normalised float16 embeddings of shape (len(samples), dim), zero
+                for boxes that are empty once clipped to their frame.
+        """
+        cached = [self.cache.get((frame_num, key)) for frame_num, key, _, _ in samples]
+        missing = [i for i, embedding in enumerate(cached) if embedding is None]
+        crops = {i: get_crop(samples[i][2], samples[i][3]) for i in missing}
+        to_embed = [i for i in missing if crops[i] is not None]
+        computed = self.embed_crops([crops[i] for i in to_embed])
+        self.hits += len(samples) - len(missing)
+        self.misses += len(to_embed)
+
+        dim = next((len(embedding) for embedding in cached if embedding is not None), computed.shape[1])
+        embeddings = np.zeros((len(samples), dim), dtype=np.float16)
+        for i, embedding in enumerate(cached):
+            if embedding is not None:
+                embeddings[i] = embedding
+        for i, embedding in zip(to_embed, computed):
+            embeddings[i] = embedding
+            frame_num, key = samples[i][:2]
+            self.cache.put((frame_num, key), embedding)
+        return embeddings
+
+    def get(self, frame_num, key):
+        """
+        The cached embedding of a crop, None if it was not embedded or was evicted.
+        """
+        return self.cache.get((frame_num, key))
+
+    def rename(self, frame_num, key, new_key):
+        """
+        Key the embedding of a detection by its track id, once the tracker has assigned it.
+        """
+        self.cache.rename((frame_num, key), (frame_num, new_key))
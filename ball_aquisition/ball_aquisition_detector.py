@@ -1,6 +1,9 @@
+import numpy as np
 import sys 
 sys.path.append('../')
-from utils.bbox_utils import measure_distance, get_center_of_bbox
+from utils.bbox_utils import measure_distance
+from core.track_store import get_track_store
+from instrumentation import traced
 
 class BallAcquisitionDetector:
     """
@@ -28,6 +31,9 @@ class BallAcquisitionDetector:
         self.min_frames = 11
         self.containment_threshold = 0.8
         self.possession_list = []
+        # Run of best candidates followed by update_possession
+        self.streak_holder = -1
+        self.streak_length = 0
         
     def get_key_basketball_player_assignment_points(self, player_bbox,ball_center):
         """
@@ -130,8 +136,8 @@ class BallAcquisitionDetector:
 
         Args:
             ball_center (tuple): (x, y) coordinates of the ball center.
-            player_tracks_frame (dict): Mapping from player_id to info about that player,
-                including a 'bbox' key with (x1, y1, x2, y2).
+            player_tracks_frame (dict): Mapping from player_id to that player's
+                bounding box (x1, y1, x2, y2) in this frame.
             ball_bbox (tuple): Bounding box for the ball (x1, y1, x2, y2).
 
         Returns:
@@ -140,8 +146,7 @@ class BallAcquisitionDetector:
         high_containment_players = []
         regular_distance_players = []
         
-        for player_id, player_obj in player_tracks_frame.items():
-            player_bbox = player_obj.bbox
+        for player_id, player_bbox in player_tracks_frame.items():
             if not player_bbox:
                 continue
                 
@@ -166,10 +171,190 @@ class BallAcquisitionDetector:
                 
         return -1
     
+    def get_player_detection_arrays(self, players):
+        """
+        Get the player bounding boxes as arrays sorted by frame, from the players' TrackStore.
+
+        Within a frame, rows follow the order of the players dict, which decides ties.
+
+        Args:
+            players (dict): Mapping from player_id (track_id) to Player objects.
+
+        Returns:
+            tuple: (frames, player_ids, bboxes) arrays with one row per detection.
+        """
+        store = get_track_store(players)
+        frames = store.frames.astype(np.int64)
+        player_ids = store.track_ids.astype(np.int64)
+        roster_ids = np.array(list(players.keys()), dtype=np.int64)
+        if len(roster_ids) == 0 or len(frames) == 0:
+            return frames[:0], player_ids[:0], np.zeros((0, 4), dtype=np.float64)
+
+        # Position of each row's player in the players dict
+        sorter = np.argsort(roster_ids)
+        positions = np.searchsorted(roster_ids[sorter], player_ids)
+        known = positions < len(roster_ids)
+        known[known] = roster_ids[sorter][positions[known]] == player_ids[known]
+        rank = np.zeros(len(player_ids), dtype=np.int64)
+        rank[known] = sorter[positions[known]]
+
+        order = np.flatnonzero(known)
+        order = order[np.lexsort((rank[order], frames[order]))]
+        return frames[order], player_ids[order], store.bboxes[order].astype(np.float64)
+
+    def compute_min_key_point_distances(self, ball_centers, player_bboxes):
+        """
+        Vectorized find_minimum_distance_to_ball over rows of (ball center, player bbox) pairs.
+
+        Args:
+            ball_centers (numpy.ndarray): (N, 2) ball centers.
+            player_bboxes (numpy.ndarray): (N, 4) player bounding boxes.
+
+        Returns:
+            numpy.ndarray: (N,) smallest distance from each ball center to the key points of its bbox.
+        """
+        cx, cy = ball_centers[:, 0:1], ball_centers[:, 1:2]
+        x1, y1, x2, y2 = (player_bboxes[:, i:i+1] for i in range(4))
+        width = x2 - x1
+        height = y2 - y1
+        mid_x = x1 + width // 2
+        mid_y = y1 + height // 2
+
+        # Same fixed key points as get_key_basketball_player_assignment_points
+        points_x = np.concatenate([mid_x, x2, x1, x2, x1, mid_x, x2, x1, mid_x, mid_x], axis=1)
+        points_y = np.concatenate([y1, y1, y1, mid_y, mid_y, mid_y, y2, y2, y2, y1 + height // 3], axis=1)
+        distances = np.sqrt((points_x - cx) ** 2 + (points_y - cy) ** 2).min(axis=1)
+
+        # Points level with the ball on the box sides, when the ball is between them
+        inside_y = ((cy > y1) & (cy < y2))[:, 0]
+        inside_x = ((cx > x1) & (cx < x2))[:, 0]
+        side_x = np.minimum(np.abs(cx - x1), np.abs(cx - x2))[:, 0]
+        side_y = np.minimum(np.abs(cy - y1), np.abs(cy - y2))[:, 0]
+        distances = np.where(inside_y, np.minimum(distances, side_x), distances)
+        distances = np.where(inside_x, np.minimum(distances, side_y), distances)
+        return distances
+
+    def compute_containment_ratios(self, player_bboxes, ball_bboxes):
+        """
+        Vectorized calculate_ball_containment_ratio over rows of (player bbox, ball bbox) pairs.
+
+        Args:
+            player_bboxes (numpy.ndarray): (N, 4) player bounding boxes.
+            ball_bboxes (numpy.ndarray): (N, 4) ball bounding boxes.
+
+        Returns:
+            numpy.ndarray: (N,) fraction of each ball inside its player bbox.
+        """
+        intersection_x1 = np.maximum(player_bboxes[:, 0], ball_bboxes[:, 0])
+        intersection_y1 = np.maximum(player_bboxes[:, 1], ball_bboxes[:, 1])
+        intersection_x2 = np.minimum(player_bboxes[:, 2], ball_bboxes[:, 2])
+        intersection_y2 = np.minimum(player_bboxes[:, 3], ball_bboxes[:, 3])
+        overlaps = (intersection_x2 >= intersection_x1) & (intersection_y2 >= intersection_y1)
+
+        intersection_area = (intersection_x2 - intersection_x1) * (intersection_y2 - intersection_y1)
+        ball_area = (ball_bboxes[:, 2] - ball_bboxes[:, 0]) * (ball_bboxes[:, 3] - ball_bboxes[:, 1])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratios = intersection_area / ball_area
+        return np.where(overlaps, ratios, 0.0)
+
+    def select_possession_candidates(self, frames, player_ids, containment, distances):
+        """
+        Vectorized find_best_candidate_for_possession over the candidate rows of many frames.
+
+        In each frame, players holding the ball above the containment threshold win, the
+        farthest of them first. Otherwise the closest player under the possession threshold
+        wins. Ties go to the first row of the frame.
+
+        Args:
+            frames (numpy.ndarray): Frame of each row, sorted.
+            player_ids (numpy.ndarray): Player of each row.
+            containment (numpy.ndarray): Containment ratio of each row.
+            distances (numpy.ndarray): Key point distance of each row.
+
+        Returns:
+            tuple: (frames, player_ids) of the frames that have a holder.
+        """
+        high = containment > self.containment_threshold
+        frame_has_high = np.zeros(frames.max() + 1 if len(frames) else 0, dtype=bool)
+        frame_has_high[frames[high]] = True
+        row_has_high = frame_has_high[frames]
+
+        eligible = np.where(row_has_high, high, ~high & (distances < self.possession_threshold))
+        score = np.where(row_has_high, -distances, distances)
+
+        rows = np.flatnonzero(eligible)
+        # Lowest score first within a frame, original row order on ties
+        rows = rows[np.lexsort((rows, score[rows], frames[rows]))]
+        best_frames, first = np.unique(frames[rows], return_index=True)
+        return best_frames, player_ids[rows[first]]
+
+    def apply_min_frames(self, best_players):
+        """
+        Keep a holder only from the min_frames-th frame of its run of consecutive frames.
+
+        Args:
+            best_players (numpy.ndarray): Best candidate of each frame that has a ball, in
+                order, -1 where nobody qualifies. Frames without a ball are left out, so they
+                neither extend nor break a run.
+
+        Returns:
+            numpy.ndarray: The holders, -1 where the run is still too short.
+        """
+        if len(best_players) == 0:
+            return best_players
+        index = np.arange(len(best_players))
+        run_start = np.r_[True, best_players[1:] != best_players[:-1]]
+        run_start_index = np.maximum.accumulate(np.where(run_start, index, 0))
+        run_length = index - run_start_index + 1
+        return np.where((best_players != -1) & (run_length >= self.min_frames), best_players, -1)
+
+    def update_possession(self, player_ids, player_bboxes, ball_bbox):
+        """
+        Detect who has the ball on the next frame of a live stream.
+
+        Gives the same result as detect_ball_possession, one frame at a time: the best
+        candidate has to keep the ball for min_frames frames with a ball before holding it.
+
+        Args:
+            player_ids (numpy.ndarray): Players visible on the frame, in roster order.
+            player_bboxes (numpy.ndarray): (N, 4) bounding boxes of those players.
+            ball_bbox (list): Ball bounding box, None if the ball was not detected.
+
+        Returns:
+            int: Player in possession, -1 if none.
+        """
+        if not ball_bbox:
+            # Frames without a ball neither extend nor break a run
+            return -1
+        best = -1
+        if len(player_ids):
+            player_bboxes = np.asarray(player_bboxes, dtype=np.float64).reshape(-1, 4)
+            ball_bboxes = np.repeat(np.asarray([ball_bbox], dtype=np.float64), len(player_bboxes), axis=0)
+            # Truncated to whole pixels, as get_center_of_bbox does
+            ball_centers = np.trunc(np.stack([(ball_bboxes[:, 0] + ball_bboxes[:, 2]) / 2,
+                                              (ball_bboxes[:, 1] + ball_bboxes[:, 3]) / 2], axis=1))
+            containment = self.compute_containment_ratios(player_bboxes, ball_bboxes)
+            distances = self.compute_min_key_point_distances(ball_centers, player_bboxes)
+            frames = np.zeros(len(player_bboxes), dtype=np.int64)
+            _, best_ids = self.select_possession_candidates(frames, np.asarray(player_ids), containment, distances)
+            if len(best_ids):
+                best = int(best_ids[0])
+
+        if best == self.streak_holder:
+            self.streak_length += 1
+        else:
+            self.streak_holder, self.streak_length = best, 1
+        return best if best != -1 and self.streak_length >= self.min_frames else -1
+
+    @traced()
     def detect_ball_possession(self, players, ball_object):
         """
         Detect which player has the ball in each frame based on bounding box information.
 
+        All player detections are processed at once as arrays. Detections whose box lies
+        farther from the ball than the possession threshold (or the ball's own size, for
+        containment) are pruned before the key point distances are computed.
+
         Args:
             players (dict): Mapping from player_id (track_id) to Player objects.
             ball_object (Ball): Ball object with bbox_per_frame data.
@@ -178,38 +363,45 @@ class BallAcquisitionDetector:
             list: A list with player_id who has possession in each frame, or -1 if none.
         """
         num_frames = max(ball_object.bbox_per_frame.keys()) + 1
-        self.possession_list = [-1] * num_frames
-        consecutive_possession_count = {}
+        possession = np.full(num_frames, -1, dtype=np.int64)
 
-        for frame_num in range(num_frames):
-            if frame_num not in ball_object.bbox_per_frame:
-                continue
+        ball_frames = np.array(sorted(frame_num for frame_num, bbox in ball_object.bbox_per_frame.items() if bbox),
+                               dtype=np.int64)
+        if len(ball_frames) == 0:
+            self.possession_list = possession.tolist()
+            return self.possession_list
+        has_ball = np.zeros(num_frames, dtype=bool)
+        has_ball[ball_frames] = True
+        ball_bboxes = np.zeros((num_frames, 4), dtype=np.float64)
+        ball_bboxes[ball_frames] = [ball_object.bbox_per_frame[frame_num] for frame_num in ball_frames]
 
-            ball_bbox = ball_object.bbox_per_frame[frame_num]
-            if not ball_bbox:
-                continue
-
-            ball_center = get_center_of_bbox(ball_bbox)
+        frames, player_ids, player_bboxes = self.get_player_detection_arrays(players)
+        in_range = frames < num_frames
+        keep = np.zeros(len(frames), dtype=bool)
+        keep[in_range] = has_ball[frames[in_range]]
+        frames, player_ids, player_bboxes = frames[keep], player_ids[keep], player_bboxes[keep]
 
-            # Build player data for this frame
-            players_in_frame = {}
-            for player_id, player_obj in players.items():
-                if frame_num in player_obj.bboxs_per_frame:
-                    players_in_frame[player_id] = player_obj
+        # Spatial pruning: distance from the ball center to each player box
+        row_ball_bboxes = ball_bboxes[frames]
+        # Truncated to whole pixels, as get_center_of_bbox does
+        ball_centers = np.trunc(np.stack([(row_ball_bboxes[:, 0] + row_ball_bboxes[:, 2]) / 2,
+                                          (row_ball_bboxes[:, 1] + row_ball_bboxes[:, 3]) / 2], axis=1))
+        gap_x = np.maximum(np.maximum(player_bboxes[:, 0] - ball_centers[:, 0], ball_centers[:, 0] - player_bboxes[:, 2]), 0)
+        gap_y = np.maximum(np.maximum(player_bboxes[:, 1] - ball_centers[:, 1], ball_centers[:, 1] - player_bboxes[:, 3]), 0)
+        ball_diagonal = np.hypot(row_ball_bboxes[:, 2] - row_ball_bboxes[:, 0], row_ball_bboxes[:, 3] - row_ball_bboxes[:, 1])
+        # Key points lie on or inside the box, and a contained ball overlaps it
+        near = np.hypot(gap_x, gap_y) <= np.maximum(self.possession_threshold, ball_diagonal)
 
-            best_player_id = self.find_best_candidate_for_possession(
-                ball_center,
-                players_in_frame,
-                ball_bbox
-            )
+        frames, player_ids = frames[near], player_ids[near]
+        player_bboxes, row_ball_bboxes, ball_centers = player_bboxes[near], row_ball_bboxes[near], ball_centers[near]
 
-            if best_player_id != -1:
-                number_of_consecutive_frames = consecutive_possession_count.get(best_player_id, 0) + 1
-                consecutive_possession_count = {best_player_id: number_of_consecutive_frames}
+        containment = self.compute_containment_ratios(player_bboxes, row_ball_bboxes)
+        distances = self.compute_min_key_point_distances(ball_centers, player_bboxes)
+        best_frames, best_ids = self.select_possession_candidates(frames, player_ids, containment, distances)
 
-                if number_of_consecutive_frames >= self.min_frames:
-                    self.possession_list[frame_num] = best_player_id
-            else:
-                consecutive_possession_count = {}
+        best_players = np.full(num_frames, -1, dtype=np.int64)
+        best_players[best_frames] = best_ids
+        possession[ball_frames] = self.apply_min_frames(best_players[ball_frames])
 
+        self.possession_list = possession.tolist()
         return self.possession_list
@@ -0,0 +1,4 @@
+from .synthetic_game import SyntheticGame
+from .stub_models import stub_models, synthetic_video
+from .stages import BENCHMARKS
+from .runner import run_benchmarks, compare_results, format_results
\ No newline at end of file
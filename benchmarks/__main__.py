@@ -0,0 +1,83 @@
+"""
+Command line interface of the benchmarks.
+
+Usage:
+    python -m benchmarks [--stages STAGE ...] [--frames N] [--output results.json]
+    python -m benchmarks --baseline baseline.json [--tolerance 0.2]
+
+With --baseline, the exit status is 1 when a stage regressed beyond the tolerance, so
+the benchmarks can gate a CI job. A results file written with --output is a baseline
+for later runs.
+"""
+
+import argparse
+import json
+import sys
+sys.path.append('../')
+from .synthetic_game import SyntheticGame
+from .stages import BENCHMARKS
+from .runner import run_benchmarks, compare_results, format_results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline stages on a synthetic game')
+    parser.add_argument('--stages', nargs='+', choices=[benchmark.name for benchmark in BENCHMARKS],
+                        default=None, help='Benchmarks to run (default: all)')
+    parser.add_argument('--frames', type=int, default=300, help='Length of the synthetic game')
+    parser.add_argument('--width', type=int, default=1280, help='Frame width')
+    parser.add_argument('--height', type=int, default=720, help='Frame height')
+    parser.add_argument('--tracks', type=int, default=10, help='Number of players')
+    parser.add_argument('--ball_visibility', type=float, default=0.85,
+                        help='Probability that the ball is detected on a frame')
+    parser.add_argument('--keypoint_dropout', type=float, default=0.15,
+                        help='Probability that a visible court keypoint is missed')
+    parser.add_argument('--fps', type=float, default=30, help='Frame rate of the synthetic game')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic game')
+    parser.add_argument('--chunk_size', type=int, default=64, help='Frames per window')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed rounds of each benchmark')
+    parser.add_argument('--warmup', type=int, default=1, help='Untimed rounds run first')
+    parser.add_argument('--output', type=str, default=None, help='Write the results to this JSON file')
+    parser.add_argument('--baseline', type=str, default=None, help='Compare with the results in this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Relative loss of throughput or growth of p90 latency allowed')
+    parser.add_argument('--memory_tolerance', type=float, default=0.1,
+                        help='Relative growth of peak memory allowed')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    game = SyntheticGame(num_frames=args.frames, width=args.width, height=args.height, num_tracks=args.tracks,
+                         ball_visibility=args.ball_visibility, keypoint_dropout=args.keypoint_dropout,
+                         fps=args.fps, seed=args.seed)
+    benchmarks = [benchmark for benchmark in BENCHMARKS if args.stages is None or benchmark.name in args.stages]
+    results = run_benchmarks(game, benchmarks, args.chunk_size, args.repeats, args.warmup)
+
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print(format_results(results, baseline))
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if baseline is not None:
+        if baseline["environment"] != results["environment"]:
+            print("Warning: the baseline was recorded on a different machine or library versions")
+        try:
+            regressions = compare_results(results, baseline, args.tolerance, args.memory_tolerance)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(2)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regression against the baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""
+A module for timing the benchmarks and comparing the results with a baseline.
+
+Each benchmark runs a few warmup rounds, then the timed rounds. Throughput is the
+number of frames covered per second of work, latencies are taken per unit of work, and
+peak memory comes from a separate round under tracemalloc, so tracing does not slow the
+timed rounds. Peak memory is what a unit allocates on top of what was alive when it
+started, as seen by tracemalloc: Python objects and numpy arrays, not torch tensors.
+"""
+
+import contextlib
+import os
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+import torch
+
+
+def run_units(units, trace_memory=False):
+    """
+    Run the units of work of one round.
+
+    Args:
+        units (iterable): (number of frames, callable) pairs.
+        trace_memory (bool): Measure the peak memory of the units, tracemalloc must be tracing.
+
+    Returns:
+        tuple: (frames covered, seconds of each unit, peak memory in bytes).
+    """
+    num_frames = 0
+    durations = []
+    peak_bytes = 0
+    with open(os.devnull, "w") as devnull:
+        for unit_frames, work in units:
+            # Progress printed by the stages would be timed with them
+            with contextlib.redirect_stdout(devnull):
+                if trace_memory:
+                    current_bytes = tracemalloc.get_traced_memory()[0]
+                    tracemalloc.reset_peak()
+                start = time.perf_counter()
+                work()
+                durations.append(time.perf_counter() - start)
+                if trace_memory:
+                    peak_bytes = max(peak_bytes, tracemalloc.get_traced_memory()[1] - current_bytes)
+            num_frames += unit_frames
+    return num_frames, durations, peak_bytes
+
+
+def run_benchmark(benchmark, game, chunk_size, repeats=3, warmup=1):
+    """
+    Time one benchmark.
+
+    Args:
+        benchmark (StageBenchmark): The benchmark to run.
+        game (SyntheticGame): The game processed.
+        chunk_size (int): Frames per window.
+        repeats (int): Timed rounds.
+        warmup (int): Untimed rounds run first.
+
+    Returns:
+        dict: Unit, frames, throughput in frames per second, latency percentiles in
+            milliseconds per unit and peak memory in megabytes.
+    """
+    for _ in range(warmup):
+        run_units(benchmark.prepare(game, chunk_size))
+
+    total_frames = 0
+    durations = []
+    for _ in range(repeats):
+        num_frames, round_durations, _ = run_units(benchmark.prepare(game, chunk_size))
+        total_frames += num_frames
+        durations += round_durations
+
+    tracemalloc.start()
+    try:
+        _, _, peak_bytes = run_units(benchmark.prepare(game, chunk_size), trace_memory=True)
+    finally:
+        tracemalloc.stop()
+
+    total_seconds = sum(durations)
+    latencies = np.array(durations) * 1000
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) if len(latencies) else (0.0, 0.0, 0.0)
+    return {
+        "unit": benchmark.unit,
+        "frames": total_frames // max(repeats, 1),
+        "throughput_fps": total_frames / total_seconds if total_seconds > 0 else 0.0,
+        "latency_ms": {
+            "mean": float(latencies.mean()) if len(latencies) else 0.0,
+            "p50": float(p50),
+            "p90": float(p90),
+            "p99": float(p99),
+        },
+        "peak_memory_mb": peak_bytes / 1024 ** 2,
+    }
+
+
+def get_environment():
+    """
+    Describe the machine, so results from different machines are not mistaken for a regression.
+    """
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "torch": torch.__version__,
+    }
+
+
+def run_benchmarks(game, benchmarks, chunk_size, repeats=3, warmup=1):
+    """
+    Run several benchmarks on one game.
+
+    Args:
+        game (SyntheticGame): The game processed.
+        benchmarks (list): StageBenchmark instances.
+        chunk_size (int): Frames per window.
+        repeats (int): Timed rounds of each benchmark.
+        warmup (int): Untimed rounds run first.
+
+    Returns:
+        dict: Game parameters, environment and the result of each benchmark by name.
+    """
+    results = {
+        "game": game.get_config(),
+        "chunk_size": chunk_size,
+        "environment": get_environment(),
+        "stages": {},
+    }
+    for benchmark in benchmarks:
+        print(f"Running {benchmark.name}")
+        results["stages"][benchmark.name] = run_benchmark(benchmark, game, chunk_size, repeats, warmup)
+    return results
+
+
+def compare_results(results, baseline, tolerance=0.2, memory_tolerance=0.1):
+    """
+    Find the stages that got slower or bigger than in a baseline.
+
+    Args:
+        results (dict): Output of run_benchmarks.
+        baseline (dict): An earlier output of run_benchmarks.
+        tolerance (float): Relative loss of throughput or growth of p90 latency allowed.
+        memory_tolerance (float): Relative growth of peak memory allowed.
+
+    Returns:
+        list of str: One message per regression, empty when there is none.
+
+    Raises:
+        ValueError: If the two runs did not process the same game.
+    """
+    if results["game"] != baseline["game"] or results["chunk_size"] != baseline["chunk_size"]:
+        raise ValueError("The baseline was run on a different synthetic game or chunk size, "
+                         "its numbers are not comparable")
+
+    regressions = []
+    for name, stage in results["stages"].items():
+        reference = baseline["stages"].get(name)
+        if reference is None:
+            continue
+        checks = [
+            ("throughput", stage["throughput_fps"], reference["throughput_fps"], -tolerance, "fps"),
+            ("p90 latency", stage["latency_ms"]["p90"], reference["latency_ms"]["p90"], tolerance, "ms"),
+            ("peak memory", stage["peak_memory_mb"], reference["peak_memory_mb"], memory_tolerance, "MB"),
+        ]
+        for metric, value, reference_value, allowed, unit in checks:
+            if reference_value <= 0:
+                continue
+            change = value / reference_value - 1
+            # Throughput regresses downwards, latency and memory upwards
+            if (allowed < 0 and change < allowed) or (allowed > 0 and change > allowed):
+                regressions.append(f"{name}: {metric} {value:.2f} {unit} vs {reference_value:.2f} {unit} "
+                                   f"in the baseline ({change:+.0%})")
+    return regressions
+
+
+def format_results(results, baseline=None):
+    """
+    Format the results as a table, with the change from the baseline when one is given.
+
+    Returns:
+        str: The table.
+    """
+    lines = [f"{'stage':<20} {'unit':<7} {'fps':>10} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} "
+             f"{'peak MB':>9}{'  vs baseline' if baseline else ''}"]
+    for name, stage in results["stages"].items():
+        latency = stage["latency_ms"]
+        line = (f"{name:<20} {stage['unit']:<7} {stage['throughput_fps']:>10.1f} {latency['p50']:>9.2f} "
+                f"{latency['p90']:>9.2f} {latency['p99']:>9.2f} {stage['peak_memory_mb']:>9.1f}")
+        reference = baseline["stages"].get(name) if baseline else None
+        if reference and reference["throughput_fps"] > 0:
+            line += f"  {stage['throughput_fps'] / reference['throughput_fps'] - 1:+.0%} fps"
+        lines.append(line)
+    return "\n".join(lines)
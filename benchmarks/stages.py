@@ -0,0 +1,341 @@
+"""
+A module with one benchmark per stage of the pipeline, plus the whole pipeline and the
+startup of a fresh process.
+
+A benchmark prepares its inputs from a SyntheticGame and yields units of work as
+(frames covered, callable) pairs. Only the callables are timed: building inputs,
+rendering frames and loading the stub models happen between them.
+"""
+
+import contextlib
+import os
+import subprocess
+import sys
+import tempfile
+from functools import partial
+
+import numpy as np
+
+sys.path.append('../')
+from trackers import PlayerTracker, BallTracker
+from trackers.ball_trajectory import BallTrajectory
+from team_assigner import TeamAssigner
+from ball_aquisition import BallAcquisitionDetector
+from pass_and_interception_detector import PassAndInterceptionDetector
+from tactical_view_converter import TacticalViewConverter
+from speed_and_distance_calculator import SpeedAndDistanceCalculator
+from pipeline import StreamingPipeline
+from model_registry import convert_results
+from detection_cache import DetectionCache
+from configs import (PLAYER_DETECTOR_PATH, HOOP_DETECTOR_PATH, BALL_DETECTOR_PATH, COURT_KEYPOINT_DETECTOR_PATH,
+                     COURT_KEYFRAME_INTERVAL, BALL_MAX_SPEED, BALL_MAX_GAP_FRAMES, DETECTION_CACHE_DIR)
+from .stub_models import STUB_CLIP_MODEL_NAME, stub_models, synthetic_video
+
+COURT_IMAGE_PATH = "./images/basketball_court.png"
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CACHED_VIDEO_NAME = "synthetic_game.avi"
+
+# A run of main.py served from the detection cache, stopped at its first written frame.
+# The CLIP model name is the stub's, which the cached team votes are keyed by
+CACHED_RUN_CODE = f"""
+import os
+import sys
+sys.path.insert(0, {REPO_DIR!r})
+import appearance_embedding.appearance_embedder as appearance_embedder
+from utils.video_writer import BackgroundVideoWriter
+appearance_embedder.CLIP_MODEL_NAME = {STUB_CLIP_MODEL_NAME!r}
+BackgroundVideoWriter.write = lambda self, frame: os._exit(0)
+import main
+main.main()
+"""
+
+
+class StageBenchmark:
+    """
+    Base class of the benchmarks.
+
+    Attributes:
+        name (str): Name of the benchmark in reports and baselines.
+        unit (str): What one unit of work covers: "frame", "window" or "video".
+    """
+    name = None
+    unit = "video"
+
+    def prepare(self, game, chunk_size):
+        """
+        Yield the units of work of one run.
+
+        Args:
+            game (SyntheticGame): The game to process.
+            chunk_size (int): Frames per window, for the stages that work window by window.
+
+        Yields:
+            tuple: (number of frames covered, callable doing the work).
+        """
+        raise NotImplementedError("Must be implemented in subclass")
+
+    def get_tracks(self, game):
+        return game.build_tracks(keyframe_interval=COURT_KEYFRAME_INTERVAL)
+
+    def get_tactical_positions(self, tracks):
+        converter = TacticalViewConverter(court_image_path=COURT_IMAGE_PATH)
+        keypoints = converter.validate_keypoints(tracks["court_keypoints"])
+        return converter.transform_players_to_tactical_view(keypoints, tracks["players"], tracks["camera_motion"])
+
+
+class PlayerTrackingBenchmark(StageBenchmark):
+    """
+    A multi-object tracker and the track store, fed the stub detections window by window.
+    """
+    unit = "window"
+
+    def __init__(self, name, tracker_type):
+        """
+        Args:
+            name (str): Name of the benchmark.
+            tracker_type (str): Tracker of the PlayerTracker, one without appearance
+                features since no frame is given.
+        """
+        self.name = name
+        self.tracker_type = tracker_type
+
+    def prepare(self, game, chunk_size):
+        with stub_models(game):
+            tracker = PlayerTracker(PLAYER_DETECTOR_PATH, tracker_type=self.tracker_type)
+            # The model is built on first use, which has to happen while the stubs are patched in
+            model = tracker.model
+        for start in range(0, game.num_frames, chunk_size):
+            frame_nums = range(start, min(start + chunk_size, game.num_frames))
+            detections = convert_results(model.get_results(frame_nums, conf=tracker.conf))
+            yield len(frame_nums), partial(tracker.update_player_objects, [], start, detections)
+
+
+class TeamAssignmentBenchmark(StageBenchmark):
+    """
+    Crop sampling, preprocessing and voting of the TeamAssigner, with the stub CLIP.
+    """
+    name = "team_assignment"
+    unit = "window"
+
+    def prepare(self, game, chunk_size):
+        tracks = self.get_tracks(game)
+        with stub_models(game):
+            team_assigner = TeamAssigner()
+            team_assigner.load_model()
+        for frame_offset, frames in game.read_video_chunks(None, chunk_size):
+            yield len(frames), partial(team_assigner.get_player_teams_for_frames, frames, tracks["players"],
+                                       frame_offset)
+
+
+class BallDetectionBenchmark(StageBenchmark):
+    """
+    Ball detection window by window, on whole frames or in the window around the
+    predicted ball. The stub answers in about the same time whatever the input size,
+    so this measures the search overhead, not the inference saved.
+    """
+    unit = "window"
+
+    def __init__(self, name, detection_mode):
+        """
+        Args:
+            name (str): Name of the benchmark.
+            detection_mode (str): Detection mode of the BallTracker, "full" or "roi".
+        """
+        self.name = name
+        self.detection_mode = detection_mode
+
+    def prepare(self, game, chunk_size):
+        with stub_models(game):
+            tracker = BallTracker(BALL_DETECTOR_PATH, detection_mode=self.detection_mode)
+            # Built while the stubs are patched in, the tracker keeps the stub afterwards
+            tracker.model
+        for frame_offset, frames in game.read_video_chunks(None, chunk_size):
+            yield len(frames), partial(tracker.detect_frames, frames, frame_offset)
+
+
+class BallTrajectoryBenchmark(StageBenchmark):
+    """
+    Spike rejection and gap interpolation of the raw ball detections.
+    """
+    name = "ball_trajectory"
+
+    def prepare(self, game, chunk_size):
+        frames = np.flatnonzero(game.ball_visible)
+        bboxes = game.ball_bboxes[frames]
+        trajectory = BallTrajectory(max_speed=BALL_MAX_SPEED, max_gap=BALL_MAX_GAP_FRAMES)
+        yield game.num_frames, partial(trajectory.clean, frames, bboxes)
+
+
+class BallAcquisitionBenchmark(StageBenchmark):
+    """
+    Possession of the ball on every frame.
+    """
+    name = "ball_acquisition"
+
+    def prepare(self, game, chunk_size):
+        tracks = self.get_tracks(game)
+        yield game.num_frames, partial(BallAcquisitionDetector().detect_ball_possession, tracks["players"],
+                                       tracks["ball"])
+
+
+class PassDetectionBenchmark(StageBenchmark):
+    """
+    Passes and interceptions from the possession of every frame.
+    """
+    name = "pass_detection"
+
+    def prepare(self, game, chunk_size):
+        tracks = self.get_tracks(game)
+        possession = BallAcquisitionDetector().detect_ball_possession(tracks["players"], tracks["ball"])
+        detector = PassAndInterceptionDetector()
+
+        def detect_events():
+            detector.detect_passes(possession, tracks["player_assignment"])
+            detector.detect_interceptions(possession, tracks["player_assignment"])
+
+        yield game.num_frames, detect_events
+
+
+class TacticalViewBenchmark(StageBenchmark):
+    """
+    Keypoint validation, homographies and projection of the players to the tactical view.
+    """
+    name = "tactical_view"
+
+    def prepare(self, game, chunk_size):
+        tracks = self.get_tracks(game)
+        yield game.num_frames, partial(self.get_tactical_positions, tracks)
+
+
+class SpeedAndDistanceBenchmark(StageBenchmark):
+    """
+    Distance, speed and acceleration of every player from their tactical positions.
+    """
+    name = "speed_and_distance"
+
+    def prepare(self, game, chunk_size):
+        positions = self.get_tactical_positions(self.get_tracks(game))
+        converter = TacticalViewConverter(court_image_path=COURT_IMAGE_PATH)
+        calculator = SpeedAndDistanceCalculator(converter.width, converter.height,
+                                                converter.actual_width_in_meters,
+                                                converter.actual_height_in_meters)
+
+        def compute_kinematics():
+            kinematics = calculator.calculate_kinematics(positions, fps=game.fps)
+            kinematics.distance_per_frame()
+            kinematics.speed_per_frame()
+
+        yield game.num_frames, compute_kinematics
+
+
+class DrawersBenchmark(StageBenchmark):
+    """
+    Every overlay of the output video drawn on each frame, as the second pass does.
+    """
+    name = "drawers"
+    unit = "frame"
+
+    def prepare(self, game, chunk_size):
+        tracks = self.get_tracks(game)
+        with synthetic_video(game):
+            pipeline = StreamingPipeline("synthetic_game", None, chunk_size, court_image_path=COURT_IMAGE_PATH)
+        analytics = pipeline.compute_analytics(tracks)
+        compositor = pipeline.build_compositor(tracks, analytics)
+        for frame_offset, frames in game.read_video_chunks(None, chunk_size):
+            for frame_num, frame in enumerate(frames, start=frame_offset):
+                yield 1, partial(compositor.render_frame, frame, frame_num)
+
+
+class EndToEndBenchmark(StageBenchmark):
+    """
+    The streaming pipeline from the first frame read to the last frame encoded.
+    """
+    name = "end_to_end"
+
+    def prepare(self, game, chunk_size):
+        with tempfile.TemporaryDirectory() as output_dir, stub_models(game), synthetic_video(game):
+            pipeline = StreamingPipeline("synthetic_game", os.path.join(output_dir, "output.mp4"), chunk_size,
+                                         court_image_path=COURT_IMAGE_PATH)
+            yield game.num_frames, pipeline.run
+
+
+class StartupBenchmark(StageBenchmark):
+    """
+    Time for a fresh interpreter to get through a command, from launch to exit.
+
+    Imports are cached by the interpreter, so every unit starts a new process.
+    The command covers no frame: compare the latencies, not the throughput.
+    """
+    unit = "process"
+
+    def __init__(self, name, args, repeats=5):
+        """
+        Args:
+            name (str): Name of the benchmark.
+            args (list): Arguments of the Python interpreter, run from the repository root.
+            repeats (int): Processes started per round.
+        """
+        self.name = name
+        self.args = args
+        self.repeats = repeats
+
+    def prepare(self, game, chunk_size):
+        command = [sys.executable] + self.args
+        for _ in range(self.repeats):
+            yield 0, partial(subprocess.run, command, cwd=REPO_DIR, check=True,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+class CachedRunBenchmark(StartupBenchmark):
+    """
+    Time for a fresh process to re-render a video whose detections and team votes are
+    all cached, from launch to its first written frame.
+
+    The game is written to a video file in a scratch folder, next to placeholder weights
+    files, and processed once with the stub models to fill the detection cache. Each unit
+    then runs main.py on it in a new process, which exits on its first written frame.
+    Nothing is stubbed in that process: a cache miss would try to load the placeholder
+    weights and fail.
+    """
+    def __init__(self, name, repeats=5):
+        super().__init__(name, ["-c", CACHED_RUN_CODE], repeats)
+
+    def prepare(self, game, chunk_size):
+        with tempfile.TemporaryDirectory() as work_dir:
+            game.write_video(os.path.join(work_dir, CACHED_VIDEO_NAME))
+            for model_path in (PLAYER_DETECTOR_PATH, HOOP_DETECTOR_PATH, BALL_DETECTOR_PATH,
+                               COURT_KEYPOINT_DETECTOR_PATH):
+                os.makedirs(os.path.join(work_dir, os.path.dirname(model_path)), exist_ok=True)
+                with open(os.path.join(work_dir, model_path), "w") as f:
+                    f.write(model_path)
+            os.symlink(os.path.join(REPO_DIR, "images"), os.path.join(work_dir, "images"))
+
+            # The same run as main.py --chunk_size does, so it fills the entries main.py reads
+            with contextlib.chdir(work_dir), stub_models(game):
+                StreamingPipeline(CACHED_VIDEO_NAME, "warmup.mp4", chunk_size,
+                                  detection_cache=DetectionCache(DETECTION_CACHE_DIR)).run()
+
+            command = ([sys.executable] + self.args +
+                       [CACHED_VIDEO_NAME, "--output_video", "output.mp4", "--chunk_size", str(chunk_size)])
+            for _ in range(self.repeats):
+                yield 0, partial(subprocess.run, command, cwd=work_dir, check=True,
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+BENCHMARKS = [
+    PlayerTrackingBenchmark("player_tracking", "bytetrack"),
+    PlayerTrackingBenchmark("player_tracking_iou_kalman", "iou_kalman"),
+    TeamAssignmentBenchmark(),
+    BallDetectionBenchmark("ball_detection_full", "full"),
+    BallDetectionBenchmark("ball_detection_roi", "roi"),
+    BallTrajectoryBenchmark(),
+    BallAcquisitionBenchmark(),
+    PassDetectionBenchmark(),
+    TacticalViewBenchmark(),
+    SpeedAndDistanceBenchmark(),
+    DrawersBenchmark(),
+    EndToEndBenchmark(),
+    StartupBenchmark("startup_help", ["main.py", "--help"]),
+    CachedRunBenchmark("startup_cached"),
+]
@@ -0,0 +1,273 @@
+"""
+A module of stand-ins for the detection and team classification models.
+
+The stubs answer with the detections a SyntheticGame generated up front, so the
+trackers, the inference scheduler and everything after them run on realistic inputs
+without any model weights. stub_models patches them in where the real models are
+loaded.
+"""
+
+import math
+import sys
+from contextlib import ExitStack
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+sys.path.append('../')
+from configs import PLAYER_DETECTOR_PATH, HOOP_DETECTOR_PATH, BALL_DETECTOR_PATH, COURT_KEYPOINT_DETECTOR_PATH
+from model_registry import ModelRegistry
+from .synthetic_game import PLAYER_CLASS_NAMES, BALL_CLASS_NAMES, COURT_CLASS_NAMES, read_frame_tag
+
+STUB_CLIP_MODEL_NAME = "benchmark-stub-clip"
+
+def is_crop(image):
+    """
+    Whether an image is a view into a larger frame.
+    """
+    return image.base is not None and image.base.shape != image.shape
+
+
+def get_crop_origin(crop):
+    """
+    Find the frame a crop was cut from and where.
+
+    Returns:
+        tuple: (frame index read from the tag of the frame, (x, y) of the crop in it).
+    """
+    frame = crop.base
+    offset = crop.__array_interface__["data"][0] - frame.__array_interface__["data"][0]
+    return read_frame_tag(frame), (offset % frame.strides[0] // frame.strides[1], offset // frame.strides[0])
+
+
+class StubDetector:
+    """
+    Stands in for an ultralytics YOLO model, answering with pre-generated detections.
+
+    Frames are recognised by the index tag of the synthetic game. A letterboxed batch
+    tensor, as sent by the InferenceScheduler, carries no tag: tensors are taken as the
+    frames following the last ones predicted, which is how the scheduler feeds a model.
+    A crop, as searched by the ball tracker, is a view into a tagged frame: it gets the
+    detections of that frame whose center falls inside it, in crop coordinates.
+
+    Attributes:
+        game (SyntheticGame): The game the detections come from.
+        kind (str): "players" (players and hoops), "ball" or "court".
+        names (dict): Class names of the model.
+        overrides (dict): Training arguments, as read by the InferenceScheduler.
+    """
+    def __init__(self, game, kind):
+        self.game = game
+        self.kind = kind
+        self.names = {"players": PLAYER_CLASS_NAMES, "ball": BALL_CLASS_NAMES, "court": COURT_CLASS_NAMES}[kind]
+        self.overrides = {"imgsz": 640}
+        self.next_frame = 0
+
+    def get_frame_numbers(self, source):
+        if isinstance(source, torch.Tensor):
+            frame_nums = list(range(self.next_frame, self.next_frame + len(source)))
+        else:
+            frame_nums = [read_frame_tag(frame) for frame in source]
+        if frame_nums:
+            self.next_frame = frame_nums[-1] + 1
+        return frame_nums
+
+    def predict(self, source, conf=0.25, **kwargs):
+        """
+        Return the detections of the frames, like YOLO.predict.
+
+        Args:
+            source (list or torch.Tensor): Tagged frames, or a letterboxed batch.
+            conf (float): Detections below this confidence are dropped.
+
+        Returns:
+            list: One ultralytics Results per frame.
+        """
+        if isinstance(source, np.ndarray) and source.ndim == 3:
+            source = [source]
+        if not isinstance(source, torch.Tensor) and any(is_crop(image) for image in source):
+            return [self.get_crop_result(image, conf) for image in source]
+        input_shape = tuple(source.shape[2:]) if isinstance(source, torch.Tensor) else None
+        return self.get_results(self.get_frame_numbers(source), conf, input_shape)
+
+    def get_results(self, frame_nums, conf=0.25, input_shape=None):
+        """
+        Build the results of frames by index, without any frame.
+
+        Args:
+            frame_nums (list): Indices of the frames.
+            conf (float): Detections below this confidence are dropped.
+            input_shape (tuple, optional): (height, width) of the letterboxed input the
+                coordinates refer to. Defaults to the frame size.
+
+        Returns:
+            list: One ultralytics Results per frame.
+        """
+        frame_shape = (self.game.height, self.game.width)
+        input_shape = input_shape or frame_shape
+        # Letterboxing scales the frame by gain and pads it on both sides
+        gain = min(input_shape[0] / frame_shape[0], input_shape[1] / frame_shape[1])
+        pad_x = round((input_shape[1] - frame_shape[1] * gain) / 2 - 0.1)
+        pad_y = round((input_shape[0] - frame_shape[0] * gain) / 2 - 0.1)
+        scale = np.array([gain, gain]), np.array([pad_x, pad_y])
+        image = np.broadcast_to(np.zeros((1, 1, 3), dtype=np.uint8), input_shape + (3,))
+        return [self.build_result(frame_num, image, conf, scale) for frame_num in frame_nums]
+
+    def get_crop_result(self, crop, conf=0.25):
+        """
+        Build the result of a crop of a tagged frame.
+
+        Args:
+            crop (numpy.ndarray): View into a frame.
+            conf (float): Detections below this confidence are dropped.
+
+        Returns:
+            Results: Detections inside the crop, in crop coordinates.
+        """
+        frame_num, (x, y) = get_crop_origin(crop)
+        height, width = crop.shape[:2]
+        if self.kind == "players":
+            detections = self.game.get_player_detections(frame_num)
+        else:
+            detections = self.game.get_ball_detections(frame_num)
+        centers = (detections[:, :2] + detections[:, 2:4]) / 2
+        inside = ((centers >= (x, y)) & (centers < (x + width, y + height))).all(axis=1)
+        detections = detections[inside & (detections[:, 4] >= conf)].copy()
+        detections[:, [0, 2]] = np.clip(detections[:, [0, 2]] - x, 0, width)
+        detections[:, [1, 3]] = np.clip(detections[:, [1, 3]] - y, 0, height)
+        image = np.broadcast_to(np.zeros((1, 1, 3), dtype=np.uint8), crop.shape)
+        return Results(image, path=f"synthetic_{frame_num}", names=self.names,
+                       boxes=torch.from_numpy(detections).float())
+
+    def build_result(self, frame_num, image, conf, scale):
+        gain, pad = scale
+        boxes = None
+        keypoints = None
+        if self.kind == "court":
+            keypoints = self.game.keypoints[frame_num].copy()
+            detected = keypoints[:, 2] > 0
+            keypoints[detected, :2] = keypoints[detected, :2] * gain + pad
+            keypoints = torch.from_numpy(keypoints[None]).float()
+        else:
+            if self.kind == "players":
+                detections = self.game.get_player_detections(frame_num)
+            else:
+                detections = self.game.get_ball_detections(frame_num)
+            detections = detections[detections[:, 4] >= conf].copy()
+            detections[:, :4] = detections[:, :4] * np.tile(gain, 2) + np.tile(pad, 2)
+            boxes = torch.from_numpy(detections).float()
+        return Results(image, path=f"synthetic_{frame_num}", names=self.names, boxes=boxes, keypoints=keypoints)
+
+
+class StubDetectorFactory:
+    """
+    Replaces load_detector: builds the stub of the model a weights path stands for.
+    """
+    def __init__(self, game):
+        self.game = game
+        self.kinds = {
+            PLAYER_DETECTOR_PATH: "players",
+            HOOP_DETECTOR_PATH: "players",
+            BALL_DETECTOR_PATH: "ball",
+            COURT_KEYPOINT_DETECTOR_PATH: "court",
+        }
+
+    def __call__(self, model_path, backend=None):
+        if model_path not in self.kinds:
+            raise ValueError(f"No stub model for {model_path}")
+        return StubDetector(self.game, self.kinds[model_path])
+
+
+class StubClipProcessor:
+    """
+    Stands in for the CLIP processor: the image preprocessing settings and a tokenizer
+    that only tells the two team prompts apart.
+    """
+    def __init__(self):
+        self.image_processor = SimpleNamespace(
+            crop_size={"height": 224, "width": 224},
+            size={"shortest_edge": 224},
+            image_mean=[0.48145466, 0.4578275, 0.40821073],
+            image_std=[0.26862954, 0.26130258, 0.27577711],
+        )
+
+    @classmethod
+    def from_pretrained(cls, model_name):
+        return cls()
+
+    def __call__(self, text, return_tensors="pt", padding=True):
+        return {"input_ids": torch.tensor([[1.0 if "white" in prompt else 0.0] for prompt in text])}
+
+
+class StubClipModel:
+    """
+    Stands in for CLIP: the embedding of an image is its mean normalised color, which
+    points towards (1, 1, 1) for white shirts and away from it for dark ones.
+    """
+    def __init__(self):
+        self.logit_scale = torch.tensor(math.log(100.0))
+
+    @classmethod
+    def from_pretrained(cls, model_name):
+        return cls()
+
+    def eval(self):
+        return self
+
+    def get_text_features(self, input_ids, **kwargs):
+        light = torch.tensor([1.0, 1.0, 1.0])
+        dark = torch.tensor([-1.0, -1.0, 0.0])
+        return torch.where(input_ids > 0, light, dark)
+
+    def get_image_features(self, pixel_values):
+        return pixel_values.mean(dim=(2, 3))
+
+
+def load_stub_clip_model(model_name):
+    """
+    Replaces load_clip_model.
+    """
+    return StubClipModel.from_pretrained(model_name).eval(), StubClipProcessor.from_pretrained(model_name)
+
+
+def stub_models(game):
+    """
+    Patch the stub models in place of YOLO and CLIP.
+
+    The text embeddings of the stub CLIP are cached under their own model name, apart
+    from those of the real model. The stubs go into a model registry of their own, where
+    the weights, which need not exist, are identified by their path.
+
+    Args:
+        game (SyntheticGame): The game the stub detectors answer from.
+
+    Returns:
+        ExitStack: Context manager undoing the patches on exit.
+    """
+    stack = ExitStack()
+    factory = StubDetectorFactory(game)
+    stack.enter_context(mock.patch("model_registry.model_registry._registry", ModelRegistry()))
+    stack.enter_context(mock.patch("model_registry.model_registry.load_detector", factory))
+    stack.enter_context(mock.patch("model_registry.model_registry.hash_file", lambda path, memo_path=None: path))
+    stack.enter_context(mock.patch("appearance_embedding.appearance_embedder.load_clip_model", load_stub_clip_model))
+    stack.enter_context(mock.patch("appearance_embedding.appearance_embedder.CLIP_MODEL_NAME", STUB_CLIP_MODEL_NAME))
+    return stack
+
+
+def synthetic_video(game):
+    """
+    Patch the video reading of the streaming pipeline to render the game instead.
+
+    Args:
+        game (SyntheticGame): The game read as the input video.
+
+    Returns:
+        ExitStack: Context manager undoing the patches on exit.
+    """
+    stack = ExitStack()
+    stack.enter_context(mock.patch("pipeline.streaming_pipeline.read_video_chunks", game.read_video_chunks))
+    stack.enter_context(mock.patch("pipeline.streaming_pipeline.get_video_properties", game.get_video_properties))
+    return stack
@@ -0,0 +1,427 @@
+"""
+A module for generating synthetic basketball games with a known ground truth.
+
+Players walk around a court seen by a slowly panning camera and pass the ball to each
+other. Everything a detector would report (player, hoop and ball boxes, court keypoints)
+is generated up front from the same random seed, and frames are only rendered when
+they are read, so a long or high resolution game costs one window of frames in memory.
+
+Every rendered frame carries its own index in its top left pixel, which is how the stub
+models find the detections of the frames they are given.
+"""
+
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.append('../')
+from core.ball import Ball
+from core.hoop import Hoop
+from core.player import Player
+from core.track_store import TrackStore, TrackBBoxView, PlayerRoster
+from model_registry import FrameKeypoints
+from tactical_view_converter import TacticalViewConverter
+
+PLAYER_CLASS_NAMES = {0: "Player", 1: "Hoop"}
+BALL_CLASS_NAMES = {0: "Ball"}
+COURT_CLASS_NAMES = {0: "Court"}
+
+# BGR colors, the team colors match the default TeamAssigner prompts
+TEAM_COLORS = {1: (240, 240, 240), 2: (110, 40, 15)}
+SKIN_COLOR = (120, 160, 205)
+COURT_COLOR = (80, 140, 200)
+CROWD_COLOR = (60, 55, 50)
+LINE_COLOR = (235, 235, 235)
+HOOP_COLOR = (30, 70, 230)
+BALL_COLOR = (20, 100, 230)
+
+
+def tag_frame(frame, frame_num):
+    """
+    Write the frame index into the top left pixel of a frame.
+    """
+    frame[0, 0] = (frame_num & 255, (frame_num >> 8) & 255, (frame_num >> 16) & 255)
+
+
+def read_frame_tag(frame):
+    """
+    Read back the frame index written by tag_frame.
+    """
+    blue, green, red = (int(value) for value in frame[0, 0])
+    return blue | (green << 8) | (red << 16)
+
+
+def apply_homography(homography, points):
+    """
+    Project (..., 2) points with a 3x3 homography.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    projected = points @ homography[:, :2].T + homography[:, 2]
+    return projected[..., :2] / projected[..., 2:]
+
+
+class SyntheticGame:
+    """
+    A generated game: ground truth tracks, detections and lazily rendered frames.
+
+    Attributes:
+        num_frames (int): Length of the game.
+        width (int): Frame width in pixels.
+        height (int): Frame height in pixels.
+        num_tracks (int): Number of players, split evenly between the two teams.
+        ball_visibility (float): Probability that the ball is detected on a frame.
+        keypoint_dropout (float): Probability that a visible court keypoint is missed.
+        fps (float): Frame rate of the game.
+        seed (int): Seed of every random choice.
+        player_bboxes (numpy.ndarray): (num_frames, num_tracks, 4) player boxes.
+        player_teams (numpy.ndarray): Team (1 or 2) of each player.
+        ball_bboxes (numpy.ndarray): (num_frames, 4) ball box, whether detected or not.
+        ball_visible (numpy.ndarray): Frames on which the ball is detected.
+        ball_holders (numpy.ndarray): Player index holding the ball per frame, -1 in flight.
+        hoop_bboxes (numpy.ndarray): (num_frames, 2, 4) left and right hoop boxes.
+        keypoints (numpy.ndarray): (num_frames, K, 3) court keypoints with their confidence,
+            zero for the missed ones.
+    """
+    def __init__(self, num_frames=300, width=1280, height=720, num_tracks=10, ball_visibility=0.85,
+                 keypoint_dropout=0.15, fps=30, seed=0):
+        self.num_frames = num_frames
+        self.width = width
+        self.height = height
+        self.num_tracks = num_tracks
+        self.ball_visibility = ball_visibility
+        self.keypoint_dropout = keypoint_dropout
+        self.fps = fps
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
+        converter = TacticalViewConverter(court_image_path=None)
+        self.tactical_scale = np.array([converter.width / converter.actual_width_in_meters,
+                                        converter.height / converter.actual_height_in_meters])
+        self.court_size = np.array([converter.actual_width_in_meters, converter.actual_height_in_meters])
+        self.tactical_key_points = np.array(converter.key_points, dtype=np.float64)
+
+        # The camera pans over a background wider than the frame
+        self.max_pan = max(1, int(0.05 * width))
+        self.court_top, self.court_bottom = 0.32 * height, 0.95 * height
+        self.court_homography = self.build_court_homography(converter.width, converter.height)
+        self.pan = np.round(self.max_pan * np.sin(2 * np.pi * np.arange(num_frames) / (10 * fps))).astype(np.int64)
+
+        self.player_teams = np.where(np.arange(num_tracks) < (num_tracks + 1) // 2, 1, 2)
+        self.player_positions = self.generate_player_positions()
+        self.player_bboxes = self.get_player_bboxes(self.player_positions)
+        self.player_confidence = self.rng.uniform(0.6, 0.95, (num_frames, num_tracks))
+        self.ball_holders = self.generate_ball_holders()
+        self.ball_bboxes = self.get_ball_bboxes()
+        self.ball_visible = self.rng.random(num_frames) < ball_visibility
+        self.hoop_bboxes = self.get_hoop_bboxes()
+        self.keypoints = self.get_keypoints()
+        self.background = self.render_background()
+
+    def get_config(self):
+        """
+        Parameters the game was generated from, enough to generate it again.
+
+        Returns:
+            dict: JSON serialisable parameters.
+        """
+        return {
+            "num_frames": self.num_frames,
+            "width": self.width,
+            "height": self.height,
+            "num_tracks": self.num_tracks,
+            "ball_visibility": self.ball_visibility,
+            "keypoint_dropout": self.keypoint_dropout,
+            "fps": self.fps,
+            "seed": self.seed,
+        }
+
+    def build_court_homography(self, tactical_width, tactical_height):
+        # Tactical view corners to a trapezoid on the panorama, far sideline at the top
+        source = np.float32([[0, 0], [tactical_width, 0], [tactical_width, tactical_height], [0, tactical_height]])
+        left, right = self.max_pan, self.max_pan + self.width
+        target = np.float32([[left + 0.14 * self.width, self.court_top],
+                             [right - 0.14 * self.width, self.court_top],
+                             [right - 0.01 * self.width, self.court_bottom],
+                             [left + 0.01 * self.width, self.court_bottom]])
+        return cv2.getPerspectiveTransform(source, target).astype(np.float64)
+
+    def get_frame_shift(self, frame_nums):
+        # Panorama x minus frame x
+        return self.max_pan - self.pan[frame_nums]
+
+    def project_meters(self, positions, frame_nums):
+        """
+        Project court positions in meters to frame pixels.
+
+        Args:
+            positions (numpy.ndarray): (num_frames, N, 2) positions in meters.
+            frame_nums (numpy.ndarray): Frame of each row of positions.
+
+        Returns:
+            numpy.ndarray: (num_frames, N, 2) pixel positions.
+        """
+        points = apply_homography(self.court_homography, positions * self.tactical_scale)
+        points[..., 0] -= self.get_frame_shift(frame_nums)[:, None]
+        return points
+
+    def generate_player_positions(self):
+        """
+        Walk every player towards random targets on the court, at most 6 m/s.
+
+        Returns:
+            numpy.ndarray: (num_frames, num_tracks, 2) positions in meters.
+        """
+        margin = 0.5
+        low, high = np.array([margin, margin]), self.court_size - margin
+        position = self.rng.uniform(low, high, (self.num_tracks, 2))
+        target = self.rng.uniform(low, high, (self.num_tracks, 2))
+        speed = self.rng.uniform(1.0, 6.0, self.num_tracks) / self.fps
+
+        positions = np.empty((self.num_frames, self.num_tracks, 2))
+        for frame_num in range(self.num_frames):
+            step = target - position
+            distance = np.hypot(step[:, 0], step[:, 1])
+            arrived = distance <= speed
+            position = np.where(arrived[:, None], target,
+                                position + step * (speed / np.maximum(distance, 1e-9))[:, None])
+            if arrived.any():
+                target[arrived] = self.rng.uniform(low, high, (int(arrived.sum()), 2))
+                speed[arrived] = self.rng.uniform(1.0, 6.0, int(arrived.sum())) / self.fps
+            positions[frame_num] = position
+        return positions
+
+    def get_player_bboxes(self, positions):
+        feet = self.project_meters(positions, np.arange(self.num_frames))
+        # Players further up the frame are further from the camera, so smaller
+        depth = np.clip((feet[..., 1] - self.court_top) / (self.court_bottom - self.court_top), 0, 1)
+        box_height = self.height * (0.16 + 0.14 * depth)
+        box_width = 0.4 * box_height
+        return np.stack([feet[..., 0] - box_width / 2, feet[..., 1] - box_height,
+                         feet[..., 0] + box_width / 2, feet[..., 1]], axis=-1)
+
+    def generate_ball_holders(self):
+        """
+        Pass the ball around: each holder keeps it one to three seconds, then it flies to a
+        teammate, or one time in five to the other team.
+
+        Returns:
+            numpy.ndarray: Player index holding the ball per frame, -1 while in flight.
+        """
+        holders = np.full(self.num_frames, -1, dtype=np.int64)
+        holder = int(self.rng.integers(self.num_tracks))
+        frame_num = 0
+        while frame_num < self.num_frames:
+            hold = int(self.rng.integers(self.fps, 3 * self.fps))
+            holders[frame_num:frame_num + hold] = holder
+            frame_num += hold + int(self.rng.integers(max(1, self.fps // 4), max(2, self.fps // 2)))
+            same_team = self.rng.random() < 0.8
+            candidates = np.flatnonzero((self.player_teams == self.player_teams[holder]) == same_team)
+            candidates = candidates[candidates != holder]
+            if len(candidates):
+                holder = int(self.rng.choice(candidates))
+        return holders
+
+    def get_ball_bboxes(self):
+        # Held in the hand of the holder, flying in an arc between two holders
+        frames = np.arange(self.num_frames)
+        bboxes = self.player_bboxes
+        box_width = bboxes[..., 2] - bboxes[..., 0]
+        hands = np.stack([bboxes[..., 2] - 0.15 * box_width,
+                          bboxes[..., 1] + 0.45 * (bboxes[..., 3] - bboxes[..., 1])], axis=-1)
+
+        held = self.ball_holders >= 0
+        centers = np.zeros((self.num_frames, 2))
+        centers[held] = hands[frames[held], self.ball_holders[held]]
+        held_frames = frames[held]
+        if len(held_frames) and not held.all():
+            flying = frames[~held]
+            before = np.clip(np.searchsorted(held_frames, flying) - 1, 0, len(held_frames) - 1)
+            after = np.minimum(before + 1, len(held_frames) - 1)
+            release, catch = held_frames[before], held_frames[after]
+            progress = np.clip((flying - release) / np.maximum(catch - release, 1), 0, 1)
+            centers[flying] = (centers[release] + (centers[catch] - centers[release]) * progress[:, None])
+            centers[flying, 1] -= 0.08 * self.height * 4 * progress * (1 - progress)
+
+        radius = 0.012 * self.height
+        return np.concatenate([centers - radius, centers + radius], axis=1)
+
+    def get_hoop_bboxes(self):
+        baskets = np.array([[1.575, 7.5], [self.court_size[0] - 1.575, 7.5]])
+        feet = self.project_meters(np.broadcast_to(baskets, (self.num_frames, 2, 2)), np.arange(self.num_frames))
+        half_width, half_height = 0.022 * self.width, 0.018 * self.height
+        centers_y = feet[..., 1] - 0.22 * self.height
+        return np.stack([feet[..., 0] - half_width, centers_y - half_height,
+                         feet[..., 0] + half_width, centers_y + half_height], axis=-1)
+
+    def get_keypoints(self):
+        points = apply_homography(self.court_homography, self.tactical_key_points)
+        points = np.repeat(points[None], self.num_frames, axis=0)
+        points[..., 0] -= self.get_frame_shift(np.arange(self.num_frames))[:, None]
+        inside = ((points[..., 0] > 0) & (points[..., 0] < self.width)
+                  & (points[..., 1] > 0) & (points[..., 1] < self.height))
+        detected = inside & (self.rng.random(inside.shape) >= self.keypoint_dropout)
+        keypoints = np.zeros(points.shape[:2] + (3,))
+        keypoints[..., :2] = np.where(detected[..., None], points, 0)
+        keypoints[..., 2] = np.where(detected, 0.9, 0.0)
+        return keypoints
+
+    def render_background(self):
+        """
+        Draw the crowd, the court and its lines on a panorama covering the whole pan.
+        """
+        panorama_width = self.width + 2 * self.max_pan
+        background = np.empty((self.height, panorama_width, 3), dtype=np.uint8)
+        background[:] = COURT_COLOR
+        background[:int(self.court_top)] = CROWD_COLOR
+        # Texture, so the camera motion estimator has features to follow
+        noise = self.rng.integers(-25, 26, (self.height, panorama_width, 1), dtype=np.int16)
+        background[:] = np.clip(background.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+        width, height = self.court_size
+        lines = [
+            [[0, 0], [width, 0], [width, height], [0, height]],
+            [[width / 2, 0], [width / 2, height]],
+            [[0, 5.18], [5.79, 5.18], [5.79, 10], [0, 10]],
+            [[width, 5.18], [width - 5.79, 5.18], [width - 5.79, 10], [width, 10]],
+        ]
+        for line in lines:
+            points = apply_homography(self.court_homography, np.array(line) * self.tactical_scale)
+            cv2.polylines(background, [np.round(points).astype(np.int32)], len(line) == 4, LINE_COLOR,
+                          thickness=max(1, self.height // 240))
+        return background
+
+    def render_frame(self, frame_num):
+        """
+        Draw one frame of the game.
+
+        Args:
+            frame_num (int): Index of the frame.
+
+        Returns:
+            numpy.ndarray: BGR frame, tagged with its index.
+        """
+        shift = int(self.get_frame_shift(frame_num))
+        frame = self.background[:, shift:shift + self.width].copy()
+
+        thickness = max(1, self.height // 180)
+        for x1, y1, x2, y2 in np.round(self.hoop_bboxes[frame_num]).astype(int):
+            cv2.rectangle(frame, (x1, y1), (x2, y2), HOOP_COLOR, thickness)
+
+        # Far players first, so near players are drawn over them
+        bboxes = self.player_bboxes[frame_num]
+        for player in np.argsort(bboxes[:, 3]):
+            x1, y1, x2, y2 = np.round(bboxes[player]).astype(int)
+            head = y1 + (y2 - y1) // 7
+            cv2.rectangle(frame, (x1, head), (x2, y2), TEAM_COLORS[int(self.player_teams[player])], -1)
+            cv2.rectangle(frame, (x1 + (x2 - x1) // 4, y1), (x2 - (x2 - x1) // 4, head), SKIN_COLOR, -1)
+
+        x1, y1, x2, y2 = self.ball_bboxes[frame_num]
+        cv2.circle(frame, (int(round((x1 + x2) / 2)), int(round((y1 + y2) / 2))),
+                   max(1, int(round((x2 - x1) / 2))), BALL_COLOR, -1)
+
+        tag_frame(frame, frame_num)
+        return frame
+
+    def read_video_chunks(self, video_path, chunk_size, start_frame=0, end_frame=None):
+        """
+        Render the game in windows, with the signature of utils.read_video_chunks.
+
+        Yields:
+            tuple: (frame_offset, frames), frame_offset counted from start_frame.
+        """
+        end_frame = self.num_frames if end_frame is None else min(end_frame, self.num_frames)
+        for window_start in range(start_frame, end_frame, chunk_size):
+            window_end = min(window_start + chunk_size, end_frame)
+            yield window_start - start_frame, [self.render_frame(frame_num)
+                                               for frame_num in range(window_start, window_end)]
+
+    def write_video(self, video_path, chunk_size=64):
+        """
+        Write the game to a video file, losslessly so the frame tags survive.
+
+        Args:
+            video_path (str): Path of the AVI file to write.
+            chunk_size (int): Frames rendered at once.
+        """
+        writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"HFYU"), self.fps, (self.width, self.height))
+        try:
+            for _, frames in self.read_video_chunks(None, chunk_size):
+                for frame in frames:
+                    writer.write(frame)
+        finally:
+            writer.release()
+
+    def get_video_properties(self, video_path, default_fps=24):
+        """
+        Properties of the game, with the signature of utils.get_video_properties.
+        """
+        return {"fps": self.fps, "width": self.width, "height": self.height, "frame_count": self.num_frames}
+
+    def get_player_detections(self, frame_num):
+        """
+        Output of the player and hoop detector on a frame.
+
+        Returns:
+            numpy.ndarray: (N, 6) rows of x1, y1, x2, y2, confidence, class id.
+        """
+        players = np.concatenate([self.player_bboxes[frame_num], self.player_confidence[frame_num, :, None],
+                                  np.zeros((self.num_tracks, 1))], axis=1)
+        hoops = np.concatenate([self.hoop_bboxes[frame_num], np.full((2, 1), 0.8), np.ones((2, 1))], axis=1)
+        return np.concatenate([players, hoops])
+
+    def get_ball_detections(self, frame_num):
+        """
+        Output of the ball detector on a frame: one row, or none when the ball is missed.
+        """
+        if not self.ball_visible[frame_num]:
+            return np.zeros((0, 6))
+        return np.concatenate([self.ball_bboxes[frame_num], [0.8, 0.0]])[None]
+
+    def build_tracks(self, keyframe_interval=1):
+        """
+        The ground truth in the form StreamingPipeline.analyse_video returns it.
+
+        Args:
+            keyframe_interval (int): Court keypoints are given every this many frames and
+                None on the others, like the keyframe mode of the keypoint detector.
+
+        Returns:
+            dict: Players, ball, baskets, court keypoints, camera motion and player assignment.
+        """
+        frames = np.repeat(np.arange(self.num_frames), self.num_tracks)
+        track_ids = np.tile(np.arange(1, self.num_tracks + 1), self.num_frames)
+        store = TrackStore.from_arrays(frames, track_ids, np.zeros(len(frames)),
+                                       self.player_bboxes.reshape(-1, 4))
+        players = PlayerRoster(store)
+        for track_id in range(1, self.num_tracks + 1):
+            players[track_id] = Player(track_id, track_id)
+            players[track_id].bboxs_per_frame = TrackBBoxView(store, track_id)
+
+        ball = Ball()
+        for frame_num in np.flatnonzero(self.ball_visible).tolist():
+            ball.add_bbox(frame_num, self.ball_bboxes[frame_num].tolist())
+        left_hoop, right_hoop = Hoop(label="left"), Hoop(label="right")
+        for frame_num in range(self.num_frames):
+            left_hoop.add_bbox(frame_num, self.hoop_bboxes[frame_num, 0].tolist())
+            right_hoop.add_bbox(frame_num, self.hoop_bboxes[frame_num, 1].tolist())
+
+        court_keypoints = [None] * self.num_frames
+        for frame_num in range(0, self.num_frames, keyframe_interval):
+            court_keypoints[frame_num] = FrameKeypoints(self.keypoints[frame_num][None].astype(np.float32),
+                                                        (self.height, self.width))
+        camera_motion = [None]
+        for frame_num in range(1, self.num_frames):
+            motion = np.eye(3)
+            motion[0, 2] = self.pan[frame_num] - self.pan[frame_num - 1]
+            camera_motion.append(motion)
+
+        teams = {track_id: int(team) for track_id, team in enumerate(self.player_teams.tolist(), start=1)}
+        return {
+            "players": players,
+            "ball": ball,
+            "baskets": (left_hoop, right_hoop),
+            "court_keypoints": court_keypoints,
+            "camera_motion": camera_motion,
+            "player_assignment": [dict(teams) for _ in range(self.num_frames)],
+        }
@@ -0,0 +1,164 @@
+"""
+A module for comparing the multi-object trackers on the same player detections.
+
+The detections come from the ground truth of a synthetic game, with their boxes
+jittered and some of them dropped, as a detector would. Every tracker is fed the same
+detections, frame by frame. Its cost is the time of each update, and its quality the
+number of id switches: a player is switched when the track id it gets differs from the
+one it had on the last frame it was tracked.
+
+Usage:
+    python -m benchmarks.tracker_comparison [--trackers TRACKER ...] [--frames N]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import supervision as sv
+
+import sys
+sys.path.append('../')
+from object_trackers import build_tracker, TRACKER_TYPES
+from object_trackers.iou_kalman_tracker import box_iou_matrix
+from .synthetic_game import SyntheticGame
+
+
+def get_noisy_detections(game, jitter=0.03, dropout=0.05, seed=0):
+    """
+    Player detections of every frame of a game, with the errors of a detector.
+
+    Args:
+        game (SyntheticGame): The game.
+        jitter (float): Standard deviation of the box coordinate noise, relative to the box height.
+        dropout (float): Probability that a player is not detected on a frame.
+        seed (int): Seed of the noise, so every tracker gets the same detections.
+
+    Returns:
+        list of tuple: Per frame, (supervision.Detections, player index of each detection).
+    """
+    rng = np.random.default_rng(seed)
+    detections = []
+    for frame_num in range(game.num_frames):
+        players = np.flatnonzero(rng.random(game.num_tracks) >= dropout)
+        boxes = game.player_bboxes[frame_num, players]
+        heights = (boxes[:, 3] - boxes[:, 1])[:, None]
+        boxes = boxes + rng.normal(0, jitter, boxes.shape) * heights
+        detections.append((sv.Detections(xyxy=boxes.astype(np.float32),
+                                         confidence=game.player_confidence[frame_num, players].astype(np.float32),
+                                         class_id=np.zeros(len(players), dtype=int)), players))
+    return detections
+
+
+def count_id_switches(tracked_players):
+    """
+    Count the id switches and the tracked share of the players.
+
+    Args:
+        tracked_players (list): Per frame, dict of player index -> track id of the tracked players.
+
+    Returns:
+        tuple: (number of id switches, number of distinct track ids, player boxes tracked).
+    """
+    last_track_ids = {}
+    switches = 0
+    tracked = 0
+    track_ids = set()
+    for players in tracked_players:
+        for player, track_id in players.items():
+            if player in last_track_ids and last_track_ids[player] != track_id:
+                switches += 1
+            last_track_ids[player] = track_id
+            track_ids.add(track_id)
+        tracked += len(players)
+    return switches, len(track_ids), tracked
+
+
+def evaluate_tracker(tracker_type, game, detections):
+    """
+    Run one tracker over the detections of a game.
+
+    Args:
+        tracker_type (str): Tracker to build, see build_tracker.
+        game (SyntheticGame): The game, rendered for the trackers that need the frames.
+        detections (list): Output of get_noisy_detections.
+
+    Returns:
+        dict: Per frame latencies in milliseconds, id switches, distinct track ids and the
+            share of the detected players that were tracked.
+    """
+    tracker = build_tracker(tracker_type)
+    durations = []
+    tracked_players = []
+    for frame_num, (frame_detections, players) in enumerate(detections):
+        frame = game.render_frame(frame_num) if tracker.needs_frames else None
+        start = time.perf_counter()
+        tracked = tracker.update(frame_detections, frame, frame_num)
+        durations.append(time.perf_counter() - start)
+
+        # The trackers report detection boxes: the best overlap gives back the player
+        matched = {}
+        if len(tracked) and len(players):
+            iou = box_iou_matrix(tracked.xyxy.astype(np.float64), frame_detections.xyxy.astype(np.float64))
+            for row, track_id in enumerate(tracked.tracker_id.tolist()):
+                matched[int(players[np.argmax(iou[row])])] = track_id
+        tracked_players.append(matched)
+
+    switches, num_tracks, tracked = count_id_switches(tracked_players)
+    durations_ms = np.array(durations) * 1000
+    detected = sum(len(players) for _, players in detections)
+    return {
+        "mean_ms": float(durations_ms.mean()),
+        "p90_ms": float(np.percentile(durations_ms, 90)),
+        "id_switches": switches,
+        "track_ids": num_tracks,
+        "tracked_share": tracked / max(1, detected),
+    }
+
+
+def format_comparison(results):
+    """
+    Format the results of evaluate_tracker as a table.
+
+    Args:
+        results (dict): Tracker type -> results.
+
+    Returns:
+        str: The table.
+    """
+    lines = [f"{'tracker':<12} {'mean ms':>9} {'p90 ms':>9} {'id switches':>12} {'track ids':>10} {'tracked':>8}"]
+    for tracker_type, result in results.items():
+        lines.append(f"{tracker_type:<12} {result['mean_ms']:>9.3f} {result['p90_ms']:>9.3f} "
+                     f"{result['id_switches']:>12} {result['track_ids']:>10} {result['tracked_share']:>8.1%}")
+    return "\n".join(lines)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Compare the cost and id switches of the player trackers')
+    parser.add_argument('--trackers', nargs='+', choices=TRACKER_TYPES, default=list(TRACKER_TYPES),
+                        help='Trackers to compare (default: all)')
+    parser.add_argument('--frames', type=int, default=300, help='Length of the synthetic game')
+    parser.add_argument('--tracks', type=int, default=10, help='Number of players')
+    parser.add_argument('--jitter', type=float, default=0.03,
+                        help='Box noise, relative to the box height')
+    parser.add_argument('--dropout', type=float, default=0.05,
+                        help='Probability that a player is not detected on a frame')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the game and of the detection noise')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    game = SyntheticGame(num_frames=args.frames, num_tracks=args.tracks, seed=args.seed)
+    detections = get_noisy_detections(game, args.jitter, args.dropout, args.seed)
+    results = {}
+    for tracker_type in args.trackers:
+        try:
+            results[tracker_type] = evaluate_tracker(tracker_type, game, detections)
+        except ImportError as e:
+            print(f"Skipping {tracker_type}: {e}")
+    print(format_comparison(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -1 +1 @@
-from .configs import HOOP_DETECTOR_PATH, STUBS_DEFAULT_PATH,PLAYER_DETECTOR_PATH,BALL_DETECTOR_PATH,COURT_KEYPOINT_DETECTOR_PATH,OUTPUT_VIDEO_PATH
\ No newline at end of file
+from .configs import HOOP_DETECTOR_PATH, STUBS_DEFAULT_PATH,PLAYER_DETECTOR_PATH,BALL_DETECTOR_PATH,COURT_KEYPOINT_DETECTOR_PATH,OUTPUT_VIDEO_PATH,VIDEO_WRITER_QUEUE_SIZE,OUTPUT_VIDEO_CRF,DECODER_BUFFER_SIZE,SEEK_INDEX_DIR,DETECTION_CACHE_DIR,DETECTION_CACHE_MAX_BYTES,INFERENCE_BATCH_SIZE,INFERENCE_THREADS,COURT_KEYFRAME_INTERVAL,COURT_KEYFRAME_MOTION_THRESHOLD,TEXT_EMBEDDING_CACHE_DIR,BALL_MAX_SPEED,BALL_MAX_GAP_FRAMES,BALL_SMOOTHING,LIVE_LATENCY_BUDGET,LIVE_MICRO_BATCH_SIZE,LIVE_MAX_SKIPPED_FRAMES,SHARD_WORKERS,SHARD_OVERLAP_FRAMES,SHARD_MIN_IOU,SHARD_CHUNK_SIZE,DETECTOR_BACKEND,ONNX_INTRA_OP_THREADS,BALL_DETECTION_MODE,BALL_ROI_SIZE,BALL_ROI_MAX_MISSES,BALL_ROI_FALLBACK,BALL_ROI_BATCH_SIZE,PLAYER_TRACKER,IOU_TRACKER_IOU_THRESHOLD,IOU_TRACKER_MAX_AGE,IOU_TRACKER_MIN_HITS,IOU_TRACKER_MATCHING,APPEARANCE_BATCH_SIZE,APPEARANCE_CACHE_SIZE,FRAME_STORE_DIR
\ No newline at end of file
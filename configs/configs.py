@@ -3,4 +3,40 @@ PLAYER_DETECTOR_PATH = 'models/player_detector.pt'
 HOOP_DETECTOR_PATH = 'models/player_detector.pt'
 BALL_DETECTOR_PATH = 'models/ball_detector_model.pt'
 COURT_KEYPOINT_DETECTOR_PATH = 'models/court_keypoint_detector.pt'
-OUTPUT_VIDEO_PATH = 'output_videos/output_video_1.avi'
\ No newline at end of file
+OUTPUT_VIDEO_PATH = 'output_videos/output_video_1.mp4'
+VIDEO_WRITER_QUEUE_SIZE = 32  # frames waiting for the background encoder
+OUTPUT_VIDEO_CRF = 23  # x264 quality when ffmpeg is available, lower is better
+DECODER_BUFFER_SIZE = 64  # frames decoded ahead of the pipeline
+SEEK_INDEX_DIR = 'cache/seek_index'
+FRAME_STORE_DIR = 'cache/frames'  # raw decoded frames of --frame_store runs, deleted when the run ends
+DETECTION_CACHE_DIR = 'cache/detections'
+DETECTION_CACHE_MAX_BYTES = 20 * 1024 ** 3  # least recently used entries are evicted above this
+INFERENCE_BATCH_SIZE = 20  # frames sent to every detector at once
+INFERENCE_THREADS = None  # CPU threads shared by the detectors, None for all cores
+COURT_KEYFRAME_INTERVAL = 10  # court keypoints are detected on every Nth frame
+COURT_KEYFRAME_MOTION_THRESHOLD = 40.0  # camera motion in pixels that forces an earlier keyframe
+TEXT_EMBEDDING_CACHE_DIR = 'cache/text_embeddings'  # CLIP embeddings of the team prompts
+BALL_MAX_SPEED = 25  # pixels per frame, faster ball detections are rejected as spikes
+BALL_MAX_GAP_FRAMES = 30  # longer runs without a ball are left empty instead of interpolated
+BALL_SMOOTHING = False  # Kalman / RTS smoothing of the ball trajectory
+LIVE_LATENCY_BUDGET = 0.5  # seconds from capture to annotated output in live mode
+LIVE_MICRO_BATCH_SIZE = 4  # frames processed at once in live mode
+LIVE_MAX_SKIPPED_FRAMES = 15  # detection runs at least this often, even over budget
+SHARD_WORKERS = None  # processes of the sharded mode, None for one per core
+SHARD_OVERLAP_FRAMES = 60  # frames shared by consecutive segments, used to stitch tracks
+SHARD_MIN_IOU = 0.5  # mean overlap IoU above which two tracks are stitched
+SHARD_CHUNK_SIZE = 256  # window size of each segment when --chunk_size is not set
+DETECTOR_BACKEND = 'onnx'  # 'onnx' runs the YOLO detectors with ONNX Runtime, 'torch' with PyTorch
+ONNX_INTRA_OP_THREADS = 0  # threads of a session run outside the InferenceScheduler, 0 for one per physical core
+BALL_DETECTION_MODE = 'full'  # 'full' detects on whole frames, 'roi' searches a window around the predicted ball (faster, recall not yet measured)
+BALL_ROI_SIZE = 320  # side in frame pixels of the window searched for the ball, fed to the model unscaled
+BALL_ROI_MAX_MISSES = 10  # frames without the ball before the whole frame is scanned again
+BALL_ROI_FALLBACK = 'full'  # scan of a lost ball: 'full' frame, or 'tiles' of BALL_ROI_SIZE
+BALL_ROI_BATCH_SIZE = 4  # frames whose windows are predicted ahead and sent to the model at once
+PLAYER_TRACKER = 'bytetrack'  # 'bytetrack', 'deepsort', or 'iou_kalman' for the lightest CPU tracker
+IOU_TRACKER_IOU_THRESHOLD = 0.3  # least IoU between a predicted track box and a detection to match them
+IOU_TRACKER_MAX_AGE = 30  # frames a track is kept without a matching detection
+IOU_TRACKER_MIN_HITS = 3  # matched frames before a track is reported
+IOU_TRACKER_MATCHING = 'greedy'  # 'greedy' best IoU first, or 'hungarian' optimal assignment
+APPEARANCE_BATCH_SIZE = 32  # player crops sent to the appearance embedding model at once
+APPEARANCE_CACHE_SIZE = 4096  # float16 appearance embeddings kept, about 4 MB with CLIP's 512 dimensions
@@ -0,0 +1,167 @@
+import numpy as np
+
+
+class StatsTimeline:
+    """
+    Running team statistics of a game, answered for any frame in O(1).
+
+    Built once from the per-frame team ball control, pass and interception arrays, it
+    keeps prefix sums of each of them per team, so "stats up to frame f" is a lookup
+    instead of a recount of every frame before f.
+
+    Attributes:
+        num_frames (int): Number of frames covered.
+        control_counts (numpy.ndarray): (num_frames + 1, 2) frames of ball control of
+            team 1 and team 2 before each frame.
+        pass_counts (numpy.ndarray): (num_frames + 1, 2) passes of each team before each frame.
+        interception_counts (numpy.ndarray): (num_frames + 1, 2) interceptions of each team
+            before each frame.
+    """
+    def __init__(self, team_ball_control, passes, interceptions):
+        """
+        Args:
+            team_ball_control (array-like): Team in control of the ball per frame (1, 2 or -1).
+            passes (array-like): Team that completed a pass per frame (1, 2, or -1 for none).
+            interceptions (array-like): Team that intercepted per frame (1, 2, or -1 for none).
+        """
+        team_ball_control = np.asarray(team_ball_control)
+        self.num_frames = len(team_ball_control)
+        self.control_counts = self.prefix_counts(team_ball_control)
+        self.pass_counts = self.prefix_counts(np.asarray(passes))
+        self.interception_counts = self.prefix_counts(np.asarray(interceptions))
+
+    @staticmethod
+    def prefix_counts(events):
+        """
+        Prefix sums of the frames equal to 1 and to 2.
+
+        Args:
+            events (numpy.ndarray): Team per frame.
+
+        Returns:
+            numpy.ndarray: (len(events) + 1, 2) counts, row i covering frames [0, i).
+        """
+        counts = np.zeros((len(events) + 1, 2), dtype=np.int64)
+        if len(events):
+            counts[1:, 0] = np.cumsum(events == 1)
+            counts[1:, 1] = np.cumsum(events == 2)
+        return counts
+
+    def clamp(self, frame_num, counts):
+        # Row covering frames [0, frame_num], limited to the frames the array has
+        return min(max(frame_num + 1, 0), len(counts) - 1)
+
+    def ball_control_until(self, frame_num):
+        """
+        Share of frames each team controlled the ball, from the first frame to frame_num.
+
+        Args:
+            frame_num (int): Last frame included.
+
+        Returns:
+            tuple: (team_1, team_2) fractions between 0 and 1.
+        """
+        row = self.clamp(frame_num, self.control_counts)
+        if row == 0:
+            return 0.0, 0.0
+        team_1, team_2 = self.control_counts[row]
+        return team_1 / row, team_2 / row
+
+    def passes_until(self, frame_num):
+        """
+        Passes of each team from the first frame to frame_num.
+
+        Returns:
+            tuple: (team_1, team_2) counts.
+        """
+        team_1, team_2 = self.pass_counts[self.clamp(frame_num, self.pass_counts)]
+        return int(team_1), int(team_2)
+
+    def interceptions_until(self, frame_num):
+        """
+        Interceptions of each team from the first frame to frame_num.
+
+        Returns:
+            tuple: (team_1, team_2) counts.
+        """
+        team_1, team_2 = self.interception_counts[self.clamp(frame_num, self.interception_counts)]
+        return int(team_1), int(team_2)
+
+    def get_team_totals(self):
+        """
+        Whole-game statistics of each team, for the summary report.
+
+        Returns:
+            list of dict: One dict per team (team 1 first) with ball control percentage,
+                passes and interceptions.
+        """
+        control = self.ball_control_until(self.num_frames - 1)
+        passes = self.pass_counts[-1].tolist()
+        interceptions = self.interception_counts[-1].tolist()
+        return [
+            {
+                "ball_control": f"{control[team] * 100:.2f}%",
+                "passes": passes[team],
+                "interceptions": interceptions[team],
+            }
+            for team in range(2)
+        ]
+
+
+class RunningStats:
+    """
+    Running team statistics of a live stream, updated one frame at a time.
+
+    Answers the same queries as StatsTimeline for the latest frame added, which is the
+    only frame a live overlay draws.
+
+    Attributes:
+        num_frames (int): Number of frames added.
+        control_counts (numpy.ndarray): Frames of ball control of team 1 and team 2.
+        pass_counts (numpy.ndarray): Passes of each team.
+        interception_counts (numpy.ndarray): Interceptions of each team.
+    """
+    def __init__(self):
+        self.num_frames = 0
+        self.control_counts = np.zeros(2, dtype=np.int64)
+        self.pass_counts = np.zeros(2, dtype=np.int64)
+        self.interception_counts = np.zeros(2, dtype=np.int64)
+
+    def update(self, control_team, pass_team, interception_team):
+        """
+        Add the next frame.
+
+        Args:
+            control_team (int): Team in control of the ball (1, 2 or -1).
+            pass_team (int): Team that completed a pass on this frame, -1 for none.
+            interception_team (int): Team that intercepted on this frame, -1 for none.
+        """
+        self.num_frames += 1
+        for counts, team in ((self.control_counts, control_team),
+                             (self.pass_counts, pass_team),
+                             (self.interception_counts, interception_team)):
+            if team in (1, 2):
+                counts[team - 1] += 1
+
+    def ball_control_until(self, frame_num):
+        if self.num_frames == 0:
+            return 0.0, 0.0
+        team_1, team_2 = self.control_counts
+        return team_1 / self.num_frames, team_2 / self.num_frames
+
+    def passes_until(self, frame_num):
+        return int(self.pass_counts[0]), int(self.pass_counts[1])
+
+    def interceptions_until(self, frame_num):
+        return int(self.interception_counts[0]), int(self.interception_counts[1])
+
+    def get_team_totals(self):
+        control = self.ball_control_until(self.num_frames - 1)
+        return [
+            {
+                "ball_control": f"{control[team] * 100:.2f}%",
+                "passes": int(self.pass_counts[team]),
+                "interceptions": int(self.interception_counts[team]),
+            }
+            for team in range(2)
+        ]
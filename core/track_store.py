@@ -0,0 +1,297 @@
+from collections.abc import Mapping
+
+import numpy as np
+
+
+class TrackStore:
+    """
+    Columnar storage for tracked bounding boxes.
+
+    Every detection is one row of four contiguous arrays: frame index, track id and class
+    id as int32 and the bbox as four float32, about 28 bytes per detection. Rows are
+    appended in frame order, which lets a CSR style index (the first row of every frame)
+    grow with them, so the rows of a frame are a slice found in O(1).
+    """
+    def __init__(self, capacity=4096):
+        self.size = 0
+        self._frames = np.empty(capacity, dtype=np.int32)
+        self._track_ids = np.empty(capacity, dtype=np.int32)
+        self._class_ids = np.empty(capacity, dtype=np.int32)
+        self._bboxes = np.empty((capacity, 4), dtype=np.float32)
+        # frame_starts[f] is the first row of frame f, frame_starts[num_frames] == size
+        self._frame_starts = np.zeros(capacity + 1, dtype=np.int64)
+        self.num_frames = 0
+        self._track_index = None
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def frames(self):
+        return self._frames[:self.size]
+
+    @property
+    def track_ids(self):
+        return self._track_ids[:self.size]
+
+    @property
+    def class_ids(self):
+        return self._class_ids[:self.size]
+
+    @property
+    def bboxes(self):
+        return self._bboxes[:self.size]
+
+    def _grow(self, min_capacity):
+        capacity = max(min_capacity, 2 * len(self._frames))
+        for name in ("_frames", "_track_ids", "_class_ids", "_bboxes"):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def _grow_frames(self, min_frames):
+        starts = np.zeros(max(min_frames, 2 * len(self._frame_starts)) + 1, dtype=np.int64)
+        starts[:self.num_frames + 1] = self._frame_starts[:self.num_frames + 1]
+        self._frame_starts = starts
+
+    def _open_frame(self, frame_num):
+        """
+        Extend the frame index up to frame_num, so its rows start at the current end.
+        """
+        if frame_num < self.num_frames - 1:
+            raise ValueError(f"Rows must be added in frame order, got frame {frame_num} "
+                             f"after frame {self.num_frames - 1}")
+        if frame_num >= self.num_frames:
+            if frame_num + 2 > len(self._frame_starts):
+                self._grow_frames(frame_num + 2)
+            self._frame_starts[self.num_frames + 1:frame_num + 2] = self.size
+            self.num_frames = frame_num + 1
+
+    def append(self, frame_num, track_id, class_id, bbox):
+        """
+        Add one detection.
+
+        Args:
+            frame_num (int): Frame of the detection, not lower than any frame added before.
+            track_id (int): Track the detection belongs to.
+            class_id (int): Class of the detection.
+            bbox (list): Bounding box [x1, y1, x2, y2].
+        """
+        self._open_frame(frame_num)
+        if self.size == len(self._frames):
+            self._grow(self.size + 1)
+        row = self.size
+        self._frames[row] = frame_num
+        self._track_ids[row] = track_id
+        self._class_ids[row] = class_id
+        self._bboxes[row] = bbox
+        self.size += 1
+        self._frame_starts[self.num_frames] = self.size
+        self._track_index = None
+
+    def extend(self, frame_nums, track_ids, class_ids, bboxes):
+        """
+        Add many detections at once.
+
+        Args:
+            frame_nums (array-like): Frame of each detection, sorted, not lower than any
+                frame added before.
+            track_ids (array-like): Track of each detection.
+            class_ids (array-like): Class of each detection.
+            bboxes (array-like): (N, 4) bounding boxes.
+        """
+        frame_nums = np.asarray(frame_nums, dtype=np.int32)
+        if len(frame_nums) == 0:
+            return
+        if np.any(np.diff(frame_nums) < 0):
+            raise ValueError("Rows must be added in frame order")
+        self._open_frame(int(frame_nums[0]))
+        last_frame = int(frame_nums[-1])
+        if last_frame + 2 > len(self._frame_starts):
+            self._grow_frames(last_frame + 2)
+        if self.size + len(frame_nums) > len(self._frames):
+            self._grow(self.size + len(frame_nums))
+
+        start = self.size
+        end = start + len(frame_nums)
+        self._frames[start:end] = frame_nums
+        self._track_ids[start:end] = track_ids
+        self._class_ids[start:end] = class_ids
+        self._bboxes[start:end] = bboxes
+        self.size = end
+
+        # Frames from the first new one onwards start at their first new row
+        first_frame = int(frame_nums[0])
+        new_frames = np.arange(first_frame + 1, last_frame + 2)
+        self._frame_starts[first_frame + 1:last_frame + 2] = start + np.searchsorted(frame_nums, new_frames)
+        self.num_frames = last_frame + 1
+        self._track_index = None
+
+    @classmethod
+    def from_arrays(cls, frame_nums, track_ids, class_ids, bboxes):
+        """
+        Build a store from detection arrays in any order.
+
+        Returns:
+            TrackStore: The store, with rows sorted by frame (stable).
+        """
+        frame_nums = np.asarray(frame_nums, dtype=np.int32)
+        order = np.argsort(frame_nums, kind="stable")
+        store = cls(capacity=max(1, len(frame_nums)))
+        store.extend(frame_nums[order], np.asarray(track_ids)[order], np.asarray(class_ids)[order],
+                     np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)[order])
+        return store
+
+    @classmethod
+    def from_players(cls, players, class_id=0):
+        """
+        Build a store from Player objects whose bboxs_per_frame are plain dicts.
+
+        Args:
+            players (dict): Mapping from track id to Player objects.
+            class_id (int): Class written for every row.
+
+        Returns:
+            TrackStore: The store.
+        """
+        frame_nums, track_ids, bboxes = [], [], []
+        for track_id, player in players.items():
+            for frame_num, bbox in player.bboxs_per_frame.items():
+                frame_nums.append(frame_num)
+                track_ids.append(track_id)
+                bboxes.append(bbox)
+        return cls.from_arrays(frame_nums, track_ids, [class_id] * len(frame_nums), bboxes)
+
+    def frame_rows(self, frame_num):
+        """
+        Get the rows of one frame.
+
+        Args:
+            frame_num (int): Frame index.
+
+        Returns:
+            slice: Rows of the frame, empty if there are none.
+        """
+        if frame_num < 0 or frame_num >= self.num_frames:
+            return slice(0, 0)
+        return slice(int(self._frame_starts[frame_num]), int(self._frame_starts[frame_num + 1]))
+
+    def frame_tracks(self, frame_num):
+        """
+        Get the track ids and bboxes of one frame.
+
+        Args:
+            frame_num (int): Frame index.
+
+        Returns:
+            tuple: (track_ids, bboxes) arrays of the frame.
+        """
+        rows = self.frame_rows(frame_num)
+        return self._track_ids[rows], self._bboxes[rows]
+
+    def frame_range_rows(self, start_frame, end_frame):
+        """
+        Get the rows of the frames in [start_frame, end_frame).
+
+        Returns:
+            slice: Rows of the frames.
+        """
+        start_frame = min(max(start_frame, 0), self.num_frames)
+        end_frame = min(max(end_frame, start_frame), self.num_frames)
+        return slice(int(self._frame_starts[start_frame]), int(self._frame_starts[end_frame]))
+
+    def track_rows(self, track_id):
+        """
+        Get the rows of one track, sorted by frame.
+
+        The per-track index is built on first use after rows were added.
+
+        Args:
+            track_id (int): Track id.
+
+        Returns:
+            numpy.ndarray: Row indices.
+        """
+        if self._track_index is None:
+            order = np.argsort(self.track_ids, kind="stable")
+            ids, starts = np.unique(self.track_ids[order], return_index=True)
+            ends = np.r_[starts[1:], len(order)]
+            self._track_index = {int(track): order[start:end] for track, start, end in zip(ids, starts, ends)}
+        return self._track_index.get(int(track_id), np.empty(0, dtype=np.int64))
+
+    def find_row(self, track_id, frame_num):
+        """
+        Find the row of a track in a frame.
+
+        Returns:
+            int or None: The row, or None if the track is not in the frame.
+        """
+        rows = self.frame_rows(frame_num)
+        matches = np.flatnonzero(self._track_ids[rows] == track_id)
+        if len(matches) == 0:
+            return None
+        return rows.start + int(matches[0])
+
+
+class TrackBBoxView(Mapping):
+    """
+    Read-only frame -> bbox mapping of one track of a TrackStore.
+
+    Stands in for the bboxs_per_frame / bbox_per_frame dicts of Player and Ball.
+    """
+    def __init__(self, store, track_id):
+        self.store = store
+        self.track_id = track_id
+
+    def __getitem__(self, frame_num):
+        row = self.store.find_row(self.track_id, frame_num)
+        if row is None:
+            raise KeyError(frame_num)
+        return self.store.bboxes[row].tolist()
+
+    def __contains__(self, frame_num):
+        return self.store.find_row(self.track_id, frame_num) is not None
+
+    def __iter__(self):
+        rows = self.store.track_rows(self.track_id)
+        return iter(self.store.frames[rows].tolist())
+
+    def __len__(self):
+        return len(self.store.track_rows(self.track_id))
+
+    def items(self):
+        rows = self.store.track_rows(self.track_id)
+        return list(zip(self.store.frames[rows].tolist(), self.store.bboxes[rows].tolist()))
+
+    def values(self):
+        rows = self.store.track_rows(self.track_id)
+        return self.store.bboxes[rows].tolist()
+
+
+class PlayerRoster(dict):
+    """
+    Players keyed by track id, with the TrackStore holding their bounding boxes.
+
+    Behaves like the plain players dict; consumers that need every player of a frame
+    read store.frame_tracks instead of scanning the roster.
+    """
+    def __init__(self, store=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.store = store if store is not None else TrackStore()
+
+
+def get_track_store(players):
+    """
+    Get the TrackStore behind a players mapping, building one for a plain dict.
+
+    Args:
+        players (dict): PlayerRoster or dict of Player objects.
+
+    Returns:
+        TrackStore: Store with the bounding boxes of the players.
+    """
+    store = getattr(players, "store", None)
+    if store is None:
+        store = TrackStore.from_players(players)
+    return store
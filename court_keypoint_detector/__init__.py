@@ -1 +1,2 @@
-from .court_keypoint_detector import CourtKeypointDetector
\ No newline at end of file
+from .court_keypoint_detector import CourtKeypointDetector
+from .camera_motion_estimator import CameraMotionEstimator
\ No newline at end of file
@@ -0,0 +1,85 @@
+import cv2
+import numpy as np
+
+
+class CameraMotionEstimator:
+    """
+    Estimates the global camera motion between consecutive frames with sparse optical flow.
+
+    Corners are tracked with pyramidal Lucas-Kanade on downscaled grayscale frames and a
+    homography is fitted to them with RANSAC, so players moving across the court are
+    rejected as outliers and only the pan and zoom of the camera remain.
+    """
+    def __init__(self, scale=0.25, max_corners=300, min_tracked_points=12):
+        """
+        Args:
+            scale (float): Factor frames are downscaled by before tracking.
+            max_corners (int): Maximum number of corners tracked per frame.
+            min_tracked_points (int): Below this many tracked corners the motion is unknown.
+        """
+        self.scale = scale
+        self.max_corners = max_corners
+        self.min_tracked_points = min_tracked_points
+        self.prev_gray = None
+        self.frame_size = None
+
+    def reset(self):
+        """
+        Forget the previous frame, so the next frame starts a new sequence.
+        """
+        self.prev_gray = None
+
+    def preprocess(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+
+    def update(self, frame):
+        """
+        Add the next frame of the sequence and estimate the motion from the previous one.
+
+        Args:
+            frame (numpy.ndarray): BGR frame.
+
+        Returns:
+            numpy.ndarray or None: 3x3 homography mapping previous-frame pixel coordinates to
+                this frame, or None for the first frame or when too few corners could be tracked.
+        """
+        gray = self.preprocess(frame)
+        self.frame_size = frame.shape[:2]
+        prev_gray, self.prev_gray = self.prev_gray, gray
+        if prev_gray is None:
+            return None
+
+        prev_points = cv2.goodFeaturesToTrack(prev_gray, self.max_corners, qualityLevel=0.01, minDistance=8)
+        if prev_points is None or len(prev_points) < self.min_tracked_points:
+            return None
+        points, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, prev_points, None)
+        tracked = status.reshape(-1) == 1
+        if tracked.sum() < self.min_tracked_points:
+            return None
+
+        motion, _ = cv2.findHomography(prev_points[tracked], points[tracked], cv2.RANSAC, 1.0)
+        if motion is None:
+            return None
+
+        # Express the motion in full resolution pixel coordinates
+        to_small = np.diag([self.scale, self.scale, 1.0])
+        to_full = np.diag([1.0 / self.scale, 1.0 / self.scale, 1.0])
+        return to_full @ motion @ to_small
+
+    def motion_magnitude(self, motion):
+        """
+        Measure how far a motion moves the image, as the mean displacement of the frame corners.
+
+        Args:
+            motion (numpy.ndarray or None): 3x3 homography returned by update.
+
+        Returns:
+            float: Displacement in pixels, or infinity if the motion is unknown.
+        """
+        if motion is None or self.frame_size is None:
+            return float('inf')
+        height, width = self.frame_size
+        corners = np.array([[[0, 0]], [[width, 0]], [[width, height]], [[0, height]]], dtype=np.float32)
+        moved = cv2.perspectiveTransform(corners, motion)
+        return float(np.linalg.norm(moved - corners, axis=2).mean())
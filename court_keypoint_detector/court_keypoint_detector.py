@@ -1,20 +1,42 @@
-from ultralytics import YOLO
 import supervision as sv
 import sys 
 sys.path.append('../')
-import os, pickle
+from model_registry import get_model_registry, convert_results, pack_detections, unpack_detections
+from instrumentation import traced
+from .camera_motion_estimator import CameraMotionEstimator
 
 class CourtKeypointDetector:
     """
     The CourtKeypointDetector class uses a YOLO model to detect court keypoints in image frames. 
     It also provides functionality to draw these detected keypoints on the frames.
+
+    In keyframe mode the model only runs every keyframe_interval frames, or sooner when the
+    camera has moved more than motion_threshold pixels since the last keyframe. The camera
+    motion between frames is returned alongside, so the court homography can be carried
+    across the frames in between.
     """
-    def __init__(self, model_path):
-        self.model = YOLO(model_path)
-        class_name = self.__class__.__name__.replace("Tracker", "").lower()
-        self.cache_path = f"cache/{class_name}_detections.pkl"
-    
-    def get_court_keypoints(self, frames,read_from_stub=False, stub_path=None):
+    def __init__(self, model_path, cache=None, keyframe_interval=1, motion_threshold=float('inf')):
+        self.model_path = model_path
+        self._model = None  # Loaded on the first cache miss
+        self.conf = 0.5
+        self.cache = cache  # VideoDetectionCache of the video being processed, or None
+        self.keyframe_interval = keyframe_interval
+        self.motion_threshold = motion_threshold
+        self.motion_estimator = CameraMotionEstimator()
+        self.frames_since_keyframe = None  # None until the first keyframe
+        self.motion_since_keyframe = 0.0
+
+    @property
+    def model(self):
+        """
+        The YOLO detector, built on first use so runs served from the detection cache never load it.
+        Detectors with the same weights share one model.
+        """
+        if self._model is None:
+            self._model = get_model_registry().get_model(self.model_path)
+        return self._model
+
+    def get_court_keypoints(self, frames,read_from_stub=False, stub_path=None, frame_offset=0, detections=None):
         """
         Detect court keypoints for a batch of frames using the YOLO model. If requested, 
         attempts to read previously detected keypoints from a stub file before running the model.
@@ -25,28 +47,164 @@ class CourtKeypointDetector:
                 instead of running the detection model. Defaults to False.
             stub_path (str, optional): The file path for the stub file. If None, a default path may be used. 
                 Defaults to None.
+            frame_offset (int, optional): Index of the first frame in the whole video, part of
+                the detection cache key. Defaults to 0.
+            detections (list, optional): Precomputed YOLO results for the frames, for instance
+                from the InferenceScheduler. Detection runs here when omitted.
 
         Returns:
             list: A list of detected keypoints for each input frame.
         """
-        court_keypoints = None
-        if os.path.exists(self.cache_path):
-            with open(self.cache_path, "rb") as f:
-                print(f"Loading cached detections from {self.cache_path}")
-                return pickle.load(f)
+        if detections is None:
+            detections = self.detect_frames(frames, frame_offset)
+        return [detection.keypoints for detection in detections]
+
+    @traced(frames_arg="frames")
+    def get_keyframe_keypoints(self, frames, frame_offset=0):
+        """
+        Detect court keypoints on keyframes only and estimate the camera motion of every frame.
+
+        Successive calls continue the same sequence, so a video can be fed window by window.
+
+        Args:
+            frames (list of numpy.ndarray): Frames of the current window, in order.
+            frame_offset (int): Index of the first frame in the whole video.
+
+        Returns:
+            tuple: (court_keypoints, camera_motion). court_keypoints holds the keypoints of
+                keyframes and None for the other frames. camera_motion holds, per frame, the
+                3x3 homography from the previous frame to this one, or None if it is unknown.
+        """
+        camera_motion = []
+        keyframe_indices = []
+        for i, frame in enumerate(frames):
+            # Estimated even when every frame is a keyframe: the homography of a frame
+            # whose keypoints fail validation is carried over through it
+            motion = self.motion_estimator.update(frame)
+            camera_motion.append(motion)
+            if self.is_keyframe(motion):
+                keyframe_indices.append(i)
+
+        keyframes = [frame_offset + i for i in keyframe_indices]
+        detections = self.load_cached_detections(len(keyframes), frame_offset, keyframes)
+        if detections is None:
+            detections = self.predict_frames([frames[i] for i in keyframe_indices])
+            self.store_detections(detections, frame_offset, keyframes)
 
-        
-        batch_size=20
-        court_keypoints = []
+        court_keypoints = [None] * len(frames)
+        for i, detection in zip(keyframe_indices, detections):
+            court_keypoints[i] = detection.keypoints
+        return court_keypoints, camera_motion
+
+    def is_keyframe(self, motion):
+        """
+        Decide whether the keypoint model has to run on the next frame.
+
+        Args:
+            motion (numpy.ndarray or None): Camera motion from the previous frame.
+
+        Returns:
+            bool: True for the first frame, after keyframe_interval frames, when the camera
+                moved more than motion_threshold pixels since the last keyframe, or when the
+                motion could not be estimated.
+        """
+        magnitude = self.motion_estimator.motion_magnitude(motion)
+        if (self.frames_since_keyframe is None
+                or self.frames_since_keyframe + 1 >= self.keyframe_interval
+                or self.motion_since_keyframe + magnitude > self.motion_threshold):
+            self.frames_since_keyframe = 0
+            self.motion_since_keyframe = 0.0
+            return True
+        self.frames_since_keyframe += 1
+        self.motion_since_keyframe += magnitude
+        return False
+
+    def detect_frames(self, frames, frame_offset=0):
+        """
+        Run the keypoint model over the frames, reusing cached results when available.
+
+        Args:
+            frames (list of numpy.ndarray): Frames on which to detect keypoints.
+            frame_offset (int): Index of the first frame in the whole video.
+
+        Returns:
+            list: YOLO results, one per frame.
+        """
+        detections = self.load_cached_detections(len(frames), frame_offset)
+        if detections is None:
+            detections = self.predict_frames(frames)
+            # Save detections for future use
+            self.store_detections(detections, frame_offset)
+        return detections
+
+    def load_cached_detections(self, num_frames, frame_offset=0, keyframes=None):
+        """
+        Read previously computed results from the detection cache.
+
+        Args:
+            num_frames (int): Number of frames the results cover.
+            frame_offset (int): Index of the first frame in the whole video.
+            keyframes (list of int, optional): Frames the results were computed on, when
+                they do not cover every frame.
+
+        Returns:
+            list: The cached detections, or None if there is no cache or no entry.
+        """
+        if self.cache is None:
+            return None
+        detections = unpack_detections(self.cache.load(self.model_path,
+                                                       self.get_cache_params(num_frames, frame_offset, keyframes)))
+        if detections is not None:
+            print(f"Loading cached keypoints for {self.model_path}")
+        return detections
+
+    def store_detections(self, detections, frame_offset=0, keyframes=None):
+        """
+        Write results to the detection cache, if one is set.
+
+        Args:
+            detections (list): FrameDetections, one per frame.
+            frame_offset (int): Index of the first frame in the whole video.
+            keyframes (list of int, optional): Frames the results were computed on, when
+                they do not cover every frame.
+        """
+        if self.cache is not None:
+            self.cache.store(self.model_path, self.get_cache_params(len(detections), frame_offset, keyframes),
+                             pack_detections(detections))
+
+    def get_cache_params(self, num_frames, frame_offset=0, keyframes=None):
+        # The cache key covers the video, the weights and these parameters
+        params = {"conf": self.conf, "frame_offset": frame_offset, "num_frames": num_frames}
+        if keyframes is not None:
+            params["keyframes"] = keyframes
+        return params
+
+    @traced(frames_arg="frames")
+    def predict_frames(self, frames, batch_size=20):
+        """
+        Run the keypoint model over a sequence of frames in batches, without caching.
+
+        Args:
+            frames (list of numpy.ndarray): Frames on which to detect keypoints.
+            batch_size (int): Number of frames sent to the model at once.
+
+        Returns:
+            list: FrameDetections, one per frame.
+        """
+        detections = []
         for i in range(0,len(frames),batch_size):
-            detections_batch = self.model.predict(frames[i:i+batch_size],conf=0.5)
-            for detection in detections_batch:
-                court_keypoints.append(detection.keypoints)
+            detections += convert_results(self.model.predict(frames[i:i+batch_size],conf=self.conf))
+        return detections
 
-        # Save detections for future use
-        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
-        with open(self.cache_path, "wb") as f:
-            pickle.dump(court_keypoints, f)
+    def predict_court_keypoints(self, frames, batch_size=20):
+        """
+        Run the keypoint model over a sequence of frames in batches, without caching.
 
+        Args:
+            frames (list of numpy.ndarray): Frames on which to detect keypoints.
+            batch_size (int): Number of frames sent to the model at once.
 
-        return court_keypoints
\ No newline at end of file
+        Returns:
+            list: A list of detected keypoints for each input frame.
+        """
+        return [detection.keypoints for detection in self.predict_frames(frames, batch_size)]
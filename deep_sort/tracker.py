@@ -1,11 +1,12 @@
 from deep_sort_realtime.deepsort_tracker import DeepSort
 
 class DeepSORTTracker:
-    def __init__(self):
-        self.tracker = DeepSort(max_age=20)
+    def __init__(self, embedder="mobilenet"):
+        # Without an embedder, the appearance embeddings are given to update_tracks
+        self.tracker = DeepSort(max_age=20, embedder=embedder)
 
-    def update_tracks(self, detections, frame):
-        tracks = self.tracker.update_tracks(detections, frame=frame)
+    def update_tracks(self, detections, frame, embeds=None, others=None):
+        tracks = self.tracker.update_tracks(detections, embeds=embeds, frame=frame, others=others)
         valid_tracks = []
         for track in tracks:
             if not track.is_confirmed():
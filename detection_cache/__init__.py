@@ -0,0 +1,2 @@
+from .detection_cache import DetectionCache, VideoDetectionCache
+from .hashing import hash_file
\ No newline at end of file
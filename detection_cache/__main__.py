@@ -0,0 +1,60 @@
+"""
+Command line interface of the detection cache.
+
+Usage:
+    python -m detection_cache stats
+    python -m detection_cache prune [--max_bytes N] [--max_age_days D]
+"""
+
+import argparse
+import sys
+import time
+sys.path.append('../')
+from configs import DETECTION_CACHE_DIR, DETECTION_CACHE_MAX_BYTES
+from .detection_cache import DetectionCache
+
+
+def format_bytes(num_bytes):
+    for unit in ("B", "KB", "MB", "GB"):
+        if num_bytes < 1024:
+            return f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Inspect and prune the detection cache')
+    parser.add_argument('--cache_dir', type=str, default=DETECTION_CACHE_DIR,
+                        help='Path to the cache directory')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('stats', help='Show the number and total size of cached entries')
+    prune_parser = subparsers.add_parser('prune', help='Evict least recently used entries')
+    prune_parser.add_argument('--max_bytes', type=int, default=DETECTION_CACHE_MAX_BYTES,
+                              help='Evict entries until the cache fits in this many bytes')
+    prune_parser.add_argument('--max_age_days', type=float, default=None,
+                              help='Also evict entries not used for this many days')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    cache = DetectionCache(args.cache_dir, DETECTION_CACHE_MAX_BYTES)
+
+    if args.command == 'stats':
+        stats = cache.stats()
+        print(f"Cache directory: {stats['cache_dir']}")
+        print(f"Entries: {stats['entries']}")
+        print(f"Total size: {format_bytes(stats['total_bytes'])}")
+        if stats['max_bytes'] is not None:
+            print(f"Size cap: {format_bytes(stats['max_bytes'])}")
+        if stats['entries']:
+            print(f"Least recently used: {time.ctime(stats['oldest_access'])}")
+            print(f"Most recently used: {time.ctime(stats['newest_access'])}")
+    elif args.command == 'prune':
+        max_age_seconds = args.max_age_days * 86400 if args.max_age_days is not None else None
+        evicted, freed = cache.prune(args.max_bytes, max_age_seconds)
+        print(f"Evicted {evicted} entries, freed {format_bytes(freed)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+"""
+A module for caching model outputs on disk, keyed by what produced them.
+
+Each entry is keyed by a hash of the video content (and the frame range processed),
+the model weights file and the inference parameters, so two games never share
+detections and changing a model or a threshold never returns stale results.
+Entries are written atomically and the cache is kept under a total size cap by
+evicting the least recently used entries.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import time
+
+from .hashing import hash_file
+
+# Bump when the format of cached objects changes
+CACHE_FORMAT_VERSION = 3
+
+
+class DetectionCache:
+    """
+    A size-bounded on-disk cache with least recently used eviction.
+
+    Reading an entry refreshes its modification time, which is used as its last access
+    time for eviction.
+
+    Attributes:
+        cache_dir (str): Folder holding the cache entries.
+        max_bytes (int): Total size above which old entries are evicted, None for no limit.
+    """
+    def __init__(self, cache_dir, max_bytes=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hash_memo_path = os.path.join(cache_dir, "file_hashes.json")
+
+    def make_key(self, video_key, model_path, params):
+        """
+        Build the key of an entry.
+
+        Args:
+            video_key (dict): Identifies the video content and the processed frame range.
+            model_path (str): Path to the model weights file, None for outputs computed
+                without a weights file, whose params then identify the model.
+            params (dict): Inference parameters, must be JSON serialisable.
+
+        Returns:
+            str: Hex digest identifying the entry.
+        """
+        description = {
+            "version": CACHE_FORMAT_VERSION,
+            "video": video_key,
+            "model": hash_file(model_path, self.hash_memo_path) if model_path is not None else None,
+            "params": params,
+        }
+        return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, "entries", key[:2], key + ".pkl")
+
+    def load(self, key):
+        """
+        Load an entry and mark it as recently used.
+
+        Args:
+            key (str): Key returned by make_key.
+
+        Returns:
+            object: The cached object, or None on a miss.
+        """
+        path = self.entry_path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(path)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            # Missing, or evicted by another process while we were reading it
+            return None
+        return value
+
+    def store(self, key, value):
+        """
+        Write an entry atomically, then evict old entries if the cache is over its cap.
+
+        Args:
+            key (str): Key returned by make_key.
+            value (object): Any picklable object.
+        """
+        path = self.entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if self.max_bytes is not None:
+            self.prune(self.max_bytes)
+
+    def list_entries(self):
+        """
+        List the stored entries.
+
+        Returns:
+            list: (path, size in bytes, last access time) for every entry, oldest first.
+        """
+        entries = []
+        entries_dir = os.path.join(self.cache_dir, "entries")
+        if not os.path.isdir(entries_dir):
+            return entries
+        for shard in os.scandir(entries_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.name.endswith(".pkl"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        entries.sort(key=lambda entry: entry[2])
+        return entries
+
+    def stats(self):
+        """
+        Summarise the content of the cache.
+
+        Returns:
+            dict: Number of entries, total size, size cap and access time range.
+        """
+        entries = self.list_entries()
+        return {
+            "cache_dir": self.cache_dir,
+            "entries": len(entries),
+            "total_bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "oldest_access": entries[0][2] if entries else None,
+            "newest_access": entries[-1][2] if entries else None,
+        }
+
+    def prune(self, max_bytes=None, max_age_seconds=None):
+        """
+        Evict least recently used entries until the cache fits in max_bytes.
+
+        Args:
+            max_bytes (int, optional): Size cap, defaults to the cache's own cap.
+            max_age_seconds (float, optional): Also evict entries not used for this long.
+
+        Returns:
+            tuple: (number of evicted entries, bytes freed).
+        """
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        entries = self.list_entries()
+        total_bytes = sum(size for _, size, _ in entries)
+        oldest_allowed = time.time() - max_age_seconds if max_age_seconds is not None else None
+
+        evicted = 0
+        freed = 0
+        for path, size, last_access in entries:
+            too_big = max_bytes is not None and total_bytes > max_bytes
+            too_old = oldest_allowed is not None and last_access < oldest_allowed
+            if not too_big and not too_old:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+            evicted += 1
+            freed += size
+        return evicted, freed
+
+    def for_video(self, video_path, start_frame=0, end_frame=None):
+        """
+        Get a view of the cache bound to one video and frame range.
+
+        Args:
+            video_path (str): Path to the video being processed.
+            start_frame (int): First processed frame.
+            end_frame (int, optional): Frame at which processing stops (exclusive).
+
+        Returns:
+            VideoDetectionCache: The bound cache.
+        """
+        return VideoDetectionCache(self, video_path, start_frame, end_frame)
+
+
+class VideoDetectionCache:
+    """
+    A DetectionCache bound to one video and frame range, as used by the detectors.
+
+    The video is hashed on first use only.
+
+    Attributes:
+        cache (DetectionCache): The underlying cache.
+        video_path (str): Path to the video being processed.
+        start_frame (int): First processed frame.
+        end_frame (int): Frame at which processing stops (exclusive), None for the end.
+    """
+    def __init__(self, cache, video_path, start_frame=0, end_frame=None):
+        self.cache = cache
+        self.video_path = video_path
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.video_key = None
+
+    def get_video_key(self):
+        if self.video_key is None:
+            self.video_key = {
+                "content": hash_file(self.video_path, self.cache.hash_memo_path),
+                "start_frame": self.start_frame,
+                "end_frame": self.end_frame,
+            }
+        return self.video_key
+
+    def load(self, model_path, params):
+        """
+        Load the cached output of a model on this video.
+
+        Args:
+            model_path (str): Path to the model weights file.
+            params (dict): Inference parameters.
+
+        Returns:
+            object: The cached output, or None on a miss.
+        """
+        return self.cache.load(self.cache.make_key(self.get_video_key(), model_path, params))
+
+    def store(self, model_path, params, value):
+        """
+        Store the output of a model on this video.
+
+        Args:
+            model_path (str): Path to the model weights file.
+            params (dict): Inference parameters.
+            value (object): The model output.
+        """
+        self.cache.store(self.cache.make_key(self.get_video_key(), model_path, params), value)
+
@@ -0,0 +1,61 @@
+"""
+A module for hashing files by content, with the digests remembered on disk.
+
+Hashing a full game video takes a while, so digests are stored in a small JSON file
+keyed by the absolute path, size and modification time of each file. A file is only
+hashed again when it changes.
+"""
+
+import hashlib
+import json
+import os
+
+_BLOCK_SIZE = 1 << 20
+
+
+def _compute_file_hash(path):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_file(path, memo_path=None):
+    """
+    Return the content hash of a file, reusing a remembered digest when the file is unchanged.
+
+    Args:
+        path (str): Path of the file to hash.
+        memo_path (str, optional): JSON file remembering previous digests. If None,
+            the file is always hashed.
+
+    Returns:
+        str: Hex digest of the file content.
+    """
+    stat = os.stat(path)
+    memo_key = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    memo = {}
+    if memo_path is not None and os.path.exists(memo_path):
+        try:
+            with open(memo_path) as f:
+                memo = json.load(f)
+        except (OSError, ValueError):
+            memo = {}
+        if memo_key in memo:
+            return memo[memo_key]
+
+    file_hash = _compute_file_hash(path)
+
+    if memo_path is not None:
+        memo[memo_key] = file_hash
+        os.makedirs(os.path.dirname(memo_path) or ".", exist_ok=True)
+        tmp_path = f"{memo_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(memo, f)
+        os.replace(tmp_path, memo_path)
+    return file_hash
@@ -0,0 +1 @@
+from .loader import load_detector, DETECTOR_BACKENDS
\ No newline at end of file
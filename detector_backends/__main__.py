@@ -0,0 +1,76 @@
+"""
+Command line interface of the detector backends.
+
+Usage:
+    python -m detector_backends export [--models PATH ...]
+    python -m detector_backends parity input_video [--models PATH ...] [--frames N]
+
+export builds the ONNX models ahead of a run. parity runs both backends on the first
+frames of a video and exits with status 1 when they disagree beyond the tolerances.
+The outcome is recorded for every model: the detectors only run with ONNX Runtime
+once their export has passed.
+"""
+
+import argparse
+import sys
+sys.path.append('../')
+from configs import PLAYER_DETECTOR_PATH, BALL_DETECTOR_PATH, COURT_KEYPOINT_DETECTOR_PATH
+from utils.video_utils import read_video
+from .onnx_backend import export_onnx
+from .parity import check_parity, get_parity_failures, save_parity_record
+
+# The hoop detector shares the weights of the player detector
+DEFAULT_MODELS = [PLAYER_DETECTOR_PATH, BALL_DETECTOR_PATH, COURT_KEYPOINT_DETECTOR_PATH]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Export the detectors to ONNX and check the backends agree')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help='Export the models to ONNX')
+    export_parser.add_argument('--models', nargs='+', default=DEFAULT_MODELS, help='Weights to export')
+    parity_parser = subparsers.add_parser('parity', help='Compare the PyTorch and ONNX Runtime detections')
+    parity_parser.add_argument('input_video', type=str, help='Video whose first frames are compared')
+    parity_parser.add_argument('--models', nargs='+', default=DEFAULT_MODELS, help='Weights to compare')
+    parity_parser.add_argument('--frames', type=int, default=60, help='Number of frames compared')
+    parity_parser.add_argument('--conf', type=float, default=0.5, help='Confidence threshold')
+    parity_parser.add_argument('--max_unmatched', type=float, default=0.01,
+                               help='Share of boxes allowed to be found by one backend only')
+    parity_parser.add_argument('--max_box_error', type=float, default=2.0,
+                               help='Largest box coordinate difference allowed, in pixels')
+    parity_parser.add_argument('--max_conf_error', type=float, default=0.02,
+                               help='Largest confidence difference allowed')
+    parity_parser.add_argument('--max_keypoint_error', type=float, default=2.0,
+                               help='Largest keypoint coordinate difference allowed, in pixels')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.command == 'export':
+        for model_path in args.models:
+            print(f"{model_path} -> {export_onnx(model_path)}")
+        return
+
+    frames = read_video(args.input_video, 0, args.frames)
+    failed = False
+    for model_path in args.models:
+        report = check_parity(model_path, frames, conf=args.conf)
+        print(f"{model_path}: {report['frames']} frames, {report['reference_boxes']} PyTorch boxes, "
+              f"{report['candidate_boxes']} ONNX Runtime boxes, {report['matched']} matched")
+        print(f"  max box error {report['max_box_error']:.3f} px, "
+              f"max confidence error {report['max_conf_error']:.4f}, "
+              f"max keypoint error {report['max_keypoint_error']:.3f} px")
+        failures = get_parity_failures(report, args.max_unmatched, args.max_box_error,
+                                       args.max_conf_error, args.max_keypoint_error)
+        save_parity_record(model_path, report, failures)
+        for failure in failures:
+            print(f"  Mismatch: {failure}")
+            failed = True
+    if failed:
+        sys.exit(1)
+    print("The backends agree")
+
+
+if __name__ == '__main__':
+    main()
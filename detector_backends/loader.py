@@ -0,0 +1,39 @@
+import sys
+sys.path.append('../')
+from utils.model_loader import load_yolo_model
+from configs import DETECTOR_BACKEND
+
+DETECTOR_BACKENDS = ("onnx", "torch")
+
+
+def load_detector(model_path, backend=DETECTOR_BACKEND):
+    """
+    Build a YOLO detector with the chosen inference backend.
+
+    The ONNX Runtime backend falls back to PyTorch when onnxruntime or onnx is not
+    installed, and for models whose export has not passed the parity check of
+    python -m detector_backends parity.
+
+    Args:
+        model_path (str): Path to the .pt weights.
+        backend (str): "onnx" or "torch".
+
+    Returns:
+        OnnxDetector or YOLO: A model with the predict interface of ultralytics' YOLO.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend not in DETECTOR_BACKENDS:
+        raise ValueError(f"Unknown detector backend {backend}, expected one of {DETECTOR_BACKENDS}")
+    if backend == "onnx":
+        try:
+            from .onnx_backend import OnnxDetector
+            from .parity import has_passed_parity
+            if has_passed_parity(model_path):
+                return OnnxDetector.from_model_path(model_path)
+            print(f"The ONNX export of {model_path} has not passed the parity check, running it with PyTorch "
+                  f"(python -m detector_backends parity VIDEO checks it)")
+        except ImportError as e:
+            print(f"ONNX Runtime backend unavailable ({e}), running {model_path} with PyTorch")
+    return load_yolo_model(model_path)
@@ -0,0 +1,288 @@
+"""
+A module for running the YOLO detectors with ONNX Runtime on the CPU.
+
+Each .pt model is exported once to ONNX with dynamic batch and input sizes. The export
+is stored in an onnx folder next to the weights, under a hash of the weights, so it is
+redone when a model is retrained. Frames go through the same letterboxing as the
+InferenceScheduler. The raw head output is decoded with numpy: confidence filtering,
+class-aware non-maximum suppression and, for pose models, the keypoints of the kept
+boxes. The results are ultralytics Results in frame coordinates, the same as
+YOLO.predict returns, so the trackers and the detection cache are unchanged.
+"""
+
+import ast
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+import sys
+sys.path.append('../')
+from detection_cache import hash_file
+from inference_scheduler import letterbox_batch, restore_results
+from utils.model_loader import load_yolo_model
+from configs import ONNX_INTRA_OP_THREADS
+
+# Defaults of ultralytics' non_max_suppression, so both backends keep the same boxes
+NMS_IOU_THRESHOLD = 0.7
+MAX_DETECTIONS = 300
+MAX_CANDIDATES = 30000
+CLASS_OFFSET = 7680  # larger than any box coordinate, keeps the classes apart in NMS
+
+
+def get_onnx_path(model_path, export_dir=None):
+    """
+    Where the ONNX export of a model is stored.
+
+    Args:
+        model_path (str): Path to the .pt weights.
+        export_dir (str, optional): Folder of the exports. Defaults to an onnx folder
+            next to the weights.
+
+    Returns:
+        str: Path of the export, named after the weights and their content hash.
+    """
+    export_dir = export_dir or os.path.join(os.path.dirname(model_path), "onnx")
+    weights_hash = hash_file(model_path, os.path.join(export_dir, "file_hashes.json"))
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(export_dir, f"{name}-{weights_hash[:16]}.onnx")
+
+
+def export_onnx(model_path, export_dir=None):
+    """
+    Export a YOLO model to ONNX, unless it was already exported.
+
+    The export runs on a copy of the weights in a temporary folder and is moved into
+    place at the end, so processes exporting the same model at once do not clash.
+
+    Args:
+        model_path (str): Path to the .pt weights.
+        export_dir (str, optional): Folder of the exports.
+
+    Returns:
+        str: Path of the ONNX model.
+    """
+    onnx_path = get_onnx_path(model_path, export_dir)
+    if os.path.exists(onnx_path):
+        return onnx_path
+
+    print(f"Exporting {model_path} to ONNX")
+    os.makedirs(os.path.dirname(onnx_path), exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(onnx_path)) as tmp_dir:
+        tmp_weights = shutil.copy(model_path, tmp_dir)
+        model = load_yolo_model(tmp_weights)
+        exported = model.export(format="onnx", imgsz=model.overrides.get("imgsz", 640), dynamic=True,
+                                verbose=False)
+        os.replace(exported, onnx_path)
+    return onnx_path
+
+
+def box_iou(box, boxes):
+    """
+    IoU of one box with many, in xyxy format.
+    """
+    width = np.clip(np.minimum(box[2], boxes[:, 2]) - np.maximum(box[0], boxes[:, 0]), 0, None)
+    height = np.clip(np.minimum(box[3], boxes[:, 3]) - np.maximum(box[1], boxes[:, 1]), 0, None)
+    intersection = width * height
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return intersection / (area + areas - intersection + 1e-9)
+
+
+def non_max_suppression(boxes, scores, iou_threshold=NMS_IOU_THRESHOLD):
+    """
+    Greedy non-maximum suppression.
+
+    Every step keeps the best remaining box and drops, in one array operation, all
+    the remaining boxes that overlap it by more than the threshold.
+
+    Args:
+        boxes (numpy.ndarray): (n, 4) boxes in xyxy format.
+        scores (numpy.ndarray): (n,) scores.
+        iou_threshold (float): Overlap above which the lower scoring box is dropped.
+
+    Returns:
+        numpy.ndarray: Indices of the kept boxes, best score first.
+    """
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size:
+        best = order[0]
+        keep.append(best)
+        rest = order[1:]
+        order = rest[box_iou(boxes[best], boxes[rest]) <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def decode_predictions(output, num_classes, conf, iou_threshold=NMS_IOU_THRESHOLD, max_det=MAX_DETECTIONS,
+                       kpt_shape=None):
+    """
+    Turn the raw output of a YOLOv8 detection or pose head into boxes and keypoints.
+
+    Args:
+        output (numpy.ndarray): Head output of shape (batch, 4 + num_classes + extra, anchors),
+            boxes as center, width and height in input pixels.
+        num_classes (int): Number of classes of the model.
+        conf (float): Boxes whose best class score is not above this are dropped.
+        iou_threshold (float): Overlap threshold of the class-aware NMS.
+        max_det (int): Most boxes kept per image.
+        kpt_shape (tuple, optional): (keypoints, values per keypoint) of pose models.
+
+    Returns:
+        list of tuple: Per image, (boxes, keypoints). boxes is (n, 6) with xyxy, score and
+            class, keypoints is (n, keypoints, values) or None for detection models.
+    """
+    decoded = []
+    for prediction in output:
+        prediction = prediction.T
+        class_scores = prediction[:, 4:4 + num_classes]
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(prediction)), class_ids]
+        candidates = np.flatnonzero(scores > conf)
+        if len(candidates) > MAX_CANDIDATES:
+            candidates = candidates[np.argsort(-scores[candidates], kind="stable")[:MAX_CANDIDATES]]
+
+        xywh = prediction[candidates, :4]
+        boxes = np.empty_like(xywh)
+        boxes[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+        boxes[:, 2:] = xywh[:, :2] + xywh[:, 2:] / 2
+        # Shifting each class by its own offset keeps boxes of different classes from suppressing each other
+        keep = non_max_suppression(boxes + class_ids[candidates, None] * CLASS_OFFSET, scores[candidates],
+                                   iou_threshold)[:max_det]
+
+        kept = candidates[keep]
+        detections = np.concatenate([boxes[keep], scores[kept, None], class_ids[kept, None]], axis=1)
+        keypoints = None
+        if kpt_shape is not None:
+            keypoints = prediction[kept, 4 + num_classes:].reshape(len(kept), *kpt_shape)
+        decoded.append((detections.astype(np.float32), keypoints))
+    return decoded
+
+
+class OnnxDetector:
+    """
+    A YOLO model exported to ONNX, with the predict interface of ultralytics' YOLO class.
+
+    Attributes:
+        onnx_path (str): Path of the ONNX model.
+        num_threads (int): Intra-op threads of the session.
+        session (onnxruntime.InferenceSession): The ONNX Runtime session.
+        names (dict): Class names of the model.
+        overrides (dict): Training arguments, "imgsz" is read by the InferenceScheduler.
+        stride (int): Largest stride of the model, input sizes are padded to a multiple of it.
+        kpt_shape (tuple): Keypoint shape of pose models, None for detection models.
+    """
+    def __init__(self, onnx_path, num_threads=ONNX_INTRA_OP_THREADS):
+        """
+        Args:
+            onnx_path (str): Path to an ONNX model exported by ultralytics.
+            num_threads (int): Intra-op threads of the session, 0 for one per physical core.
+        """
+        self.onnx_path = onnx_path
+        self.num_threads = None
+        self.set_num_threads(num_threads)
+
+        # ultralytics writes the model description into the ONNX metadata
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata["names"])
+        imgsz = ast.literal_eval(metadata["imgsz"])
+        self.overrides = {"imgsz": tuple(imgsz) if isinstance(imgsz, list) else imgsz}
+        self.stride = int(metadata.get("stride", 32))
+        self.kpt_shape = tuple(ast.literal_eval(metadata["kpt_shape"])) if "kpt_shape" in metadata else None
+
+    def set_num_threads(self, num_threads):
+        """
+        Size the thread pool of the session, rebuilding the session if the size changes.
+
+        ONNX Runtime fixes the pool when the session is created. The InferenceScheduler
+        calls this with each model's share of the cores before running models side by
+        side, so the sessions together do not start more threads than there are cores.
+
+        Args:
+            num_threads (int): Intra-op threads, 0 for one per physical core.
+        """
+        if num_threads == self.num_threads:
+            return
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        # Sessions run side by side: idle threads sleep instead of spinning
+        options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+        self.session = ort.InferenceSession(self.onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.num_threads = num_threads
+
+    @classmethod
+    def from_model_path(cls, model_path, num_threads=ONNX_INTRA_OP_THREADS):
+        """
+        Build the detector of a .pt model, exporting it first if needed.
+
+        Args:
+            model_path (str): Path to the .pt weights.
+            num_threads (int): Intra-op threads of the session.
+
+        Returns:
+            OnnxDetector: The detector.
+        """
+        return cls(export_onnx(model_path), num_threads)
+
+    def run(self, tensor, conf):
+        """
+        Run the session on a letterboxed batch and decode its output.
+
+        Args:
+            tensor (torch.Tensor): Letterboxed batch, (batch, 3, height, width) in [0, 1].
+            conf (float): Confidence threshold.
+
+        Returns:
+            list: Ultralytics Results in the coordinates of the batch.
+        """
+        output = self.session.run(None, {self.input_name: tensor.numpy()})[0]
+        input_shape = tuple(tensor.shape[2:])
+        image = np.broadcast_to(np.zeros((1, 1, 3), dtype=np.uint8), input_shape + (3,))
+        results = []
+        for boxes, keypoints in decode_predictions(output, len(self.names), conf, kpt_shape=self.kpt_shape):
+            results.append(Results(image, path="", names=self.names, boxes=torch.from_numpy(boxes),
+                                   keypoints=torch.from_numpy(keypoints) if keypoints is not None else None))
+        return results
+
+    def predict(self, source, conf=0.25, imgsz=None, verbose=False, **kwargs):
+        """
+        Detect objects, like YOLO.predict.
+
+        Args:
+            source (list or numpy.ndarray or torch.Tensor): BGR frames, or a batch already
+                letterboxed by the InferenceScheduler.
+            conf (float): Confidence threshold.
+            imgsz (int or tuple, optional): Input size frames are letterboxed to, defaults
+                to the size the model was trained at.
+            verbose (bool): Unused, accepted for compatibility with YOLO.predict.
+
+        Returns:
+            list: One ultralytics Results per frame. Results of frames are in frame
+                coordinates, those of a letterboxed batch in batch coordinates.
+        """
+        if isinstance(source, torch.Tensor):
+            return self.run(source, conf)
+        if isinstance(source, np.ndarray):
+            source = [source]
+        if not source:
+            return []
+        if all(frame.shape == source[0].shape for frame in source):
+            groups = [source]
+        else:
+            # letterbox_batch needs frames of one size
+            groups = [[frame] for frame in source]
+
+        results = []
+        for frames in groups:
+            tensor = letterbox_batch(frames, imgsz or self.overrides["imgsz"], self.stride)
+            results += restore_results(self.run(tensor, conf), frames, tensor.shape[2:])
+        return results
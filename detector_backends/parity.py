@@ -0,0 +1,187 @@
+"""
+A module for checking that the ONNX Runtime backend detects what PyTorch detects.
+
+Both backends run on the same frames. On every frame, the boxes of the two are matched
+one to one by class and IoU, and the check reports the boxes found by one backend
+only, plus the largest coordinate, confidence and keypoint differences of the matched
+boxes.
+
+The outcome is recorded next to the ONNX export, and load_detector only runs an export
+with ONNX Runtime once it has passed: a retrained model gets a new export, which is
+checked again.
+"""
+
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from .onnx_backend import OnnxDetector, box_iou, get_onnx_path
+import sys
+sys.path.append('../')
+from utils.model_loader import load_yolo_model
+
+
+def match_boxes(reference, candidate, min_iou=0.5):
+    """
+    Match two sets of boxes of one frame, best overlaps first.
+
+    Args:
+        reference (numpy.ndarray): (n, 6) boxes of the reference backend, xyxy, score, class.
+        candidate (numpy.ndarray): (m, 6) boxes of the backend checked.
+        min_iou (float): Lowest IoU of a match.
+
+    Returns:
+        list of tuple: (reference index, candidate index) pairs.
+    """
+    if not len(reference) or not len(candidate):
+        return []
+    iou = np.stack([box_iou(box, candidate[:, :4]) for box in reference[:, :4]])
+    iou[reference[:, 5, None] != candidate[None, :, 5]] = 0
+
+    pairs = []
+    matched_reference = set()
+    matched_candidate = set()
+    order = np.argsort(-iou, axis=None, kind="stable")
+    for i, j in zip(*np.unravel_index(order, iou.shape)):
+        if iou[i, j] < min_iou:
+            break
+        # A matched box takes no further part
+        if i in matched_reference or j in matched_candidate:
+            continue
+        matched_reference.add(i)
+        matched_candidate.add(j)
+        pairs.append((int(i), int(j)))
+    return pairs
+
+
+def compare_results(reference_results, candidate_results, min_iou=0.5):
+    """
+    Compare the results of two backends on the same frames.
+
+    Args:
+        reference_results (list): Ultralytics Results of the reference backend, one per frame.
+        candidate_results (list): Results of the backend checked.
+        min_iou (float): Lowest IoU for two boxes to be the same detection.
+
+    Returns:
+        dict: Detection counts of both backends, matched and unmatched boxes, and the
+            largest box coordinate (pixels), confidence and keypoint (pixels) differences.
+    """
+    report = {"frames": len(reference_results), "reference_boxes": 0, "candidate_boxes": 0, "matched": 0,
+              "max_box_error": 0.0, "max_conf_error": 0.0, "max_keypoint_error": 0.0}
+    for reference, candidate in zip(reference_results, candidate_results):
+        reference_boxes = reference.boxes.data.cpu().numpy()
+        candidate_boxes = candidate.boxes.data.cpu().numpy()
+        report["reference_boxes"] += len(reference_boxes)
+        report["candidate_boxes"] += len(candidate_boxes)
+        pairs = match_boxes(reference_boxes, candidate_boxes, min_iou)
+        report["matched"] += len(pairs)
+        if not pairs:
+            continue
+
+        i, j = np.array(pairs).T
+        box_error = np.abs(reference_boxes[i, :4] - candidate_boxes[j, :4]).max()
+        conf_error = np.abs(reference_boxes[i, 4] - candidate_boxes[j, 4]).max()
+        report["max_box_error"] = max(report["max_box_error"], float(box_error))
+        report["max_conf_error"] = max(report["max_conf_error"], float(conf_error))
+        if reference.keypoints is not None and candidate.keypoints is not None:
+            keypoint_error = np.abs(reference.keypoints.xy.cpu().numpy()[i] - candidate.keypoints.xy.cpu().numpy()[j])
+            report["max_keypoint_error"] = max(report["max_keypoint_error"], float(keypoint_error.max()))
+
+    report["unmatched_reference"] = report["reference_boxes"] - report["matched"]
+    report["unmatched_candidate"] = report["candidate_boxes"] - report["matched"]
+    return report
+
+
+def check_parity(model_path, frames, conf=0.5, batch_size=20, min_iou=0.5):
+    """
+    Run a model with PyTorch and with ONNX Runtime on the same frames and compare them.
+
+    Args:
+        model_path (str): Path to the .pt weights.
+        frames (list of numpy.ndarray): BGR frames.
+        conf (float): Confidence threshold, as used by the detectors.
+        batch_size (int): Frames sent to the models at once.
+        min_iou (float): Lowest IoU for two boxes to be the same detection.
+
+    Returns:
+        dict: Output of compare_results.
+    """
+    torch_model = load_yolo_model(model_path)
+    onnx_model = OnnxDetector.from_model_path(model_path)
+    reference_results = []
+    candidate_results = []
+    for i in range(0, len(frames), batch_size):
+        batch = frames[i:i + batch_size]
+        reference_results += torch_model.predict(batch, conf=conf, verbose=False)
+        candidate_results += onnx_model.predict(batch, conf=conf)
+    return compare_results(reference_results, candidate_results, min_iou)
+
+
+def get_parity_failures(report, max_unmatched=0.01, max_box_error=2.0, max_conf_error=0.02,
+                        max_keypoint_error=2.0):
+    """
+    List the tolerances a parity report exceeds.
+
+    Args:
+        report (dict): Output of compare_results.
+        max_unmatched (float): Share of the boxes of either backend allowed to go unmatched.
+        max_box_error (float): Largest box coordinate difference allowed, in pixels.
+        max_conf_error (float): Largest confidence difference allowed.
+        max_keypoint_error (float): Largest keypoint coordinate difference allowed, in pixels.
+
+    Returns:
+        list of str: One message per exceeded tolerance, empty when the backends agree.
+    """
+    failures = []
+    for side in ("reference", "candidate"):
+        total = report[f"{side}_boxes"]
+        unmatched = report[f"unmatched_{side}"]
+        if total and unmatched / total > max_unmatched:
+            failures.append(f"{unmatched} of {total} {side} boxes have no match")
+    checks = [
+        ("box error", report["max_box_error"], max_box_error),
+        ("confidence error", report["max_conf_error"], max_conf_error),
+        ("keypoint error", report["max_keypoint_error"], max_keypoint_error),
+    ]
+    for name, value, limit in checks:
+        if value > limit:
+            failures.append(f"{name} {value:.3f} above {limit}")
+    return failures
+
+
+def get_parity_record_path(model_path):
+    """
+    Where the parity outcome of the ONNX export of a model is recorded.
+    """
+    return get_onnx_path(model_path) + ".parity.json"
+
+
+def save_parity_record(model_path, report, failures):
+    """
+    Record the outcome of a parity check of a model.
+
+    Args:
+        model_path (str): Path to the .pt weights.
+        report (dict): Output of compare_results.
+        failures (list of str): Output of get_parity_failures.
+    """
+    path = get_parity_record_path(model_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump({"passed": not failures, "failures": failures, "report": report}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def has_passed_parity(model_path):
+    """
+    Whether the current ONNX export of a model passed its parity check.
+    """
+    try:
+        with open(get_parity_record_path(model_path)) as f:
+            return bool(json.load(f).get("passed"))
+    except (FileNotFoundError, ValueError):
+        return False
@@ -6,4 +6,5 @@ from .frame_number_drawer import FrameNumberDrawer
 from .pass_and_interceptions_drawer import PassInterceptionDrawer
 from .tactical_view_drawer import TacticalViewDrawer
 from .speed_and_distance_drawer import SpeedAndDistanceDrawer
-from .hoop_tracks_drawer import HoopTracksDrawer
\ No newline at end of file
+from .hoop_tracks_drawer import HoopTracksDrawer
+from .frame_compositor import FrameCompositor
\ No newline at end of file
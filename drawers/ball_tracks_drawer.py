@@ -14,32 +14,43 @@ class BallTracksDrawer:
         """
         self.ball_pointer_color = (0, 255, 0)
 
-    def draw(self, video_frames, ball_object):
+    def draw(self, video_frames, ball_object, frame_offset=0):
         """
         Draws ball pointers on each video frame based on the Ball object's tracking data.
 
         Args:
             video_frames (list): A list of video frames (as NumPy arrays or image objects).
             ball_object (Ball): A Ball instance containing bounding boxes per frame.
+            frame_offset (int, optional): Index of the first frame in the whole video, used when
+                drawing one window of a longer video. Defaults to 0.
 
         Returns:
             list: A list of processed video frames with drawn ball pointers.
         """
         output_video_frames = []
 
-        for frame_num, frame in enumerate(video_frames):
-            frame = frame.copy()
+        for frame_num, frame in enumerate(video_frames, start=frame_offset):
+            frame = self.draw_frame(frame.copy(), frame_num, ball_object)
+            output_video_frames.append(frame)
 
-            # Skip if the frame doesn't have ball data
-            if frame_num not in ball_object.bbox_per_frame:
-                output_video_frames.append(frame)
-                continue
+        return output_video_frames
 
-            bbox = ball_object.bbox_per_frame[frame_num]
+    def draw_frame(self, frame, frame_num, ball_object):
+        """
+        Draws the ball pointer on a single frame, in place.
+
+        Args:
+            frame (numpy.ndarray): The frame to draw on.
+            frame_num (int): The index of the frame in the video.
+            ball_object (Ball): A Ball instance containing bounding boxes per frame.
 
-            if bbox is not None:
-                frame = draw_triangle(frame, bbox, self.ball_pointer_color)
+        Returns:
+            numpy.ndarray: The same frame with the ball pointer drawn on it.
+        """
+        # Skip if the frame doesn't have ball data
+        bbox = ball_object.bbox_per_frame.get(frame_num)
 
-            output_video_frames.append(frame)
+        if bbox is not None:
+            frame = draw_triangle(frame, bbox, self.ball_pointer_color)
 
-        return output_video_frames
+        return frame
@@ -9,8 +9,10 @@ class CourtKeypointDrawer:
     """
     def __init__(self):
         self.keypoint_color = '#ff2c2c'
+        self.vertex_annotator = None
+        self.vertex_label_annotator = None
 
-    def draw(self, frames, court_keypoints):
+    def draw(self, frames, court_keypoints, frame_offset=0):
         """
         Draws court keypoints on a given list of frames.
 
@@ -18,37 +20,55 @@ class CourtKeypointDrawer:
             frames (list): A list of frames (as NumPy arrays or image objects) on which to draw.
             court_keypoints (list): A corresponding list of lists where each sub-list contains
                 the (x, y) coordinates of court keypoints for that frame.
+            frame_offset (int, optional): Index of the first frame in the whole video, used when
+                drawing one window of a longer video. Defaults to 0.
 
         Returns:
             list: A list of frames with keypoints drawn on them.
         """
-        vertex_annotator = sv.VertexAnnotator(
-            color=sv.Color.from_hex(self.keypoint_color),
-            radius=8)
-        
-        vertex_label_annotator = sv.VertexLabelAnnotator(
-            color=sv.Color.from_hex(self.keypoint_color),
-            text_color=sv.Color.WHITE,
-            text_scale=0.5,
-            text_thickness=1
-        )
-        
         output_frames = []
-        for index,frame in enumerate(frames):
-            annotated_frame = frame.copy()
-
-            keypoints = court_keypoints[index]
-            # Draw dots
-            annotated_frame = vertex_annotator.annotate(
-                scene=annotated_frame,
-                key_points=keypoints)
-            # Draw labels
-            # Convert PyTorch tensor to numpy array
-            keypoints_numpy = keypoints.cpu().numpy()
-            annotated_frame = vertex_label_annotator.annotate(
-                scene=annotated_frame,
-                key_points=keypoints_numpy)
-
+        for index,frame in enumerate(frames, start=frame_offset):
+            annotated_frame = self.draw_frame(frame.copy(), index, court_keypoints)
             output_frames.append(annotated_frame)
 
-        return output_frames
\ No newline at end of file
+        return output_frames
+
+    def draw_frame(self, frame, frame_num, court_keypoints):
+        """
+        Draws the court keypoints of a single frame, in place.
+
+        Args:
+            frame (numpy.ndarray): The frame to draw on.
+            frame_num (int): The index of the frame in the video.
+            court_keypoints (list): Court keypoints for every frame of the video, None where none were detected.
+
+        Returns:
+            numpy.ndarray: The same frame with keypoints drawn on it.
+        """
+        if self.vertex_annotator is None:
+            self.vertex_annotator = sv.VertexAnnotator(
+                color=sv.Color.from_hex(self.keypoint_color),
+                radius=8)
+
+            self.vertex_label_annotator = sv.VertexLabelAnnotator(
+                color=sv.Color.from_hex(self.keypoint_color),
+                text_color=sv.Color.WHITE,
+                text_scale=0.5,
+                text_thickness=1
+            )
+
+        keypoints = court_keypoints[frame_num]
+        # Keypoints are only detected on keyframes
+        if keypoints is None:
+            return frame
+        keypoints = sv.KeyPoints(xy=keypoints.xy, confidence=keypoints.conf)
+        # Draw dots
+        frame = self.vertex_annotator.annotate(
+            scene=frame,
+            key_points=keypoints)
+        # Draw labels
+        frame = self.vertex_label_annotator.annotate(
+            scene=frame,
+            key_points=keypoints)
+
+        return frame
@@ -0,0 +1,83 @@
+import sys
+sys.path.append('../')
+from instrumentation import span, get_tracer
+
+
+def get_layer_name(layer):
+    """
+    Name of a layer in traces: the class of its drawer, or the function name.
+    """
+    owner = getattr(layer, "__self__", None)
+    if owner is not None:
+        return type(owner).__name__
+    return getattr(layer, "__name__", type(layer).__name__)
+
+
+class FrameCompositor:
+    """
+    Renders a stack of overlay layers onto video frames in a single pass.
+
+    A layer is any callable with the signature ``layer(frame, frame_num, *args)`` that
+    draws on the frame in place, such as the ``draw_frame`` method of every drawer.
+    Layers are applied in registration order, so later layers are drawn on top.
+    Each frame is used as its own output buffer: nothing is copied.
+
+    Attributes:
+        layers (list): Registered (layer, args) pairs.
+    """
+    def __init__(self):
+        self.layers = []
+
+    def add_layer(self, layer, *args):
+        """
+        Register a layer to be drawn on every frame.
+
+        Args:
+            layer (callable): Function drawing on a frame in place, called as
+                ``layer(frame, frame_num, *args)``.
+            *args: Extra arguments bound to the layer, typically the per-frame data it draws.
+
+        Returns:
+            FrameCompositor: The compositor itself, so calls can be chained.
+        """
+        self.layers.append((layer, args))
+        return self
+
+    def render_frame(self, frame, frame_num):
+        """
+        Draw every layer on a single frame, in place.
+
+        Args:
+            frame (numpy.ndarray): The frame to draw on.
+            frame_num (int): The index of the frame in the video.
+
+        Returns:
+            numpy.ndarray: The same frame with all layers drawn on it.
+        """
+        if get_tracer().enabled:
+            # One span per layer shows which overlay the drawing time goes to
+            for layer, args in self.layers:
+                with span(get_layer_name(layer), category="layer", frames=1):
+                    layer(frame, frame_num, *args)
+            return frame
+        for layer, args in self.layers:
+            layer(frame, frame_num, *args)
+        return frame
+
+    def render(self, video_frames, frame_offset=0):
+        """
+        Draw every layer on a sequence of frames, in place.
+
+        Frames must be rendered in order, since some layers keep running totals.
+
+        Args:
+            video_frames (list): Frames to draw on. They are modified in place.
+            frame_offset (int, optional): Index of the first frame in the whole video, used when
+                rendering one window of a longer video. Defaults to 0.
+
+        Returns:
+            list: The same list of frames, now annotated.
+        """
+        for frame_num, frame in enumerate(video_frames, start=frame_offset):
+            self.render_frame(frame, frame_num)
+        return video_frames
@@ -19,7 +19,7 @@ class HoopTracksDrawer:
         self.left_hoop_color = left_hoop_color
         self.right_hoop_color = right_hoop_color
 
-    def draw(self, video_frames, left_hoop, right_hoop):
+    def draw(self, video_frames, left_hoop, right_hoop, frame_offset=0):
         """
         Draws the two hoops on each frame using their bounding boxes.
 
@@ -27,28 +27,44 @@ class HoopTracksDrawer:
             video_frames (list): A list of video frames (NumPy arrays).
             left_hoop (Hoop): Hoop object representing the left hoop.
             right_hoop (Hoop): Hoop object representing the right hoop.
+            frame_offset (int, optional): Index of the first frame in the whole video, used when
+                drawing one window of a longer video. Defaults to 0.
 
         Returns:
             list: List of annotated frames.
         """
         output_frames = []
 
-        for frame_idx, frame in enumerate(video_frames):
-            frame = frame.copy()
+        for frame_idx, frame in enumerate(video_frames, start=frame_offset):
+            frame = self.draw_frame(frame.copy(), frame_idx, left_hoop, right_hoop)
+            output_frames.append(frame)
+
+        return output_frames
 
-            # Draw left hoop if available
-            left_bbox = left_hoop.get_bbox(frame_idx)
-            if left_bbox is not None:
-                #print(f"Left hoop bbox detected at frame {frame_idx}: {left_bbox}")
-                frame = draw_ellipse(frame, left_bbox, self.left_hoop_color, label="Left Hoop")
+    def draw_frame(self, frame, frame_idx, left_hoop, right_hoop):
+        """
+        Draws the two hoops on a single frame, in place.
+
+        Args:
+            frame (numpy.ndarray): The frame to draw on.
+            frame_idx (int): The index of the frame in the video.
+            left_hoop (Hoop): Hoop object representing the left hoop.
+            right_hoop (Hoop): Hoop object representing the right hoop.
 
-            # Draw right hoop if available
-            right_bbox = right_hoop.get_bbox(frame_idx)
-            if right_bbox is not None:
-                #print(f"Right hoop bbox detected at frame {frame_idx}: {right_bbox}")
+        Returns:
+            numpy.ndarray: The same frame with the hoops drawn on it.
+        """
+        # Draw left hoop if available
+        left_bbox = left_hoop.get_bbox(frame_idx)
+        if left_bbox is not None:
+            #print(f"Left hoop bbox detected at frame {frame_idx}: {left_bbox}")
+            frame = draw_ellipse(frame, left_bbox, self.left_hoop_color, label="Left Hoop")
 
-                frame = draw_ellipse(frame, right_bbox, self.right_hoop_color, label="Right Hoop")
+        # Draw right hoop if available
+        right_bbox = right_hoop.get_bbox(frame_idx)
+        if right_bbox is not None:
+            #print(f"Right hoop bbox detected at frame {frame_idx}: {right_bbox}")
 
-            output_frames.append(frame)
+            frame = draw_ellipse(frame, right_bbox, self.right_hoop_color, label="Right Hoop")
 
-        return output_frames
+        return frame
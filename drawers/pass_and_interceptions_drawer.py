@@ -1,5 +1,9 @@
 import cv2
 import numpy as np
+from .utils import draw_transparent_rectangle
+import sys
+sys.path.append('../')
+from core.stats_timeline import StatsTimeline
 
 class PassInterceptionDrawer:
     """
@@ -42,7 +46,7 @@ class PassInterceptionDrawer:
                 
         return len(team1_passes), len(team2_passes), len(team1_interceptions), len(team2_interceptions)
 
-    def draw(self, video_frames, passes, interceptions):
+    def draw(self, video_frames, passes, interceptions, frame_offset=0):
         """
         Draw pass and interception statistics on a list of video frames.
 
@@ -52,39 +56,43 @@ class PassInterceptionDrawer:
                 (1 represents a pass by Team 1, 2 represents a pass by Team 2, 0 represents no pass.)
             interceptions (list): A list of integers representing interception events at each frame.
                 (1 represents an interception by Team 1, 2 represents an interception by Team 2, 0 represents no interception.)
+            frame_offset (int, optional): Index of the first frame in the whole video, used when
+                drawing one window of a longer video. Defaults to 0.
 
         Returns:
             list: A list of frames with pass and interception statistics drawn on them.
         """
+        stats_timeline = StatsTimeline([], passes, interceptions)
         output_video_frames = []
-        for frame_num, frame in enumerate(video_frames):
-            if frame_num == 0:
-                continue
-            
-            frame_drawn = self.draw_frame(frame, frame_num, passes, interceptions)
+        for frame_num, frame in enumerate(video_frames, start=frame_offset):
+            frame_drawn = self.draw_frame(frame.copy(), frame_num, stats_timeline)
             output_video_frames.append(frame_drawn)
         return output_video_frames
     
-    def draw_frame(self, frame, frame_num, passes, interceptions):
+    def draw_frame(self, frame, frame_num, stats_timeline):
         """
-        Draw a semi-transparent overlay of pass and interception counts on a single frame.
+        Draw a semi-transparent overlay of pass and interception counts on a single frame, in place.
+
+        The first frame is left untouched.
 
         Args:
             frame (numpy.ndarray): The current video frame on which the overlay will be drawn.
             frame_num (int): The index of the current frame.
-            passes (list): A list of pass events up to this frame.
-            interceptions (list): A list of interception events up to this frame.
+            stats_timeline (StatsTimeline): Running team statistics, holding the pass and
+                interception prefix sums.
 
         Returns:
             numpy.ndarray: The frame with the semi-transparent overlay and statistics.
         """
+        if frame_num == 0:
+            return frame
+
         # Draw a semi-transparent rectangle
-        overlay = frame.copy()
         font_scale = 0.7
         font_thickness=2
 
         # Overlay Position
-        frame_height, frame_width = overlay.shape[:2]
+        frame_height, frame_width = frame.shape[:2]
         rect_x1 = int(frame_width * 0.16) 
         rect_y1 = int(frame_height * 0.75)
         rect_x2 = int(frame_width * 0.55)  
@@ -94,18 +102,12 @@ class PassInterceptionDrawer:
         text_y1 = int(frame_height * 0.80)  
         text_y2 = int(frame_height * 0.88)
 
-        cv2.rectangle(overlay, (rect_x1, rect_y1), (rect_x2, rect_y2), (255,255,255), -1)
         alpha = 0.8
-        cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
+        draw_transparent_rectangle(frame, (rect_x1, rect_y1), (rect_x2, rect_y2), (255,255,255), alpha)
 
         # Get stats until current frame
-        passes_till_frame = passes[:frame_num+1]
-        interceptions_till_frame = interceptions[:frame_num+1]
-        
-        team1_passes, team2_passes, team1_interceptions, team2_interceptions = self.get_stats(
-            passes_till_frame, 
-            interceptions_till_frame
-        )
+        team1_passes, team2_passes = stats_timeline.passes_until(frame_num)
+        team1_interceptions, team2_interceptions = stats_timeline.interceptions_until(frame_num)
 
         cv2.putText(
             frame, 
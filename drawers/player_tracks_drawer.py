@@ -1,4 +1,7 @@
 from .utils import draw_ellipse,draw_triangle
+import sys
+sys.path.append('../')
+from core.track_store import get_track_store
 
 class PlayerTracksDrawer:
     """
@@ -20,8 +23,10 @@ class PlayerTracksDrawer:
         self.default_player_team_id = 1
         self.team_1_color=team_1_color
         self.team_2_color=team_2_color
+        self.players = None
+        self.store = None  # TrackStore of self.players
 
-    def draw(self, video_frames, players, player_assignment, ball_aquisition):
+    def draw(self, video_frames, players, player_assignment, ball_aquisition, frame_offset=0):
         """
         Draw player tracks and ball possession indicators on a list of video frames.
 
@@ -31,38 +36,58 @@ class PlayerTracksDrawer:
             player_assignment (list): A list of dictionaries indicating team assignments for each player
                                       in the corresponding frame.
             ball_aquisition (list): A list indicating which player has possession of the ball in each frame.
+            frame_offset (int, optional): Index of the first frame in the whole video, used when
+                drawing one window of a longer video. Defaults to 0.
 
         Returns:
             list: A list of frames with player tracks and ball possession indicators drawn on them.
         """
         output_video_frames = []
 
-        for frame_num, frame in enumerate(video_frames):
-            frame = frame.copy()
-            # Safely get player assignments, defaulting to empty dict if out of range
-            player_assignment_for_frame = (player_assignment[frame_num]
-                                           if frame_num < len(player_assignment)
-                                           else {})
+        for frame_num, frame in enumerate(video_frames, start=frame_offset):
+            frame = self.draw_frame(frame.copy(), frame_num, players, player_assignment, ball_aquisition)
+            output_video_frames.append(frame)
 
-            # Safely get ball acquisition info, defaulting to None if out of range
-            player_id_has_ball = (ball_aquisition[frame_num]
-                                  if frame_num < len(ball_aquisition)
-                                  else None)
+        return output_video_frames
 
-            for track_id, player in players.items():
-                bbox = player.bboxs_per_frame.get(frame_num)
-                if bbox is None:
-                    continue  # Skip player if no bbox for this frame
+    def draw_frame(self, frame, frame_num, players, player_assignment, ball_aquisition):
+        """
+        Draw player tracks and the ball possession indicator on a single frame, in place.
 
-                team_id = player_assignment_for_frame.get(track_id, self.default_player_team_id)
-                color = self.team_1_color if team_id == 1 else self.team_2_color
+        Args:
+            frame (numpy.ndarray): The frame to draw on.
+            frame_num (int): The index of the frame in the video.
+            players (dict): Dictionary mapping track_id to Player objects, each containing bboxs_per_frame.
+            player_assignment (list): A list of dictionaries indicating team assignments for each player
+                                      in the corresponding frame.
+            ball_aquisition (list): A list indicating which player has possession of the ball in each frame.
 
-                frame = draw_ellipse(frame, bbox, color, track_id)
+        Returns:
+            numpy.ndarray: The same frame with player tracks drawn on it.
+        """
+        # Safely get player assignments, defaulting to empty dict if out of range
+        player_assignment_for_frame = (player_assignment[frame_num]
+                                       if frame_num < len(player_assignment)
+                                       else {})
 
-                if player_id_has_ball is not None and track_id == player_id_has_ball:
-                    frame = draw_triangle(frame, bbox, (0, 0, 255))
+        # Safely get ball acquisition info, defaulting to None if out of range
+        player_id_has_ball = (ball_aquisition[frame_num]
+                              if frame_num < len(ball_aquisition)
+                              else None)
 
-            output_video_frames.append(frame)
+        # Only the players present in this frame, read from the track store
+        if players is not self.players:
+            self.players, self.store = players, get_track_store(players)
+        track_ids, bboxes = self.store.frame_tracks(frame_num)
 
-        return output_video_frames
+        for track_id, bbox in zip(track_ids.tolist(), bboxes.tolist()):
+            team_id = player_assignment_for_frame.get(track_id, self.default_player_team_id)
+            color = self.team_1_color if team_id == 1 else self.team_2_color
+
+            frame = draw_ellipse(frame, bbox, color, track_id)
+
+            if player_id_has_ball is not None and track_id == player_id_has_ball:
+                frame = draw_triangle(frame, bbox, (0, 0, 255))
+
+        return frame
 
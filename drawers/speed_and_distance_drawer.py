@@ -1,41 +1,60 @@
 import cv2
+import sys
+sys.path.append('../')
+from core.track_store import get_track_store
 
 class SpeedAndDistanceDrawer():
     def __init__(self):
-        pass
+        # Running distance per player, kept across calls so that windows of a
+        # long video continue the same totals
+        self.total_distances = {}
+        self.players = None
+        self.store = None
 
-    def draw(self, video_frames, players, player_distances_per_frame, player_speed_per_frame):
+    def draw(self, video_frames, players, player_distances_per_frame, player_speed_per_frame, frame_offset=0):
         output_video_frames = []
-        total_distances = {}
-
-        for frame_num, (frame, player_distance, player_speed) in enumerate(
-                zip(video_frames, player_distances_per_frame, player_speed_per_frame)
-        ):
-            output_frame = frame.copy()
-
-            # Update total distance
-            for player_id, distance in player_distance.items():
-                total_distances[player_id] = total_distances.get(player_id, 0) + distance
-
-            # Loop over all players
-            for player_id, player_obj in players.items():
-                bbox = player_obj.bboxs_per_frame.get(frame_num)
-                if bbox is None:
-                    continue  # Player not visible in this frame
-
-                x1, y1, x2, y2 = bbox
-                position = [int((x1 + x2) / 2), int(y2) + 40]
-
-                distance = total_distances.get(player_id)
-                speed = player_speed.get(player_id)
-
-                if speed is not None:
-                    cv2.putText(output_frame, f"{speed:.2f} km/h", position, cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0),
-                                2)
-                if distance is not None:
-                    cv2.putText(output_frame, f"{distance:.2f} m", (position[0], position[1] + 20),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
 
+        num_frames = min(len(player_distances_per_frame), len(player_speed_per_frame))
+        for frame_num, frame in enumerate(video_frames, start=frame_offset):
+            if frame_num >= num_frames:
+                break
+            output_frame = self.draw_frame(frame.copy(), frame_num, players,
+                                           player_distances_per_frame, player_speed_per_frame)
             output_video_frames.append(output_frame)
 
         return output_video_frames
+
+    def draw_frame(self, frame, frame_num, players, player_distances_per_frame, player_speed_per_frame):
+        # Frames must be drawn in order, the running totals are updated as we go
+        total_distances = self.total_distances
+        if frame_num == 0:
+            total_distances.clear()
+
+        if frame_num >= len(player_distances_per_frame) or frame_num >= len(player_speed_per_frame):
+            return frame
+        player_distance = player_distances_per_frame[frame_num]
+        player_speed = player_speed_per_frame[frame_num]
+
+        # Update total distance
+        for player_id, distance in player_distance.items():
+            total_distances[player_id] = total_distances.get(player_id, 0) + distance
+
+        # Loop over the players visible in this frame
+        if players is not self.players:
+            self.players, self.store = players, get_track_store(players)
+        track_ids, bboxes = self.store.frame_tracks(frame_num)
+        for player_id, bbox in zip(track_ids.tolist(), bboxes.tolist()):
+            x1, y1, x2, y2 = bbox
+            position = [int((x1 + x2) / 2), int(y2) + 40]
+
+            distance = total_distances.get(player_id)
+            speed = player_speed.get(player_id)
+
+            if speed is not None:
+                cv2.putText(frame, f"{speed:.2f} km/h", position, cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0),
+                            2)
+            if distance is not None:
+                cv2.putText(frame, f"{distance:.2f} m", (position[0], position[1] + 20),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
+
+        return frame
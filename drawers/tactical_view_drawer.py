@@ -6,6 +6,8 @@ class TacticalViewDrawer:
         self.start_y = 40
         self.team_1_color = team_1_color
         self.team_2_color = team_2_color
+        self.court_image = None
+        self.court_image_key = None
 
     def draw(self, 
              video_frames, 
@@ -15,7 +17,8 @@ class TacticalViewDrawer:
              tactical_court_keypoints,
              tactical_player_positions=None,
              player_assignment=None,
-             ball_acquisition=None):
+             ball_acquisition=None,
+             frame_offset=0):
         """
         Draw tactical view with court keypoints and player positions.
         
@@ -29,61 +32,120 @@ class TacticalViewDrawer:
                 their positions in tactical view coordinates.
             player_assignment (list, optional): List of dictionaries mapping player IDs to team assignments.
             ball_acquisition (list, optional): List indicating which player has the ball in each frame.
+            frame_offset (int, optional): Index of the first frame in the whole video, used when
+                drawing one window of a longer video. Defaults to 0.
             
         Returns:
             list: List of frames with tactical view drawn on them.
         """
-        court_image = cv2.imread(court_image_path)
-        court_image = cv2.resize(court_image, (width, height))
-
         output_video_frames = []
-        for frame_idx, frame in enumerate(video_frames):
-            frame = frame.copy()
+        for frame_idx, frame in enumerate(video_frames, start=frame_offset):
+            frame = self.draw_frame(frame.copy(),
+                                    frame_idx,
+                                    court_image_path,
+                                    width,
+                                    height,
+                                    tactical_court_keypoints,
+                                    tactical_player_positions,
+                                    player_assignment,
+                                    ball_acquisition)
+            output_video_frames.append(frame)
 
-            y1 = self.start_y
-            y2 = self.start_y+height
-            x1 = self.start_x
-            x2 = self.start_x+width
-            
-            alpha = 0.6  # Transparency factor
-            overlay = frame[y1:y2, x1:x2].copy()
-            cv2.addWeighted(court_image, alpha, overlay, 1 - alpha, 0, frame[y1:y2, x1:x2])
-            
-            # Draw court keypoints
-            for keypoint_index, keypoint in enumerate(tactical_court_keypoints):
-                x, y = keypoint
-                x += self.start_x
-                y += self.start_y
-                cv2.circle(frame, (x, y), 5, (0, 0, 255), -1)
-                cv2.putText(frame, str(keypoint_index), (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        return output_video_frames
+
+    def get_court_image(self, court_image_path, width, height):
+        """
+        Load and resize the court image once and reuse it for every frame.
+
+        Args:
+            court_image_path (str): Path to the court image.
+            width (int): Width of the tactical view.
+            height (int): Height of the tactical view.
+
+        Returns:
+            numpy.ndarray: The resized court image.
+        """
+        key = (court_image_path, width, height)
+        if self.court_image_key != key:
+            court_image = cv2.imread(court_image_path)
+            self.court_image = cv2.resize(court_image, (width, height))
+            self.court_image_key = key
+        return self.court_image
+
+    def draw_frame(self,
+                   frame,
+                   frame_idx,
+                   court_image_path,
+                   width,
+                   height,
+                   tactical_court_keypoints,
+                   tactical_player_positions=None,
+                   player_assignment=None,
+                   ball_acquisition=None):
+        """
+        Draw the tactical view on a single frame, in place.
+
+        Only the region covered by the court image is blended.
+
+        Args:
+            frame (numpy.ndarray): The frame to draw on.
+            frame_idx (int): The index of the frame in the video.
+            court_image_path (str): Path to the court image.
+            width (int): Width of the tactical view.
+            height (int): Height of the tactical view.
+            tactical_court_keypoints (list): List of court keypoints in tactical view.
+            tactical_player_positions (list, optional): List of dictionaries mapping player IDs to 
+                their positions in tactical view coordinates.
+            player_assignment (list, optional): List of dictionaries mapping player IDs to team assignments.
+            ball_acquisition (list, optional): List indicating which player has the ball in each frame.
+
+        Returns:
+            numpy.ndarray: The same frame with the tactical view drawn on it.
+        """
+        court_image = self.get_court_image(court_image_path, width, height)
+
+        y1 = self.start_y
+        y2 = self.start_y+height
+        x1 = self.start_x
+        x2 = self.start_x+width
+        
+        alpha = 0.6  # Transparency factor
+        roi = frame[y1:y2, x1:x2]
+        cv2.addWeighted(court_image, alpha, roi, 1 - alpha, 0, roi)
+        
+        # Draw court keypoints
+        for keypoint_index, keypoint in enumerate(tactical_court_keypoints):
+            x, y = keypoint
+            x += self.start_x
+            y += self.start_y
+            cv2.circle(frame, (x, y), 5, (0, 0, 255), -1)
+            cv2.putText(frame, str(keypoint_index), (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        
+        # Draw player positions in tactical view if available
+        if tactical_player_positions and player_assignment and frame_idx < len(tactical_player_positions):
+            frame_positions = tactical_player_positions[frame_idx]
+            frame_assignments = player_assignment[frame_idx] if frame_idx < len(player_assignment) else {}
+            player_with_ball = ball_acquisition[frame_idx] if ball_acquisition and frame_idx < len(ball_acquisition) else -1
             
-            # Draw player positions in tactical view if available
-            if tactical_player_positions and player_assignment and frame_idx < len(tactical_player_positions):
-                frame_positions = tactical_player_positions[frame_idx]
-                frame_assignments = player_assignment[frame_idx] if frame_idx < len(player_assignment) else {}
-                player_with_ball = ball_acquisition[frame_idx] if ball_acquisition and frame_idx < len(ball_acquisition) else -1
+            for player_id, position in frame_positions.items():
+                # Get player's team
+                team_id = frame_assignments.get(player_id, 1)  # Default to team 1 if not assigned
                 
-                for player_id, position in frame_positions.items():
-                    # Get player's team
-                    team_id = frame_assignments.get(player_id, 1)  # Default to team 1 if not assigned
-                    
-                    # Set color based on team
-                    color = self.team_1_color if team_id == 1 else self.team_2_color
-                    
-                    # Adjust position to overlay coordinates
-                    x, y = int(position[0]) + self.start_x, int(position[1]) + self.start_y
-                    
-                    # Draw player circle
-                    player_radius = 8
-                    cv2.circle(frame, (x, y), player_radius, color, -1)
-                    
-                    # Add player ID
-                    #cv2.putText(frame, str(player_id), (x-4, y+4), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1)
-                    
-                    # Highlight player with ball
-                    if player_id == player_with_ball:
-                        cv2.circle(frame, (x, y), player_radius+3, (0, 0, 255), 2)
-            
-            output_video_frames.append(frame)
+                # Set color based on team
+                color = self.team_1_color if team_id == 1 else self.team_2_color
+                
+                # Adjust position to overlay coordinates
+                x, y = int(position[0]) + self.start_x, int(position[1]) + self.start_y
+                
+                # Draw player circle
+                player_radius = 8
+                cv2.circle(frame, (x, y), player_radius, color, -1)
+                
+                # Add player ID
+                #cv2.putText(frame, str(player_id), (x-4, y+4), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1)
+                
+                # Highlight player with ball
+                if player_id == player_with_ball:
+                    cv2.circle(frame, (x, y), player_radius+3, (0, 0, 255), 2)
 
-        return output_video_frames
+        return frame
@@ -1,5 +1,9 @@
 import cv2 
 import numpy as np
+from .utils import draw_transparent_rectangle
+import sys
+sys.path.append('../')
+from core.stats_timeline import StatsTimeline
 
 class TeamBallControlDrawer:
     """
@@ -38,7 +42,7 @@ class TeamBallControlDrawer:
         team_ball_control= np.array(team_ball_control) 
         return team_ball_control
 
-    def draw(self,video_frames,player_assignment,ball_aquisition):
+    def draw(self,video_frames,player_assignment,ball_aquisition,frame_offset=0,team_ball_control=None):
         """
         Draw team ball control statistics on a list of video frames.
 
@@ -47,42 +51,48 @@ class TeamBallControlDrawer:
             player_assignment (list): A list of dictionaries indicating team assignments for each player
                 in the corresponding frame.
             ball_aquisition (list): A list indicating which player has possession of the ball in each frame.
+            frame_offset (int, optional): Index of the first frame in the whole video, used when
+                drawing one window of a longer video. Defaults to 0.
+            team_ball_control (numpy.ndarray, optional): Precomputed output of get_team_ball_control,
+                so that windows of a long video do not recompute it. Defaults to None.
 
         Returns:
             list: A list of frames with team ball control statistics drawn on them.
         """
         
-        team_ball_control = self.get_team_ball_control(player_assignment,ball_aquisition)
+        if team_ball_control is None:
+            team_ball_control = self.get_team_ball_control(player_assignment,ball_aquisition)
+        stats_timeline = StatsTimeline(team_ball_control, [], [])
 
         output_video_frames= []
-        for frame_num, frame in enumerate(video_frames):
-            if frame_num == 0:
-                continue
-
-            frame_drawn = self.draw_frame(frame,frame_num,team_ball_control)
+        for frame_num, frame in enumerate(video_frames, start=frame_offset):
+            frame_drawn = self.draw_frame(frame.copy(),frame_num,stats_timeline)
             output_video_frames.append(frame_drawn)
         return output_video_frames
     
-    def draw_frame(self,frame,frame_num,team_ball_control):
+    def draw_frame(self,frame,frame_num,stats_timeline):
         """
-        Draw a semi-transparent overlay of team ball control percentages on a single frame.
+        Draw a semi-transparent overlay of team ball control percentages on a single frame, in place.
+
+        The first frame is left untouched.
 
         Args:
             frame (numpy.ndarray): The current video frame on which the overlay will be drawn.
             frame_num (int): The index of the current frame.
-            team_ball_control (numpy.ndarray): An array indicating which team has ball control for each frame.
+            stats_timeline (StatsTimeline): Running team statistics, holding the ball control prefix sums.
 
         Returns:
             numpy.ndarray: The frame with the semi-transparent overlay and statistics.
         """
-        
+        if frame_num == 0:
+            return frame
+
         # Draw a semi-transparent rectaggle 
-        overlay = frame.copy()
         font_scale = 0.7
         font_thickness=2
         
         # Overlay Position
-        frame_height, frame_width = overlay.shape[:2]
+        frame_height, frame_width = frame.shape[:2]
         rect_x1 = int(frame_width * 0.60) 
         rect_y1 = int(frame_height * 0.75)
         rect_x2 = int(frame_width * 0.99)  
@@ -93,16 +103,11 @@ class TeamBallControlDrawer:
         text_y2 = int(frame_height * 0.88)
 
 
-        cv2.rectangle(overlay, (rect_x1, rect_y1), (rect_x2, rect_y2), (255,255,255), -1 )
         alpha = 0.8
-        cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
-
-        team_ball_control_till_frame = team_ball_control[:frame_num+1]
-        # Get the number of time each team had ball control
-        team_1_num_frames = team_ball_control_till_frame[team_ball_control_till_frame==1].shape[0]
-        team_2_num_frames = team_ball_control_till_frame[team_ball_control_till_frame==2].shape[0]
-        team_1 = team_1_num_frames/(team_ball_control_till_frame.shape[0])
-        team_2 = team_2_num_frames/(team_ball_control_till_frame.shape[0])
+        draw_transparent_rectangle(frame, (rect_x1, rect_y1), (rect_x2, rect_y2), (255,255,255), alpha)
+
+        # Share of the frames so far each team had ball control
+        team_1, team_2 = stats_timeline.ball_control_until(frame_num)
 
         cv2.putText(frame, f"Team 1 Ball Control: {team_1*100:.2f}%",(text_x, text_y1), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0,0,0), font_thickness)
         cv2.putText(frame, f"Team 2 Ball Control: {team_2*100:.2f}%",(text_x, text_y2), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0,0,0), font_thickness)
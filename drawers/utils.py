@@ -101,3 +101,31 @@ def draw_ellipse(frame, bbox, color, label=None):
         )
 
     return frame
+
+def draw_transparent_rectangle(frame, top_left, bottom_right, color, alpha):
+    """
+    Blends a filled rectangle onto the frame, in place, touching only the rectangle's pixels.
+
+    Equivalent to drawing the rectangle on a full copy of the frame and blending the copy
+    back with cv2.addWeighted, without the full-frame copy.
+
+    Args:
+        frame (numpy.ndarray): The frame on which to draw the rectangle.
+        top_left (tuple): (x1, y1) corner of the rectangle.
+        bottom_right (tuple): (x2, y2) corner of the rectangle, inclusive.
+        color (tuple): The color of the rectangle in BGR format.
+        alpha (float): Opacity of the rectangle, between 0 and 1.
+
+    Returns:
+        numpy.ndarray: The frame with the rectangle blended in.
+    """
+    x1, y1 = max(0, top_left[0]), max(0, top_left[1])
+    x2, y2 = bottom_right
+    roi = frame[y1:y2 + 1, x1:x2 + 1]
+    if roi.size == 0:
+        return frame
+
+    fill = np.empty_like(roi)
+    fill[:] = color
+    cv2.addWeighted(fill, alpha, roi, 1 - alpha, 0, roi)
+    return frame
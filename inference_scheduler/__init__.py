@@ -0,0 +1 @@
+from .inference_scheduler import InferenceScheduler, letterbox_batch, restore_results
\ No newline at end of file
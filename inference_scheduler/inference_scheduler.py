@@ -0,0 +1,270 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+import sys
+sys.path.append('../')
+from instrumentation import span, traced
+from model_registry import get_model_registry, convert_results
+
+
+def letterbox_shape(frame_shape, imgsz, stride=32):
+    """
+    Compute the letterboxed size of a frame, the way ultralytics does for rectangular inference.
+
+    Args:
+        frame_shape (tuple): (height, width) of the original frame.
+        imgsz (int or tuple): Model input size, as an int or (height, width).
+        stride (int): Model stride the padded size is rounded up to.
+
+    Returns:
+        tuple: (resized_width, resized_height), (top, bottom, left, right) padding.
+    """
+    if isinstance(imgsz, int):
+        imgsz = (imgsz, imgsz)
+    height, width = frame_shape[:2]
+    ratio = min(imgsz[0] / height, imgsz[1] / width)
+    new_width, new_height = int(round(width * ratio)), int(round(height * ratio))
+    pad_width = np.mod(imgsz[1] - new_width, stride) / 2
+    pad_height = np.mod(imgsz[0] - new_height, stride) / 2
+    padding = (int(round(pad_height - 0.1)), int(round(pad_height + 0.1)),
+               int(round(pad_width - 0.1)), int(round(pad_width + 0.1)))
+    return (new_width, new_height), padding
+
+
+def letterbox_batch(frames, imgsz, stride=32):
+    """
+    Resize, pad and normalise a batch of BGR frames into one model input tensor.
+
+    Args:
+        frames (list of numpy.ndarray): BGR frames of identical size.
+        imgsz (int or tuple): Model input size.
+        stride (int): Model stride.
+
+    Returns:
+        torch.Tensor: Float tensor of shape (batch, 3, height, width) with values in [0, 1].
+    """
+    import torch
+
+    (new_width, new_height), (top, bottom, left, right) = letterbox_shape(frames[0].shape, imgsz, stride)
+    batch = np.full((len(frames), new_height + top + bottom, new_width + left + right, 3), 114, dtype=np.uint8)
+    for i, frame in enumerate(frames):
+        if frame.shape[1] != new_width or frame.shape[0] != new_height:
+            frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+        batch[i, top:top + new_height, left:left + new_width] = frame
+    # BGR HWC -> RGB CHW, once for every model sharing this input size
+    batch = np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2))
+    return torch.from_numpy(batch).float().div_(255.0)
+
+
+def restore_results(results, frames, input_shape):
+    """
+    Map results computed on letterboxed input back to the original frames.
+
+    Args:
+        results (list): YOLO results returned for the letterboxed tensor.
+        frames (list of numpy.ndarray): The original frames.
+        input_shape (tuple): (height, width) of the letterboxed tensor.
+
+    Returns:
+        list: Results in original frame coordinates, as model.predict on the frames would return.
+    """
+    from ultralytics.engine.results import Results
+    from ultralytics.utils import ops
+
+    restored = []
+    for result, frame in zip(results, frames):
+        boxes = None
+        if result.boxes is not None:
+            boxes = result.boxes.data.clone()
+            boxes[:, :4] = ops.scale_boxes(input_shape, boxes[:, :4], frame.shape)
+        keypoints = None
+        if result.keypoints is not None:
+            keypoints = result.keypoints.data.clone()
+            keypoints[..., :2] = ops.scale_coords(input_shape, keypoints[..., :2], frame.shape)
+        restored.append(Results(frame, path=result.path, names=result.names,
+                                boxes=boxes, keypoints=keypoints, speed=result.speed))
+    return restored
+
+
+class InferenceScheduler:
+    """
+    Runs several YOLO models over the same frames in a single pass.
+
+    Each batch of frames is letterboxed once per distinct model input size and the
+    resulting tensor is shared by every model of that size. Models run in parallel
+    threads, each with its share of the CPU threads (torch intra-op threads, or the
+    thread pool of an ONNX Runtime session), so four detectors cost one read of the
+    frames instead of four.
+    """
+    def __init__(self, batch_size=20, num_threads=None, parallel=True):
+        """
+        Args:
+            batch_size (int): Number of frames sent to the models at once.
+            num_threads (int, optional): CPU threads shared by the models. Defaults to all cores.
+            parallel (bool): Run the models of a batch concurrently instead of one after another.
+        """
+        self.batch_size = batch_size
+        self.num_threads = num_threads or os.cpu_count() or 1
+        self.parallel = parallel
+        self.models = {}
+        self.model_locks = {}
+        self.stats = {}
+        self.preprocess_seconds = 0.0
+
+    def register(self, name, model, **predict_params):
+        """
+        Add a model to the scheduler.
+
+        Args:
+            name (str): Key of the model's results in the output of run.
+            model (YOLO): Ultralytics model.
+            **predict_params: Extra arguments for model.predict, such as conf.
+                imgsz defaults to the size the model was trained at.
+        """
+        imgsz = predict_params.pop("imgsz", model.overrides.get("imgsz", 640))
+        if isinstance(imgsz, list):
+            imgsz = tuple(imgsz)
+        # A model registered under several names with different parameters is never run
+        # from two threads at once: ultralytics predictors are not thread safe
+        lock = self.model_locks.setdefault(id(model), threading.Lock())
+        self.models[name] = {"model": model, "imgsz": imgsz, "params": predict_params, "lock": lock}
+        # Statistics accumulate across calls, for instance over the windows of a stream
+        self.stats.setdefault(name, {"frames": 0, "seconds": 0.0})
+
+    @traced(frames_arg="frames")
+    def run(self, frames):
+        """
+        Run every registered model over the frames.
+
+        Args:
+            frames (list of numpy.ndarray): Frames to process.
+
+        Returns:
+            dict: Model name -> list of FrameDetections, one per frame.
+        """
+        results = {name: [] for name in self.models}
+        if not self.models:
+            return results
+
+        # Imported once there is inference to run: runs served from the cache never need it
+        import torch
+
+        # Models that take the same input size share the preprocessed batch
+        groups = {}
+        for name, entry in self.models.items():
+            groups.setdefault(entry["imgsz"], []).append(name)
+
+        threads_per_model = max(1, self.num_threads // len(self.models)) if self.parallel else self.num_threads
+        torch.set_num_threads(threads_per_model)
+        for entry in self.models.values():
+            # ONNX Runtime sessions have their own thread pools
+            if hasattr(entry["model"], "set_num_threads"):
+                entry["model"].set_num_threads(threads_per_model)
+
+        with ThreadPoolExecutor(max_workers=len(self.models) if self.parallel else 1) as executor:
+            for i in range(0, len(frames), self.batch_size):
+                batch = frames[i:i+self.batch_size]
+                futures = {}
+                for imgsz, names in groups.items():
+                    start = time.perf_counter()
+                    tensor = letterbox_batch(batch, imgsz)
+                    self.preprocess_seconds += time.perf_counter() - start
+                    for name in names:
+                        futures[name] = executor.submit(self.predict_batch, name, tensor, batch)
+                for name, future in futures.items():
+                    results[name] += future.result()
+        return results
+
+    def predict_batch(self, name, tensor, frames):
+        """
+        Run one model on a preprocessed batch and record its throughput.
+
+        Args:
+            name (str): Registered model name.
+            tensor (torch.Tensor): Letterboxed batch.
+            frames (list of numpy.ndarray): The original frames of the batch.
+
+        Returns:
+            list: FrameDetections in original frame coordinates.
+        """
+        entry = self.models[name]
+        start = time.perf_counter()
+        with span(f"predict {name}", category="model", frames=len(frames)), entry["lock"]:
+            results = entry["model"].predict(tensor, verbose=False, **entry["params"])
+            results = convert_results(restore_results(results, frames, tensor.shape[2:]))
+        self.stats[name]["seconds"] += time.perf_counter() - start
+        self.stats[name]["frames"] += len(frames)
+        return results
+
+    def run_detectors(self, detectors, frames, frame_offset=0):
+        """
+        Get detections for several detectors, running inference only for cache misses.
+
+        Detectors with the same weights and inference parameters, such as the player and
+        the hoop trackers, are served by one cache read or one inference, and receive the
+        same result objects. Each detector exposes model, model_path, conf,
+        get_cache_params, load_cached_detections and store_detections, as the trackers
+        and the court keypoint detector do.
+
+        Args:
+            detectors (dict): Name -> detector.
+            frames (list of numpy.ndarray): Frames to process.
+            frame_offset (int): Index of the first frame in the whole video.
+
+        Returns:
+            dict: Name -> list of YOLO results, one per frame.
+        """
+        registry = get_model_registry()
+        groups = {}
+        for name, detector in detectors.items():
+            key = registry.get_inference_key(detector.model_path, detector.get_cache_params(len(frames), frame_offset))
+            groups.setdefault(key, []).append(name)
+
+        detections = {}
+        self.models = {}
+        group_names = {}
+        for names in groups.values():
+            detector = detectors[names[0]]
+            cached = detector.load_cached_detections(len(frames), frame_offset)
+            if cached is not None:
+                detections.update({name: cached for name in names})
+            else:
+                group_name = "+".join(names)
+                group_names[group_name] = names
+                self.register(group_name, detector.model, conf=detector.conf)
+
+        computed = self.run(frames)
+        for group_name, results in computed.items():
+            names = group_names[group_name]
+            detectors[names[0]].store_detections(results, frame_offset)
+            detections.update({name: results for name in names})
+        return detections
+
+    def get_report(self):
+        """
+        Summarise the throughput of each model.
+
+        Returns:
+            list of dict: One entry per model with frames, seconds and fps.
+        """
+        report = []
+        for name, stats in self.stats.items():
+            fps = stats["frames"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+            report.append({"model": name, "frames": stats["frames"],
+                           "seconds": stats["seconds"], "fps": fps})
+        return report
+
+    def print_report(self):
+        """
+        Print the per-model throughput report.
+        """
+        print(f"Inference: {self.num_threads} CPU threads, "
+              f"{self.preprocess_seconds:.2f}s shared preprocessing")
+        for entry in self.get_report():
+            print(f"  {entry['model']:<16} {entry['frames']:>6} frames "
+                  f"{entry['seconds']:>8.2f}s {entry['fps']:>7.2f} fps")
@@ -0,0 +1 @@
+from .tracer import Tracer, span, traced, get_tracer, enable_tracing, disable_tracing
\ No newline at end of file
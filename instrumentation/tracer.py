@@ -0,0 +1,367 @@
+"""
+A module for tracing where the time of a run goes.
+
+The stages of a run and the methods of the detectors, trackers and drawers open spans.
+While tracing is enabled, every span records its wall time, the CPU time of its thread,
+the frames it processed and how much the peak RSS of the process grew, plus the growth
+of the tracemalloc heap when memory tracing is on. Spans are exported as Chrome trace
+events, to open in chrome://tracing or Perfetto, and summarised per name.
+
+Tracing is off by default. A span is then a shared no-op context manager and a traced
+function costs one attribute check on top of the plain call.
+"""
+
+import cProfile
+import functools
+import inspect
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak RSS is reported as 0 there
+    resource = None
+
+
+def get_peak_rss_kb():
+    """
+    Highest resident set size of the process so far, in kilobytes.
+    """
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+class NullSpan:
+    """
+    The span handed out while tracing is disabled: it does nothing.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def add_frames(self, num_frames):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    """
+    One timed section of a run, used as a context manager.
+
+    Attributes:
+        name (str): Name of the span, shared by every call of the same stage or method.
+        category (str): Kind of span, such as "stage", "call" or "model".
+        frames (int): Frames processed in the span.
+        args (dict): Extra values exported with the span.
+    """
+    __slots__ = ("tracer", "name", "category", "frames", "args", "start", "cpu_start", "rss_start",
+                 "traced_start", "traced_peak")
+
+    def __init__(self, tracer, name, category="stage", frames=0, args=None):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.frames = frames
+        self.args = args or {}
+
+    def add_frames(self, num_frames):
+        """
+        Count frames processed in the span, when they are only known inside it.
+        """
+        self.frames += num_frames
+
+    def __enter__(self):
+        self.tracer.open_span(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.tracer.close_span(self)
+        return False
+
+
+class Tracer:
+    """
+    Records the spans of a run.
+
+    Spans nest per thread. Memory figures are process wide, so the spans of threads
+    running at the same time see each other's allocations.
+
+    Attributes:
+        enabled (bool): Whether spans are recorded.
+        trace_memory (bool): Whether the tracemalloc heap is measured as well.
+        profile_span (str): Name of the spans run under cProfile, None for none.
+        events (list): Chrome trace events of the closed spans.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self.profile_span = None
+        self.events = []
+        self.thread_names = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.origin = time.perf_counter()
+        self.profiler = None
+        self.profile_depth = 0
+
+    def reset(self):
+        """
+        Forget the recorded spans and the profile.
+        """
+        self.events = []
+        self.thread_names = {}
+        self.origin = time.perf_counter()
+        self.profiler = None
+        self.profile_depth = 0
+
+    def get_stack(self):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def open_span(self, span):
+        stack = self.get_stack()
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # The peak is reset for the new span, the parent keeps what it reached so far
+            if stack:
+                stack[-1].traced_peak = max(stack[-1].traced_peak, peak)
+            tracemalloc.reset_peak()
+            span.traced_start = span.traced_peak = current
+        stack.append(span)
+
+        if span.name == self.profile_span:
+            with self.lock:
+                if self.profile_depth == 0:
+                    if self.profiler is None:
+                        self.profiler = cProfile.Profile()
+                    self.profiler.enable()
+                self.profile_depth += 1
+
+        span.rss_start = get_peak_rss_kb()
+        span.cpu_start = time.thread_time()
+        span.start = time.perf_counter()
+
+    def close_span(self, span):
+        end = time.perf_counter()
+        cpu_seconds = time.thread_time() - span.cpu_start
+
+        if span.name == self.profile_span:
+            with self.lock:
+                self.profile_depth -= 1
+                if self.profile_depth == 0:
+                    self.profiler.disable()
+
+        stack = self.get_stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+        args = dict(span.args)
+        args["cpu_ms"] = cpu_seconds * 1000
+        args["frames"] = span.frames
+        args["peak_rss_growth_kb"] = get_peak_rss_kb() - span.rss_start
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            span_peak = max(span.traced_peak, peak)
+            if stack:
+                stack[-1].traced_peak = max(stack[-1].traced_peak, span_peak)
+            args["traced_growth_kb"] = (current - span.traced_start) / 1024
+            args["traced_peak_kb"] = (span_peak - span.traced_start) / 1024
+
+        thread = threading.current_thread()
+        event = {
+            "name": span.name,
+            "cat": span.category,
+            "ph": "X",
+            "ts": (span.start - self.origin) * 1e6,
+            "dur": (end - span.start) * 1e6,
+            "pid": os.getpid(),
+            "tid": thread.ident,
+            "args": args,
+        }
+        with self.lock:
+            self.events.append(event)
+            self.thread_names[thread.ident] = thread.name
+
+    def get_summary(self):
+        """
+        Aggregate the spans by name. Times include the spans nested in them.
+
+        Returns:
+            list of dict: One entry per name, the longest total wall time first.
+        """
+        summary = {}
+        for event in self.events:
+            entry = summary.setdefault(event["name"], {
+                "name": event["name"], "calls": 0, "wall_s": 0.0, "max_ms": 0.0, "cpu_s": 0.0,
+                "frames": 0, "peak_rss_growth_mb": 0.0,
+            })
+            entry["calls"] += 1
+            entry["wall_s"] += event["dur"] / 1e6
+            entry["max_ms"] = max(entry["max_ms"], event["dur"] / 1000)
+            entry["cpu_s"] += event["args"]["cpu_ms"] / 1000
+            entry["frames"] += event["args"]["frames"]
+            entry["peak_rss_growth_mb"] += event["args"]["peak_rss_growth_kb"] / 1024
+            if "traced_peak_kb" in event["args"]:
+                entry["traced_peak_mb"] = max(entry.get("traced_peak_mb", 0.0),
+                                              event["args"]["traced_peak_kb"] / 1024)
+        for entry in summary.values():
+            entry["mean_ms"] = entry["wall_s"] * 1000 / entry["calls"]
+            entry["fps"] = entry["frames"] / entry["wall_s"] if entry["frames"] and entry["wall_s"] > 0 else None
+        return sorted(summary.values(), key=lambda entry: entry["wall_s"], reverse=True)
+
+    def format_summary(self):
+        """
+        Format the summary as a table.
+
+        Returns:
+            str: The table.
+        """
+        summary = self.get_summary()
+        show_traced = any("traced_peak_mb" in entry for entry in summary)
+        lines = [f"{'span':<48} {'calls':>7} {'total s':>9} {'mean ms':>9} {'max ms':>9} {'cpu s':>8} "
+                 f"{'frames':>7} {'fps':>8} {'rss+ MB':>8}{' heap MB' if show_traced else ''}"]
+        for entry in summary:
+            fps = f"{entry['fps']:>8.1f}" if entry["fps"] is not None else f"{'-':>8}"
+            line = (f"{entry['name'][:48]:<48} {entry['calls']:>7} {entry['wall_s']:>9.2f} {entry['mean_ms']:>9.2f} "
+                    f"{entry['max_ms']:>9.2f} {entry['cpu_s']:>8.2f} {entry['frames']:>7} {fps} "
+                    f"{entry['peak_rss_growth_mb']:>8.1f}")
+            if show_traced:
+                line += f" {entry.get('traced_peak_mb', 0.0):>8.1f}"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def export_chrome_trace(self, path):
+        """
+        Write the spans as a Chrome trace event JSON file.
+
+        Args:
+            path (str): Output file.
+        """
+        metadata = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                    for tid, name in self.thread_names.items()]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": metadata + self.events, "displayTimeUnit": "ms"}, f)
+
+    def write_profile(self, path, limit=25):
+        """
+        Write the cProfile statistics of the profiled spans and return the top functions.
+
+        Args:
+            path (str): Output file, readable with pstats or snakeviz.
+            limit (int): Number of functions listed.
+
+        Returns:
+            str: The functions with the highest cumulative time, empty if the profiled
+                span never ran.
+        """
+        if self.profiler is None:
+            return ""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.profiler.dump_stats(path)
+        output = io.StringIO()
+        pstats.Stats(self.profiler, stream=output).sort_stats("cumulative").print_stats(limit)
+        return output.getvalue()
+
+
+_tracer = Tracer()
+
+
+def get_tracer():
+    """
+    The tracer of the process.
+    """
+    return _tracer
+
+
+def enable_tracing(trace_memory=False, profile_span=None):
+    """
+    Start recording spans.
+
+    Args:
+        trace_memory (bool): Also measure the tracemalloc heap of every span. Slows
+            allocation heavy code down noticeably.
+        profile_span (str, optional): Run the spans of this name under cProfile.
+
+    Returns:
+        Tracer: The tracer of the process.
+    """
+    _tracer.reset()
+    _tracer.trace_memory = trace_memory
+    _tracer.profile_span = profile_span
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _tracer.enabled = True
+    return _tracer
+
+
+def disable_tracing():
+    """
+    Stop recording spans. Recorded spans are kept until the next enable_tracing.
+    """
+    _tracer.enabled = False
+    if _tracer.trace_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def span(name, category="stage", frames=0, **args):
+    """
+    Open a span, as a context manager.
+
+    Args:
+        name (str): Name of the span.
+        category (str): Kind of span.
+        frames (int): Frames processed in the span, more can be added with add_frames.
+        **args: Extra values exported with the span.
+
+    Returns:
+        Span or NullSpan: The span, or the no-op span when tracing is disabled.
+    """
+    if not _tracer.enabled:
+        return NULL_SPAN
+    return Span(_tracer, name, category, frames, args)
+
+
+def traced(name=None, category="call", frames_arg=None):
+    """
+    Decorator tracing every call of a function or method.
+
+    Args:
+        name (str, optional): Span name, defaults to the qualified name of the function.
+        category (str): Kind of span.
+        frames_arg (str, optional): Argument whose length is the number of frames processed.
+
+    Returns:
+        callable: The decorator.
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+        position = list(inspect.signature(func).parameters).index(frames_arg) if frames_arg else None
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _tracer.enabled:
+                return func(*args, **kwargs)
+            frames = 0
+            if frames_arg is not None:
+                value = args[position] if position < len(args) else kwargs.get(frames_arg)
+                frames = len(value) if value is not None else 0
+            with Span(_tracer, span_name, category, frames):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
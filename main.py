@@ -1,200 +1,328 @@
 import os
 import argparse
-from court_keypoint_detector import CourtKeypointDetector
-from trackers.hoop_tracker import HoopTracker
-from utils.video_utils import read_video, save_video, check_for_shots
-import torch.serialization
-from trackers import PlayerTracker, BallTracker
-from torch.nn.modules.container import Sequential, ModuleList
-from ultralytics.nn.modules import Conv, C2f, Bottleneck, SPPF, Concat, Detect, DFL
-from torch.nn.modules.conv import Conv2d
-from torch.nn.modules.batchnorm import BatchNorm2d
-from torch.nn.modules.activation import SiLU
-from torch.nn.modules.pooling import MaxPool2d
-from torch.nn.modules.upsampling import Upsample
-from team_assigner import TeamAssigner
-from ball_aquisition import BallAcquisitionDetector
-from pass_and_interception_detector import PassAndInterceptionDetector
-from tactical_view_converter import TacticalViewConverter
-from speed_and_distance_calculator import SpeedAndDistanceCalculator
-from ultralytics.nn.tasks import DetectionModel
 from core.team import Team
-from drawers import (
-    PlayerTracksDrawer,
-    BallTracksDrawer,
-    CourtKeypointDrawer,
-    TeamBallControlDrawer,
-    FrameNumberDrawer,
-    PassInterceptionDrawer,
-    TacticalViewDrawer,
-    SpeedAndDistanceDrawer,
-    HoopTracksDrawer
-)
-from utils.report_generator import generate_game_summary_pdf
+from instrumentation import span, enable_tracing, disable_tracing
 from configs import(
     STUBS_DEFAULT_PATH,
     HOOP_DETECTOR_PATH,
     PLAYER_DETECTOR_PATH,
     BALL_DETECTOR_PATH,
     COURT_KEYPOINT_DETECTOR_PATH,
-    OUTPUT_VIDEO_PATH
+    OUTPUT_VIDEO_PATH,
+    VIDEO_WRITER_QUEUE_SIZE,
+    OUTPUT_VIDEO_CRF,
+    DETECTION_CACHE_DIR,
+    DETECTION_CACHE_MAX_BYTES,
+    INFERENCE_BATCH_SIZE,
+    INFERENCE_THREADS,
+    COURT_KEYFRAME_INTERVAL,
+    COURT_KEYFRAME_MOTION_THRESHOLD,
+    LIVE_LATENCY_BUDGET,
+    SHARD_CHUNK_SIZE
 )
 
 def parse_args():
     parser = argparse.ArgumentParser(description='Basketball Video Analysis')
-    parser.add_argument('input_video', type=str, help='Path to input video file')
+    parser.add_argument('input_video', type=str,
+                        help='Path to input video file, or the capture source with --live '
+                             '(camera index, stream URL or a file replayed in real time)')
     parser.add_argument('--output_video', type=str, default=OUTPUT_VIDEO_PATH,
                         help='Path to output video file')
     parser.add_argument('--stub_path', type=str, default=STUBS_DEFAULT_PATH,
                         help='Path to stub directory')
+    parser.add_argument('--chunk_size', type=int, default=0,
+                        help='Process the video in windows of this many frames to bound memory use '
+                             '(0 loads the whole video at once)')
+    parser.add_argument('--start_frame', '--start-frame', type=int, default=None,
+                        help='First frame to process')
+    parser.add_argument('--end_frame', '--end-frame', type=int, default=None,
+                        help='Frame at which processing stops (exclusive)')
+    parser.add_argument('--start_time', '--start-time', type=float, default=None,
+                        help='Start of the range to process, in seconds (ignored if --start_frame is set)')
+    parser.add_argument('--end_time', '--end-time', type=float, default=None,
+                        help='End of the range to process, in seconds (ignored if --end_frame is set)')
+    parser.add_argument('--court_keyframe_interval', type=int, default=COURT_KEYFRAME_INTERVAL,
+                        help='Detect court keypoints every N frames and follow the camera in between '
+                             '(1 detects them on every frame)')
+    parser.add_argument('--no_detection_cache', action='store_true',
+                        help='Always run the models instead of reusing cached detections')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Analyse overlapping segments of the video in this many processes '
+                             'and stitch their tracks (0 or 1 runs in a single process)')
+    parser.add_argument('--live', action='store_true',
+                        help='Process the input as a live stream, drawing each frame as soon as it is captured')
+    parser.add_argument('--latency_budget', type=float, default=LIVE_LATENCY_BUDGET,
+                        help='Live mode: capture to output delay in seconds above which detection is skipped')
+    parser.add_argument('--event_log', type=str, default=None,
+                        help='Live mode: write possession, pass and interception events to this JSON lines file')
+    parser.add_argument('--frame_store', action='store_true',
+                        help='Decode the video into a memory-mapped file instead of RAM, when analysing it '
+                             'in one pass (no --chunk_size)')
+    parser.add_argument('--trace', type=str, default=None,
+                        help='Time every stage and write the spans to this Chrome trace JSON file '
+                             '(open it in chrome://tracing or Perfetto)')
+    parser.add_argument('--trace_memory', action='store_true',
+                        help='Also measure the Python heap of every span with tracemalloc (slower)')
+    parser.add_argument('--profile', type=str, default=None, metavar='SPAN',
+                        help='Run the spans of this name under cProfile, for instance "tracking" or '
+                             '"AppearanceEmbedder.embed_crops"')
+    parser.add_argument('--profile_output', type=str, default=None,
+                        help='Where the cProfile statistics are written (default: output/profile_<span>.prof)')
     return parser.parse_args()
 
 
-torch.serialization.add_safe_globals([
-    DetectionModel,
-    Sequential,
-    Upsample,
-    Concat,
-    Conv,
-    Conv2d,
-    BatchNorm2d,
-    Detect,
-    SiLU,
-    C2f,
-    DFL,
-    ModuleList,
-    MaxPool2d,
-    Bottleneck,
-    SPPF
-])
+def resolve_frame_range(args, fps):
+    """
+    Turn the frame or time range options into a [start_frame, end_frame) range.
 
+    Args:
+        args (argparse.Namespace): Parsed command line arguments.
+        fps (float): Frame rate of the input video.
 
-def main():
-    print("Basketball Video Analysis")
-    args = parse_args()
+    Returns:
+        tuple: (start_frame, end_frame), end_frame being None for the end of the video.
+    """
+    start_frame = args.start_frame
+    if start_frame is None:
+        start_frame = int(round(args.start_time * fps)) if args.start_time is not None else 0
 
-    # Read Video
-    print(f"Input video {args.input_video}")
-    video_frames = read_video(args.input_video)
-    print(f"Number of frames: {len(video_frames)}")
-    ## Initialize Tracker
+    end_frame = args.end_frame
+    if end_frame is None and args.end_time is not None:
+        end_frame = int(round(args.end_time * fps))
+    return start_frame, end_frame
+
+
+def run_analysis(args):
+    # Subsystems are imported by the mode that uses them: --help and cached runs do not
+    # pay for torch, ultralytics or transformers up front
+    from utils.report_generator import generate_game_summary_pdf
 
     team1 = Team("name1", "white shirt")
     team2 = Team("name2", "blue shirt")
 
-    ## Initialize Keypoint Detector
-    # We have different models hence why we predict lot of times
-    # each model is speciliazed for different task
-    print("Running Trackers")
-    court_keypoint_detector = CourtKeypointDetector(COURT_KEYPOINT_DETECTOR_PATH)
-    # Run Detectors to get Player, Ball and Hoop Tracks lists for each frame
-    players = PlayerTracker(PLAYER_DETECTOR_PATH).get_player_objects(video_frames)
-    baskets = HoopTracker(HOOP_DETECTOR_PATH).get_tracks(video_frames)
-    ball_object = BallTracker(BALL_DETECTOR_PATH).get_object_tracks(video_frames)
-    court_keypoints_tracks = court_keypoint_detector.get_court_keypoints(video_frames)
-
-
-
-    ## Draw object Tracks
-    player_tracks_drawer = PlayerTracksDrawer()
-    # Assign Player Teams
-    team_assigner = TeamAssigner()
-    player_assignment = team_assigner.get_player_teams_across_frames(video_frames,
-                                                                    players,
-                                                                    read_from_stub=False,
-                                                                    stub_path=os.path.join(args.stub_path, 'player_assignment_stub.pkl')
-                                                                    )
-
-    # Ball Acquisition
-    print("Ball acquisition")
-    possession_list = BallAcquisitionDetector().detect_ball_possession(players, ball_object)
-    pass_and_interception_detector = PassAndInterceptionDetector()
-    passes = pass_and_interception_detector.detect_passes(possession_list,player_assignment)
-    interceptions = pass_and_interception_detector.detect_interceptions(possession_list,player_assignment)
-
-    # Detect Passes
-    # Tactical View
-    tactical_view_converter = TacticalViewConverter(
-        court_image_path="./images/basketball_court.png"
-    )
-
-    court_keypoints_tracks = tactical_view_converter.validate_keypoints(court_keypoints_tracks)
-    tactical_player_positions = tactical_view_converter.transform_players_to_tactical_view(court_keypoints_tracks, players)
-    # Speed and Distance Calculator
-    speed_and_distance_calculator = SpeedAndDistanceCalculator(
-        tactical_view_converter.width,
-        tactical_view_converter.height,
-        tactical_view_converter.actual_width_in_meters,
-        tactical_view_converter.actual_height_in_meters
-    )
-    player_distances_per_frame = speed_and_distance_calculator.calculate_distance(tactical_player_positions)
-    player_speed_per_frame = speed_and_distance_calculator.calculate_speed(player_distances_per_frame)
-    output_video_frames = player_tracks_drawer.draw(video_frames,
-                                                    players,
-                                                    player_assignment,
-                                                    possession_list)
-
-    # Draw output
-    # Initialize Drawers
-    player_tracks_drawer = PlayerTracksDrawer()
-    ball_tracks_drawer = BallTracksDrawer()
-    court_keypoint_drawer = CourtKeypointDrawer()
-    team_ball_control_drawer = TeamBallControlDrawer()
-    frame_number_drawer = FrameNumberDrawer()
-    pass_and_interceptions_drawer = PassInterceptionDrawer()
-    tactical_view_drawer = TacticalViewDrawer()
-    speed_and_distance_drawer = SpeedAndDistanceDrawer()
-
-    ## Draw object Tracks
-    output_video_frames = player_tracks_drawer.draw(video_frames,
-                                                    players,
-                                                    player_assignment,
-                                                    possession_list)
-
-    output_video_frames = check_for_shots(output_video_frames, ball_object, baskets, possession_list, players)
-
-    output_video_frames = ball_tracks_drawer.draw(output_video_frames, ball_object)
-
-    ## Draw KeyPoints
-    output_video_frames = court_keypoint_drawer.draw(output_video_frames, court_keypoints_tracks)
-
-    ## Draw Frame Number
-    output_video_frames = frame_number_drawer.draw(output_video_frames)
-
-    # Draw Team Ball Control
-    output_video_frames = team_ball_control_drawer.draw(output_video_frames,
-                                                        player_assignment,
-                                                        possession_list)
-
-    # Draw Passes and Interceptions
-    output_video_frames = pass_and_interceptions_drawer.draw(output_video_frames,
-                                                             passes,
-                                                             interceptions)
-
-    # Speed and Distance Drawer
-    output_video_frames = speed_and_distance_drawer.draw(output_video_frames,
-                                                         players,
-                                                         player_distances_per_frame,
-                                                         player_speed_per_frame
-                                                         )
-
-    ## Draw Tactical View
-    output_video_frames = tactical_view_drawer.draw(output_video_frames,
-                                                    tactical_view_converter.court_image_path,
-                                                    tactical_view_converter.width,
-                                                    tactical_view_converter.height,
-                                                    tactical_view_converter.key_points,
-                                                    tactical_player_positions,
-                                                    player_assignment,
-                                                    possession_list,
-                                                    )
-
-    hoop_drawer = HoopTracksDrawer()
-    output_video_frames = hoop_drawer.draw(output_video_frames, baskets[0], baskets[1])
-    # Save video
-    print(f"Saving video file {args.output_video}")
-    save_video(output_video_frames, args.output_video)
-    generate_game_summary_pdf("output/game_summary.pdf", teams=[team1, team2], players=players)
+    if args.live:
+        # Live mode: frames are annotated as they arrive, within the latency budget
+        from pipeline.live_pipeline import LivePipeline
+        print(f"Live source {args.input_video}")
+        pipeline = LivePipeline(args.input_video, args.output_video, event_log=args.event_log,
+                                latency_budget=args.latency_budget,
+                                court_keyframe_interval=args.court_keyframe_interval)
+        players = pipeline.run()
+        generate_game_summary_pdf("output/game_summary.pdf", teams=[team1, team2], players=players,
+                                  stats_timeline=pipeline.stats)
+        return
+
+    from utils.video_utils import get_video_properties
+    from detection_cache import DetectionCache
+    video_properties = get_video_properties(args.input_video)
+    start_frame, end_frame = resolve_frame_range(args, video_properties["fps"])
+    detection_cache = None
+    if not args.no_detection_cache:
+        detection_cache = DetectionCache(DETECTION_CACHE_DIR, DETECTION_CACHE_MAX_BYTES)
+
+    if args.workers > 1:
+        # Sharded mode: segments are analysed in parallel processes, then stitched
+        from pipeline.sharded_pipeline import ShardedPipeline
+        print(f"Input video {args.input_video} (sharded, {args.workers} processes)")
+        pipeline = ShardedPipeline(args.input_video, args.output_video, args.chunk_size or SHARD_CHUNK_SIZE,
+                                   start_frame=start_frame, end_frame=end_frame,
+                                   detection_cache=detection_cache,
+                                   court_keyframe_interval=args.court_keyframe_interval,
+                                   num_workers=args.workers)
+        players = pipeline.run()
+        generate_game_summary_pdf("output/game_summary.pdf", teams=[team1, team2], players=players,
+                                  stats_timeline=pipeline.stats_timeline)
+        return
+
+    if args.chunk_size > 0:
+        # Streaming mode: peak memory depends on the window size, not on the game length
+        from pipeline.streaming_pipeline import StreamingPipeline
+        print(f"Input video {args.input_video} (streaming, {args.chunk_size} frames per window)")
+        pipeline = StreamingPipeline(args.input_video, args.output_video, args.chunk_size,
+                                     start_frame=start_frame, end_frame=end_frame,
+                                     detection_cache=detection_cache,
+                                     court_keyframe_interval=args.court_keyframe_interval)
+        players = pipeline.run()
+        generate_game_summary_pdf("output/game_summary.pdf", teams=[team1, team2], players=players,
+                                  stats_timeline=pipeline.stats_timeline)
+        return
+
+    from utils.video_utils import read_video
+    from utils.frame_store import FrameStore
+    from utils.video_writer import BackgroundVideoWriter
+    from trackers import PlayerTracker, BallTracker
+    from trackers.hoop_tracker import HoopTracker
+    from court_keypoint_detector import CourtKeypointDetector
+    from team_assigner import TeamAssigner
+    from appearance_embedding import AppearanceEmbedder
+    from ball_aquisition import BallAcquisitionDetector
+    from pass_and_interception_detector import PassAndInterceptionDetector
+    from tactical_view_converter import TacticalViewConverter
+    from speed_and_distance_calculator import SpeedAndDistanceCalculator
+    from core.stats_timeline import StatsTimeline
+    from drawers import TeamBallControlDrawer
+    from pipeline.overlays import build_overlay_compositor
+    from inference_scheduler import InferenceScheduler
+
+    # Read Video
+    print(f"Input video {args.input_video}")
+    # Frames before start_frame are skipped through the keyframe index, not decoded
+    with span("read_video") as read_span:
+        if args.frame_store:
+            # Frames are views of one file, which worker processes can map without copies
+            video_frames = FrameStore.from_video(args.input_video, start_frame, end_frame)
+        else:
+            video_frames = read_video(args.input_video, start_frame, end_frame)
+        read_span.add_frames(len(video_frames))
+    try:
+        print(f"Number of frames: {len(video_frames)} at {video_properties['fps']:.2f} fps")
+        ## Initialize Tracker
+
+        ## Initialize Keypoint Detector
+        # We have different models, each specialized for a different task.
+        # The scheduler feeds every batch of frames to all of them in one pass
+        print("Running Trackers")
+        # Detections are cached per video content, model weights and inference parameters
+        video_cache = detection_cache.for_video(args.input_video, start_frame, end_frame) if detection_cache else None
+        # Player crops are embedded once for the tracker re-identification and the team assignment
+        appearance_embedder = AppearanceEmbedder()
+        player_tracker = PlayerTracker(PLAYER_DETECTOR_PATH, cache=video_cache, embedder=appearance_embedder)
+        hoop_tracker = HoopTracker(HOOP_DETECTOR_PATH, cache=video_cache)
+        ball_tracker = BallTracker(BALL_DETECTOR_PATH, cache=video_cache)
+        court_keypoint_detector = CourtKeypointDetector(COURT_KEYPOINT_DETECTOR_PATH, cache=video_cache,
+                                                        keyframe_interval=args.court_keyframe_interval,
+                                                        motion_threshold=COURT_KEYFRAME_MOTION_THRESHOLD)
+        num_frames = len(video_frames)
+        inference_scheduler = InferenceScheduler(INFERENCE_BATCH_SIZE, INFERENCE_THREADS)
+        detectors = {
+            "players": player_tracker,
+            "hoops": hoop_tracker,
+        }
+        if not ball_tracker.uses_roi:
+            # The ball search depends on the previous frames and runs on its own
+            detectors["ball"] = ball_tracker
+        with span("inference", frames=num_frames):
+            detections = inference_scheduler.run_detectors(detectors, video_frames)
+        inference_scheduler.print_report()
+
+        # Run Detectors to get Player, Ball and Hoop Tracks lists for each frame
+        with span("tracking", frames=num_frames):
+            players = player_tracker.get_player_objects(video_frames, detections=detections["players"])
+            baskets = hoop_tracker.get_tracks(video_frames, detections=detections["hoops"])
+            ball_object = ball_tracker.get_object_tracks(video_frames, detections=detections.get("ball"))
+        # Court keypoints only on keyframes, the camera motion carries the court in between
+        with span("court_keypoints", frames=num_frames):
+            court_keypoints_tracks, camera_motion = court_keypoint_detector.get_keyframe_keypoints(video_frames)
+
+
+        # Assign Player Teams
+        team_assigner = TeamAssigner(embedder=appearance_embedder, cache=video_cache)
+        with span("team_assignment", frames=num_frames):
+            player_assignment = team_assigner.get_player_teams_across_frames(video_frames,
+                                                                            players,
+                                                                            read_from_stub=False,
+                                                                            stub_path=os.path.join(args.stub_path, 'player_assignment_stub.pkl')
+                                                                            )
+
+        # Ball Acquisition
+        print("Ball acquisition")
+        with span("ball_acquisition", frames=num_frames):
+            possession_list = BallAcquisitionDetector().detect_ball_possession(players, ball_object)
+        pass_and_interception_detector = PassAndInterceptionDetector()
+        with span("pass_detection", frames=num_frames):
+            passes = pass_and_interception_detector.detect_passes(possession_list,player_assignment)
+            interceptions = pass_and_interception_detector.detect_interceptions(possession_list,player_assignment)
+
+        # Detect Passes
+        # Tactical View
+        tactical_view_converter = TacticalViewConverter(
+            court_image_path="./images/basketball_court.png"
+        )
+
+        with span("tactical_view", frames=num_frames):
+            court_keypoints_tracks = tactical_view_converter.validate_keypoints(court_keypoints_tracks)
+            tactical_player_positions = tactical_view_converter.transform_players_to_tactical_view(court_keypoints_tracks, players,
+                                                                                                   camera_motion)
+        # Speed and Distance Calculator
+        speed_and_distance_calculator = SpeedAndDistanceCalculator(
+            tactical_view_converter.width,
+            tactical_view_converter.height,
+            tactical_view_converter.actual_width_in_meters,
+            tactical_view_converter.actual_height_in_meters
+        )
+        # Distance, speed and acceleration in one vectorized pass at the real frame rate
+        with span("speed_and_distance", frames=num_frames):
+            kinematics = speed_and_distance_calculator.calculate_kinematics(tactical_player_positions,
+                                                                            fps=video_properties["fps"])
+            player_distances_per_frame = kinematics.distance_per_frame()
+            player_speed_per_frame = kinematics.speed_per_frame()
+
+        # Draw output
+        # Every overlay is a layer of one compositor, each frame is drawn once and in place
+        team_ball_control = TeamBallControlDrawer().get_team_ball_control(player_assignment, possession_list)
+        # Running totals are prefix sums built once, each frame reads them in O(1)
+        stats_timeline = StatsTimeline(team_ball_control, passes, interceptions)
+        compositor = build_overlay_compositor(
+            players=players,
+            ball_object=ball_object,
+            baskets=baskets,
+            court_keypoints=court_keypoints_tracks,
+            player_assignment=player_assignment,
+            possession_list=possession_list,
+            stats_timeline=stats_timeline,
+            tactical_view_converter=tactical_view_converter,
+            tactical_player_positions=tactical_player_positions,
+            player_distances_per_frame=player_distances_per_frame,
+            player_speed_per_frame=player_speed_per_frame,
+        )
+
+        # Save video
+        # Each frame goes to the encoder thread as soon as it is drawn, at the source frame rate
+        print(f"Saving video file {args.output_video}")
+        frame_size = (video_frames[0].shape[1], video_frames[0].shape[0])
+        with span("render", frames=num_frames), \
+                BackgroundVideoWriter(args.output_video, video_properties["fps"], frame_size,
+                                      queue_size=VIDEO_WRITER_QUEUE_SIZE, crf=OUTPUT_VIDEO_CRF) as writer:
+            for frame_num, frame in enumerate(video_frames):
+                if args.frame_store:
+                    # The store is mapped read-only: each frame is drawn on a copy, freed once encoded
+                    frame = frame.copy()
+                writer.write(compositor.render_frame(frame, frame_num))
+    finally:
+        if args.frame_store:
+            video_frames.close()
+    with span("report"):
+        generate_game_summary_pdf("output/game_summary.pdf", teams=[team1, team2], players=players,
+                                  stats_timeline=stats_timeline)
+
+
+def main():
+    print("Basketball Video Analysis")
+    args = parse_args()
+
+    if not (args.trace or args.trace_memory or args.profile):
+        run_analysis(args)
+        return
+
+    # Tracing is only switched on when asked for, the spans cost nothing otherwise
+    tracer = enable_tracing(trace_memory=args.trace_memory, profile_span=args.profile)
+    try:
+        with span("main"):
+            run_analysis(args)
+    finally:
+        disable_tracing()
+        print(tracer.format_summary())
+        if args.trace:
+            tracer.export_chrome_trace(args.trace)
+            print(f"Trace written to {args.trace}")
+        if args.profile:
+            profile_output = args.profile_output or os.path.join("output", f"profile_{args.profile}.prof")
+            profile = tracer.write_profile(profile_output)
+            if profile:
+                print(profile)
+                print(f"Profile written to {profile_output}")
+            else:
+                print(f"No span named {args.profile} ran, nothing was profiled")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,2 @@
+from .model_registry import ModelRegistry, get_model_registry
+from .shared_results import FrameDetections, FrameKeypoints, convert_results, pack_detections, unpack_detections, get_supervision_detections
@@ -0,0 +1,92 @@
+"""
+A module for sharing the detection models between the stages that use them.
+
+Several stages can run the same weights: the hoop and the player trackers both use the
+player detector. The registry loads each model once per weights content and backend,
+and gives the InferenceScheduler the key under which two detectors would compute the
+same detections, so it runs inference once for all of them.
+"""
+
+import json
+import os
+import threading
+
+import sys
+sys.path.append('../')
+from detection_cache import hash_file
+from detector_backends import load_detector
+from configs import DETECTOR_BACKEND, DETECTION_CACHE_DIR
+
+
+class ModelRegistry:
+    """
+    Loads every model once, keyed by the content hash of its weights.
+
+    Attributes:
+        hash_memo_path (str): JSON file remembering the weights hashes, shared with the
+            detection cache.
+        models (dict): (weights hash, backend) -> loaded model.
+        weights_hashes (dict): Weights path -> content hash, for this process.
+    """
+    def __init__(self, hash_memo_path=os.path.join(DETECTION_CACHE_DIR, "file_hashes.json")):
+        self.hash_memo_path = hash_memo_path
+        self.models = {}
+        self.weights_hashes = {}
+        self.lock = threading.Lock()
+
+    def get_weights_hash(self, model_path):
+        """
+        Content hash of a weights file, computed once per process.
+
+        Args:
+            model_path (str): Path to the weights.
+
+        Returns:
+            str: Hex digest of the weights.
+        """
+        weights_hash = self.weights_hashes.get(model_path)
+        if weights_hash is None:
+            weights_hash = self.weights_hashes[model_path] = hash_file(model_path, self.hash_memo_path)
+        return weights_hash
+
+    def get_model(self, model_path, backend=DETECTOR_BACKEND):
+        """
+        Get the model of a weights file, loading it on the first request.
+
+        Args:
+            model_path (str): Path to the weights.
+            backend (str): Inference backend, see load_detector.
+
+        Returns:
+            The model, shared by every caller asking for the same weights and backend.
+        """
+        key = (self.get_weights_hash(model_path), backend)
+        with self.lock:
+            model = self.models.get(key)
+            if model is None:
+                model = self.models[key] = load_detector(model_path, backend)
+        return model
+
+    def get_inference_key(self, model_path, params):
+        """
+        Key identifying the detections of a model run with given parameters.
+
+        Args:
+            model_path (str): Path to the weights.
+            params (dict): Inference parameters, JSON serialisable.
+
+        Returns:
+            tuple: (weights hash, parameters), equal for detectors whose detections are
+                the same.
+        """
+        return self.get_weights_hash(model_path), json.dumps(params, sort_keys=True)
+
+
+_registry = ModelRegistry()
+
+
+def get_model_registry():
+    """
+    The model registry of the process.
+    """
+    return _registry
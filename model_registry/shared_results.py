@@ -0,0 +1,168 @@
+"""
+A module for the detections the stages read, as plain numpy arrays.
+
+The models return ultralytics Results, which hold torch tensors. They are converted
+once, right after inference, into FrameDetections: boxes, scores, classes and keypoints
+in numpy arrays, read like Results by the trackers. The detection cache stores them
+packed into a few flat arrays, so a run served from the cache never imports torch or
+ultralytics.
+"""
+
+import numpy as np
+import supervision as sv
+
+
+class FrameKeypoints:
+    """
+    Keypoints of one frame, read like ultralytics Keypoints.
+
+    Attributes:
+        data (numpy.ndarray): (detections, keypoints, 3) x, y and confidence, or
+            (detections, keypoints, 2) without confidence.
+        orig_shape (tuple): (height, width) of the frame.
+    """
+    def __init__(self, data, orig_shape):
+        self.data = data
+        self.orig_shape = tuple(orig_shape)
+
+    @property
+    def xy(self):
+        # A view: zeroing a keypoint through it zeroes it in data
+        return self.data[..., :2]
+
+    @property
+    def xyn(self):
+        return self.xy / np.array([self.orig_shape[1], self.orig_shape[0]], dtype=self.data.dtype)
+
+    @property
+    def conf(self):
+        return self.data[..., 2] if self.data.shape[-1] == 3 else None
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self
+
+    def __len__(self):
+        return len(self.data)
+
+
+class FrameDetections:
+    """
+    Detections of one frame, read like an ultralytics Results.
+
+    Attributes:
+        boxes (numpy.ndarray): (n, 6) float32 boxes: x1, y1, x2, y2, confidence, class.
+        names (dict): Class names of the model.
+        keypoints (FrameKeypoints): Keypoints of pose models, None for detection models.
+        orig_shape (tuple): (height, width) of the frame.
+    """
+    def __init__(self, boxes, names, keypoints=None, orig_shape=None):
+        self.boxes = boxes
+        self.names = names
+        self.keypoints = keypoints
+        self.orig_shape = tuple(orig_shape) if orig_shape is not None else None
+
+    @classmethod
+    def from_result(cls, result):
+        """
+        Convert an ultralytics Results, dropping its copy of the frame.
+        """
+        boxes = np.zeros((0, 6), dtype=np.float32)
+        if result.boxes is not None:
+            boxes = result.boxes.data.cpu().numpy().astype(np.float32)
+        keypoints = None
+        if result.keypoints is not None:
+            keypoints = FrameKeypoints(result.keypoints.data.cpu().numpy().astype(np.float32), result.orig_shape)
+        return cls(boxes, result.names, keypoints, result.orig_shape)
+
+    def to_supervision(self):
+        """
+        Convert to supervision Detections, as sv.Detections.from_ultralytics does.
+        """
+        class_ids = self.boxes[:, 5].astype(int)
+        return sv.Detections(xyxy=self.boxes[:, :4], confidence=self.boxes[:, 4], class_id=class_ids,
+                             data={"class_name": np.array([self.names[class_id] for class_id in class_ids.tolist()])})
+
+
+def convert_results(results):
+    """
+    Convert the ultralytics Results of a model into FrameDetections.
+
+    Args:
+        results (list): Results, one per frame.
+
+    Returns:
+        list of FrameDetections: The detections, one per frame.
+    """
+    return [FrameDetections.from_result(result) for result in results]
+
+
+def pack_detections(detections):
+    """
+    Pack the detections of consecutive frames into flat arrays, as they are cached.
+
+    Args:
+        detections (list of FrameDetections): Detections, one per frame.
+
+    Returns:
+        dict: Class names, and per frame the number of boxes, the frame shape and
+            whether it has keypoints; the boxes and keypoints of all frames concatenated.
+    """
+    has_keypoints = np.array([detection.keypoints is not None for detection in detections], dtype=bool)
+    keypoints = [detection.keypoints.data for detection in detections if detection.keypoints is not None]
+    return {
+        "names": detections[0].names if detections else {},
+        "counts": np.array([len(detection.boxes) for detection in detections], dtype=np.int64),
+        "orig_shapes": np.array([detection.orig_shape or (0, 0) for detection in detections],
+                                dtype=np.int64).reshape(-1, 2),
+        "boxes": (np.concatenate([detection.boxes for detection in detections]) if detections
+                  else np.zeros((0, 6), dtype=np.float32)),
+        "has_keypoints": has_keypoints,
+        "keypoints": np.concatenate(keypoints) if keypoints else None,
+    }
+
+
+def unpack_detections(packed):
+    """
+    Rebuild the detections packed by pack_detections.
+
+    Args:
+        packed (dict): Output of pack_detections, or None.
+
+    Returns:
+        list of FrameDetections: Detections, one per frame, or None if packed is None.
+            Their arrays are views of the packed arrays.
+    """
+    if packed is None:
+        return None
+    bounds = np.concatenate([[0], np.cumsum(packed["counts"])]).tolist()
+    detections = []
+    for i, orig_shape in enumerate(packed["orig_shapes"].tolist()):
+        start, end = bounds[i], bounds[i + 1]
+        keypoints = None
+        if packed["has_keypoints"][i]:
+            keypoints = FrameKeypoints(packed["keypoints"][start:end], orig_shape)
+        detections.append(FrameDetections(packed["boxes"][start:end], packed["names"], keypoints, orig_shape))
+    return detections
+
+
+def get_supervision_detections(result):
+    """
+    Convert detections to supervision Detections, once for all the stages reading them.
+
+    Stages that share a model receive the same detection objects, the players and the
+    hoops for instance. The conversion is kept on the detections, so each stage reads a
+    view of the same Detections instead of converting again. They must not modify it.
+
+    Args:
+        result (FrameDetections): Detections of one frame.
+
+    Returns:
+        supervision.Detections: The converted detections.
+    """
+    detections = result.__dict__.get("supervision_detections")
+    if detections is None:
+        detections = result.supervision_detections = result.to_supervision()
+    return detections
@@ -0,0 +1,2 @@
+from .object_tracker import ObjectTracker
+from .loader import build_tracker, TRACKER_TYPES
\ No newline at end of file
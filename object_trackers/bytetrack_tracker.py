@@ -0,0 +1,27 @@
+import supervision as sv
+
+import sys
+sys.path.append('../')
+from .object_tracker import ObjectTracker
+
+
+class ByteTrackTracker(ObjectTracker):
+    """
+    supervision's ByteTrack: Kalman filter on the boxes, two matching rounds that also
+    recover the tracks of low confidence detections.
+    """
+    def __init__(self, **params):
+        """
+        Args:
+            **params: Arguments of supervision.ByteTrack.
+        """
+        self.params = params
+        self.tracker = sv.ByteTrack(**params)
+
+    def update(self, detections, frame=None, frame_num=None):
+        # ByteTrack sets the tracker ids of the detections it is given: it gets its own
+        # Detections object, so the view shared with the hoop tracker stays untouched
+        return self.tracker.update_with_detections(detections[:])
+
+    def reset(self):
+        self.tracker = sv.ByteTrack(**self.params)
@@ -0,0 +1,66 @@
+import numpy as np
+import supervision as sv
+
+import sys
+sys.path.append('../')
+from .object_tracker import ObjectTracker
+
+
+class DeepSortTracker(ObjectTracker):
+    """
+    DeepSORT from deep_sort_realtime: Kalman filter and IoU matching, plus an appearance
+    embedding of every detection, computed on the frame. The most robust to occlusions
+    and the most expensive of the trackers.
+
+    With an AppearanceEmbedder, the embeddings come from it instead of deep_sort_realtime's
+    own model. They are stored under the track id each detection gets, so the team
+    assigner finds the crops it samples already embedded.
+    """
+    needs_frames = True
+
+    def __init__(self, embedder=None):
+        """
+        Args:
+            embedder (AppearanceEmbedder, optional): Embedding service shared with the team
+                assigner. deep_sort_realtime's MobileNet embedder is used without it.
+        """
+        self.embedder = embedder
+        self.reset()
+
+    def update(self, detections, frame=None, frame_num=None):
+        if frame is None:
+            raise ValueError("DeepSORT needs the frames to compute the appearance embeddings")
+
+        # deep_sort_realtime takes ([left, top, width, height], confidence, class) tuples
+        raw_detections = [([x1, y1, x2 - x1, y2 - y1], confidence, class_id)
+                          for (x1, y1, x2, y2), confidence, class_id
+                          in zip(detections.xyxy.tolist(), detections.confidence.tolist(),
+                                 detections.class_id.tolist())]
+        if self.embedder is None:
+            tracks = self.tracker.update_tracks(raw_detections, frame)
+        else:
+            if frame_num is None:
+                raise ValueError("The shared embeddings are keyed by frame, frame_num is required")
+            # Detections are keyed by their index until the tracker gives them a track id
+            keys = [("detection", index) for index in range(len(detections))]
+            embeddings = self.embedder.embed([(frame_num, key, frame, bbox)
+                                              for key, bbox in zip(keys, detections.xyxy)])
+            tracks = self.tracker.update_tracks(raw_detections, frame, embeds=list(embeddings.astype(np.float32)),
+                                                others=keys)
+        # Tracks coasting on the Kalman prediction are left out, like ByteTrack does
+        tracks = [track for track in tracks if track.time_since_update == 0]
+        if self.embedder is not None:
+            for track in tracks:
+                self.embedder.rename(frame_num, track.get_det_supplementary(), int(track.track_id))
+        if not tracks:
+            return sv.Detections.empty()
+        return sv.Detections(
+            xyxy=np.array([track.to_ltrb(orig=True) for track in tracks], dtype=np.float32),
+            confidence=np.array([track.get_det_conf() for track in tracks], dtype=np.float32),
+            class_id=np.array([track.get_det_class() for track in tracks], dtype=int),
+            tracker_id=np.array([int(track.track_id) for track in tracks], dtype=int))
+
+    def reset(self):
+        # deep_sort_realtime loads its embedder model, only once DeepSORT is chosen
+        from deep_sort.tracker import DeepSORTTracker
+        self.tracker = DeepSORTTracker() if self.embedder is None else DeepSORTTracker(embedder=None)
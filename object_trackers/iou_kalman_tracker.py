@@ -0,0 +1,223 @@
+"""
+A module for the lightest of the trackers: IoU matching on constant velocity predictions.
+
+Every track keeps its box and the velocity of its four coordinates. Each coordinate has
+its own two-state Kalman filter (position and velocity), so the filter of all the tracks
+is a handful of array operations instead of one matrix product per track. Each frame,
+the boxes are predicted one frame ahead, the IoU of every prediction with every
+detection is computed at once, and one assignment pairs them. There is no appearance
+model and no second matching round: it costs little more than the IoU matrix, at the
+price of more id switches when players cross.
+"""
+
+import numpy as np
+
+import sys
+sys.path.append('../')
+from configs import IOU_TRACKER_IOU_THRESHOLD, IOU_TRACKER_MAX_AGE, IOU_TRACKER_MIN_HITS, IOU_TRACKER_MATCHING
+from .object_tracker import ObjectTracker
+
+MATCHING_METHODS = ("greedy", "hungarian")
+PROCESS_NOISE = 1.0  # variance of the box coordinate acceleration, in squared pixels per frame squared
+MEASUREMENT_NOISE = 10.0  # variance of the detected box coordinates, in squared pixels
+INITIAL_VELOCITY_VARIANCE = 100.0  # the velocity of a new track is unknown
+
+
+def box_iou_matrix(boxes, other_boxes):
+    """
+    IoU of every box with every other box, in xyxy format.
+
+    Args:
+        boxes (numpy.ndarray): (n, 4) boxes.
+        other_boxes (numpy.ndarray): (m, 4) boxes.
+
+    Returns:
+        numpy.ndarray: (n, m) IoU matrix.
+    """
+    top_left = np.maximum(boxes[:, None, :2], other_boxes[None, :, :2])
+    bottom_right = np.minimum(boxes[:, None, 2:], other_boxes[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    areas = np.prod(boxes[:, 2:] - boxes[:, :2], axis=1)
+    other_areas = np.prod(other_boxes[:, 2:] - other_boxes[:, :2], axis=1)
+    return intersection / (areas[:, None] + other_areas[None, :] - intersection + 1e-9)
+
+
+def match_greedy(iou, iou_threshold):
+    """
+    Pair the rows and columns of an IoU matrix, best IoU first.
+
+    Args:
+        iou (numpy.ndarray): (n, m) IoU matrix.
+        iou_threshold (float): Pairs below this IoU are not matched.
+
+    Returns:
+        tuple: (rows, columns) of the matched pairs.
+    """
+    iou = np.where(iou >= iou_threshold, iou, -1.0)
+    rows, columns = [], []
+    for _ in range(min(iou.shape)):
+        row, column = np.unravel_index(np.argmax(iou), iou.shape)
+        if iou[row, column] < 0:
+            break
+        rows.append(row)
+        columns.append(column)
+        iou[row, :] = -1.0
+        iou[:, column] = -1.0
+    return np.array(rows, dtype=np.int64), np.array(columns, dtype=np.int64)
+
+
+def match_hungarian(iou, iou_threshold):
+    """
+    Pair the rows and columns of an IoU matrix with the assignment of largest total IoU.
+
+    Args:
+        iou (numpy.ndarray): (n, m) IoU matrix.
+        iou_threshold (float): Pairs below this IoU are not matched.
+
+    Returns:
+        tuple: (rows, columns) of the matched pairs.
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    rows, columns = linear_sum_assignment(iou, maximize=True)
+    kept = iou[rows, columns] >= iou_threshold
+    return rows[kept].astype(np.int64), columns[kept].astype(np.int64)
+
+
+class IouKalmanTracker(ObjectTracker):
+    """
+    Tracks boxes by IoU with their constant velocity prediction.
+
+    The state of the tracks is kept in arrays with one row per track.
+
+    Attributes:
+        iou_threshold (float): Least IoU to match a prediction and a detection.
+        max_age (int): Frames a track is kept without a match.
+        min_hits (int): Matched frames before a track is reported.
+        matching (str): "greedy" or "hungarian".
+        boxes (numpy.ndarray): (n, 4) filtered boxes of the tracks.
+        velocities (numpy.ndarray): (n, 4) velocity of each box coordinate, in pixels per frame.
+        covariances (numpy.ndarray): (n, 4, 3) covariance of the position and velocity of
+            each coordinate: position variance, covariance, velocity variance.
+        track_ids (numpy.ndarray): (n,) id of each track.
+        hits (numpy.ndarray): (n,) frames each track was matched on.
+        misses (numpy.ndarray): (n,) frames since each track was last matched.
+    """
+    def __init__(self, iou_threshold=IOU_TRACKER_IOU_THRESHOLD, max_age=IOU_TRACKER_MAX_AGE,
+                 min_hits=IOU_TRACKER_MIN_HITS, matching=IOU_TRACKER_MATCHING):
+        """
+        Args:
+            iou_threshold (float): Least IoU to match a prediction and a detection.
+            max_age (int): Frames a track is kept without a match.
+            min_hits (int): Matched frames before a track is reported. Tracks are reported
+                from their first frame during the first min_hits frames of a video.
+            matching (str): "greedy" matches the best IoU first, "hungarian" finds the
+                assignment of largest total IoU with scipy.
+
+        Raises:
+            ValueError: If the matching method is unknown.
+        """
+        if matching not in MATCHING_METHODS:
+            raise ValueError(f"Unknown matching {matching}, expected one of {MATCHING_METHODS}")
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.matching = matching
+        self.reset()
+
+    def reset(self):
+        self.boxes = np.zeros((0, 4))
+        self.velocities = np.zeros((0, 4))
+        self.covariances = np.zeros((0, 4, 3))
+        self.track_ids = np.zeros(0, dtype=np.int64)
+        self.hits = np.zeros(0, dtype=np.int64)
+        self.misses = np.zeros(0, dtype=np.int64)
+        self.next_track_id = 1
+        self.frame_count = 0
+
+    def predict(self):
+        """
+        Move every track one frame ahead.
+        """
+        self.boxes = self.boxes + self.velocities
+        position, covariance, velocity = np.moveaxis(self.covariances, 2, 0)
+        # P = F P F^T + Q, F = [[1, 1], [0, 1]], Q from a white noise acceleration
+        self.covariances = np.stack([position + 2 * covariance + velocity + PROCESS_NOISE / 4,
+                                     covariance + velocity + PROCESS_NOISE / 2,
+                                     velocity + PROCESS_NOISE], axis=2)
+
+    def correct(self, tracks, boxes):
+        """
+        Update matched tracks with their detected boxes.
+
+        Args:
+            tracks (numpy.ndarray): Rows of the matched tracks.
+            boxes (numpy.ndarray): (len(tracks), 4) detected boxes.
+        """
+        position, covariance, velocity = np.moveaxis(self.covariances[tracks], 2, 0)
+        # Only the position is measured: the gains are the first column of P over S
+        innovation_variance = position + MEASUREMENT_NOISE
+        position_gain = position / innovation_variance
+        velocity_gain = covariance / innovation_variance
+        innovation = boxes - self.boxes[tracks]
+        self.boxes[tracks] += position_gain * innovation
+        self.velocities[tracks] += velocity_gain * innovation
+        self.covariances[tracks] = np.stack([(1 - position_gain) * position,
+                                             (1 - position_gain) * covariance,
+                                             velocity - velocity_gain * covariance], axis=2)
+
+    def add_tracks(self, boxes):
+        """
+        Start a track for each of the given boxes.
+
+        Returns:
+            numpy.ndarray: Rows of the new tracks.
+        """
+        count = len(boxes)
+        rows = np.arange(len(self.boxes), len(self.boxes) + count)
+        covariances = np.zeros((count, 4, 3))
+        covariances[:, :, 0] = MEASUREMENT_NOISE
+        covariances[:, :, 2] = INITIAL_VELOCITY_VARIANCE
+        self.boxes = np.concatenate([self.boxes, boxes])
+        self.velocities = np.concatenate([self.velocities, np.zeros((count, 4))])
+        self.covariances = np.concatenate([self.covariances, covariances])
+        self.track_ids = np.concatenate([self.track_ids, np.arange(self.next_track_id, self.next_track_id + count)])
+        self.hits = np.concatenate([self.hits, np.ones(count, dtype=np.int64)])
+        self.misses = np.concatenate([self.misses, np.zeros(count, dtype=np.int64)])
+        self.next_track_id += count
+        return rows
+
+    def remove_tracks(self, keep):
+        """
+        Keep only the tracks of a boolean mask.
+        """
+        self.boxes = self.boxes[keep]
+        self.velocities = self.velocities[keep]
+        self.covariances = self.covariances[keep]
+        self.track_ids = self.track_ids[keep]
+        self.hits = self.hits[keep]
+        self.misses = self.misses[keep]
+
+    def update(self, detections, frame=None, frame_num=None):
+        self.frame_count += 1
+        self.predict()
+
+        boxes = detections.xyxy.astype(np.float64)
+        iou = box_iou_matrix(self.boxes, boxes)
+        match = match_greedy if self.matching == "greedy" else match_hungarian
+        tracks, matched = match(iou, self.iou_threshold)
+        self.correct(tracks, boxes[matched])
+        self.misses += 1
+        self.misses[tracks] = 0
+        self.hits[tracks] += 1
+
+        unmatched = np.setdiff1d(np.arange(len(boxes)), matched)
+        tracks = np.concatenate([tracks, self.add_tracks(boxes[unmatched])])
+        matched = np.concatenate([matched, unmatched])
+
+        reported = (self.hits[tracks] >= self.min_hits) | (self.frame_count <= self.min_hits)
+        tracked = detections[matched[reported]]
+        tracked.tracker_id = self.track_ids[tracks[reported]]
+
+        self.remove_tracks(self.misses <= self.max_age)
+        return tracked
@@ -0,0 +1,34 @@
+import sys
+sys.path.append('../')
+from configs import PLAYER_TRACKER
+
+TRACKER_TYPES = ("bytetrack", "deepsort", "iou_kalman")
+
+
+def build_tracker(tracker_type=PLAYER_TRACKER, embedder=None, **params):
+    """
+    Build a multi-object tracker.
+
+    Args:
+        tracker_type (str): "bytetrack", "deepsort" or "iou_kalman".
+        embedder (AppearanceEmbedder, optional): Embedding service shared with the team
+            assigner, used by the trackers with appearance features.
+        **params: Arguments of the tracker class.
+
+    Returns:
+        ObjectTracker: The tracker.
+
+    Raises:
+        ValueError: If the tracker type is unknown.
+    """
+    if tracker_type not in TRACKER_TYPES:
+        raise ValueError(f"Unknown tracker {tracker_type}, expected one of {TRACKER_TYPES}")
+    # Only the chosen tracker's dependencies are imported
+    if tracker_type == "bytetrack":
+        from .bytetrack_tracker import ByteTrackTracker
+        return ByteTrackTracker(**params)
+    if tracker_type == "deepsort":
+        from .deepsort_tracker import DeepSortTracker
+        return DeepSortTracker(embedder=embedder, **params)
+    from .iou_kalman_tracker import IouKalmanTracker
+    return IouKalmanTracker(**params)
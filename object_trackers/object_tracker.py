@@ -0,0 +1,33 @@
+class ObjectTracker:
+    """
+    Interface of the multi-object trackers that give the player detections their ids.
+
+    A tracker is fed the detections of consecutive frames, one frame per call, and keeps
+    its state between calls, so consecutive windows of a video continue the same ids.
+
+    Attributes:
+        needs_frames (bool): Whether update needs the frame, for appearance features.
+    """
+    needs_frames = False
+
+    def update(self, detections, frame=None, frame_num=None):
+        """
+        Associate the detections of the next frame with the tracks.
+
+        Args:
+            detections (supervision.Detections): Detections of the frame. They may be shared
+                with other stages and must not be modified.
+            frame (numpy.ndarray, optional): The frame, required when needs_frames is set.
+            frame_num (int, optional): Index of the frame in the video, which keys the
+                appearance embeddings shared with the other stages.
+
+        Returns:
+            supervision.Detections: The tracked detections, with their tracker_id set.
+        """
+        raise NotImplementedError("Must be implemented in subclass")
+
+    def reset(self):
+        """
+        Forget every track, before tracking another video.
+        """
+        raise NotImplementedError("Must be implemented in subclass")
@@ -1,12 +1,45 @@
 from copy import deepcopy
+import sys
+sys.path.append('../')
+from instrumentation import traced
 
 class PassAndInterceptionDetector:
     """
     A class that detects passes between teammates and interceptions by opposing teams.
     """
     def __init__(self):
-        pass 
+        # Last holder seen by update_events and their team at that frame
+        self.prev_holder = -1
+        self.prev_team = -1
 
+    def update_events(self, holder, frame_assignment):
+        """
+        Detect a pass or an interception on the next frame of a live stream.
+
+        Gives the same result as detect_passes and detect_interceptions, one frame at a time.
+
+        Args:
+            holder (int): Player in possession on this frame, -1 if none.
+            frame_assignment (dict): Team of each player on this frame.
+
+        Returns:
+            tuple: (pass_team, interception_team), -1 for none.
+        """
+        pass_team = -1
+        interception_team = -1
+        if self.prev_holder != -1 and holder != -1 and self.prev_holder != holder:
+            current_team = frame_assignment.get(holder, -1)
+            if self.prev_team == current_team and self.prev_team != -1:
+                pass_team = self.prev_team
+            if self.prev_team != current_team and self.prev_team != -1 and current_team != -1:
+                interception_team = current_team
+
+        if holder != -1:
+            self.prev_holder = holder
+            self.prev_team = frame_assignment.get(holder, -1)
+        return pass_team, interception_team
+
+    @traced(frames_arg="ball_acquisition")
     def detect_passes(self,ball_acquisition,player_assignment):
         """
         Detects successful passes between players of the same team.
@@ -41,6 +74,7 @@ class PassAndInterceptionDetector:
 
         return passes
 
+    @traced(frames_arg="ball_acquisition")
     def detect_interceptions(self,ball_acquisition,player_assignment):
         """
         Detects interceptions where the ball possession changes between opposing teams.
@@ -0,0 +1,13 @@
+# The pipelines import every stage, and with them torch: they are only imported once used
+PIPELINES = {
+    "StreamingPipeline": ".streaming_pipeline",
+    "LivePipeline": ".live_pipeline",
+    "ShardedPipeline": ".sharded_pipeline",
+}
+
+
+def __getattr__(name):
+    if name not in PIPELINES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    return getattr(importlib.import_module(PIPELINES[name], __name__), name)
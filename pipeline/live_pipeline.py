@@ -0,0 +1,449 @@
+"""
+A module for running the analysis on a live stream within a latency budget.
+
+Frames come from a capture source (a camera, an RTSP feed, or a video file replayed at
+its native frame rate) and go through detection, tracking, team assignment and the
+analytics in micro-batches, and every frame leaves annotated as soon as it is done.
+Possession, passes, interceptions and speeds are updated frame by frame instead of
+over the whole video, and each change is published on an event feed.
+
+When processing falls behind the live edge by more than the latency budget, the
+detectors are skipped on the next micro-batch and the players are held at their last
+tracked positions, so every captured frame is still drawn and written out.
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+sys.path.append('../')
+from utils import LiveCapture, BackgroundVideoWriter
+from trackers import PlayerTracker, BallTracker
+from trackers.hoop_tracker import HoopTracker
+from court_keypoint_detector import CourtKeypointDetector
+from team_assigner import TeamAssigner
+from appearance_embedding import AppearanceEmbedder
+from ball_aquisition import BallAcquisitionDetector
+from pass_and_interception_detector import PassAndInterceptionDetector
+from tactical_view_converter import TacticalViewConverter
+from speed_and_distance_calculator import SpeedAndDistanceCalculator
+from core.stats_timeline import RunningStats
+from inference_scheduler import InferenceScheduler
+from instrumentation import span
+from .overlays import build_overlay_compositor
+from configs import (
+    VIDEO_WRITER_QUEUE_SIZE,
+    OUTPUT_VIDEO_CRF,
+    HOOP_DETECTOR_PATH,
+    PLAYER_DETECTOR_PATH,
+    BALL_DETECTOR_PATH,
+    COURT_KEYPOINT_DETECTOR_PATH,
+    INFERENCE_THREADS,
+    COURT_KEYFRAME_INTERVAL,
+    COURT_KEYFRAME_MOTION_THRESHOLD,
+    BALL_MAX_SPEED,
+    BALL_MAX_GAP_FRAMES,
+    LIVE_LATENCY_BUDGET,
+    LIVE_MICRO_BATCH_SIZE,
+    LIVE_MAX_SKIPPED_FRAMES,
+)
+
+
+class StageTimer:
+    """
+    Collects the latency of every pipeline stage.
+
+    Attributes:
+        samples (dict): Stage name -> list of durations in seconds.
+    """
+    def __init__(self):
+        self.samples = {}
+
+    def add(self, stage, seconds):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    @contextmanager
+    def measure(self, stage):
+        """
+        Time the body of a with statement as one sample of a stage, and trace it as a span.
+        """
+        start = time.perf_counter()
+        try:
+            with span(stage, category="live"):
+                yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def get_report(self):
+        """
+        Summarise the latency of each stage.
+
+        Returns:
+            list of dict: One entry per stage with the sample count and the mean, 95th
+                percentile and maximum latency in milliseconds.
+        """
+        report = []
+        for stage, samples in self.samples.items():
+            samples = np.asarray(samples) * 1000
+            report.append({"stage": stage, "count": len(samples), "mean_ms": float(samples.mean()),
+                           "p95_ms": float(np.percentile(samples, 95)), "max_ms": float(samples.max())})
+        return report
+
+    def print_report(self):
+        """
+        Print the per-stage latency report.
+        """
+        print("Latency per stage:")
+        for entry in self.get_report():
+            print(f"  {entry['stage']:<16} {entry['count']:>6} samples "
+                  f"mean {entry['mean_ms']:>8.1f}ms p95 {entry['p95_ms']:>8.1f}ms max {entry['max_ms']:>8.1f}ms")
+
+
+class LatencyBudget:
+    """
+    Decides whether the next micro-batch can afford detection.
+
+    The cost of a detected frame is tracked as a moving average. A batch is detected
+    when the oldest of its frames would still leave within the budget, or when detection
+    has been skipped for max_skipped_frames frames in a row, so the tracks never go
+    stale for long.
+
+    Attributes:
+        budget (float): Largest capture to output delay aimed for, in seconds.
+        max_skipped_frames (int): Longest run of frames without detection.
+        skipped_frames (int): Frames skipped since the last detection.
+        total_skipped_frames (int): Frames skipped over the whole run.
+    """
+    def __init__(self, budget, max_skipped_frames, smoothing=0.2):
+        self.budget = budget
+        self.max_skipped_frames = max_skipped_frames
+        self.smoothing = smoothing
+        self.detected_frame_seconds = None
+        self.skipped_frames = 0
+        self.total_skipped_frames = 0
+
+    def should_detect(self, lag, num_frames):
+        """
+        Args:
+            lag (float): Seconds since the oldest frame of the batch was captured.
+            num_frames (int): Frames in the batch.
+
+        Returns:
+            bool: True to run the detectors on the batch.
+        """
+        if self.detected_frame_seconds is None or self.skipped_frames >= self.max_skipped_frames:
+            return True
+        return lag + num_frames * self.detected_frame_seconds <= self.budget
+
+    def record(self, detected, num_frames, seconds):
+        """
+        Add the processing time of a batch to the cost estimate.
+        """
+        if detected:
+            per_frame = seconds / max(num_frames, 1)
+            previous = self.detected_frame_seconds
+            self.detected_frame_seconds = (per_frame if previous is None
+                                           else (1 - self.smoothing) * previous + self.smoothing * per_frame)
+            self.skipped_frames = 0
+        else:
+            self.skipped_frames += num_frames
+            self.total_skipped_frames += num_frames
+
+
+class LivePipeline:
+    """
+    Runs the basketball analysis on a live stream, frame by frame.
+
+    Tracks and analytics grow with the stream: the per-frame lists the overlays read
+    get one entry per frame as it is processed, and the drawers only ever look at the
+    latest one.
+
+    Attributes:
+        source (str or int): Capture source, see LiveCapture.
+        output_video (str): Path where the annotated stream is recorded, None to not record.
+        event_log (str): Path of the JSON lines event feed, None to not write it.
+        latency_budget (float): Capture to output delay aimed for, in seconds.
+        micro_batch_size (int): Largest number of frames processed at once.
+        events (list): Every event emitted so far.
+        stage_timer (StageTimer): Latency of every stage.
+    """
+    def __init__(self, source, output_video=None, event_log=None, latency_budget=LIVE_LATENCY_BUDGET,
+                 micro_batch_size=LIVE_MICRO_BATCH_SIZE, max_skipped_frames=LIVE_MAX_SKIPPED_FRAMES,
+                 court_keyframe_interval=COURT_KEYFRAME_INTERVAL,
+                 court_image_path="./images/basketball_court.png", realtime=None,
+                 on_frame=None, on_event=None):
+        """
+        Args:
+            source (str or int): Camera index, stream URL or video file path.
+            output_video (str, optional): Path where the annotated stream is recorded.
+            event_log (str, optional): Path of the JSON lines event feed.
+            latency_budget (float): Capture to output delay aimed for, in seconds.
+            micro_batch_size (int): Largest number of frames processed at once.
+            max_skipped_frames (int): Longest run of frames without detection.
+            court_keyframe_interval (int): Court keypoints are detected every this many frames.
+            court_image_path (str): Path to the court image used for the tactical view.
+            realtime (bool, optional): Replay a file at its frame rate, see LiveCapture.
+            on_frame (callable, optional): Called as on_frame(frame_num, frame) with every
+                annotated frame, for instance to show it.
+            on_event (callable, optional): Called with every event dict.
+        """
+        self.source = source
+        self.output_video = output_video
+        self.event_log = event_log
+        self.latency_budget = latency_budget
+        self.micro_batch_size = micro_batch_size
+        self.court_keyframe_interval = court_keyframe_interval
+        self.court_image_path = court_image_path
+        self.realtime = realtime
+        self.on_frame = on_frame
+        self.on_event = on_event
+        self.budget = LatencyBudget(latency_budget, max_skipped_frames)
+        self.stage_timer = StageTimer()
+        self.events = []
+        self.stats = RunningStats()
+
+    def setup(self, fps):
+        """
+        Create the stage objects and the per-frame state of a run.
+        """
+        # Player crops are embedded once for the tracker re-identification and the team assignment
+        appearance_embedder = AppearanceEmbedder()
+        self.player_tracker = PlayerTracker(PLAYER_DETECTOR_PATH, embedder=appearance_embedder)
+        self.hoop_tracker = HoopTracker(HOOP_DETECTOR_PATH)
+        self.ball_tracker = BallTracker(BALL_DETECTOR_PATH)
+        self.court_keypoint_detector = CourtKeypointDetector(COURT_KEYPOINT_DETECTOR_PATH,
+                                                             keyframe_interval=self.court_keyframe_interval,
+                                                             motion_threshold=COURT_KEYFRAME_MOTION_THRESHOLD)
+        self.team_assigner = TeamAssigner(embedder=appearance_embedder)
+        self.inference_scheduler = InferenceScheduler(self.micro_batch_size, INFERENCE_THREADS)
+        self.detectors = {
+            "players": self.player_tracker,
+            "hoops": self.hoop_tracker,
+        }
+        if not self.ball_tracker.uses_roi:
+            # The ball search depends on the previous frames and runs on its own
+            self.detectors["ball"] = self.ball_tracker
+
+        self.tactical_view_converter = TacticalViewConverter(court_image_path=self.court_image_path)
+        speed_and_distance_calculator = SpeedAndDistanceCalculator(
+            self.tactical_view_converter.width,
+            self.tactical_view_converter.height,
+            self.tactical_view_converter.actual_width_in_meters,
+            self.tactical_view_converter.actual_height_in_meters
+        )
+        self.meter_scale = speed_and_distance_calculator.get_meter_scale()
+        self.kinematics = speed_and_distance_calculator.create_running_kinematics(fps)
+        self.ball_acquisition_detector = BallAcquisitionDetector()
+        self.pass_and_interception_detector = PassAndInterceptionDetector()
+        self.fps = fps
+
+        self.players = self.player_tracker.players
+        self.court_keypoints = []
+        self.player_assignment = []
+        self.possession_list = []
+        self.tactical_player_positions = []
+        self.player_distances_per_frame = []
+        self.player_speed_per_frame = []
+        self.last_homography = None
+        self.last_ball_frame = None
+        self.last_holder = -1
+
+        self.compositor = build_overlay_compositor(
+            players=self.players,
+            ball_object=self.ball_tracker.ball,
+            baskets=(self.hoop_tracker.left_hoop, self.hoop_tracker.right_hoop),
+            court_keypoints=self.court_keypoints,
+            player_assignment=self.player_assignment,
+            possession_list=self.possession_list,
+            stats_timeline=self.stats,
+            tactical_view_converter=self.tactical_view_converter,
+            tactical_player_positions=self.tactical_player_positions,
+            player_distances_per_frame=self.player_distances_per_frame,
+            player_speed_per_frame=self.player_speed_per_frame,
+        )
+
+    def run(self):
+        """
+        Process the stream until the source ends.
+
+        Returns:
+            dict: Players keyed by track id, with their statistics.
+        """
+        capture = LiveCapture(self.source, realtime=self.realtime)
+        self.setup(capture.fps)
+        writer = None
+        if self.output_video is not None:
+            writer = BackgroundVideoWriter(self.output_video, capture.fps, capture.frame_size,
+                                           queue_size=VIDEO_WRITER_QUEUE_SIZE, crf=OUTPUT_VIDEO_CRF)
+        event_file = None
+        if self.event_log is not None:
+            os.makedirs(os.path.dirname(self.event_log) or ".", exist_ok=True)
+            event_file = open(self.event_log, "w")
+
+        try:
+            with capture:
+                while True:
+                    batch = capture.read_batch(self.micro_batch_size)
+                    if not batch:
+                        break
+                    self.process_batch(batch, writer, event_file)
+        finally:
+            if writer is not None:
+                writer.close()
+            if event_file is not None:
+                event_file.close()
+
+        print(f"Live: {len(self.possession_list)} frames, "
+              f"detection skipped on {self.budget.total_skipped_frames}")
+        self.stage_timer.print_report()
+        self.inference_scheduler.print_report()
+        return self.players
+
+    def process_batch(self, batch, writer=None, event_file=None):
+        """
+        Run every stage on one micro-batch and emit its frames.
+
+        Args:
+            batch (list): (frame_num, capture_time, frame) tuples, in order.
+            writer (BackgroundVideoWriter, optional): Recorder of the annotated frames.
+            event_file (file, optional): Open event feed.
+        """
+        frame_offset = batch[0][0]
+        frames = [frame for _, _, frame in batch]
+        lag = time.perf_counter() - batch[0][1]
+        detect = self.budget.should_detect(lag, len(frames))
+
+        start = time.perf_counter()
+        if detect:
+            with self.stage_timer.measure("detection"):
+                detections = self.inference_scheduler.run_detectors(self.detectors, frames, frame_offset)
+            with self.stage_timer.measure("tracking"):
+                self.player_tracker.update_player_objects(frames, frame_offset, detections["players"])
+                self.hoop_tracker.update_tracks(frames, frame_offset, detections["hoops"])
+                self.ball_tracker.update_object_tracks(frames, frame_offset, detections.get("ball"))
+                self.reject_ball_spikes(frame_offset, len(frames))
+            with self.stage_timer.measure("team_assignment"):
+                self.player_assignment += self.team_assigner.get_player_teams_for_frames(
+                    frames, self.players, frame_offset)
+        else:
+            with self.stage_timer.measure("tracking"):
+                for frame_num in range(frame_offset, frame_offset + len(frames)):
+                    self.player_tracker.hold_tracks(frame_num)
+            with self.stage_timer.measure("team_assignment"):
+                self.player_assignment += self.team_assigner.build_assignment(
+                    self.players, frame_offset, len(frames))
+
+        with self.stage_timer.measure("court"):
+            keypoints, camera_motion = self.court_keypoint_detector.get_keyframe_keypoints(frames, frame_offset)
+            self.court_keypoints += self.tactical_view_converter.validate_keypoints(keypoints)
+
+        for (frame_num, capture_time, frame), motion in zip(batch, camera_motion):
+            with self.stage_timer.measure("analytics"):
+                frame_events = self.update_analytics(frame_num, motion)
+            with self.stage_timer.measure("render"):
+                self.compositor.render_frame(frame, frame_num)
+                if writer is not None:
+                    writer.write(frame)
+                if self.on_frame is not None:
+                    self.on_frame(frame_num, frame)
+            self.stage_timer.add("end_to_end", time.perf_counter() - capture_time)
+            self.emit_events(frame_events, event_file)
+
+        self.budget.record(detect, len(frames), time.perf_counter() - start)
+
+    def reject_ball_spikes(self, frame_offset, num_frames):
+        """
+        Drop the new ball detections that jump too far from the last accepted one.
+
+        A live stream cannot look ahead, so each detection is checked against the last
+        accepted position only. After a gap longer than BALL_MAX_GAP_FRAMES any detection
+        is accepted again.
+        """
+        bbox_per_frame = self.ball_tracker.ball.bbox_per_frame
+        for frame_num in range(frame_offset, frame_offset + num_frames):
+            bbox = bbox_per_frame.get(frame_num)
+            if bbox is None:
+                continue
+            if self.last_ball_frame is not None:
+                frame_gap = frame_num - self.last_ball_frame
+                last_bbox = bbox_per_frame[self.last_ball_frame]
+                distance = np.hypot(bbox[0] - last_bbox[0], bbox[1] - last_bbox[1])
+                if frame_gap <= BALL_MAX_GAP_FRAMES and distance > BALL_MAX_SPEED * frame_gap:
+                    del bbox_per_frame[frame_num]
+                    continue
+            self.last_ball_frame = frame_num
+
+    def update_analytics(self, frame_num, camera_motion):
+        """
+        Update tactical positions, speeds, possession and team statistics with one frame.
+
+        Args:
+            frame_num (int): The frame, right after the last one updated.
+            camera_motion (numpy.ndarray): Camera motion from the previous frame, or None.
+
+        Returns:
+            list: Events of the frame.
+        """
+        track_ids, bboxes = self.players.store.frame_tracks(frame_num)
+        frame_assignment = self.player_assignment[frame_num]
+
+        # Tactical view
+        homography = self.tactical_view_converter.next_homography(self.court_keypoints[frame_num],
+                                                                  self.last_homography, camera_motion)
+        frame_positions = {}
+        if homography is not None and len(track_ids):
+            self.last_homography = homography
+            positions, inside = self.tactical_view_converter.project_foot_positions(
+                np.broadcast_to(homography, (len(bboxes), 3, 3)), bboxes.astype(np.float64))
+            frame_positions = dict(zip(track_ids[inside].tolist(), positions[inside].tolist()))
+        self.tactical_player_positions.append(frame_positions)
+
+        # Speed and distance
+        position_ids = list(frame_positions.keys())
+        meter_positions = np.array(list(frame_positions.values()), dtype=np.float64).reshape(-1, 2) * self.meter_scale
+        distances, speeds = self.kinematics.update(frame_num, position_ids, meter_positions)
+        self.player_distances_per_frame.append(distances)
+        self.player_speed_per_frame.append(speeds)
+
+        # Possession, in roster order like the batch detector
+        roster_rank = {player_id: rank for rank, player_id in enumerate(self.players)}
+        order = sorted(range(len(track_ids)), key=lambda row: roster_rank.get(int(track_ids[row]), len(roster_rank)))
+        holder = self.ball_acquisition_detector.update_possession(
+            track_ids[order], bboxes[order], self.ball_tracker.ball.bbox_per_frame.get(frame_num))
+        self.possession_list.append(holder)
+        pass_team, interception_team = self.pass_and_interception_detector.update_events(holder, frame_assignment)
+
+        control_team = -1
+        if holder != -1 and holder in frame_assignment:
+            control_team = 1 if frame_assignment[holder] == 1 else 2
+        self.stats.update(control_team, pass_team, interception_team)
+
+        events = []
+        if holder != -1 and holder != self.last_holder:
+            events.append({"type": "possession", "player": holder, "team": frame_assignment.get(holder, -1)})
+        if holder != -1:
+            self.last_holder = holder
+        if pass_team != -1:
+            events.append({"type": "pass", "player": holder, "team": pass_team})
+        if interception_team != -1:
+            events.append({"type": "interception", "player": holder, "team": interception_team})
+        for event in events:
+            event["frame"] = frame_num
+            event["time"] = round(frame_num / self.fps, 3)
+        return events
+
+    def emit_events(self, events, event_file=None):
+        """
+        Publish events to the feed file, the callback and the events list.
+        """
+        for event in events:
+            self.events.append(event)
+            if event_file is not None:
+                event_file.write(json.dumps(event) + "\n")
+                event_file.flush()
+            if self.on_event is not None:
+                self.on_event(event)
@@ -0,0 +1,76 @@
+"""
+A module for assembling the standard stack of video overlays.
+
+The batch and streaming modes draw the same layers in the same order, so the layer
+stack is built in one place.
+"""
+
+import sys
+sys.path.append('../')
+from utils.video_utils import draw_shot_frame
+from drawers import (
+    FrameCompositor,
+    PlayerTracksDrawer,
+    BallTracksDrawer,
+    CourtKeypointDrawer,
+    TeamBallControlDrawer,
+    FrameNumberDrawer,
+    PassInterceptionDrawer,
+    TacticalViewDrawer,
+    SpeedAndDistanceDrawer,
+    HoopTracksDrawer
+)
+
+
+def build_overlay_compositor(players,
+                             ball_object,
+                             baskets,
+                             court_keypoints,
+                             player_assignment,
+                             possession_list,
+                             stats_timeline,
+                             tactical_view_converter,
+                             tactical_player_positions,
+                             player_distances_per_frame,
+                             player_speed_per_frame):
+    """
+    Create a compositor with every overlay of the analysis video registered as a layer.
+
+    Args:
+        players (dict): Players keyed by track id.
+        ball_object (Ball): The cleaned ball track.
+        baskets (tuple): The (left, right) Hoop objects.
+        court_keypoints (list): Validated court keypoints for each frame.
+        player_assignment (list): Per-frame dictionaries mapping player IDs to teams.
+        possession_list (list): Player ID in possession for each frame, or -1.
+        stats_timeline (StatsTimeline): Running ball control, pass and interception totals.
+        tactical_view_converter (TacticalViewConverter): Converter holding the tactical court geometry.
+        tactical_player_positions (list): Per-frame player positions in tactical view coordinates.
+        player_distances_per_frame (list): Per-frame distances covered by each player.
+        player_speed_per_frame (list): Per-frame speed of each player.
+
+    Returns:
+        FrameCompositor: The compositor, ready to render frames.
+    """
+    compositor = FrameCompositor()
+    compositor.add_layer(PlayerTracksDrawer().draw_frame, players, player_assignment, possession_list)
+    compositor.add_layer(draw_shot_frame, ball_object, baskets, possession_list, players)
+    compositor.add_layer(BallTracksDrawer().draw_frame, ball_object)
+    compositor.add_layer(CourtKeypointDrawer().draw_frame, court_keypoints)
+    compositor.add_layer(FrameNumberDrawer().draw_frame)
+    compositor.add_layer(TeamBallControlDrawer().draw_frame, stats_timeline)
+    compositor.add_layer(PassInterceptionDrawer().draw_frame, stats_timeline)
+    compositor.add_layer(SpeedAndDistanceDrawer().draw_frame,
+                         players,
+                         player_distances_per_frame,
+                         player_speed_per_frame)
+    compositor.add_layer(TacticalViewDrawer().draw_frame,
+                         tactical_view_converter.court_image_path,
+                         tactical_view_converter.width,
+                         tactical_view_converter.height,
+                         tactical_view_converter.key_points,
+                         tactical_player_positions,
+                         player_assignment,
+                         possession_list)
+    compositor.add_layer(HoopTracksDrawer().draw_frame, baskets[0], baskets[1])
+    return compositor
@@ -0,0 +1,313 @@
+"""
+A module for analysing one video with a pool of processes.
+
+The frame range is split into overlapping segments and the first pass of the streaming
+pipeline (detection, tracking and team assignment) runs on each segment in its own
+process. The segments are then merged into one set of tracks:
+
+- player track ids are stitched across each seam by matching the tracks of the two
+  segments on their mean IoU over the overlapping frames;
+- each frame of an overlap is taken from one side of the seam only, the earlier
+  segment up to the middle of the overlap and the later one after it;
+- the team votes of stitched tracks are added together;
+- the ball is cleaned and interpolated once over the merged detections.
+
+Possession, passes and interceptions only depend on the merged metadata, so they are
+computed over the whole video afterwards, which also settles the streaks and events
+that span a seam. Rendering stays a single sequential pass.
+"""
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.append('../')
+from core.ball import Ball
+from core.hoop import Hoop
+from core.player import Player
+from core.track_store import TrackStore, TrackBBoxView, PlayerRoster
+from team_assigner import TeamAssigner
+from trackers.ball_trajectory import BallTrajectory
+from instrumentation import span
+from .streaming_pipeline import StreamingPipeline
+from configs import (
+    COURT_KEYFRAME_INTERVAL,
+    INFERENCE_THREADS,
+    BALL_MAX_SPEED,
+    BALL_MAX_GAP_FRAMES,
+    BALL_SMOOTHING,
+    SHARD_WORKERS,
+    SHARD_OVERLAP_FRAMES,
+    SHARD_MIN_IOU,
+)
+
+
+def analyse_shard(input_video, chunk_size, start_frame, end_frame, detection_cache,
+                  court_keyframe_interval, inference_threads):
+    """
+    Run the first pass of the streaming pipeline on one segment, in a worker process.
+
+    Returns:
+        dict: The segment's tracks as plain picklable data, frames counted from start_frame.
+    """
+    pipeline = StreamingPipeline(input_video, None, chunk_size, start_frame=start_frame, end_frame=end_frame,
+                                 detection_cache=detection_cache,
+                                 court_keyframe_interval=court_keyframe_interval,
+                                 inference_threads=inference_threads)
+    tracks = pipeline.analyse_video(finalize_ball=False)
+    store = tracks["players"].store if tracks["players"] else TrackStore()
+    left_hoop, right_hoop = tracks["baskets"]
+    return {
+        "num_frames": len(tracks["court_keypoints"]),
+        "frames": store.frames.copy(),
+        "track_ids": store.track_ids.copy(),
+        "class_ids": store.class_ids.copy(),
+        "bboxes": store.bboxes.copy(),
+        "ball": dict(tracks["ball"].bbox_per_frame),
+        "hoops": (dict(left_hoop.bbox_per_frame), dict(right_hoop.bbox_per_frame)),
+        "court_keypoints": tracks["court_keypoints"],
+        "camera_motion": tracks["camera_motion"],
+        "team_votes": tracks["team_votes"],
+    }
+
+
+def compute_iou_matrix(bboxes_a, bboxes_b):
+    """
+    IoU of every pair of boxes.
+
+    Args:
+        bboxes_a (numpy.ndarray): (N, 4) boxes.
+        bboxes_b (numpy.ndarray): (M, 4) boxes.
+
+    Returns:
+        numpy.ndarray: (N, M) IoU.
+    """
+    a = bboxes_a[:, None, :]
+    b = bboxes_b[None, :, :]
+    width = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    height = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    intersection = width * height
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a + area_b - intersection
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(union > 0, intersection / union, 0.0)
+
+
+def match_tracks(store_a, store_b, frame_range, min_iou, min_frames):
+    """
+    Match the tracks of two segments on their mean IoU over the frames they share.
+
+    Args:
+        store_a (TrackStore): Earlier segment, in global frame numbers.
+        store_b (TrackStore): Later segment, in global frame numbers.
+        frame_range (tuple): [start, end) frames covered by both segments.
+        min_iou (float): Smallest mean IoU of a match.
+        min_frames (int): Smallest number of frames the two tracks must share.
+
+    Returns:
+        dict: Track id in store_b -> matched track id in store_a.
+    """
+    iou_sums = {}
+    shared_frames = {}
+    for frame_num in range(*frame_range):
+        ids_a, bboxes_a = store_a.frame_tracks(frame_num)
+        ids_b, bboxes_b = store_b.frame_tracks(frame_num)
+        if len(ids_a) == 0 or len(ids_b) == 0:
+            continue
+        iou = compute_iou_matrix(bboxes_a.astype(np.float64), bboxes_b.astype(np.float64))
+        for i, j in zip(*np.nonzero(iou > 0)):
+            pair = (int(ids_a[i]), int(ids_b[j]))
+            iou_sums[pair] = iou_sums.get(pair, 0.0) + float(iou[i, j])
+            shared_frames[pair] = shared_frames.get(pair, 0) + 1
+
+    # Greedy one-to-one matching, best mean IoU first
+    candidates = sorted(((iou_sum / shared_frames[pair], pair) for pair, iou_sum in iou_sums.items()
+                         if shared_frames[pair] >= min_frames), reverse=True)
+    matches = {}
+    matched_a = set()
+    for mean_iou, (track_a, track_b) in candidates:
+        if mean_iou < min_iou:
+            break
+        if track_a in matched_a or track_b in matches:
+            continue
+        matches[track_b] = track_a
+        matched_a.add(track_a)
+    return matches
+
+
+class ShardedPipeline(StreamingPipeline):
+    """
+    Runs the first pass of the streaming pipeline on overlapping segments in parallel.
+
+    The merged tracks go through the same analytics and rendering as a single-process
+    run.
+
+    Attributes:
+        num_workers (int): Number of worker processes, also the number of segments.
+        overlap_frames (int): Frames shared by two consecutive segments.
+        min_iou (float): Smallest mean IoU for two tracks to be stitched across a seam.
+    """
+    def __init__(self, input_video, output_video, chunk_size, court_image_path="./images/basketball_court.png",
+                 start_frame=0, end_frame=None, detection_cache=None,
+                 court_keyframe_interval=COURT_KEYFRAME_INTERVAL, num_workers=SHARD_WORKERS,
+                 overlap_frames=SHARD_OVERLAP_FRAMES, min_iou=SHARD_MIN_IOU):
+        super().__init__(input_video, output_video, chunk_size, court_image_path=court_image_path,
+                         start_frame=start_frame, end_frame=end_frame, detection_cache=detection_cache,
+                         court_keyframe_interval=court_keyframe_interval)
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.overlap_frames = overlap_frames
+        self.min_iou = min_iou
+
+    def plan_shards(self):
+        """
+        Split the frame range into overlapping segments.
+
+        Returns:
+            list: (start, end) frames of each segment, counted from start_frame, end being
+                None for the last segment when the range runs to the end of the video.
+        """
+        end_frame = self.end_frame if self.end_frame is not None else self.video_properties["frame_count"]
+        num_frames = max(end_frame - self.start_frame, 0)
+        # Segments shorter than a few overlaps would mostly be seams
+        num_shards = max(1, min(self.num_workers, num_frames // max(4 * self.overlap_frames, 1)))
+        shard_length = -(-num_frames // num_shards)
+
+        shards = []
+        for index in range(num_shards):
+            start = index * shard_length
+            end = min((index + 1) * shard_length + self.overlap_frames, num_frames)
+            if index == num_shards - 1:
+                end = None if self.end_frame is None else num_frames
+            shards.append((start, end))
+        return shards
+
+    def analyse_video(self, finalize_ball=True):
+        """
+        First pass over all segments in a process pool, then merged into one set of tracks.
+
+        Returns:
+            dict: Same content as StreamingPipeline.analyse_video.
+        """
+        shards = self.plan_shards()
+        threads_per_worker = max(1, (INFERENCE_THREADS or os.cpu_count() or 1) // len(shards))
+        print(f"Analysing {len(shards)} segments with {len(shards)} processes")
+        # The segments are traced as a whole: the worker processes do not record spans
+        with span("analyse_shards", num_shards=len(shards)), ProcessPoolExecutor(max_workers=len(shards)) as executor:
+            futures = [executor.submit(analyse_shard, self.input_video, self.chunk_size,
+                                       self.start_frame + start,
+                                       None if end is None else self.start_frame + end,
+                                       self.detection_cache, self.court_keyframe_interval,
+                                       threads_per_worker)
+                       for start, end in shards]
+            results = [future.result() for future in futures]
+        with span("merge_shards"):
+            return self.merge_shards(shards, results, finalize_ball)
+
+    def merge_shards(self, shards, results, finalize_ball=True):
+        """
+        Stitch the tracks of the segments together.
+
+        Args:
+            shards (list): (start, end) frames of each segment.
+            results (list): Output of analyse_shard for each segment.
+            finalize_ball (bool): Clean and interpolate the merged ball track.
+
+        Returns:
+            dict: Same content as StreamingPipeline.analyse_video.
+        """
+        starts = [start for start, _ in shards]
+        ends = [start + result["num_frames"] for start, result in zip(starts, results)]
+        # Each overlap is split in its middle, frames before it come from the earlier segment
+        overlaps = [(starts[i], min(ends[i - 1], starts[i] + self.overlap_frames)) for i in range(1, len(shards))]
+        cuts = [0] + [(start + end) // 2 for start, end in overlaps] + [ends[-1]]
+
+        team_assigner = TeamAssigner()
+        frames, track_ids, class_ids, bboxes = [], [], [], []
+        ball, left_hoop, right_hoop = Ball(), Hoop(label="left"), Hoop(label="right")
+        court_keypoints, camera_motion = [], []
+        previous_store = None
+        next_id = 0
+
+        for index, (start, result) in enumerate(zip(starts, results)):
+            shard_frames = result["frames"].astype(np.int64) + start
+            local_store = TrackStore.from_arrays(shard_frames, result["track_ids"], result["class_ids"],
+                                                 result["bboxes"])
+
+            # Global track ids: the first segment keeps its own, later ones are stitched
+            # to the previous segment or numbered after every id used so far
+            shard_track_ids = np.unique(result["track_ids"]).tolist()
+            if previous_store is None:
+                id_map = {track_id: track_id for track_id in shard_track_ids}
+            else:
+                overlap = overlaps[index - 1]
+                min_frames = max(1, (overlap[1] - overlap[0]) // 4)
+                id_map = match_tracks(previous_store, local_store, overlap, self.min_iou, min_frames)
+                for track_id in shard_track_ids:
+                    if track_id not in id_map:
+                        id_map[track_id] = next_id
+                        next_id += 1
+            next_id = max([next_id] + [global_id + 1 for global_id in id_map.values()])
+            global_ids = np.array([id_map[track_id] for track_id in result["track_ids"].tolist()],
+                                  dtype=np.int64)
+            team_assigner.merge_track_votes(*result["team_votes"], id_map=id_map)
+            previous_store = TrackStore.from_arrays(shard_frames, global_ids, result["class_ids"], result["bboxes"])
+
+            # Keep this segment's side of the seams
+            cut_start, cut_end = cuts[index], cuts[index + 1]
+            keep = (shard_frames >= cut_start) & (shard_frames < cut_end)
+            frames.append(shard_frames[keep])
+            track_ids.append(global_ids[keep])
+            class_ids.append(result["class_ids"][keep])
+            bboxes.append(result["bboxes"][keep])
+            for merged, shard_boxes in ((ball, result["ball"]), (left_hoop, result["hoops"][0]),
+                                        (right_hoop, result["hoops"][1])):
+                for frame_num, bbox in shard_boxes.items():
+                    if cut_start <= frame_num + start < cut_end:
+                        merged.add_bbox(frame_num + start, bbox)
+            court_keypoints += result["court_keypoints"][cut_start - start:cut_end - start]
+            camera_motion += result["camera_motion"][cut_start - start:cut_end - start]
+
+        store = TrackStore.from_arrays(np.concatenate(frames), np.concatenate(track_ids),
+                                       np.concatenate(class_ids), np.concatenate(bboxes))
+        players = self.build_roster(store)
+        if finalize_ball:
+            ball = self.finalize_ball(ball)
+        print(f"Number of frames: {len(court_keypoints)}")
+        return {
+            "players": players,
+            "ball": ball,
+            "baskets": (left_hoop, right_hoop),
+            "court_keypoints": court_keypoints,
+            "camera_motion": camera_motion,
+            "player_assignment": team_assigner.build_assignment(players, 0, len(court_keypoints)),
+            "team_votes": (team_assigner.track_votes, team_assigner.track_confidence),
+        }
+
+    def build_roster(self, store):
+        """
+        Create the players of a merged TrackStore, in order of first appearance like the
+        tracker does.
+        """
+        players = PlayerRoster(store)
+        track_ids, first_rows = np.unique(store.track_ids, return_index=True)
+        for track_id in track_ids[np.argsort(first_rows)].tolist():
+            players[track_id] = Player(track_id, track_id)
+            players[track_id].bboxs_per_frame = TrackBBoxView(store, track_id)
+        return players
+
+    def finalize_ball(self, ball):
+        """
+        Clean and interpolate the merged ball detections, as BallTracker.finalize_tracks does.
+        """
+        if not ball.bbox_per_frame:
+            return ball
+        trajectory = BallTrajectory(max_speed=BALL_MAX_SPEED, max_gap=BALL_MAX_GAP_FRAMES, smoothing=BALL_SMOOTHING)
+        frame_nums, bboxes = trajectory.clean(list(ball.bbox_per_frame.keys()), list(ball.bbox_per_frame.values()))
+        store = TrackStore.from_arrays(frame_nums, np.full(len(frame_nums), ball.ball_id),
+                                       np.zeros(len(frame_nums)), bboxes)
+        ball.bbox_per_frame = TrackBBoxView(store, ball.ball_id)
+        ball.smoothed = trajectory.smoothing
+        return ball
@@ -0,0 +1,255 @@
+"""
+A module for running the full analysis on long videos with bounded memory.
+
+Frames are pulled from the video in fixed-size windows. The first pass runs the
+detectors, trackers and team assignment on each window and keeps only per-frame
+metadata. Possession, passes, tactical positions and speeds are then computed on that
+metadata. The second pass decodes the video again window by window, draws every
+overlay in place and writes the frames out, so no more than one window of frames
+is alive at a time.
+"""
+
+import sys
+sys.path.append('../')
+from utils import read_video_chunks, get_video_properties, BackgroundVideoWriter
+from trackers import PlayerTracker, BallTracker
+from trackers.hoop_tracker import HoopTracker
+from court_keypoint_detector import CourtKeypointDetector
+from team_assigner import TeamAssigner
+from appearance_embedding import AppearanceEmbedder
+from ball_aquisition import BallAcquisitionDetector
+from pass_and_interception_detector import PassAndInterceptionDetector
+from tactical_view_converter import TacticalViewConverter
+from speed_and_distance_calculator import SpeedAndDistanceCalculator
+from drawers import TeamBallControlDrawer
+from core.stats_timeline import StatsTimeline
+from inference_scheduler import InferenceScheduler
+from instrumentation import span
+from .overlays import build_overlay_compositor
+from configs import (
+    VIDEO_WRITER_QUEUE_SIZE,
+    OUTPUT_VIDEO_CRF,
+    HOOP_DETECTOR_PATH,
+    PLAYER_DETECTOR_PATH,
+    BALL_DETECTOR_PATH,
+    COURT_KEYPOINT_DETECTOR_PATH,
+    INFERENCE_BATCH_SIZE,
+    INFERENCE_THREADS,
+    COURT_KEYFRAME_INTERVAL,
+    COURT_KEYFRAME_MOTION_THRESHOLD,
+)
+
+
+class StreamingPipeline:
+    """
+    Runs the basketball analysis over a video in fixed-size windows of frames.
+
+    State that spans window boundaries (the player tracks, the team cache, the ball track,
+    the shot overlay and the running distance totals) lives on the stage objects,
+    which are created once per run and fed every window in order.
+
+    Attributes:
+        input_video (str): Path to the input video file.
+        output_video (str): Path where the annotated video is written.
+        chunk_size (int): Number of frames decoded and processed at once.
+        court_image_path (str): Path to the court image used for the tactical view.
+        start_frame (int): First frame of the video to process.
+        end_frame (int): Frame at which processing stops (exclusive), None for the end of the video.
+        detection_cache (DetectionCache): Cache for the model outputs, None to disable caching.
+        court_keyframe_interval (int): Court keypoints are detected every this many frames.
+        inference_threads (int): CPU threads shared by the detectors, None for all cores.
+    """
+    def __init__(self, input_video, output_video, chunk_size, court_image_path="./images/basketball_court.png",
+                 start_frame=0, end_frame=None, detection_cache=None,
+                 court_keyframe_interval=COURT_KEYFRAME_INTERVAL, inference_threads=INFERENCE_THREADS):
+        self.input_video = input_video
+        self.output_video = output_video
+        self.chunk_size = chunk_size
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.detection_cache = detection_cache
+        self.court_keyframe_interval = court_keyframe_interval
+        self.inference_threads = inference_threads
+        self.court_image_path = court_image_path
+        self.video_properties = get_video_properties(input_video)
+        self.stats_timeline = None
+
+    def run(self):
+        """
+        Run both passes over the video and write the annotated output.
+
+        Returns:
+            dict: Players keyed by track id, with their statistics.
+        """
+        with span("analyse_video"):
+            tracks = self.analyse_video()
+        with span("compute_analytics", frames=len(tracks["player_assignment"])):
+            analytics = self.compute_analytics(tracks)
+        self.stats_timeline = analytics["stats_timeline"]
+        with span("render_video") as render_span:
+            self.render_video(tracks, analytics)
+            render_span.add_frames(len(tracks["player_assignment"]))
+        return tracks["players"]
+
+    def analyse_video(self, finalize_ball=True):
+        """
+        First pass: detect and track every object and assign teams, window by window.
+
+        Args:
+            finalize_ball (bool): Clean and interpolate the ball track. Without it the ball
+                keeps its raw detections, for callers that merge several runs first.
+
+        Returns:
+            dict: Players, ball, hoops, court keypoints, camera motion, per-frame team
+                assignments and the team votes of every track.
+        """
+        video_cache = None
+        if self.detection_cache is not None:
+            video_cache = self.detection_cache.for_video(self.input_video, self.start_frame, self.end_frame)
+        # Player crops are embedded once for the tracker re-identification and the team assignment
+        appearance_embedder = AppearanceEmbedder()
+        player_tracker = PlayerTracker(PLAYER_DETECTOR_PATH, cache=video_cache, embedder=appearance_embedder)
+        hoop_tracker = HoopTracker(HOOP_DETECTOR_PATH, cache=video_cache)
+        ball_tracker = BallTracker(BALL_DETECTOR_PATH, cache=video_cache)
+        court_keypoint_detector = CourtKeypointDetector(COURT_KEYPOINT_DETECTOR_PATH, cache=video_cache,
+                                                        keyframe_interval=self.court_keyframe_interval,
+                                                        motion_threshold=COURT_KEYFRAME_MOTION_THRESHOLD)
+        team_assigner = TeamAssigner(embedder=appearance_embedder, cache=video_cache)
+        inference_scheduler = InferenceScheduler(INFERENCE_BATCH_SIZE, self.inference_threads)
+        detectors = {
+            "players": player_tracker,
+            "hoops": hoop_tracker,
+        }
+        if not ball_tracker.uses_roi:
+            # The ball search depends on the previous frames and runs on its own
+            detectors["ball"] = ball_tracker
+
+        players = {}
+        court_keypoints_tracks = []
+        camera_motion = []
+        player_assignment = []
+        num_frames = 0
+
+        for frame_offset, frames in read_video_chunks(self.input_video, self.chunk_size,
+                                                      self.start_frame, self.end_frame):
+            print(f"Analysing frames {self.start_frame + frame_offset} - "
+                  f"{self.start_frame + frame_offset + len(frames) - 1}")
+            with span("analyse_window", frames=len(frames), frame_offset=frame_offset):
+                # Every detector sees the window in the same batches
+                detections = inference_scheduler.run_detectors(detectors, frames, frame_offset)
+                players = player_tracker.update_player_objects(frames, frame_offset, detections["players"])
+                hoop_tracker.update_tracks(frames, frame_offset, detections["hoops"])
+                ball_tracker.update_object_tracks(frames, frame_offset, detections.get("ball"))
+                # The camera motion estimator carries over from the previous window
+                window_keypoints, window_motion = court_keypoint_detector.get_keyframe_keypoints(frames,
+                                                                                                 frame_offset)
+                court_keypoints_tracks += window_keypoints
+                camera_motion += window_motion
+                player_assignment += team_assigner.get_player_teams_for_frames(frames, players, frame_offset)
+            num_frames = frame_offset + len(frames)
+
+        print(f"Number of frames: {num_frames}")
+        inference_scheduler.print_report()
+        return {
+            "players": players,
+            "ball": ball_tracker.finalize_tracks() if finalize_ball else ball_tracker.ball,
+            "baskets": (hoop_tracker.left_hoop, hoop_tracker.right_hoop),
+            "court_keypoints": court_keypoints_tracks,
+            "camera_motion": camera_motion,
+            "player_assignment": player_assignment,
+            "team_votes": (team_assigner.track_votes, team_assigner.track_confidence),
+        }
+
+    def compute_analytics(self, tracks):
+        """
+        Compute possession, passes, tactical positions and speeds from the tracks.
+
+        These stages only touch per-frame metadata, so they run over the whole video at once.
+
+        Args:
+            tracks (dict): Output of analyse_video. The court keypoints are replaced by
+                their validated version.
+
+        Returns:
+            dict: Per-frame analytics used by the drawers.
+        """
+        players = tracks["players"]
+        player_assignment = tracks["player_assignment"]
+
+        possession_list = BallAcquisitionDetector().detect_ball_possession(players, tracks["ball"])
+        pass_and_interception_detector = PassAndInterceptionDetector()
+        passes = pass_and_interception_detector.detect_passes(possession_list, player_assignment)
+        interceptions = pass_and_interception_detector.detect_interceptions(possession_list, player_assignment)
+
+        tactical_view_converter = TacticalViewConverter(court_image_path=self.court_image_path)
+        tracks["court_keypoints"] = tactical_view_converter.validate_keypoints(tracks["court_keypoints"])
+        tactical_player_positions = tactical_view_converter.transform_players_to_tactical_view(
+            tracks["court_keypoints"], players, tracks["camera_motion"])
+
+        speed_and_distance_calculator = SpeedAndDistanceCalculator(
+            tactical_view_converter.width,
+            tactical_view_converter.height,
+            tactical_view_converter.actual_width_in_meters,
+            tactical_view_converter.actual_height_in_meters
+        )
+        kinematics = speed_and_distance_calculator.calculate_kinematics(tactical_player_positions,
+                                                                        fps=self.video_properties["fps"])
+        player_distances_per_frame = kinematics.distance_per_frame()
+        player_speed_per_frame = kinematics.speed_per_frame()
+
+        team_ball_control = TeamBallControlDrawer().get_team_ball_control(player_assignment, possession_list)
+
+        return {
+            "possession_list": possession_list,
+            "passes": passes,
+            "interceptions": interceptions,
+            "tactical_view_converter": tactical_view_converter,
+            "tactical_player_positions": tactical_player_positions,
+            "player_distances_per_frame": player_distances_per_frame,
+            "player_speed_per_frame": player_speed_per_frame,
+            "stats_timeline": StatsTimeline(team_ball_control, passes, interceptions),
+        }
+
+    def build_compositor(self, tracks, analytics):
+        """
+        Create the overlay compositor of the second pass.
+
+        Args:
+            tracks (dict): Output of analyse_video.
+            analytics (dict): Output of compute_analytics.
+
+        Returns:
+            FrameCompositor: The compositor drawing every overlay.
+        """
+        return build_overlay_compositor(
+            players=tracks["players"],
+            ball_object=tracks["ball"],
+            baskets=tracks["baskets"],
+            court_keypoints=tracks["court_keypoints"],
+            player_assignment=tracks["player_assignment"],
+            possession_list=analytics["possession_list"],
+            stats_timeline=analytics["stats_timeline"],
+            tactical_view_converter=analytics["tactical_view_converter"],
+            tactical_player_positions=analytics["tactical_player_positions"],
+            player_distances_per_frame=analytics["player_distances_per_frame"],
+            player_speed_per_frame=analytics["player_speed_per_frame"],
+        )
+
+    def render_video(self, tracks, analytics):
+        """
+        Second pass: decode the video again, draw every overlay and write each window out.
+
+        Args:
+            tracks (dict): Output of analyse_video.
+            analytics (dict): Output of compute_analytics.
+        """
+        compositor = self.build_compositor(tracks, analytics)
+        frame_size = (self.video_properties["width"], self.video_properties["height"])
+        with BackgroundVideoWriter(self.output_video, self.video_properties["fps"], frame_size,
+                                   queue_size=VIDEO_WRITER_QUEUE_SIZE, crf=OUTPUT_VIDEO_CRF) as writer:
+            for frame_offset, frames in read_video_chunks(self.input_video, self.chunk_size,
+                                                          self.start_frame, self.end_frame):
+                # Frames are drawn in place and handed to the encoder thread as soon as they are ready
+                with span("render_window", frames=len(frames), frame_offset=frame_offset):
+                    for frame_num, frame in enumerate(frames, start=frame_offset):
+                        writer.write(compositor.render_frame(frame, frame_num))
@@ -0,0 +1,312 @@
+"""
+Vectorized per-track kinematics: step distance, windowed speed, acceleration and
+cumulative distance.
+
+Every quantity is computed for all tracks at once on rows sorted by (track, frame),
+with cumulative sums standing in for the sliding windows, so the cost is linear in
+the number of detections whatever the window length.
+"""
+
+from collections import deque
+
+import numpy as np
+
+
+class FrameSeries:
+    """
+    One value per (frame, track) row, sorted by frame, with a per-frame index.
+
+    Behaves like a list of per-frame {track_id: value} dicts, which is the shape the
+    drawers and the older callers use.
+
+    Attributes:
+        frames (numpy.ndarray): int32 frame of each row.
+        track_ids (numpy.ndarray): int32 track id of each row.
+        values (numpy.ndarray): float64 value of each row.
+        num_frames (int): Number of frames covered.
+    """
+    def __init__(self, frames, track_ids, values, num_frames):
+        self.frames = np.asarray(frames, dtype=np.int32)
+        self.track_ids = np.asarray(track_ids, dtype=np.int32)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.num_frames = num_frames
+        self.frame_starts = np.searchsorted(self.frames, np.arange(num_frames + 1))
+
+    @classmethod
+    def from_list(cls, per_frame_values):
+        """
+        Build from a list of per-frame {track_id: value} dicts.
+        """
+        frames, track_ids, values = [], [], []
+        for frame_num, frame_values in enumerate(per_frame_values):
+            for track_id, value in frame_values.items():
+                frames.append(frame_num)
+                track_ids.append(track_id)
+                values.append(value)
+        return cls(frames, track_ids, values, len(per_frame_values))
+
+    def frame_rows(self, frame_num):
+        return slice(int(self.frame_starts[frame_num]), int(self.frame_starts[frame_num + 1]))
+
+    def __len__(self):
+        return self.num_frames
+
+    def __getitem__(self, frame_num):
+        if frame_num < 0:
+            frame_num += self.num_frames
+        if not 0 <= frame_num < self.num_frames:
+            raise IndexError(frame_num)
+        rows = self.frame_rows(frame_num)
+        return dict(zip(self.track_ids[rows].tolist(), self.values[rows].tolist()))
+
+    def __iter__(self):
+        for frame_num in range(self.num_frames):
+            yield self[frame_num]
+
+    def to_list(self):
+        return list(self)
+
+
+def sort_by_track(frames, track_ids):
+    """
+    Order rows by track, then frame.
+
+    Returns:
+        tuple: (order, first) where order sorts the rows and first marks, in sorted
+            order, the first row of each track.
+    """
+    order = np.lexsort((frames, track_ids))
+    sorted_tracks = track_ids[order]
+    first = np.r_[True, sorted_tracks[1:] != sorted_tracks[:-1]] if len(order) else np.zeros(0, dtype=bool)
+    return order, first
+
+
+def step_distances(frames, track_ids, positions):
+    """
+    Distance each track moved since its previous appearance.
+
+    Args:
+        frames (numpy.ndarray): Frame of each row.
+        track_ids (numpy.ndarray): Track of each row.
+        positions (numpy.ndarray): (N, 2) positions, in the unit of the result.
+
+    Returns:
+        tuple: (frames, track_ids, distances) of every row but the first of each track,
+            sorted by track then frame.
+    """
+    order, first = sort_by_track(frames, track_ids)
+    sorted_positions = positions[order]
+    steps = np.zeros(len(order), dtype=np.float64)
+    if len(order) > 1:
+        steps[1:] = np.hypot(*(sorted_positions[1:] - sorted_positions[:-1]).T)
+    moved = ~first
+    return frames[order][moved], track_ids[order][moved], steps[moved]
+
+
+def window_speeds(frames, track_ids, distances, fps, window_frames, min_samples):
+    """
+    Speed of each track over a trailing window of frames, from its step distances.
+
+    For a row at frame f, the steps of the same track in [f - window_frames + 1, f] are
+    taken, except the oldest, whose step started before the window. Their summed distance
+    is divided by the time actually elapsed between the oldest and the newest of them, so
+    frames where the track was missing do not count as time spent moving.
+
+    Args:
+        frames (numpy.ndarray): Frame of each step, sorted by track then frame.
+        track_ids (numpy.ndarray): Track of each step.
+        distances (numpy.ndarray): Step distances in meters.
+        fps (float): Frames per second of the video.
+        window_frames (int): Length of the trailing window in frames.
+        min_samples (int): Fewer steps than this in the window give a speed of 0.
+
+    Returns:
+        tuple: (speeds in km/h, valid mask) per step.
+    """
+    if len(frames) == 0:
+        return np.zeros(0, dtype=np.float64), np.zeros(0, dtype=bool)
+
+    # One sorted key per (track, frame), tracks far enough apart that windows never cross
+    _, track_rank = np.unique(track_ids, return_inverse=True)
+    stride = int(frames.max()) + window_frames + 1
+    keys = track_rank.astype(np.int64) * stride + frames
+    lo = np.searchsorted(keys, keys - (window_frames - 1))
+    index = np.arange(len(frames))
+
+    cumulative = np.cumsum(distances)
+    window_distance = cumulative - cumulative[lo]
+    samples = index - lo
+    elapsed_frames = frames - frames[lo]
+
+    valid = (samples >= min_samples) & (elapsed_frames > 0)
+    speeds = np.zeros(len(frames), dtype=np.float64)
+    # meters per frame -> km/h
+    speeds[valid] = window_distance[valid] / elapsed_frames[valid] * fps * 3.6
+    return speeds, valid
+
+
+def accelerations(frames, track_ids, speeds, valid, fps):
+    """
+    Change of speed between consecutive valid speeds of the same track.
+
+    Args:
+        frames (numpy.ndarray): Frame of each row, sorted by track then frame.
+        track_ids (numpy.ndarray): Track of each row.
+        speeds (numpy.ndarray): Speeds in km/h.
+        valid (numpy.ndarray): Rows whose speed is meaningful.
+        fps (float): Frames per second of the video.
+
+    Returns:
+        numpy.ndarray: Acceleration in m/s² per row, NaN where it is not defined.
+    """
+    result = np.full(len(frames), np.nan)
+    if len(frames) < 2:
+        return result
+    same_track = track_ids[1:] == track_ids[:-1]
+    both_valid = valid[1:] & valid[:-1]
+    defined = same_track & both_valid
+    elapsed_seconds = (frames[1:] - frames[:-1]) / fps
+    change = (speeds[1:] - speeds[:-1]) / 3.6
+    result[1:][defined] = change[defined] / elapsed_seconds[defined]
+    return result
+
+
+def cumulative_distances(track_ids, distances):
+    """
+    Running total of the step distances of each track.
+
+    Args:
+        track_ids (numpy.ndarray): Track of each step, sorted by track then frame.
+        distances (numpy.ndarray): Step distances.
+
+    Returns:
+        numpy.ndarray: Distance covered by the track up to and including each step.
+    """
+    if len(distances) == 0:
+        return distances.copy()
+    cumulative = np.cumsum(distances)
+    first = np.r_[True, track_ids[1:] != track_ids[:-1]]
+    track_start = np.maximum.accumulate(np.where(first, np.arange(len(first)), 0))
+    # Subtract what the previous tracks had covered before each track starts
+    return cumulative - (cumulative - distances)[track_start]
+
+
+class Kinematics:
+    """
+    Step distance, speed, acceleration and cumulative distance of every track.
+
+    All arrays have one entry per step (every appearance of a track but its first),
+    sorted by frame.
+
+    Attributes:
+        frames (numpy.ndarray): Frame of each step.
+        track_ids (numpy.ndarray): Track of each step.
+        distances (numpy.ndarray): Meters moved since the previous appearance.
+        speeds (numpy.ndarray): Speed in km/h, 0 while too few steps are in the window.
+        accelerations (numpy.ndarray): m/s², NaN where undefined.
+        cumulative_distances (numpy.ndarray): Meters covered by the track so far.
+        num_frames (int): Number of frames covered.
+    """
+    def __init__(self, frames, track_ids, distances, fps, num_frames, window_frames, min_samples):
+        frames = np.asarray(frames, dtype=np.int64)
+        track_ids = np.asarray(track_ids, dtype=np.int64)
+        distances = np.asarray(distances, dtype=np.float64)
+        order, _ = sort_by_track(frames, track_ids)
+        frames, track_ids, distances = frames[order], track_ids[order], distances[order]
+
+        speeds, valid = window_speeds(frames, track_ids, distances, fps, window_frames, min_samples)
+        acceleration = accelerations(frames, track_ids, speeds, valid, fps)
+        cumulative = cumulative_distances(track_ids, distances)
+
+        # Back to frame order for per-frame access
+        by_frame = np.argsort(frames, kind="stable")
+        self.frames = frames[by_frame]
+        self.track_ids = track_ids[by_frame]
+        self.distances = distances[by_frame]
+        self.speeds = speeds[by_frame]
+        self.accelerations = acceleration[by_frame]
+        self.cumulative_distances = cumulative[by_frame]
+        self.num_frames = num_frames
+
+    def series(self, values):
+        """
+        Wrap one of the per-step arrays as a FrameSeries.
+        """
+        return FrameSeries(self.frames, self.track_ids, values, self.num_frames)
+
+    def distance_per_frame(self):
+        return self.series(self.distances)
+
+    def speed_per_frame(self):
+        return self.series(self.speeds)
+
+    def acceleration_per_frame(self):
+        return self.series(self.accelerations)
+
+    def cumulative_distance_per_frame(self):
+        return self.series(self.cumulative_distances)
+
+
+class RunningKinematics:
+    """
+    Step distance and windowed speed of every track, updated one frame at a time.
+
+    Gives the same values as Kinematics for a live stream, where frames arrive one by
+    one: each track keeps its last position and the running distance of the steps still
+    inside the speed window.
+
+    Attributes:
+        fps (float): Frames per second of the stream.
+        window_frames (int): Length of the trailing speed window in frames.
+        min_samples (int): Fewer steps than this in the window give a speed of 0.
+        distance_scale (float): Factor applied to every step distance.
+    """
+    def __init__(self, fps, window_frames, min_samples, distance_scale=1.0):
+        self.fps = fps
+        self.window_frames = window_frames
+        self.min_samples = min_samples
+        self.distance_scale = distance_scale
+        self.last_positions = {}  # track id -> last position in meters
+        self.total_distances = {}  # track id -> meters covered so far
+        self.windows = {}  # track id -> deque of (frame, total distance) of the recent steps
+
+    def update(self, frame_num, track_ids, positions):
+        """
+        Add the positions of one frame.
+
+        Args:
+            frame_num (int): Frame index, increasing from call to call.
+            track_ids (list): Tracks visible on the frame.
+            positions (numpy.ndarray): (N, 2) positions of those tracks, in meters.
+
+        Returns:
+            tuple: ({track_id: step distance}, {track_id: speed in km/h}) for every track
+                seen before this frame.
+        """
+        distances = {}
+        speeds = {}
+        oldest_frame = frame_num - (self.window_frames - 1)
+        for track_id, position in zip(track_ids, np.asarray(positions, dtype=np.float64).reshape(-1, 2)):
+            last_position = self.last_positions.get(track_id)
+            self.last_positions[track_id] = position
+            if last_position is None:
+                continue
+            distance = float(np.hypot(*(position - last_position))) * self.distance_scale
+            total = self.total_distances.get(track_id, 0.0) + distance
+            self.total_distances[track_id] = total
+
+            window = self.windows.setdefault(track_id, deque())
+            window.append((frame_num, total))
+            while window[0][0] < oldest_frame:
+                window.popleft()
+
+            # The oldest step of the window started before it, only the later ones count
+            first_frame, first_total = window[0]
+            samples = len(window) - 1
+            elapsed_frames = frame_num - first_frame
+            speed = 0.0
+            if samples >= self.min_samples and elapsed_frames > 0:
+                speed = (total - first_total) / elapsed_frames * self.fps * 3.6
+            distances[track_id] = distance
+            speeds[track_id] = speed
+        return distances, speeds
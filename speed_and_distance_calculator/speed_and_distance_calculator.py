@@ -4,6 +4,9 @@ import pathlib
 folder_path = pathlib.Path(__file__).parent.resolve()
 sys.path.append(os.path.join(folder_path,"../"))
 from utils import measure_distance
+import numpy as np
+from .kinematics import FrameSeries, Kinematics, RunningKinematics, step_distances
+from instrumentation import traced
 
 
 class SpeedAndDistanceCalculator():
@@ -20,25 +23,69 @@ class SpeedAndDistanceCalculator():
         self.width_in_meters = width_in_meters
         self.height_in_meters= height_in_meters
 
+        # Speed is averaged over this much trailing time, and needs this many steps in it
+        self.speed_window_seconds = 0.5
+        self.min_speed_samples = 5
+        # Empirical correction of the tactical view scale
+        self.distance_scale = 0.4
+
+    def get_position_arrays(self, tactical_player_positions):
+        """
+        Get (frames, track_ids, positions in meters) from tactical view positions.
+
+        Args:
+            tactical_player_positions: TacticalPositions, or a list of per-frame
+                {player_id: [x, y]} dicts in tactical view pixels.
+
+        Returns:
+            tuple: frames, track_ids and (N, 2) positions in meters.
+        """
+        frames = getattr(tactical_player_positions, "frames", None)
+        if frames is None:
+            frame_list, track_ids, positions = [], [], []
+            for frame_number, frame_positions in enumerate(tactical_player_positions):
+                for player_id, position in frame_positions.items():
+                    frame_list.append(frame_number)
+                    track_ids.append(player_id)
+                    positions.append(position)
+            frames = np.array(frame_list, dtype=np.int64)
+            track_ids = np.array(track_ids, dtype=np.int64)
+            positions = np.array(positions, dtype=np.float64).reshape(-1, 2)
+        else:
+            frames = frames.astype(np.int64)
+            track_ids = tactical_player_positions.track_ids.astype(np.int64)
+            positions = tactical_player_positions.positions.astype(np.float64)
+
+        return frames, track_ids, positions * self.get_meter_scale()
+
+    def get_meter_scale(self):
+        """
+        Meters per tactical view pixel along x and y.
+        """
+        return np.array([self.width_in_meters / self.width_in_pixels,
+                         self.height_in_meters / self.height_in_pixels])
+
     def calculate_distance(self,
                             tactical_player_positions
                             ):
-        previous_players_position = {}
-        output_distances =[]
+        """
+        Calculate how far each player moved since their previous appearance, in meters.
 
-        for frame_number, tactical_player_position_frame in enumerate(tactical_player_positions):
-            output_distances.append({})
+        Args:
+            tactical_player_positions: TacticalPositions or a list of per-frame
+                {player_id: [x, y]} dicts.
 
-            for player_id, current_player_position in tactical_player_position_frame.items():
-                # Calculate distance
-                if player_id in previous_players_position:
-                    previous_position = previous_players_position[player_id]
-                    meter_distance = self.calculate_meter_distance(previous_position, current_player_position)
-                    output_distances[frame_number][player_id] = meter_distance
+        Returns:
+            FrameSeries: Per-frame {player_id: distance} for every appearance of a player
+                but their first. Indexes like the list of dicts it used to be.
+        """
+        frames, track_ids, positions = self.get_position_arrays(tactical_player_positions)
+        frames, track_ids, distances = step_distances(frames, track_ids, positions)
+        distances = distances * self.distance_scale
 
-                previous_players_position[player_id]=current_player_position
-        
-        return output_distances
+        by_frame = np.argsort(frames, kind="stable")
+        return FrameSeries(frames[by_frame], track_ids[by_frame], distances[by_frame],
+                           len(tactical_player_positions))
 
     def calculate_meter_distance(self,previous_pixel_position, current_pixel_position):
          # using width_in_pixels,height_in_pixels and width_in_meters,height_in_meters Calculate the meter distance betweent current position and previous position
@@ -55,58 +102,63 @@ class SpeedAndDistanceCalculator():
                                           (previous_meter_x,previous_meter_y)
                                           )
 
-         meter_distance = meter_distance*0.4
+         meter_distance = meter_distance*self.distance_scale
          return meter_distance
 
+    def get_window_frames(self, fps):
+        """
+        Length of the speed window in frames at the given frame rate.
+        """
+        return max(self.min_speed_samples + 1, int(round(self.speed_window_seconds * fps)))
+
     def calculate_speed(self, distances, fps=30):
         """
-        Calculate player speeds based on distances covered over the last 5 frames.
-        
+        Calculate player speeds from the distance they covered over a trailing window.
+
+        The window lasts speed_window_seconds (15 frames at 30 fps). Speed is the distance
+        covered in it divided by the time elapsed, and is 0 until the player has at least
+        min_speed_samples steps in the window.
+
         Args:
-            distances (list): List of dictionaries containing distance per player per frame,
-                            as output by calculate_distance method.
+            distances: Output of calculate_distance, or a list of per-frame
+                {player_id: distance} dicts.
             fps (float): Frames per second of the video, used to calculate elapsed time.
-            
+
         Returns:
-            list: List of dictionaries where each dictionary maps player_id to their
-                speed in km/h at that frame.
+            FrameSeries: Per-frame {player_id: speed in km/h}, with the same entries as distances.
         """
-        speeds = []
-        window_size = 5  # Look at last 5 frames for speed calculation
-        
-        # Calculate speed for each frame and player
-        for frame_idx in range(len(distances)):
-            speeds.append({})
-            # For each player in current frame
-            for player_id in distances[frame_idx].keys():
-                # Look back window_size frames or fewer if at the beginning
-                start_frame = max(0, frame_idx - (window_size * 3) + 1)
-                
-                total_distance = 0
-                frames_present = 0
-                last_frame_present = None
-                
-                # Calculate total distance in the window
-                for i in range(start_frame, frame_idx + 1):
-                    if player_id in distances[i]:
-                        if last_frame_present is not None:
-                            total_distance += distances[i][player_id]
-                            frames_present += 1
-                        last_frame_present = i
-                
-                # Calculate speed only if player was present in at least two frames
-                if frames_present >= window_size:
-                    # Calculate time in hours (convert frames to hours)
-                    time_in_seconds = frames_present / fps
-                    time_in_hours = time_in_seconds / 3600
-                    
-                    # Calculate speed in km/h
-                    if time_in_hours > 0:
-                        speed_kmh = (total_distance / 1000) / time_in_hours
-                        speeds[frame_idx][player_id] = speed_kmh
-                    else:
-                        speeds[frame_idx][player_id] = 0
-                else:
-                    speeds[frame_idx][player_id] = 0
-        
-        return speeds
\ No newline at end of file
+        if not isinstance(distances, FrameSeries):
+            distances = FrameSeries.from_list(distances)
+        kinematics = Kinematics(distances.frames, distances.track_ids, distances.values, fps,
+                                distances.num_frames, self.get_window_frames(fps), self.min_speed_samples)
+        return kinematics.speed_per_frame()
+
+    @traced(frames_arg="tactical_player_positions")
+    def calculate_kinematics(self, tactical_player_positions, fps):
+        """
+        Compute step distance, speed, acceleration and cumulative distance in one pass.
+
+        Args:
+            tactical_player_positions: TacticalPositions or a list of per-frame
+                {player_id: [x, y]} dicts.
+            fps (float): Frames per second of the video.
+
+        Returns:
+            Kinematics: Per-step arrays, with FrameSeries views for the drawers.
+        """
+        distances = self.calculate_distance(tactical_player_positions)
+        return Kinematics(distances.frames, distances.track_ids, distances.values, fps,
+                          distances.num_frames, self.get_window_frames(fps), self.min_speed_samples)
+
+    def create_running_kinematics(self, fps):
+        """
+        Create the frame by frame counterpart of calculate_kinematics, for live streams.
+
+        Args:
+            fps (float): Frames per second of the stream.
+
+        Returns:
+            RunningKinematics: Fed with positions in meters, see get_meter_scale.
+        """
+        return RunningKinematics(fps, self.get_window_frames(fps), self.min_speed_samples,
+                                 distance_scale=self.distance_scale)
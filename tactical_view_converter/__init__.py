@@ -1 +1,2 @@
-from .tactical_view_converter import TacticalViewConverter
\ No newline at end of file
+from .tactical_view_converter import TacticalViewConverter
+from .tactical_positions import TacticalPositions
\ No newline at end of file
@@ -0,0 +1,67 @@
+import numpy as np
+
+
+class TacticalPositions:
+    """
+    Player positions in tactical view coordinates, stored as compact arrays.
+
+    Holds one (frame, track, x, y) row per visible player, sorted by frame, with the
+    first row of every frame indexed. It also behaves like the list of per-frame
+    {player_id: [x, y]} dicts the converter used to return: indexing a frame, len()
+    and iteration give those dicts, so the drawers and existing callers keep working.
+
+    Attributes:
+        frames (numpy.ndarray): int32 frame index of each row.
+        track_ids (numpy.ndarray): int32 track id of each row.
+        positions (numpy.ndarray): float32 (N, 2) tactical x, y of each row.
+        num_frames (int): Number of frames covered, including frames without players.
+    """
+    def __init__(self, frames, track_ids, positions, num_frames):
+        self.frames = np.asarray(frames, dtype=np.int32)
+        self.track_ids = np.asarray(track_ids, dtype=np.int32)
+        self.positions = np.asarray(positions, dtype=np.float32).reshape(-1, 2)
+        self.num_frames = num_frames
+        self.frame_starts = np.searchsorted(self.frames, np.arange(num_frames + 1))
+
+    @classmethod
+    def from_list(cls, tactical_player_positions):
+        """
+        Build from a list of per-frame {player_id: [x, y]} dicts.
+        """
+        frames, track_ids, positions = [], [], []
+        for frame_num, frame_positions in enumerate(tactical_player_positions):
+            for player_id, position in frame_positions.items():
+                frames.append(frame_num)
+                track_ids.append(player_id)
+                positions.append(position)
+        return cls(frames, track_ids, positions, len(tactical_player_positions))
+
+    def frame_rows(self, frame_num):
+        """
+        Get the rows of one frame.
+
+        Returns:
+            slice: Rows of the frame.
+        """
+        return slice(int(self.frame_starts[frame_num]), int(self.frame_starts[frame_num + 1]))
+
+    def __len__(self):
+        return self.num_frames
+
+    def __getitem__(self, frame_num):
+        if frame_num < 0:
+            frame_num += self.num_frames
+        if not 0 <= frame_num < self.num_frames:
+            raise IndexError(frame_num)
+        rows = self.frame_rows(frame_num)
+        return dict(zip(self.track_ids[rows].tolist(), self.positions[rows].tolist()))
+
+    def __iter__(self):
+        for frame_num in range(self.num_frames):
+            yield self[frame_num]
+
+    def to_list(self):
+        """
+        Convert to the list of per-frame {player_id: [x, y]} dicts.
+        """
+        return list(self)
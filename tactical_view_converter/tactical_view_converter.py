@@ -5,10 +5,13 @@ import numpy as np
 import cv2
 from copy import deepcopy
 from .homography import Homography
+from .tactical_positions import TacticalPositions
 
 folder_path = pathlib.Path(__file__).parent.resolve()
 sys.path.append(os.path.join(folder_path,"../"))
-from utils import get_foot_position,measure_distance
+from utils import measure_distance
+from core.track_store import get_track_store
+from instrumentation import traced
 
 class TacticalViewConverter:
     def __init__(self, court_image_path):
@@ -49,6 +52,7 @@ class TacticalViewConverter:
             (int(((self.actual_width_in_meters-5.79)/self.actual_width_in_meters)*self.width),int((10/self.actual_height_in_meters)*self.height)),
         ]
 
+    @traced(frames_arg="keypoints_list")
     def validate_keypoints(self, keypoints_list):
         """
         Validates detected keypoints by comparing their proportional distances
@@ -67,6 +71,9 @@ class TacticalViewConverter:
         keypoints_list = deepcopy(keypoints_list)
 
         for frame_idx, frame_keypoints in enumerate(keypoints_list):
+            # Frames between keyframes have no detections
+            if frame_keypoints is None:
+                continue
             frame_keypoints = frame_keypoints.xy.tolist()[0]
             
             # Get indices of detected keypoints (not (0, 0))
@@ -114,61 +121,146 @@ class TacticalViewConverter:
             
         return keypoints_list
 
-    def transform_players_to_tactical_view(self, keypoints_list, players):
+    def fit_homography(self, frame_keypoints):
         """
-        Transform player positions from video frame coordinates to tactical view coordinates.
+        Fit the homography from a frame to the tactical view on its detected keypoints.
 
         Args:
-            keypoints_list (list): List of detected court keypoints for each frame.
-            players (dict): Dictionary mapping player_id to Player objects, each with bboxs_per_frame.
+            frame_keypoints: Detected court keypoints of one frame, or None.
 
         Returns:
-            list: List of dictionaries mapping player IDs to (x, y) positions in tactical view,
-                  one dictionary per frame.
+            numpy.ndarray or None: 3x3 homography, or None if fewer than 4 keypoints are
+                valid or the fit failed.
         """
-        tactical_player_positions = []
-
-        num_frames = len(keypoints_list)
-
-        for frame_idx in range(num_frames):
-            tactical_positions = {}
-
-            frame_keypoints = keypoints_list[frame_idx]
-            if frame_keypoints is None:
-                tactical_player_positions.append(tactical_positions)
-                continue
-
-            frame_keypoints = frame_keypoints.xy.tolist()[0]
-            valid_indices = [i for i, kp in enumerate(frame_keypoints) if kp[0] > 0 and kp[1] > 0]
+        if frame_keypoints is None:
+            return None
+
+        frame_keypoints = frame_keypoints.xy.tolist()[0]
+        valid_indices = [i for i, kp in enumerate(frame_keypoints) if kp[0] > 0 and kp[1] > 0]
+        if len(valid_indices) < 4:
+            return None
+
+        source_points = np.array([frame_keypoints[i] for i in valid_indices], dtype=np.float32)
+        target_points = np.array([self.key_points[i] for i in valid_indices], dtype=np.float32)
+        try:
+            return Homography(source_points, target_points).m
+        except (ValueError, cv2.error):
+            return None
+
+    def compute_homographies(self, keypoints_list, camera_motion=None):
+        """
+        Compute the frame to tactical view homography of every frame.
 
-            if len(valid_indices) < 4:
-                tactical_player_positions.append(tactical_positions)
-                continue
+        Frames with at least 4 valid keypoints get a fresh fit. Other frames, including
+        the ones between keyframes, carry the previous homography forward through the
+        camera motion, or reuse it unchanged when the motion is unknown.
 
-            source_points = np.array([frame_keypoints[i] for i in valid_indices], dtype=np.float32)
-            target_points = np.array([self.key_points[i] for i in valid_indices], dtype=np.float32)
+        Args:
+            keypoints_list (list): Court keypoints for each frame, None where not detected.
+            camera_motion (list, optional): Per-frame 3x3 homography from the previous
+                frame to this one, or None where unknown.
 
-            try:
-                homography = Homography(source_points, target_points)
+        Returns:
+            list: 3x3 homography per frame, None until the first successful fit.
+        """
+        homographies = []
+        last_homography = None
+        for frame_idx, frame_keypoints in enumerate(keypoints_list):
+            motion = camera_motion[frame_idx] if camera_motion is not None else None
+            homography = self.next_homography(frame_keypoints, last_homography, motion)
+            homographies.append(homography)
+            if homography is not None:
+                last_homography = homography
+        return homographies
+
+    def next_homography(self, frame_keypoints, last_homography, motion=None):
+        """
+        Compute the homography of one frame from its keypoints or from the previous frame.
 
-                # Loop over all players to get their bbox for this frame
-                for player_id, player_obj in players.items():
-                    if frame_idx not in player_obj.bboxs_per_frame:
-                        continue
+        Args:
+            frame_keypoints: Detected court keypoints of the frame, or None.
+            last_homography (numpy.ndarray): Homography of the previous frame, or None.
+            motion (numpy.ndarray, optional): 3x3 camera motion from the previous frame to
+                this one, None if unknown.
 
-                    bbox = player_obj.bboxs_per_frame[frame_idx]
-                    player_position = np.array([get_foot_position(bbox)])
-                    tactical_position = homography.transform_points(player_position)
+        Returns:
+            numpy.ndarray or None: 3x3 homography, None until the first successful fit.
+        """
+        homography = self.fit_homography(frame_keypoints)
+        if homography is None and last_homography is not None:
+            homography = last_homography
+            if motion is not None:
+                # This frame -> previous frame -> tactical view
+                homography = last_homography @ np.linalg.inv(motion)
+                homography /= homography[2, 2]
+        return homography
+
+    def project_foot_positions(self, homographies, bboxes):
+        """
+        Project the foot position of each bbox with its own homography.
 
-                    x, y = tactical_position[0]
-                    if 0 <= x <= self.width and 0 <= y <= self.height:
-                        tactical_positions[player_id] = [x, y]
+        Args:
+            homographies (numpy.ndarray): (N, 3, 3) homography of each row.
+            bboxes (numpy.ndarray): (N, 4) bounding boxes.
 
-            except (ValueError, cv2.error):
-                # Homography failed; skip this frame
-                pass
+        Returns:
+            tuple: (N, 2) tactical view positions and the mask of the rows inside the court.
+        """
+        # Foot positions, as get_foot_position computes them, in homogeneous coordinates
+        foot_positions = np.stack([((bboxes[:, 0] + bboxes[:, 2]) / 2).astype(np.int32),
+                                   bboxes[:, 3].astype(np.int32),
+                                   np.ones(len(bboxes), dtype=np.int32)], axis=1).astype(np.float64)
+        projected = np.einsum("nij,nj->ni", homographies, foot_positions)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            positions = projected[:, :2] / projected[:, 2:3]
+
+        x, y = positions[:, 0], positions[:, 1]
+        inside = np.isfinite(x) & np.isfinite(y) & (x >= 0) & (x <= self.width) & (y >= 0) & (y <= self.height)
+        return positions, inside
+
+    @traced(frames_arg="keypoints_list")
+    def transform_players_to_tactical_view(self, keypoints_list, players, camera_motion=None):
+        """
+        Transform player positions from video frame coordinates to tactical view coordinates.
 
-            tactical_player_positions.append(tactical_positions)
+        The foot positions of every detection are projected at once: each row is multiplied
+        by the homography of its frame in one batched matrix product, and rows that fall
+        outside the court are masked out.
 
-        return tactical_player_positions
+        Args:
+            keypoints_list (list): List of detected court keypoints for each frame,
+                None for frames without detection.
+            players (dict): Dictionary mapping player_id to Player objects, each with bboxs_per_frame.
+            camera_motion (list, optional): Per-frame camera motion from
+                CourtKeypointDetector.get_keyframe_keypoints, used to carry the homography
+                across frames without keypoints.
 
+        Returns:
+            TacticalPositions: Compact (frame, track, x, y) positions. Indexing it by frame
+                gives the {player_id: [x, y]} dict of that frame.
+        """
+        num_frames = len(keypoints_list)
+        homographies = self.compute_homographies(keypoints_list, camera_motion)
+        has_homography = np.array([homography is not None for homography in homographies], dtype=bool)
+        homography_stack = np.zeros((num_frames, 3, 3), dtype=np.float64)
+        if has_homography.any():
+            homography_stack[has_homography] = [homography for homography in homographies if homography is not None]
+
+        store = get_track_store(players)
+        rows = store.frame_range_rows(0, num_frames)
+        frames = store.frames[rows]
+        track_ids = store.track_ids[rows]
+        bboxes = store.bboxes[rows]
+
+        keep = has_homography[frames]
+        frames, track_ids, bboxes = frames[keep], track_ids[keep], bboxes[keep]
+
+        positions = np.empty((len(frames), 2), dtype=np.float64)
+        inside = np.empty(len(frames), dtype=bool)
+        chunk_size = 1 << 18  # bounds the memory of the gathered homographies
+        for start in range(0, len(frames), chunk_size):
+            end = start + chunk_size
+            positions[start:end], inside[start:end] = self.project_foot_positions(
+                homography_stack[frames[start:end]], bboxes[start:end])
+
+        return TacticalPositions(frames[inside], track_ids[inside], positions[inside], num_frames)
@@ -1,27 +1,49 @@
-from PIL import Image
-import cv2
-from transformers import CLIPProcessor, CLIPModel
+import hashlib
+import json
+import os
+import tempfile
 
-import sys 
+import numpy as np
+
+import sys
 sys.path.append('../')
 from utils import read_stub, save_stub
+from configs import TEXT_EMBEDDING_CACHE_DIR
+from core.track_store import get_track_store
+from instrumentation import traced
+from appearance_embedding import AppearanceEmbedder, get_crop
+
 
 class TeamAssigner:
     """
     A class that assigns players to teams based on their jersey colors using visual analysis.
 
     The class uses a pre-trained vision model to classify players into teams based on their
-    appearance. It maintains a consistent team assignment for each player across frames.
+    appearance. Each track is classified once, from a few crops sampled along it: every crop
+    votes for a team, and the track keeps the majority team, ties going to the team with the
+    higher summed confidence. The crops are embedded by the AppearanceEmbedder, which may be
+    shared with the player tracker, and compared with text embeddings that are computed once
+    and cached on disk. With a detection cache, the votes of each window are cached as well,
+    so a run over cached tracks never loads the vision model.
 
     Attributes:
-        team_colors (dict): Dictionary storing team color information.
         player_team_dict (dict): Dictionary mapping player IDs to their team assignments.
         team_1_class_name (str): Description of Team 1's jersey appearance.
         team_2_class_name (str): Description of Team 2's jersey appearance.
+        samples_per_track (int): Number of crops classified for each track.
+        sample_spacing (int): Minimum number of frames between two crops of a track.
+        embedder (AppearanceEmbedder): Embeds the player crops.
+        cache (VideoDetectionCache): Cache of the votes on the video being processed, or None.
     """
     def __init__(self,
                  team_1_class_name= "white shirt",
                  team_2_class_name= "dark blue shirt",
+                 samples_per_track=5,
+                 sample_spacing=10,
+                 batch_size=32,
+                 embedding_cache_dir=TEXT_EMBEDDING_CACHE_DIR,
+                 embedder=None,
+                 cache=None,
                  ):
         """
         Initialize the TeamAssigner with specified team jersey descriptions.
@@ -29,19 +51,109 @@ class TeamAssigner:
         Args:
             team_1_class_name (str): Description of Team 1's jersey appearance.
             team_2_class_name (str): Description of Team 2's jersey appearance.
+            samples_per_track (int): Number of crops classified for each track.
+            sample_spacing (int): Minimum number of frames between two crops of a track.
+            batch_size (int): Number of crops sent to the model at once.
+            embedding_cache_dir (str): Folder where the text embeddings are cached.
+            embedder (AppearanceEmbedder, optional): Embedding service shared with other stages.
+                A new one, batching batch_size crops, by default.
+            cache (VideoDetectionCache, optional): Cache of the video being processed. The
+                votes of each window are read from and written to it.
         """
         self.team_colors = {}
-        self.player_team_dict = {}        
-    
+        self.player_team_dict = {}
+        self.text_embeddings = None
+        self.logit_scale = None
+        self.embedder = embedder if embedder is not None else AppearanceEmbedder(batch_size=batch_size)
+
         self.team_1_class_name = team_1_class_name
         self.team_2_class_name = team_2_class_name
+        self.samples_per_track = samples_per_track
+        self.sample_spacing = sample_spacing
+        self.embedding_cache_dir = embedding_cache_dir
+        self.cache = cache
+
+        # Per track: frames sampled so far, votes per team and summed probabilities per team
+        self.track_samples = {}
+        self.track_votes = {}
+        self.track_confidence = {}
 
     def load_model(self):
         """
-        Loads the pre-trained vision model for jersey color classification.
+        Loads the pre-trained vision model for jersey color classification, and the
+        embeddings of the team prompts.
+        """
+        self.embedder.load_model()
+        self.load_text_embeddings()
+
+    def load_text_embeddings(self):
+        """
+        Loads the embeddings of the team prompts. The vision model is not needed when
+        they are cached, it is only loaded once crops have to be embedded.
+        """
+        self.text_embeddings, self.logit_scale = self.get_text_embeddings([self.team_1_class_name,
+                                                                           self.team_2_class_name])
+
+    def get_text_embeddings(self, classes):
+        """
+        Get the normalised text embeddings of the class prompts, computing them only once.
+
+        Embeddings are stored on disk under a hash of the model name and the prompts,
+        with the logit scale of the model.
+
+        Args:
+            classes (list of str): Text prompts, one per team.
+
+        Returns:
+            tuple: (normalised embeddings of shape (len(classes), dim), logit scale).
+        """
+        key = hashlib.sha256(json.dumps([self.embedder.model_name, classes]).encode()).hexdigest()
+        path = os.path.join(self.embedding_cache_dir, f"{key}.npz")
+        if os.path.exists(path):
+            with np.load(path) as cached:
+                return cached["embeddings"], float(cached["logit_scale"])
+
+        embeddings = self.embedder.embed_texts(classes)
+        logit_scale = self.embedder.logit_scale
+
+        os.makedirs(self.embedding_cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.embedding_cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, embeddings=embeddings, logit_scale=np.float32(logit_scale))
+        os.replace(tmp_path, path)
+        return embeddings, logit_scale
+
+    def classify_embeddings(self, image_embeddings):
+        """
+        Classify player crops against the team prompts from their embeddings.
+
+        Args:
+            image_embeddings (numpy.ndarray): Normalised embeddings of the crops.
+
+        Returns:
+            numpy.ndarray: Team probabilities of shape (len(image_embeddings), 2).
+        """
+        if self.text_embeddings is None:
+            self.load_text_embeddings()
+        if not len(image_embeddings):
+            return np.zeros((0, 2), dtype=np.float32)
+        logits = self.logit_scale * image_embeddings.astype(np.float32) @ self.text_embeddings.T
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+    @traced()
+    def classify_crops(self, crops):
+        """
+        Classify player crops against the team prompts, in batches, without the embedding cache.
+
+        Args:
+            crops (list of numpy.ndarray): BGR crops of players.
+
+        Returns:
+            numpy.ndarray: Team probabilities of shape (len(crops), 2).
         """
-        self.model = CLIPModel.from_pretrained("patrickjohncyh/fashion-clip")
-        self.processor = CLIPProcessor.from_pretrained("patrickjohncyh/fashion-clip")
+        return self.classify_embeddings(self.embedder.embed_crops(crops))
 
     def get_player_color(self,frame,bbox):
         """
@@ -54,25 +166,92 @@ class TeamAssigner:
         Returns:
             str: The classified jersey color/description.
         """
-        image = frame[int(bbox[1]):int(bbox[3]),int(bbox[0]):int(bbox[2])]
+        classes = [self.team_1_class_name, self.team_2_class_name]
+        crop = get_crop(frame, bbox)
+        if crop is None:
+            return classes[1]
+        probs = self.classify_crops([crop])
+        return classes[int(probs[0].argmax())]
 
-        # Convert to PIL Image
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        pil_image = Image.fromarray(rgb_image)
-        image = pil_image
+    def collect_crops(self, video_frames, players, frame_offset=0):
+        """
+        Sample crops of the tracks that still need votes from one window of frames.
 
-        classes = [self.team_1_class_name, self.team_2_class_name]
+        A track gets at most samples_per_track crops, at least sample_spacing frames apart,
+        over the whole video. Crops are only cut by the embedder, unless it already has
+        their embedding.
 
-        inputs = self.processor(text=classes, images=image, return_tensors="pt", padding=True)
+        Args:
+            video_frames (list): Frames of the current window.
+            players (dict): Dict of Player objects keyed by player ID.
+            frame_offset (int): Index of the first frame of the window in the whole video.
+
+        Returns:
+            tuple: (player_ids, samples), one entry per sampled crop. Samples are
+                (frame index, track id, frame, bbox), as taken by AppearanceEmbedder.embed.
+        """
+        store = get_track_store(players)
+        player_ids = []
+        samples = []
+        for frame_num, frame in enumerate(video_frames, start=frame_offset):
+            track_ids, bboxes = store.frame_tracks(frame_num)
+            for player_id, bbox in zip(track_ids.tolist(), bboxes):
+                sampled_frames = self.track_samples.setdefault(player_id, [])
+                if len(sampled_frames) >= self.samples_per_track:
+                    continue
+                if sampled_frames and frame_num - sampled_frames[-1] < self.sample_spacing:
+                    continue
+                if get_crop(frame, bbox) is None:
+                    continue
+                sampled_frames.append(frame_num)
+                player_ids.append(player_id)
+                samples.append((frame_num, player_id, frame, bbox))
+        return player_ids, samples
+
+    def add_votes(self, player_ids, probabilities):
+        """
+        Add the classified crops to the votes of their tracks and update the track teams.
 
-        outputs = self.model(**inputs)
-        logits_per_image = outputs.logits_per_image
-        probs = logits_per_image.softmax(dim=1) 
+        Args:
+            player_ids (list): Track ID of each crop.
+            probabilities (numpy.ndarray): Team probabilities of each crop.
+        """
+        for player_id, probs in zip(player_ids, probabilities):
+            votes = self.track_votes.setdefault(player_id, np.zeros(2, dtype=np.int32))
+            confidence = self.track_confidence.setdefault(player_id, np.zeros(2, dtype=np.float32))
+            votes[probs.argmax()] += 1
+            confidence += probs
 
+        for player_id in set(player_ids):
+            self.update_team(player_id)
 
-        class_name=  classes[probs.argmax(dim=1)[0]]
+    def update_team(self, player_id):
+        """
+        Set the team of a track from its votes, ties going to the higher summed probability.
+        """
+        votes = self.track_votes[player_id]
+        if votes[0] != votes[1]:
+            winner = int(votes.argmax())
+        else:
+            winner = int(self.track_confidence[player_id].argmax())
+        self.player_team_dict[player_id] = winner + 1
+
+    def merge_track_votes(self, track_votes, track_confidence, id_map=None):
+        """
+        Add the votes another assigner collected, for instance on another part of the video.
 
-        return class_name
+        Args:
+            track_votes (dict): Track ID -> votes per team.
+            track_confidence (dict): Track ID -> summed probabilities per team.
+            id_map (dict, optional): Track ID of the other assigner -> track ID here.
+        """
+        for player_id, other_votes in track_votes.items():
+            merged_id = id_map.get(player_id, player_id) if id_map is not None else player_id
+            votes = self.track_votes.setdefault(merged_id, np.zeros(2, dtype=np.int32))
+            confidence = self.track_confidence.setdefault(merged_id, np.zeros(2, dtype=np.float32))
+            votes += other_votes
+            confidence += track_confidence[player_id]
+            self.update_team(merged_id)
 
     def get_player_team(self,frame,player_bbox,player_id):
         """
@@ -89,15 +268,13 @@ class TeamAssigner:
         if player_id in self.player_team_dict:
           return self.player_team_dict[player_id]
 
-        player_color = self.get_player_color(frame,player_bbox)
-
-        team_id=2
-        if player_color==self.team_1_class_name:
-            team_id=1
-
-        self.player_team_dict[player_id] = team_id
-        return team_id
+        crop = get_crop(frame, player_bbox)
+        if crop is None:
+            return 2
+        self.add_votes([player_id], self.classify_crops([crop]))
+        return self.player_team_dict[player_id]
 
+    @traced(frames_arg="video_frames")
     def get_player_teams_across_frames(self, video_frames, players, read_from_stub=False, stub_path=None):
         """
         Processes all video frames to assign teams to players, with optional caching.
@@ -117,25 +294,115 @@ class TeamAssigner:
             if len(player_assignment) == len(video_frames):
                 return player_assignment
 
-        self.load_model()
+        player_assignment = self.get_player_teams_for_frames(video_frames, players)
 
-        player_assignment = []
+        save_stub(stub_path, player_assignment)
 
-        for frame_num, frame in enumerate(video_frames):
-            player_assignment.append({})
+        return player_assignment
 
-            if frame_num % 50 == 0:
-                self.player_team_dict = {}
+    @traced(frames_arg="video_frames")
+    def get_player_teams_for_frames(self, video_frames, players, frame_offset=0):
+        """
+        Assigns teams to the players visible in one window of a longer video.
 
-            for player_id, player_obj in players.items():
-                if frame_num not in player_obj.bboxs_per_frame:
-                    continue
+        Crops are sampled from the window for tracks that still need votes and classified
+        in one batched pass, reusing the embeddings the player tracker already computed,
+        then every frame takes the team of each visible track. The votes live on the
+        instance, so tracks that continue into later windows keep them.
 
-                bbox = player_obj.bboxs_per_frame[frame_num]
+        Args:
+            video_frames (list): Frames of the current window.
+            players (dict): Dict of Player objects keyed by player ID.
+            frame_offset (int): Index of the first frame of the window in the whole video.
 
-                team = self.get_player_team(frame, bbox, player_id)
-                player_assignment[frame_num][player_id] = team
+        Returns:
+            list: List of dictionaries mapping player IDs to team assignments, one per frame
+                of the window.
+        """
+        params = None
+        if self.cache is not None:
+            params = self.get_cache_params(players, frame_offset, len(video_frames))
+            state = self.cache.load(None, params)
+            if state is not None:
+                print("Loading cached team votes")
+                self.set_vote_state(state)
+                return self.build_assignment(players, frame_offset, len(video_frames))
+
+        player_ids, samples = self.collect_crops(video_frames, players, frame_offset)
+        if samples:
+            self.add_votes(player_ids, self.classify_embeddings(self.embedder.embed(samples)))
+        if params is not None:
+            self.cache.store(None, params, self.get_vote_state())
+        return self.build_assignment(players, frame_offset, len(video_frames))
+
+    def get_cache_params(self, players, frame_offset, num_frames):
+        """
+        Describe what the votes after one window depend on, for the cache key.
 
-        save_stub(stub_path, player_assignment)
+        The key covers the video and these parameters: the vision model and the prompts,
+        the sampling, the tracks visible in the window and the votes collected before it.
 
+        Args:
+            players (dict): Dict of Player objects keyed by player ID.
+            frame_offset (int): Index of the first frame of the window in the whole video.
+            num_frames (int): Number of frames of the window.
+
+        Returns:
+            dict: JSON serialisable parameters.
+        """
+        store = get_track_store(players)
+        rows = store.frame_range_rows(frame_offset, frame_offset + num_frames)
+        tracks = hashlib.sha256()
+        for column in (store.frames[rows], store.track_ids[rows], store.bboxes[rows]):
+            tracks.update(np.ascontiguousarray(column).tobytes())
+
+        votes = hashlib.sha256()
+        for player_id in sorted(self.track_samples):
+            votes.update(json.dumps([player_id, self.track_samples[player_id]]).encode())
+        for player_id in sorted(self.track_votes):
+            votes.update(json.dumps([player_id, self.track_votes[player_id].tolist(),
+                                     self.track_confidence[player_id].tolist()]).encode())
+
+        return {"stage": "team_votes", "model": self.embedder.model_name,
+                "prompts": [self.team_1_class_name, self.team_2_class_name],
+                "samples_per_track": self.samples_per_track, "sample_spacing": self.sample_spacing,
+                "frame_offset": frame_offset, "num_frames": num_frames,
+                "tracks": tracks.hexdigest(), "votes": votes.hexdigest()}
+
+    def get_vote_state(self):
+        """
+        Get the votes collected so far, as they are cached.
+        """
+        return {"track_samples": self.track_samples, "track_votes": self.track_votes,
+                "track_confidence": self.track_confidence, "player_team_dict": self.player_team_dict}
+
+    def set_vote_state(self, state):
+        """
+        Restore votes returned by get_vote_state.
+        """
+        self.track_samples = {player_id: list(frames) for player_id, frames in state["track_samples"].items()}
+        self.track_votes = {player_id: votes.copy() for player_id, votes in state["track_votes"].items()}
+        self.track_confidence = {player_id: confidence.copy()
+                                 for player_id, confidence in state["track_confidence"].items()}
+        self.player_team_dict = dict(state["player_team_dict"])
+
+    def build_assignment(self, players, frame_offset, num_frames):
+        """
+        Expand the per-track teams into per-frame assignments.
+
+        Args:
+            players (dict): Dict of Player objects keyed by player ID.
+            frame_offset (int): Index of the first frame in the whole video.
+            num_frames (int): Number of frames to build.
+
+        Returns:
+            list: List of dictionaries mapping player IDs to team assignments for each frame.
+        """
+        store = get_track_store(players)
+        player_assignment = []
+        for frame_num in range(frame_offset, frame_offset + num_frames):
+            track_ids, _ = store.frame_tracks(frame_num)
+            player_assignment.append({player_id: self.player_team_dict[player_id]
+                                      for player_id in track_ids.tolist()
+                                      if player_id in self.player_team_dict})
         return player_assignment
@@ -0,0 +1,159 @@
+"""
+A module for deciding where the ball detector looks.
+
+The ball covers a few pixels of a frame. Scaled down to the model input with the rest
+of the frame it is easily missed, and most of the compute goes to empty court. While
+the ball is tracked, BallSearch predicts its position from the recent trajectory with
+a constant velocity model, and only a window around that position is searched, at the
+resolution of the frame. Once the ball has been missed for a number of frames, the
+whole frame is scanned again, in full or as overlapping tiles.
+"""
+
+import numpy as np
+
+import sys
+sys.path.append('../')
+from utils import get_center_of_bbox
+from model_registry import FrameDetections
+
+
+def get_tiles(frame_shape, tile_size, overlap):
+    """
+    Cover a frame with overlapping square tiles.
+
+    Args:
+        frame_shape (tuple): (height, width) of the frame.
+        tile_size (int): Side of a tile, in pixels.
+        overlap (int): Pixels shared by neighbouring tiles, so a ball on a tile border
+            is whole in one of them.
+
+    Returns:
+        list of tuple: (x1, y1, x2, y2) of every tile, clipped to the frame.
+    """
+    height, width = frame_shape[:2]
+    stride = max(1, tile_size - overlap)
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        # The last tile is aligned on the far border instead of running over it
+        return sorted(set(list(range(0, length - tile_size, stride)) + [length - tile_size]))
+
+    return [(x, y, min(x + tile_size, width), min(y + tile_size, height))
+            for y in starts(height) for x in starts(width)]
+
+
+def shift_result(result, frame, offset):
+    """
+    Move the boxes of a result computed on a crop into the coordinates of its frame.
+
+    Args:
+        result (FrameDetections): Detections on the crop.
+        frame (numpy.ndarray): The frame the crop was taken from.
+        offset (tuple): (x, y) of the top left corner of the crop in the frame.
+
+    Returns:
+        FrameDetections: The same detections, in frame coordinates.
+    """
+    boxes = result.boxes.copy()
+    boxes[:, [0, 2]] += offset[0]
+    boxes[:, [1, 3]] += offset[1]
+    return FrameDetections(boxes, result.names, orig_shape=frame.shape[:2])
+
+
+def merge_results(results, frame):
+    """
+    Put the detections of several crops of one frame, already in frame coordinates,
+    into one result.
+
+    Args:
+        results (list): Detections of the crops, from shift_result.
+        frame (numpy.ndarray): The frame.
+
+    Returns:
+        FrameDetections: All the detections of the frame.
+    """
+    boxes = np.concatenate([result.boxes for result in results])
+    return FrameDetections(boxes, results[0].names, orig_shape=frame.shape[:2])
+
+
+class BallSearch:
+    """
+    Predicts the window where the ball is searched on the next frames.
+
+    Attributes:
+        window_size (int): Side of the searched window, in frame pixels.
+        max_misses (int): Consecutive frames without the ball after which it is lost.
+        max_speed (float): Largest ball speed in pixels per frame, faster estimates are
+            scaled down to it.
+        last_frame (int): Last frame the ball was found on, None if never.
+        last_center (numpy.ndarray): Ball center on that frame.
+        velocity (numpy.ndarray): Estimated ball velocity in pixels per frame.
+        misses (int): Frames searched without finding the ball since then.
+    """
+    def __init__(self, window_size, max_misses, max_speed):
+        self.window_size = window_size
+        self.max_misses = max_misses
+        self.max_speed = max_speed
+        self.last_frame = None
+        self.last_center = None
+        self.velocity = np.zeros(2)
+        self.misses = 0
+
+    @property
+    def lost(self):
+        """
+        Whether the trajectory no longer tells where the ball is.
+        """
+        return self.last_center is None or self.misses >= self.max_misses
+
+    def predict_center(self, frame_num):
+        """
+        Extrapolate the ball center on a frame from its last position and velocity.
+        """
+        return self.last_center + self.velocity * (frame_num - self.last_frame)
+
+    def get_window(self, frame_num, frame_shape):
+        """
+        Window to search on a frame, centered on the predicted ball position and kept
+        inside the frame.
+
+        Args:
+            frame_num (int): Index of the frame.
+            frame_shape (tuple): (height, width) of the frame.
+
+        Returns:
+            tuple: (x1, y1, x2, y2) of the window. Windows of frames of one size all have
+                the same size, so they can be batched.
+        """
+        height, width = frame_shape[:2]
+        window_width = min(self.window_size, width)
+        window_height = min(self.window_size, height)
+        center_x, center_y = self.predict_center(frame_num)
+        x1 = int(np.clip(round(center_x - window_width / 2), 0, width - window_width))
+        y1 = int(np.clip(round(center_y - window_height / 2), 0, height - window_height))
+        return x1, y1, x1 + window_width, y1 + window_height
+
+    def update(self, frame_num, bbox):
+        """
+        Account for the outcome of the search on a frame.
+
+        Args:
+            frame_num (int): Index of the frame, after every frame updated so far.
+            bbox (list): Ball bounding box found on the frame, None if it was missed.
+        """
+        if bbox is None:
+            self.misses += 1
+            return
+
+        center = np.array(get_center_of_bbox(bbox), dtype=np.float64)
+        if self.last_center is not None and not self.lost:
+            velocity = (center - self.last_center) / max(1, frame_num - self.last_frame)
+            speed = np.linalg.norm(velocity)
+            self.velocity = velocity * min(1.0, self.max_speed / speed) if speed > 0 else velocity
+        else:
+            # The first sighting after a scan says nothing about the motion
+            self.velocity = np.zeros(2)
+        self.last_frame = frame_num
+        self.last_center = center
+        self.misses = 0
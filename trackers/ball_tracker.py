@@ -1,12 +1,23 @@
-from ultralytics import YOLO
-import supervision as sv
 import numpy as np
-import pandas as pd
 import sys 
 sys.path.append('../')
 from utils import read_stub, save_stub
+from model_registry import get_model_registry, get_supervision_detections, convert_results, pack_detections, unpack_detections
 from core.ball import Ball
-import os, pickle
+from core.track_store import TrackStore, TrackBBoxView
+from instrumentation import traced
+from configs import (
+    BALL_MAX_SPEED,
+    BALL_MAX_GAP_FRAMES,
+    BALL_SMOOTHING,
+    BALL_DETECTION_MODE,
+    BALL_ROI_SIZE,
+    BALL_ROI_MAX_MISSES,
+    BALL_ROI_FALLBACK,
+    BALL_ROI_BATCH_SIZE,
+)
+from .ball_trajectory import BallTrajectory, reject_spikes, interpolate_gaps
+from .ball_search import BallSearch, get_tiles, shift_result, merge_results
 
 class BallTracker:
     """
@@ -14,41 +25,204 @@ class BallTracker:
 
     This class provides methods to detect the ball in video frames, process detections
     in batches, and refine tracking results through filtering and interpolation.
+
+    In "roi" detection mode, the detector only searches a window around the position
+    the recent trajectory predicts, at the resolution of the frame, and scans whole
+    frames again once the ball has been missed for roi_max_misses frames. Frames must
+    then be detected in order, so the ball is not part of the InferenceScheduler batches.
     """
-    def __init__(self, model_path):
-        self.model = YOLO(model_path)
+    def __init__(self, model_path, cache=None, max_gap=BALL_MAX_GAP_FRAMES, smoothing=BALL_SMOOTHING,
+                 detection_mode=BALL_DETECTION_MODE, roi_size=BALL_ROI_SIZE, roi_max_misses=BALL_ROI_MAX_MISSES,
+                 roi_fallback=BALL_ROI_FALLBACK, roi_batch_size=BALL_ROI_BATCH_SIZE):
+        """
+        Args:
+            model_path (str): Path to the ball detector weights.
+            cache (VideoDetectionCache, optional): Detection cache of the video being processed.
+            max_gap (int): Longest run of frames without the ball that is interpolated.
+            smoothing (bool): Smooth the ball trajectory.
+            detection_mode (str): "roi" to search around the predicted ball, "full" to
+                detect on whole frames.
+            roi_size (int): Side of the searched window, in frame pixels.
+            roi_max_misses (int): Frames without the ball before whole frames are scanned again.
+            roi_fallback (str): Scan of a lost ball, "full" frames or "tiles" of roi_size.
+            roi_batch_size (int): Frames whose windows are predicted ahead and detected at once.
+        """
+        if detection_mode not in ("roi", "full"):
+            raise ValueError(f"Unknown ball detection mode {detection_mode}")
+        if roi_fallback not in ("full", "tiles"):
+            raise ValueError(f"Unknown ball search fallback {roi_fallback}")
+        self.model_path = model_path
+        self._model = None  # Loaded on the first cache miss
         self.ball = Ball()
-        class_name = self.__class__.__name__.replace("Tracker", "").lower()
-        self.cache_path = f"cache/{class_name}_detections.pkl"
+        self.conf = 0.5
+        self.cache = cache  # VideoDetectionCache of the video being processed, or None
+        self.trajectory = BallTrajectory(max_speed=BALL_MAX_SPEED, max_gap=max_gap, smoothing=smoothing)
+        self.detection_mode = detection_mode
+        self.roi_fallback = roi_fallback
+        self.roi_batch_size = roi_batch_size
+        self.search = BallSearch(roi_size, roi_max_misses, BALL_MAX_SPEED)
 
-    def detect_frames(self, frames):
+    @property
+    def model(self):
         """
-        Detect the ball in a sequence of frames using batch processing.
+        The YOLO detector, built on first use so runs served from the detection cache never load it.
+        Detectors with the same weights share one model.
+        """
+        if self._model is None:
+            self._model = get_model_registry().get_model(self.model_path)
+        return self._model
+
+    @traced(frames_arg="frames")
+    def predict_frames(self, frames, batch_size=20):
+        """
+        Run the ball detector over a sequence of frames in batches, without caching.
 
         Args:
             frames (list): List of video frames to process.
+            batch_size (int): Number of frames sent to the model at once.
 
         Returns:
             list: YOLO detection results for each frame.
         """
-        if os.path.exists(self.cache_path):
-            with open(self.cache_path, "rb") as f:
-                print(f"Loading cached detections from {self.cache_path}")
-                return pickle.load(f)
-        batch_size=20 
         detections = []
         for i in range(0,len(frames),batch_size):
-            detections_batch = self.model.predict(frames[i:i+batch_size],conf=0.5)
-            detections += detections_batch
+            detections_batch = self.model.predict(frames[i:i+batch_size],conf=self.conf)
+            detections += convert_results(detections_batch)
+        return detections
+
+    @traced(frames_arg="frames")
+    def detect_frames(self, frames, frame_offset=0):
+        """
+        Detect the ball in a sequence of frames using batch processing.
+
+        Results are read from and written to the detection cache when one is set.
+
+        Args:
+            frames (list): List of video frames to process.
+            frame_offset (int): Index of the first frame in the whole video.
+
+        Returns:
+            list: YOLO detection results for each frame.
+        """
+        detections = self.load_cached_detections(len(frames), frame_offset)
+        if detections is not None:
+            if self.uses_roi:
+                # The next window is searched from where the cached detections left the ball
+                for frame_num, detection in enumerate(detections, start=frame_offset):
+                    self.search.update(frame_num, self.choose_ball_bbox(detection))
+        else:
+            if self.uses_roi:
+                detections = self.search_frames(frames, frame_offset)
+            else:
+                detections = self.predict_frames(frames)
+            # Save detections for future use
+            self.store_detections(detections, frame_offset)
+
+        return detections
+
+    @property
+    def uses_roi(self):
+        return self.detection_mode == "roi"
+
+    @traced(frames_arg="frames")
+    def search_frames(self, frames, frame_offset=0):
+        """
+        Detect the ball around its predicted position, frame after frame.
+
+        Windows are predicted for roi_batch_size frames ahead and detected in one batch.
+        While the ball is lost, batches of frames are scanned in full instead.
+
+        Args:
+            frames (list): Frames to process, following the frames searched so far.
+            frame_offset (int): Index of the first frame in the whole video.
+
+        Returns:
+            list: YOLO detection results for each frame, in frame coordinates.
+        """
+        detections = []
+        start = 0
+        while start < len(frames):
+            batch = frames[start:start + self.roi_batch_size]
+            batch_offset = frame_offset + start
+            if self.search.lost:
+                batch_detections = self.scan_frames(batch)
+            else:
+                windows = [self.search.get_window(frame_num, frame.shape)
+                           for frame_num, frame in enumerate(batch, start=batch_offset)]
+                crops = [frame[y1:y2, x1:x2] for frame, (x1, y1, x2, y2) in zip(batch, windows)]
+                # The crops go to the model at their own size, without downscaling
+                results = convert_results(self.model.predict(crops, conf=self.conf, imgsz=self.search.window_size))
+                batch_detections = [shift_result(result, frame, window[:2])
+                                    for result, frame, window in zip(results, batch, windows)]
+
+            for frame_num, detection in enumerate(batch_detections, start=batch_offset):
+                self.search.update(frame_num, self.choose_ball_bbox(detection))
+            detections += batch_detections
+            start += len(batch)
+        return detections
+
+    def scan_frames(self, frames):
+        """
+        Look for a lost ball over whole frames.
+
+        Args:
+            frames (list): Frames to scan.
+
+        Returns:
+            list: YOLO detection results for each frame, in frame coordinates.
+        """
+        if self.roi_fallback == "full":
+            return convert_results(self.model.predict(frames, conf=self.conf))
+
+        detections = []
+        window_size = self.search.window_size
+        for frame in frames:
+            tiles = get_tiles(frame.shape, window_size, overlap=window_size // 4)
+            crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles]
+            results = convert_results(self.model.predict(crops, conf=self.conf, imgsz=window_size))
+            detections.append(merge_results([shift_result(result, frame, tile[:2])
+                                             for result, tile in zip(results, tiles)], frame))
+        return detections
+
+    def load_cached_detections(self, num_frames, frame_offset=0):
+        """
+        Read previously computed detections from the detection cache.
 
-        # Save detections for future use
-        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
-        with open(self.cache_path, "wb") as f:
-            pickle.dump(detections, f)
+        Args:
+            num_frames (int): Number of frames the detections cover.
+            frame_offset (int): Index of the first frame in the whole video.
 
+        Returns:
+            list: The cached detections, or None if there is no cache or no entry.
+        """
+        if self.cache is None:
+            return None
+        detections = unpack_detections(self.cache.load(self.model_path, self.get_cache_params(num_frames, frame_offset)))
+        if detections is not None:
+            print(f"Loading cached detections for {self.model_path}")
         return detections
 
-    def get_object_tracks(self, frames):
+    def store_detections(self, detections, frame_offset=0):
+        """
+        Write detections to the detection cache, if one is set.
+
+        Args:
+            detections (list): FrameDetections, one per frame.
+            frame_offset (int): Index of the first frame in the whole video.
+        """
+        if self.cache is not None:
+            self.cache.store(self.model_path, self.get_cache_params(len(detections), frame_offset),
+                             pack_detections(detections))
+
+    def get_cache_params(self, num_frames, frame_offset=0):
+        # The cache key covers the video, the weights and these parameters
+        params = {"conf": self.conf, "frame_offset": frame_offset, "num_frames": num_frames}
+        if self.uses_roi:
+            params["search"] = {"size": self.search.window_size, "max_misses": self.search.max_misses,
+                                "fallback": self.roi_fallback, "batch_size": self.roi_batch_size}
+        return params
+
+    def get_object_tracks(self, frames, detections=None):
         """
         Get ball tracking results for a sequence of frames with optional caching.
 
@@ -59,74 +233,121 @@ class BallTracker:
             list: List of dictionaries containing ball tracking information for each frame.
         """
 
-        detections = self.detect_frames(frames)
+        if detections is None:
+            detections = self.detect_frames(frames)
+        self.add_detections(detections)
+        return self.finalize_tracks()
 
-        for frame_num, detection in enumerate(detections):
-            cls_names = detection.names
-            cls_names_inv = {v:k for k,v in cls_names.items()}
+    def update_object_tracks(self, frames, frame_offset=0, detections=None):
+        """
+        Detect the ball in one window of frames of a longer video.
 
-            # Covert to supervision Detection format
-            detection_supervision = sv.Detections.from_ultralytics(detection)
+        Raw detections accumulate on the Ball object; call finalize_tracks once the
+        whole video has been processed to clean and interpolate them.
 
-            chosen_bbox = None
-            max_confidence = 0
-            for frame_detection in detection_supervision:
-                bbox = frame_detection[0].tolist()
-                cls_id = frame_detection[3]
-                confidence = frame_detection[2]
+        Args:
+            frames (list): Frames of the current window.
+            frame_offset (int): Index of the first frame of the window in the whole video.
+            detections (list, optional): Precomputed detections of the window, for instance
+                from the InferenceScheduler. Detection runs here when omitted.
+        """
+        if detections is None:
+            detections = self.detect_frames(frames, frame_offset)
+        self.add_detections(detections, frame_offset)
 
-                if cls_id == cls_names_inv['Ball']:
-                    if max_confidence<confidence:
-                        chosen_bbox = bbox
-                        max_confidence = confidence
+    @traced(frames_arg="detections")
+    def add_detections(self, detections, frame_offset=0):
+        """
+        Keep the most confident ball detection of every frame.
 
+        Args:
+            detections (list): YOLO detection results, one per frame.
+            frame_offset (int): Frame index of the first detection.
+        """
+        for frame_num, detection in enumerate(detections, start=frame_offset):
+            chosen_bbox = self.choose_ball_bbox(detection)
             if chosen_bbox is not None:
                 self.ball.add_bbox(frame_num, chosen_bbox)
 
-        self.remove_wrong_detections()
-        # Interpolate Ball Tracks
-        self.interpolate_ball_positions()
-        return self.ball
+    def choose_ball_bbox(self, detection):
+        """
+        Pick the most confident ball detection of a frame.
 
-    def remove_wrong_detections(self):
-        maximum_allowed_distance = 25
-        bbox_per_frame = self.ball.bbox_per_frame
-        valid_bboxes = {}
-        last_good_frame_index = None
+        Args:
+            detection: YOLO detection result of the frame.
 
-        frame_indices = sorted(bbox_per_frame.keys())
+        Returns:
+            list: Bounding box of the ball, or None if no ball was detected.
+        """
+        cls_names = detection.names
+        cls_names_inv = {v:k for k,v in cls_names.items()}
 
-        for idx in frame_indices:
-            current_box = bbox_per_frame[idx]
+        # Covert to supervision Detection format
+        detection_supervision = get_supervision_detections(detection)
 
-            if last_good_frame_index is None:
-                last_good_frame_index = idx
-                valid_bboxes[idx] = current_box
-                continue
+        chosen_bbox = None
+        max_confidence = 0
+        for frame_detection in detection_supervision:
+            bbox = frame_detection[0].tolist()
+            cls_id = frame_detection[3]
+            confidence = frame_detection[2]
 
-            last_box = bbox_per_frame[last_good_frame_index]
-            frame_gap = idx - last_good_frame_index
-            max_distance = maximum_allowed_distance * frame_gap
+            if cls_id == cls_names_inv['Ball']:
+                if max_confidence<confidence:
+                    chosen_bbox = bbox
+                    max_confidence = confidence
+        return chosen_bbox
 
-            dist = np.linalg.norm(np.array(current_box[:2]) - np.array(last_box[:2]))
+    @traced()
+    def finalize_tracks(self):
+        """
+        Remove outlier detections, interpolate the short gaps of the ball track and
+        smooth it if enabled.
 
-            if dist <= max_distance:
-                valid_bboxes[idx] = current_box
-                last_good_frame_index = idx
+        The final track is moved into a TrackStore, and the ball's bbox_per_frame becomes
+        a read-only view of it.
 
-        self.ball.bbox_per_frame = valid_bboxes
+        Returns:
+            Ball: The ball object with its cleaned per-frame bounding boxes.
+        """
+        if not self.ball.bbox_per_frame:
+            return self.ball
+        frame_nums, bboxes = self.get_track_arrays()
+        frame_nums, bboxes = self.trajectory.clean(frame_nums, bboxes)
 
-    def interpolate_ball_positions(self):
-        bbox_per_frame = self.ball.bbox_per_frame
-        max_frame = max(bbox_per_frame.keys())
+        self.store = TrackStore.from_arrays(frame_nums,
+                                            np.full(len(frame_nums), self.ball.ball_id),
+                                            np.zeros(len(frame_nums)),
+                                            bboxes)
+        self.ball.bbox_per_frame = TrackBBoxView(self.store, self.ball.ball_id)
+        self.ball.smoothed = self.trajectory.smoothing
+        return self.ball
 
-        df = pd.DataFrame(index=range(max_frame + 1), columns=['x1', 'y1', 'x2', 'y2'])
+    def get_track_arrays(self):
+        """
+        Get the ball detections as arrays.
 
-        for frame_idx, bbox in bbox_per_frame.items():
-            df.loc[frame_idx] = bbox
+        Returns:
+            tuple: (frames, bboxes) arrays, in detection order.
+        """
+        bbox_per_frame = self.ball.bbox_per_frame
+        frame_nums = np.fromiter(bbox_per_frame.keys(), dtype=np.int64, count=len(bbox_per_frame))
+        bboxes = np.array(list(bbox_per_frame.values()), dtype=np.float64).reshape(-1, 4)
+        order = np.argsort(frame_nums, kind="stable")
+        return frame_nums[order], bboxes[order]
 
-        df = df.astype(float).interpolate().bfill()
+    def remove_wrong_detections(self):
+        """
+        Drop the ball detections that jump away from the neighbouring ones.
+        """
+        frame_nums, bboxes = self.get_track_arrays()
+        kept = reject_spikes(frame_nums, bboxes, self.trajectory.max_speed)
+        self.ball.bbox_per_frame = dict(zip(frame_nums[kept].tolist(), bboxes[kept].tolist()))
 
-        # Update ball object
-        interpolated_bboxes = df.to_dict('index')
-        self.ball.bbox_per_frame = {idx: list(bbox.values()) for idx, bbox in interpolated_bboxes.items()}
+    def interpolate_ball_positions(self):
+        """
+        Fill the gaps of the ball track up to the trajectory's maximum gap length.
+        """
+        frame_nums, bboxes = self.get_track_arrays()
+        frame_nums, bboxes, _ = interpolate_gaps(frame_nums, bboxes, self.trajectory.max_gap)
+        self.ball.bbox_per_frame = dict(zip(frame_nums.tolist(), bboxes.tolist()))
@@ -0,0 +1,181 @@
+"""
+Ball trajectory cleaning: spike rejection, bounded gap interpolation and optional
+constant-velocity Kalman / Rauch-Tung-Striebel smoothing.
+
+The track is held as a sorted array of frames and an (N, 4) array of bboxes, and every
+step works on whole arrays instead of per-frame dicts.
+"""
+
+import numpy as np
+
+
+def get_centers(bboxes):
+    return (bboxes[:, :2] + bboxes[:, 2:]) / 2
+
+
+def reject_spikes(frames, bboxes, max_speed, window=7):
+    """
+    Find the detections that jump away from the ball's neighbouring positions.
+
+    Each detection is compared with the median center of the `window` detections around
+    it. The ball cannot be further from that median than max_speed times the frames
+    separating it from the furthest detection of the window, so detections beyond that
+    are false positives. Up to window // 2 consecutive spikes are caught.
+
+    Args:
+        frames (numpy.ndarray): Sorted frame of each detection.
+        bboxes (numpy.ndarray): (N, 4) bounding boxes.
+        max_speed (float): Largest ball movement in pixels per frame.
+        window (int): Detections in the median window.
+
+    Returns:
+        numpy.ndarray: Boolean mask of the detections kept.
+    """
+    count = len(frames)
+    if count < 3:
+        return np.ones(count, dtype=bool)
+    window = min(window, count)
+    # Windows are centered on each detection, and shifted inwards at both ends
+    starts = np.clip(np.arange(count) - window // 2, 0, count - window)
+    neighbours = starts[:, None] + np.arange(window)
+
+    centers = get_centers(bboxes)
+    medians = np.median(centers[neighbours], axis=1)
+    reach = np.maximum(frames[neighbours[:, -1]] - frames, frames - frames[neighbours[:, 0]])
+    allowed = max_speed * np.maximum(reach, 1)
+    return np.hypot(*(centers - medians).T) <= allowed
+
+
+def interpolate_gaps(frames, bboxes, max_gap=None):
+    """
+    Linearly fill the frames missing between detections.
+
+    Args:
+        frames (numpy.ndarray): Sorted frame of each detection.
+        bboxes (numpy.ndarray): (N, 4) bounding boxes.
+        max_gap (int, optional): Longest run of missing frames that is filled. Longer gaps,
+            like dead-ball stretches, stay empty. None fills every gap.
+
+    Returns:
+        tuple: (frames, bboxes, observed) of the track from its first to its last detection,
+            where observed marks the frames that were detected rather than interpolated.
+    """
+    if len(frames) == 0:
+        return frames, bboxes, np.zeros(0, dtype=bool)
+    all_frames = np.arange(frames[0], frames[-1] + 1)
+    right = np.searchsorted(frames, all_frames)
+    observed = frames[right] == all_frames
+    left = np.where(observed, right, right - 1)
+    gap = frames[right] - frames[left]
+
+    if max_gap is None:
+        keep = np.ones(len(all_frames), dtype=bool)
+    else:
+        keep = observed | (gap - 1 <= max_gap)
+    all_frames, left, right, gap, observed = (all_frames[keep], left[keep], right[keep], gap[keep],
+                                              observed[keep])
+
+    weight = np.where(observed, 0.0, (all_frames - frames[left]) / np.maximum(gap, 1))
+    filled = bboxes[left] + (bboxes[right] - bboxes[left]) * weight[:, None]
+    return all_frames, filled, observed
+
+
+def rts_smooth(values, observed, process_noise, measurement_noise):
+    """
+    Constant-velocity Kalman filter followed by a Rauch-Tung-Striebel backward pass.
+
+    All columns share the same motion model and observation pattern, so they share one
+    2x2 covariance recursion and are filtered together.
+
+    Args:
+        values (numpy.ndarray): (T, D) values of consecutive frames.
+        observed (numpy.ndarray): (T,) mask of the rows that are measurements; the other
+            rows are only predicted.
+        process_noise (float): Variance of the acceleration, in pixels² per frame⁴.
+        measurement_noise (float): Variance of a detection, in pixels².
+
+    Returns:
+        numpy.ndarray: (T, D) smoothed values.
+    """
+    count, dims = values.shape
+    transition = np.array([[1.0, 1.0], [0.0, 1.0]])
+    noise = process_noise * np.array([[0.25, 0.5], [0.5, 1.0]])
+
+    predicted_states = np.empty((count, 2, dims))
+    predicted_covs = np.empty((count, 2, 2))
+    filtered_states = np.empty((count, 2, dims))
+    filtered_covs = np.empty((count, 2, 2))
+
+    state = np.stack([values[0], np.zeros(dims)])
+    cov = np.diag([measurement_noise, 1e4])
+    for t in range(count):
+        if t:
+            state = transition @ state
+            cov = transition @ cov @ transition.T + noise
+        predicted_states[t], predicted_covs[t] = state, cov
+        if observed[t]:
+            gain = cov[:, 0] / (cov[0, 0] + measurement_noise)
+            state = state + np.outer(gain, values[t] - state[0])
+            cov = cov - np.outer(gain, cov[0])
+        filtered_states[t], filtered_covs[t] = state, cov
+
+    smoothed = filtered_states.copy()
+    for t in range(count - 2, -1, -1):
+        gain = filtered_covs[t] @ transition.T @ np.linalg.inv(predicted_covs[t + 1])
+        smoothed[t] = filtered_states[t] + gain @ (smoothed[t + 1] - predicted_states[t + 1])
+    return smoothed[:, 0]
+
+
+class BallTrajectory:
+    """
+    Turns the raw per-frame ball detections into a clean trajectory.
+
+    Attributes:
+        max_speed (float): Largest ball movement in pixels per frame, for spike rejection.
+        max_gap (int): Longest run of missing frames that is interpolated, None for any.
+        smoothing (bool): Whether to run the Kalman / RTS smoother.
+        process_noise (float): Acceleration variance of the smoother.
+        measurement_noise (float): Detection variance of the smoother.
+    """
+    def __init__(self, max_speed=25, max_gap=None, smoothing=False, process_noise=1.0,
+                 measurement_noise=16.0):
+        self.max_speed = max_speed
+        self.max_gap = max_gap
+        self.smoothing = smoothing
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+
+    def smooth(self, frames, bboxes, observed):
+        """
+        Smooth every run of consecutive frames on its own, so no velocity is carried
+        across the gaps left empty.
+        """
+        smoothed = bboxes.copy()
+        breaks = np.flatnonzero(np.diff(frames) > 1) + 1
+        for run in np.split(np.arange(len(frames)), breaks):
+            if observed[run].sum() >= 2:
+                smoothed[run] = rts_smooth(bboxes[run], observed[run], self.process_noise,
+                                           self.measurement_noise)
+        return smoothed
+
+    def clean(self, frames, bboxes):
+        """
+        Reject spikes, fill short gaps and optionally smooth the track.
+
+        Args:
+            frames (array-like): Frame of each detection.
+            bboxes (array-like): (N, 4) bounding boxes.
+
+        Returns:
+            tuple: (frames, bboxes) arrays of the cleaned track, sorted by frame.
+        """
+        frames = np.asarray(frames, dtype=np.int64)
+        bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        order = np.argsort(frames, kind="stable")
+        frames, bboxes = frames[order], bboxes[order]
+
+        kept = reject_spikes(frames, bboxes, self.max_speed)
+        frames, bboxes, observed = interpolate_gaps(frames[kept], bboxes[kept], self.max_gap)
+        if self.smoothing:
+            bboxes = self.smooth(frames, bboxes, observed)
+        return frames, bboxes
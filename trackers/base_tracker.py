@@ -1,39 +1,84 @@
-from ultralytics import YOLO
-import supervision as sv
-import os, pickle
-from utils import read_stub, save_stub
+from model_registry import get_model_registry, convert_results, pack_detections, unpack_detections
+from instrumentation import traced
 
 class BaseTracker:
-    def __init__(self, model_path, target_class_name):
-        self.model = YOLO(model_path)
-        self.tracker = getattr(sv, "ByteTrack", None)()  # Only used by PlayerTracker
+    def __init__(self, model_path, target_class_name, cache=None):
+        self.model_path = model_path
+        self._model = None  # Loaded on the first cache miss
         self.target_class_name = target_class_name
         self.read_from_stub = False
-        class_name = self.__class__.__name__.replace("Tracker", "").lower()
-        self.cache_path = f"cache/{class_name}_detections.pkl"
+        self.conf = 0.5
+        self.cache = cache  # VideoDetectionCache of the video being processed, or None
 
-    def detect_frames(self, frames, batch_size=20):
-        if os.path.exists(self.cache_path):
-            with open(self.cache_path, "rb") as f:
-                print(f"Loading cached detections from {self.cache_path}")
-                return pickle.load(f)
+    @property
+    def model(self):
+        """
+        The YOLO detector, built on first use so runs served from the detection cache never load it.
+        Detectors with the same weights share one model.
+        """
+        if self._model is None:
+            self._model = get_model_registry().get_model(self.model_path)
+        return self._model
 
+    @traced(frames_arg="frames")
+    def predict_frames(self, frames, batch_size=20):
         detections = []
         for i in range(0, len(frames), batch_size):
-            detections_batch = self.model.predict(frames[i:i + batch_size], conf=0.5)
-            detections += detections_batch
+            detections_batch = self.model.predict(frames[i:i + batch_size], conf=self.conf)
+            detections += convert_results(detections_batch)
+        return detections
+
+    def get_cache_params(self, num_frames, frame_offset=0):
+        # The cache key covers the video, the weights and these parameters
+        return {"conf": self.conf, "frame_offset": frame_offset, "num_frames": num_frames}
+
+    def load_cached_detections(self, num_frames, frame_offset=0):
+        if self.cache is None:
+            return None
+        detections = unpack_detections(self.cache.load(self.model_path, self.get_cache_params(num_frames, frame_offset)))
+        if detections is not None:
+            print(f"Loading cached detections for {self.model_path}")
+        return detections
 
-        # Save detections for future use
-        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
-        with open(self.cache_path, "wb") as f:
-            pickle.dump(detections, f)
+    def store_detections(self, detections, frame_offset=0):
+        if self.cache is not None:
+            self.cache.store(self.model_path, self.get_cache_params(len(detections), frame_offset),
+                             pack_detections(detections))
 
+    @traced(frames_arg="frames")
+    def detect_frames(self, frames, batch_size=20, frame_offset=0):
+        detections = self.load_cached_detections(len(frames), frame_offset)
+        if detections is None:
+            detections = self.predict_frames(frames, batch_size)
+            # Save detections for future use
+            self.store_detections(detections, frame_offset)
         return detections
 
-    def track_objects(self, detections, frames):
+    def track_objects(self, detections, frames, frame_offset=0):
         raise NotImplementedError("Must be implemented in subclass")
 
-    def get_tracks(self, frames):
-        detections = self.detect_frames(frames)
+    def get_tracks(self, frames, detections=None):
+        if detections is None:
+            detections = self.detect_frames(frames)
         tracks = self.track_objects(detections, frames)
         return tracks
+
+    def update_tracks(self, frames, frame_offset=0, detections=None):
+        """
+        Run detection on one window of frames and add the results to the tracks.
+
+        Tracking state is kept on the tracker instance, so consecutive windows of the
+        same video continue the same tracks.
+
+        Args:
+            frames (list): Frames of the current window.
+            frame_offset (int): Index of the first frame of the window in the whole video.
+            detections (list, optional): Precomputed detections of the window, for instance
+                from the InferenceScheduler. Detection runs here when omitted.
+
+        Returns:
+            The tracks accumulated so far, as returned by track_objects.
+        """
+        if detections is None:
+            detections = self.detect_frames(frames, frame_offset=frame_offset)
+        return self.track_objects(detections, frames, frame_offset)
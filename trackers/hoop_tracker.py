@@ -1,22 +1,26 @@
 from trackers.base_tracker import BaseTracker
-import supervision as sv
 
 from core.hoop import Hoop
+from instrumentation import traced
+from model_registry import get_supervision_detections
 
 class HoopTracker(BaseTracker):
-    def __init__(self, model_path):
-        super().__init__(model_path, "Hoop")
+    def __init__(self, model_path, cache=None):
+        super().__init__(model_path, "Hoop", cache)
+        self.left_hoop = Hoop(label="left")
+        self.right_hoop = Hoop(label="right")
 
-    def track_objects(self, detections, frames):
+    @traced(frames_arg="detections")
+    def track_objects(self, detections, frames, frame_offset=0):
         frame_width = frames[0].shape[1]
         midpoint_x = frame_width // 2
 
-        left_hoop = Hoop(label="left")
-        right_hoop = Hoop(label="right")
+        left_hoop = self.left_hoop
+        right_hoop = self.right_hoop
 
-        for frame_idx, detection in enumerate(detections):
+        for frame_idx, detection in enumerate(detections, start=frame_offset):
             cls_names_inv = {v: k for k, v in detection.names.items()}
-            detection_supervision = sv.Detections.from_ultralytics(detection)
+            detection_supervision = get_supervision_detections(detection)
 
             left_best = None  # (bbox, confidence)
             right_best = None
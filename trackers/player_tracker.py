@@ -1,65 +1,46 @@
-from ultralytics import YOLO
-import supervision as sv
+import numpy as np
 import sys
 from core.player import Player
-import os
-import pickle
+from core.track_store import PlayerRoster, TrackBBoxView
 
 
 sys.path.append('../')
-from utils import read_stub, save_stub
+from utils import read_stub
+from model_registry import get_supervision_detections
+from instrumentation import traced
+from object_trackers import build_tracker
+from configs import PLAYER_TRACKER
+from trackers.base_tracker import BaseTracker
 
 
-class PlayerTracker:
+class PlayerTracker(BaseTracker):
     """
-    A class that handles player detection and tracking using YOLO and ByteTrack.
+    A class that handles player detection and tracking using YOLO and a multi-object tracker.
 
-    This class combines YOLO object detection with ByteTrack tracking to maintain consistent
-    player identities across frames while processing detections in batches.
+    This class combines YOLO object detection with a tracker (ByteTrack by default) to maintain
+    consistent player identities across frames while processing detections in batches.
+    Detection and the detection cache are handled by BaseTracker.
     """
 
-    def __init__(self, model_path):
+    def __init__(self, model_path, cache=None, tracker_type=PLAYER_TRACKER, embedder=None):
         """
-        Initialize the PlayerTracker with YOLO model and ByteTrack tracker.
+        Initialize the PlayerTracker with its multi-object tracker. The YOLO model is only
+        loaded when detections have to be computed.
 
         Args:
             model_path (str): Path to the YOLO model weights.
+            cache (VideoDetectionCache, optional): Detection cache of the video being processed.
+            tracker_type (str): "bytetrack", "deepsort" or "iou_kalman", see build_tracker.
+            embedder (AppearanceEmbedder, optional): Embedding service shared with the team
+                assigner, for the trackers with appearance features.
         """
-        self.model = YOLO(model_path)
-        self.tracker = sv.ByteTrack()
-        self.read_from_stub = False
+        super().__init__(model_path, "Player", cache)
+        self.tracker = build_tracker(tracker_type, embedder)
         self.stub_path = None
+        self.players = PlayerRoster()  # track_id → Player, accumulated by update_player_objects
+        self.last_frame_num = None  # last frame tracked by update_player_objects
 
-    def detect_frames(self, frames, cache_path="cache/yolo_detections.pkl"):
-        """
-        Detect players in a sequence of frames using batch processing.
-
-        Args:
-            frames (list): List of video frames to process.
-
-        Returns:
-            list: YOLO detection results for each frame.
-        """
-        batch_size = 20
-        detections = []
-        if os.path.exists(cache_path):
-            with open(cache_path, "rb") as f:
-                print(f"Loading cached detections from {cache_path}")
-                return pickle.load(f)
-
-
-        # Detecting frames in batches is faster
-        for i in range(0, len(frames), batch_size):
-            detections_batch = self.model.predict(frames[i:i + batch_size], conf=0.5)
-            detections += detections_batch
-
-        # Save to cache
-        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
-        with open(cache_path, "wb") as f:
-            pickle.dump(detections, f)
-        return detections
-
-    def get_player_objects(self, frames) -> dict:
+    def get_player_objects(self, frames, detections=None) -> dict:
         """
         Get player tracking results for a sequence of frames with optional caching.
         Returns:
@@ -71,27 +52,98 @@ class PlayerTracker:
             if len(tracks) == len(frames):
                 return tracks
 
-        detections = self.detect_frames(frames)
+        if detections is None:
+            detections = self.detect_frames(frames)
 
-        players = {}  # track_id → Player
+        players = PlayerRoster()  # track_id → Player, boxes in players.store
+        return self.track_detections(detections, players, frames=frames)
+
+    def update_player_objects(self, frames, frame_offset=0, detections=None) -> dict:
+        """
+        Detect and track players in one window of frames of a longer video.
+
+        Tracker state and the accumulated players live on the tracker instance, so
+        consecutive windows continue the same track ids.
+
+        Args:
+            frames (list): Frames of the current window.
+            frame_offset (int): Index of the first frame of the window in the whole video.
+            detections (list, optional): Precomputed detections of the window, for instance
+                from the InferenceScheduler. Detection runs here when omitted.
+
+        Returns:
+            dict: All players seen so far, keyed by track id.
+        """
+        if detections is None:
+            detections = self.detect_frames(frames, frame_offset=frame_offset)
+        players = self.track_detections(detections, self.players, frame_offset, frames)
+        if len(detections):
+            self.last_frame_num = frame_offset + len(detections) - 1
+        return players
+
+    @traced(frames_arg="detections")
+    def track_detections(self, detections, players, frame_offset=0, frames=None) -> dict:
+        """
+        Feed per-frame detections through the tracker and record player bounding boxes.
 
-        for frame_num, detection in enumerate(detections):
+        Boxes are appended to the roster's TrackStore. Each Player's bboxs_per_frame is a
+        view of its rows in that store.
+
+        Args:
+            detections (list): YOLO detection results, one per frame.
+            players (PlayerRoster): Players to update, keyed by track id.
+            frame_offset (int): Frame index of the first detection.
+            frames (list, optional): Frames of the detections, needed by the trackers that
+                use appearance features.
+
+        Returns:
+            PlayerRoster: The updated players.
+        """
+        store = players.store
+        for index, detection in enumerate(detections):
+            frame_num = frame_offset + index
             cls_names = detection.names
             cls_names_inv = {v: k for k, v in cls_names.items()}
 
             # Covert to supervision Detection format
-            detection_supervision = sv.Detections.from_ultralytics(detection)
+            detection_supervision = get_supervision_detections(detection)
 
-            detection_with_tracks = self.tracker.update_with_detections(detection_supervision)
+            frame = frames[index] if frames and self.tracker.needs_frames else None
+            detection_with_tracks = self.tracker.update(detection_supervision, frame, frame_num)
 
             for det in detection_with_tracks:
-                bbox = det[0].tolist()
+                bbox = det[0]
                 cls_id = det[3]
                 track_id = det[4]
 
                 if cls_id == cls_names_inv['Player']:
                     if track_id not in players:
                         players[track_id] = Player(track_id, track_id)
-                    players[track_id].bboxs_per_frame[frame_num] = bbox
+                        players[track_id].bboxs_per_frame = TrackBBoxView(store, track_id)
+                    store.append(frame_num, track_id, cls_id, bbox)
+
+        return players
+
+    def hold_tracks(self, frame_num):
+        """
+        Repeat the players of the last tracked frame on a frame that was not detected.
+
+        The last tracked frame is the last one update_player_objects processed, even if
+        no player was found on it: its players, possibly none, are repeated.
 
-        return players
\ No newline at end of file
+        Used by the live mode when it skips detection to keep up with the stream: the
+        overlays and analytics still see every player, at their last known position.
+
+        Args:
+            frame_num (int): The skipped frame, after every frame tracked so far.
+
+        Returns:
+            dict: All players seen so far, keyed by track id.
+        """
+        store = self.players.store
+        if self.last_frame_num is None:
+            return self.players
+        rows = store.frame_rows(self.last_frame_num)
+        store.extend(np.full(rows.stop - rows.start, frame_num), store.track_ids[rows].copy(),
+                     store.class_ids[rows].copy(), store.bboxes[rows].copy())
+        return self.players
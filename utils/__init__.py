@@ -1,3 +1,8 @@
-from .video_utils import read_video, save_video
+from .video_utils import read_video, read_video_chunks, get_video_properties
+from .frame_store import FrameStore
+from .video_writer import BackgroundVideoWriter
+from .video_reader import PrefetchingVideoReader, SeekIndex
+from .live_capture import LiveCapture
 from .bbox_utils import get_center_of_bbox, get_bbox_width, measure_distance,measure_xy_distance,get_foot_position
-from .stubs_utils import save_stub,read_stub
\ No newline at end of file
+from .stubs_utils import save_stub,read_stub
+from .model_loader import load_yolo_model
\ No newline at end of file
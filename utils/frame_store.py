@@ -0,0 +1,176 @@
+"""
+A module for sharing decoded frames between processes through a memory-mapped file.
+
+A list of frames is private to its process: handing it to a worker pickles every frame.
+FrameStore decodes a video once into a raw file of uint8 frames behind a small header
+(count, shape, fps) and maps it. Indexing returns views of the mapping, and a pickled
+store only carries the path of the file, so a worker process maps the same pages
+instead of receiving copies. The store reads like the list returned by read_video, and
+the process that created it deletes the file when it is closed or garbage collected.
+"""
+
+import os
+import struct
+import tempfile
+import weakref
+from collections.abc import Sequence
+
+import numpy as np
+
+from .video_utils import open_video_reader, get_video_properties
+from configs import FRAME_STORE_DIR
+
+MAGIC = b"FRAMES01"
+HEADER = struct.Struct("<8sQIIId")  # magic, count, height, width, channels, fps
+HEADER_SIZE = 4096  # the frames start on a page boundary
+
+
+def read_header(path):
+    """
+    Read the header of a frame store file.
+
+    Args:
+        path (str): Path to the file.
+
+    Returns:
+        tuple: (count, (height, width, channels), fps).
+
+    Raises:
+        ValueError: If the file is not a frame store.
+    """
+    with open(path, "rb") as f:
+        data = f.read(HEADER.size)
+    if len(data) < HEADER.size or data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a frame store")
+    _, count, height, width, channels, fps = HEADER.unpack(data)
+    return count, (height, width, channels), fps
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class FrameStore(Sequence):
+    """
+    Frames of a video in a memory-mapped file, indexed like a list of numpy arrays.
+
+    The mapping is read-only, so its pages stay shared with the file and can be dropped
+    by the OS under memory pressure. Frames are drawn on copies: writing to them raises.
+
+    Attributes:
+        path (str): Path of the file.
+        fps (float): Frame rate of the video.
+        frame_shape (tuple): (height, width, channels) of every frame.
+        owner (bool): Whether this store created the file and deletes it.
+    """
+    def __init__(self, path, owner=False):
+        """
+        Map an existing frame store file.
+
+        Args:
+            path (str): Path to the file.
+            owner (bool): Delete the file when the store is closed or garbage collected.
+        """
+        count, self.frame_shape, self.fps = read_header(path)
+        self.path = path
+        self.owner = owner
+        if count:
+            self.frames = np.memmap(path, dtype=np.uint8, mode="r", offset=HEADER_SIZE,
+                                    shape=(count,) + self.frame_shape).view(np.ndarray)
+        else:
+            self.frames = np.empty((0,) + self.frame_shape, dtype=np.uint8)
+        # Only the path is captured, so the file goes with the store even if close is never called
+        self._finalizer = weakref.finalize(self, remove_file, path) if owner else None
+
+    @classmethod
+    def create(cls, frames, fps, directory=FRAME_STORE_DIR):
+        """
+        Write frames into a new store file, one at a time.
+
+        Args:
+            frames (iterable): BGR frames of one shape, for instance a video reader.
+            fps (float): Frame rate stored in the header.
+            directory (str): Folder of the file.
+
+        Returns:
+            FrameStore: The store, owning the file.
+
+        Raises:
+            ValueError: If the frames do not all have the same shape.
+        """
+        os.makedirs(directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=directory, suffix=".frames")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(bytes(HEADER_SIZE))
+                count = 0
+                frame_shape = (0, 0, 3)
+                for frame in frames:
+                    if count == 0:
+                        frame_shape = frame.shape
+                    elif frame.shape != frame_shape:
+                        raise ValueError(f"Frame {count} has shape {frame.shape}, expected {frame_shape}")
+                    f.write(np.ascontiguousarray(frame, dtype=np.uint8).data)
+                    count += 1
+                f.seek(0)
+                f.write(HEADER.pack(MAGIC, count, *frame_shape, fps))
+        except BaseException:
+            remove_file(path)
+            raise
+        return cls(path, owner=True)
+
+    @classmethod
+    def from_video(cls, video_path, start_frame=0, end_frame=None, directory=FRAME_STORE_DIR):
+        """
+        Decode a video, or a range of it, into a new store: the replacement of read_video.
+
+        Args:
+            video_path (str): Path to the input video file.
+            start_frame (int): First frame to read.
+            end_frame (int, optional): Frame at which reading stops (exclusive), None for the end.
+            directory (str): Folder of the file.
+
+        Returns:
+            FrameStore: The store, owning the file.
+        """
+        fps = get_video_properties(video_path)["fps"]
+        return cls.create(open_video_reader(video_path, start_frame, end_frame), fps, directory)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            # Slices of a list are lists
+            return list(self.frames[index])
+        return self.frames[index]
+
+    def __iter__(self):
+        return iter(self.frames)
+
+    def __getstate__(self):
+        # Workers map the file themselves, the frames are never pickled
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    def close(self):
+        """
+        Unmap the frames, and delete the file if this store owns it.
+
+        Processes that already mapped the file keep their frames until they close their
+        own store, the file is only unlinked.
+        """
+        self.frames = np.empty((0,) + self.frame_shape, dtype=np.uint8)
+        if self._finalizer is not None:
+            self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,134 @@
+"""
+A module for reading frames from a live source as they are produced.
+
+The source can be a camera index, a network stream such as RTSP, or a local video file
+replayed at its native frame rate as a stand-in for a camera. Frames are read on a
+background thread and stamped with their capture time, so the consumer can measure how
+far behind the live edge it is.
+"""
+
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+
+class LiveCapture:
+    """
+    Captures frames from a live source on a background thread.
+
+    Every captured frame is kept: a live source cannot be paused, so frames queue up
+    while the consumer is busy and it is up to the consumer to catch up.
+
+    Attributes:
+        source (str or int): Camera index, stream URL or video file path.
+        realtime (bool): Whether frames are released at the source frame rate. Files are
+            replayed in real time by default, cameras and streams are paced by themselves.
+        fps (float): Frame rate of the source.
+        frame_size (tuple): (width, height) of the frames.
+    """
+    def __init__(self, source, realtime=None, default_fps=30):
+        """
+        Args:
+            source (str or int): Camera index, stream URL or video file path. A string of
+                digits is taken as a camera index.
+            realtime (bool, optional): Release frames at the source frame rate. Defaults to
+                True for files and False for other sources.
+            default_fps (float): Frame rate used when the source does not report one.
+        """
+        if isinstance(source, str) and source.isdigit():
+            source = int(source)
+        self.source = source
+        is_file = isinstance(source, str) and os.path.isfile(source)
+        self.realtime = is_file if realtime is None else realtime
+
+        self.cap = cv2.VideoCapture(source)
+        if not self.cap.isOpened():
+            raise IOError(f"Cannot open capture source {source}")
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if fps and fps > 0 else default_fps
+        self.frame_size = (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                           int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+        self.buffer = queue.Queue()
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.finished = False
+
+    def _capture_frames(self):
+        try:
+            start = time.perf_counter()
+            frame_num = 0
+            while not self.stop_event.is_set():
+                if self.realtime:
+                    # Release each frame of a file no earlier than a camera would
+                    delay = start + frame_num / self.fps - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+                self.buffer.put((frame_num, time.perf_counter(), frame))
+                frame_num += 1
+        except Exception as e:
+            self.buffer.put(e)
+        finally:
+            self.cap.release()
+            self.buffer.put(None)
+
+    def start(self):
+        """
+        Start the capture thread.
+        """
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._capture_frames, name="live-capture", daemon=True)
+            self.thread.start()
+        return self
+
+    def backlog(self):
+        """
+        Number of captured frames waiting to be read.
+        """
+        return self.buffer.qsize()
+
+    def read_batch(self, max_frames):
+        """
+        Wait for the next frame, then take the frames already waiting, up to max_frames.
+
+        Args:
+            max_frames (int): Largest number of frames returned.
+
+        Returns:
+            list: (frame_num, capture_time, frame) tuples in capture order, empty once the
+                source has ended.
+        """
+        self.start()
+        batch = []
+        while len(batch) < max_frames and not self.finished:
+            try:
+                item = self.buffer.get() if not batch else self.buffer.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self.finished = True
+                break
+            if isinstance(item, Exception):
+                raise item
+            batch.append(item)
+        return batch
+
+    def close(self):
+        """
+        Stop the capture thread and release the source.
+        """
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
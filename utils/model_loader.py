@@ -0,0 +1,63 @@
+"""
+A module for building the YOLO models with PyTorch, only once inference needs them.
+
+Importing ultralytics and torch and reading the weights takes seconds, so the detectors
+keep the path of their weights and build their model on the first cache miss. Runs
+whose detections are all cached never build a model. This is also the fallback of the
+ONNX Runtime backend, and what it exports from.
+"""
+
+_safe_globals_registered = False
+
+
+def register_safe_globals():
+    """
+    Allow the module classes of the YOLO checkpoints to be unpickled by torch.load,
+    which only loads allow-listed classes by default since torch 2.6.
+    """
+    global _safe_globals_registered
+    if _safe_globals_registered:
+        return
+    import torch.serialization
+    from torch.nn.modules.container import Sequential, ModuleList
+    from torch.nn.modules.conv import Conv2d
+    from torch.nn.modules.batchnorm import BatchNorm2d
+    from torch.nn.modules.activation import SiLU
+    from torch.nn.modules.pooling import MaxPool2d
+    from torch.nn.modules.upsampling import Upsample
+    from ultralytics.nn.modules import Conv, C2f, Bottleneck, SPPF, Concat, Detect, DFL
+    from ultralytics.nn.tasks import DetectionModel
+
+    torch.serialization.add_safe_globals([
+        DetectionModel,
+        Sequential,
+        Upsample,
+        Concat,
+        Conv,
+        Conv2d,
+        BatchNorm2d,
+        Detect,
+        SiLU,
+        C2f,
+        DFL,
+        ModuleList,
+        MaxPool2d,
+        Bottleneck,
+        SPPF
+    ])
+    _safe_globals_registered = True
+
+
+def load_yolo_model(model_path):
+    """
+    Build a YOLO model, importing ultralytics on first use.
+
+    Args:
+        model_path (str): Path to the model weights.
+
+    Returns:
+        YOLO: The loaded model.
+    """
+    from ultralytics import YOLO
+    register_safe_globals()
+    return YOLO(model_path)
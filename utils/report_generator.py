@@ -3,7 +3,7 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
 
 # TODO a team should have x players each so this function should one be taking a teams argumment
-def generate_game_summary_pdf(filename, teams, players):
+def generate_game_summary_pdf(filename, teams, players, stats_timeline=None):
     """
     Generates a PDF summary of the game stats.
 
@@ -11,6 +11,8 @@ def generate_game_summary_pdf(filename, teams, players):
         filename (str): Output PDF filename.
         teams (list): List of team objects with `name` and `score`.
         players (dict): Dictionary of player_id -> player object.
+        stats_timeline (StatsTimeline, optional): Running team statistics; its final
+            ball control, pass and interception totals are added to the team stats.
     """
     c = canvas.Canvas(filename, pagesize=A4)
     width, height = A4
@@ -32,11 +34,14 @@ def generate_game_summary_pdf(filename, teams, players):
 
     # --- Team Stats ---
     draw_text("Team Stats", font_size=16, bold=True)
-    for team in teams:
+    team_totals = stats_timeline.get_team_totals() if stats_timeline is not None else [{}] * len(teams)
+    for team, totals in zip(teams, team_totals):
         draw_text(f"{team.name}", font_size=14, bold=True)
         if hasattr(team, "stats"):
             for k, v in team.stats.items():
                 draw_text(f"  {k.replace('_', ' ').title()}: {v}")
+        for k, v in totals.items():
+            draw_text(f"  {k.replace('_', ' ').title()}: {v}")
     y -= 10
 
     # --- Player Stats ---
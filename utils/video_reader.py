@@ -0,0 +1,258 @@
+"""
+A module for decoding video frames ahead of their use on a background thread.
+
+The reader decodes into a bounded buffer while the caller processes earlier frames,
+and can start anywhere in the video. Seeking uses a keyframe index that is built once
+per video with ffprobe and stored on disk, so reprocessing the end of a long game does
+not decode everything before it.
+"""
+
+import hashlib
+import json
+import os
+import queue
+import shutil
+import subprocess
+import threading
+from bisect import bisect_right
+
+import cv2
+
+
+class SeekIndex:
+    """
+    Keyframe positions of a video, in presentation order frame numbers.
+
+    Attributes:
+        keyframes (list): Sorted frame numbers of the keyframes of the video.
+    """
+    def __init__(self, keyframes):
+        self.keyframes = sorted(keyframes)
+
+    def keyframe_before(self, frame_num):
+        """
+        Find the last keyframe at or before a frame.
+
+        Args:
+            frame_num (int): Target frame number.
+
+        Returns:
+            int: Frame number of the keyframe to seek to, 0 if none precedes the frame.
+        """
+        position = bisect_right(self.keyframes, frame_num)
+        if position == 0:
+            return 0
+        return self.keyframes[position - 1]
+
+    @staticmethod
+    def index_path(video_path, index_dir):
+        """
+        Path of the stored index of a video, keyed on its path, size and modification time.
+
+        Args:
+            video_path (str): Path to the video file.
+            index_dir (str): Folder holding the stored indexes.
+
+        Returns:
+            str: Path of the JSON index file.
+        """
+        stat = os.stat(video_path)
+        key = f"{os.path.abspath(video_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        return os.path.join(index_dir, hashlib.sha1(key.encode()).hexdigest() + ".json")
+
+    @classmethod
+    def build(cls, video_path):
+        """
+        Scan the packets of a video with ffprobe to find its keyframes, without decoding.
+
+        Args:
+            video_path (str): Path to the video file.
+
+        Returns:
+            SeekIndex: The index, or None if ffprobe is not installed or failed.
+        """
+        ffprobe_path = shutil.which("ffprobe")
+        if ffprobe_path is None:
+            return None
+
+        command = [
+            ffprobe_path, "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "packet=pts,flags", "-of", "csv=p=0",
+            video_path,
+        ]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            return None
+
+        packets = []
+        for line in result.stdout.splitlines():
+            fields = line.strip().split(",")
+            if len(fields) < 2 or fields[0] in ("", "N/A"):
+                continue
+            packets.append((int(fields[0]), "K" in fields[1]))
+
+        # Packets come in decode order, frame numbers follow presentation order
+        packets.sort(key=lambda packet: packet[0])
+        keyframes = [frame_num for frame_num, (_, is_keyframe) in enumerate(packets) if is_keyframe]
+        return cls(keyframes)
+
+    @classmethod
+    def load_or_build(cls, video_path, index_dir):
+        """
+        Load the stored index of a video, building and storing it on first use.
+
+        Args:
+            video_path (str): Path to the video file.
+            index_dir (str): Folder holding the stored indexes.
+
+        Returns:
+            SeekIndex: The index, or None if it cannot be built.
+        """
+        path = cls.index_path(video_path, index_dir)
+        if os.path.exists(path):
+            with open(path) as f:
+                return cls(json.load(f)["keyframes"])
+
+        seek_index = cls.build(video_path)
+        if seek_index is None:
+            print("ffprobe not available, seeking without a keyframe index")
+            return None
+
+        os.makedirs(index_dir, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"video_path": os.path.abspath(video_path), "keyframes": seek_index.keyframes}, f)
+        os.replace(tmp_path, path)
+        return seek_index
+
+
+class PrefetchingVideoReader:
+    """
+    Decodes a range of frames on a background thread into a bounded buffer.
+
+    Iterating over the reader yields the frames of [start_frame, end_frame) in order.
+    The decoder thread stays at most ``buffer_size`` frames ahead of the consumer.
+
+    Attributes:
+        video_path (str): Path to the input video file.
+        start_frame (int): First frame to decode.
+        end_frame (int): Frame at which decoding stops (exclusive), None for the end of the video.
+        buffer_size (int): Maximum number of decoded frames waiting to be consumed.
+    """
+    def __init__(self, video_path, start_frame=0, end_frame=None, buffer_size=64, seek_index=None):
+        """
+        Args:
+            video_path (str): Path to the input video file.
+            start_frame (int): First frame to decode.
+            end_frame (int, optional): Frame at which decoding stops (exclusive).
+            buffer_size (int): Maximum number of decoded frames waiting to be consumed.
+            seek_index (SeekIndex, optional): Keyframe index used to seek to start_frame.
+        """
+        if not os.path.isfile(video_path):
+            raise FileNotFoundError(video_path)
+        if start_frame < 0 or (end_frame is not None and end_frame < start_frame):
+            raise ValueError(f"Invalid frame range [{start_frame}, {end_frame})")
+
+        self.video_path = video_path
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.buffer_size = buffer_size
+        self.seek_index = seek_index
+        self.buffer = None
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def _seek(self, cap):
+        if self.start_frame == 0:
+            return
+        keyframe = self.seek_index.keyframe_before(self.start_frame) if self.seek_index else self.start_frame
+        cap.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+        # grab() skips the colour conversion of frames we do not keep
+        for _ in range(self.start_frame - keyframe):
+            if not cap.grab():
+                break
+
+    def _put(self, item):
+        while not self.stop_event.is_set():
+            try:
+                self.buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode_frames(self):
+        cap = cv2.VideoCapture(self.video_path)
+        try:
+            self._seek(cap)
+            frame_num = self.start_frame
+            while self.end_frame is None or frame_num < self.end_frame:
+                ret, frame = cap.read()
+                if not ret or not self._put(frame):
+                    break
+                frame_num += 1
+        except Exception as e:
+            self._put(e)
+        finally:
+            cap.release()
+            self._put(None)
+
+    def start(self):
+        """
+        Start the decoder thread. Called automatically when iteration begins.
+        """
+        if self.thread is None:
+            self.buffer = queue.Queue(maxsize=self.buffer_size)
+            self.thread = threading.Thread(target=self._decode_frames, name="video-decoder", daemon=True)
+            self.thread.start()
+        return self
+
+    def __iter__(self):
+        self.start()
+        try:
+            while True:
+                item = self.buffer.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self.close()
+
+    def read_chunks(self, chunk_size):
+        """
+        Yield the decoded frames in windows of at most chunk_size frames.
+
+        Args:
+            chunk_size (int): Maximum number of frames per window.
+
+        Yields:
+            tuple: (frame_offset, frames), frame_offset counting from start_frame.
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be a positive integer.")
+        frame_offset = 0
+        frames = []
+        for frame in self:
+            frames.append(frame)
+            if len(frames) == chunk_size:
+                yield frame_offset, frames
+                frame_offset += len(frames)
+                frames = []
+        if frames:
+            yield frame_offset, frames
+
+    def close(self):
+        """
+        Stop the decoder thread and release the video.
+        """
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
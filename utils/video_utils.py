@@ -1,67 +1,113 @@
 """
-A module for reading and writing video files.
+A module for reading video files.
 
-This module provides utility functions to load video frames into memory and save
-processed frames back to video files, with support for common video formats.
+This module provides utility functions to load video frames into memory, or a window
+at a time, with support for common video formats. Output videos are written by the
+BackgroundVideoWriter.
 """
 
 import cv2
 import os
+from .video_reader import PrefetchingVideoReader, SeekIndex
+from configs import DECODER_BUFFER_SIZE, SEEK_INDEX_DIR
 
-def read_video(video_path):
+def open_video_reader(video_path, start_frame=0, end_frame=None):
     """
-    Read all frames from a video file into memory.
+    Create a prefetching reader over a range of frames of a video.
+
+    When the range does not start at the first frame, the keyframe index of the video
+    is loaded (or built once and stored) so the reader can seek straight to it.
 
     Args:
         video_path (str): Path to the input video file.
+        start_frame (int): First frame to read.
+        end_frame (int, optional): Frame at which reading stops (exclusive), None for the end.
 
     Returns:
-        list: List of video frames as numpy arrays.
+        PrefetchingVideoReader: The reader. Iterate over it to get frames.
     """
     if not os.path.isfile(video_path):
         raise FileNotFoundError(video_path)
-    cap = cv2.VideoCapture(video_path)
-    frames = []
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        frames.append(frame)
-    return frames
-
-def save_video(ouput_video_frames,output_video_path):
+    seek_index = SeekIndex.load_or_build(video_path, SEEK_INDEX_DIR) if start_frame > 0 else None
+    return PrefetchingVideoReader(video_path, start_frame, end_frame,
+                                  buffer_size=DECODER_BUFFER_SIZE, seek_index=seek_index)
+
+def read_video(video_path, start_frame=0, end_frame=None):
     """
-    Save a sequence of frames as a video file.
+    Read all frames of a video file, or of a range of it, into memory.
 
-    Creates the necessary directories if they don't exist and writes frames using XVID codec.
+    Args:
+        video_path (str): Path to the input video file.
+        start_frame (int): First frame to read.
+        end_frame (int, optional): Frame at which reading stops (exclusive), None for the end.
+
+    Returns:
+        list: List of video frames as numpy arrays.
+    """
+    return list(open_video_reader(video_path, start_frame, end_frame))
+
+def read_video_chunks(video_path, chunk_size, start_frame=0, end_frame=None):
+    """
+    Read a video file, or a range of it, as a sequence of fixed-size frame windows.
+
+    Only one window is held in memory at a time, plus the frames the decoder thread has
+    already prefetched, so peak memory depends on ``chunk_size`` rather than on the
+    length of the video.
 
     Args:
-        ouput_video_frames (list): List of frames to save.
-        output_video_path (str): Path where the video should be saved.
+        video_path (str): Path to the input video file.
+        chunk_size (int): Maximum number of frames per window.
+        start_frame (int): First frame to read.
+        end_frame (int, optional): Frame at which reading stops (exclusive), None for the end.
+
+    Yields:
+        tuple: (frame_offset, frames) where frame_offset is the index of the first frame of
+            the window counted from start_frame and frames is a list of numpy arrays.
     """
-    if output_video_path is None:
-        print("No output video path provided.")
+    yield from open_video_reader(video_path, start_frame, end_frame).read_chunks(chunk_size)
 
-    # If folder doesn't exist, create it
-    if not os.path.exists(os.path.dirname(output_video_path)):
-        print("Creating folder for output video.")
-        os.makedirs(os.path.dirname(output_video_path))
+def get_video_properties(video_path, default_fps=24):
+    """
+    Read the frame rate, resolution and frame count from a video container.
 
-    fourcc = cv2.VideoWriter_fourcc(*'XVID')
-    out = cv2.VideoWriter(output_video_path, fourcc, 24, (ouput_video_frames[0].shape[1], ouput_video_frames[0].shape[0]))
-    for frame in ouput_video_frames:
-        out.write(frame)
-    out.release()
+    Args:
+        video_path (str): Path to the input video file.
+        default_fps (float): Frame rate used when the container does not report one.
 
+    Returns:
+        dict: Dictionary with the keys fps, width, height and frame_count.
+    """
+    if not os.path.isfile(video_path):
+        raise FileNotFoundError(video_path)
+    cap = cv2.VideoCapture(video_path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        return {
+            "fps": fps if fps and fps > 0 else default_fps,
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "frame_count": int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+        }
+    finally:
+        cap.release()
+
+
+def draw_shot_frame(frame, frame_idx, ball_object, baskets, possession_list, players):
+    """
+    Compositor layer wrapping check_for_shot: detects shots and draws the result, in place.
 
+    Args:
+        frame (numpy.ndarray): The frame to draw on.
+        frame_idx (int): The index of the frame in the video.
+        ball_object (Ball): The ball track, which also holds the shot display state.
+        baskets (tuple): The (left, right) Hoop objects.
+        possession_list (list): List of player IDs who had possession per frame.
+        players (dict): Dictionary mapping player_id to Player objects.
 
-def check_for_shots(video_frames, ball_object, baskets, possession_list, players):
-    output_video_frames = []
-    for frame_idx in range(len(video_frames)):
-        frame = video_frames[frame_idx]
-        frame = check_for_shot(ball_object, baskets, frame_idx, frame, possession_list, players)
-        output_video_frames.append(frame)
-    return  output_video_frames
+    Returns:
+        numpy.ndarray: The same frame with the shot result drawn on it, if any.
+    """
+    return check_for_shot(ball_object, baskets, frame_idx, frame, possession_list, players)
 
 
 def update_player_stats(possession_list, players, result, frame_idx):
@@ -0,0 +1,191 @@
+"""
+A module for encoding video frames on a background thread.
+
+Frames are handed to a bounded queue and encoded by a worker thread, so encoding
+overlaps with rendering. When an ``ffmpeg`` executable is available, raw frames are
+piped to it and encoded as H.264; otherwise the frames go through cv2.VideoWriter.
+"""
+
+import os
+import queue
+import shutil
+import subprocess
+import threading
+
+import cv2
+import numpy as np
+
+
+class FFmpegEncoder:
+    """
+    Encodes BGR frames to H.264 by piping raw video to an ffmpeg subprocess.
+
+    Attributes:
+        output_video_path (str): Path of the encoded video.
+        process (subprocess.Popen): The running ffmpeg process.
+    """
+    def __init__(self, output_video_path, fps, frame_size, crf=23, preset="veryfast", ffmpeg_path="ffmpeg"):
+        """
+        Start the ffmpeg process.
+
+        Args:
+            output_video_path (str): Path where the video should be saved.
+            fps (float): Frame rate of the output video.
+            frame_size (tuple): (width, height) of the frames that will be written.
+            crf (int): x264 constant rate factor, lower is better quality and larger files.
+            preset (str): x264 speed preset.
+            ffmpeg_path (str): Path to the ffmpeg executable.
+        """
+        self.output_video_path = output_video_path
+        width, height = frame_size
+        command = [
+            ffmpeg_path, "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24",
+            "-s", f"{width}x{height}", "-r", f"{fps}",
+            "-i", "-",
+            "-an",
+            # yuv420p needs even dimensions
+            "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+            "-c:v", "libx264", "-preset", preset, "-crf", str(crf),
+            "-pix_fmt", "yuv420p",
+            output_video_path,
+        ]
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def write(self, frame):
+        self.process.stdin.write(np.ascontiguousarray(frame).data)
+
+    def close(self):
+        _, stderr = self.process.communicate()
+        if self.process.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed to encode {self.output_video_path}: "
+                               f"{stderr.decode(errors='replace').strip()}")
+
+
+class OpenCVEncoder:
+    """
+    Encodes frames with cv2.VideoWriter, picking the codec from the file extension.
+
+    Attributes:
+        writer (cv2.VideoWriter): The underlying OpenCV writer.
+    """
+    def __init__(self, output_video_path, fps, frame_size):
+        """
+        Open the OpenCV writer.
+
+        Args:
+            output_video_path (str): Path where the video should be saved.
+            fps (float): Frame rate of the output video.
+            frame_size (tuple): (width, height) of the frames that will be written.
+        """
+        codec = 'XVID' if output_video_path.lower().endswith('.avi') else 'mp4v'
+        fourcc = cv2.VideoWriter_fourcc(*codec)
+        self.writer = cv2.VideoWriter(output_video_path, fourcc, fps, frame_size)
+
+    def write(self, frame):
+        self.writer.write(frame)
+
+    def close(self):
+        self.writer.release()
+
+
+class BackgroundVideoWriter:
+    """
+    Writes video frames through a bounded queue drained by an encoder thread.
+
+    ``write`` only blocks when the queue is full, so rendering and encoding run at the
+    same time while memory stays bounded by ``queue_size`` frames. Frames are queued by
+    reference and must not be modified after being written.
+
+    Attributes:
+        output_video_path (str): Path where the video is saved.
+        fps (float): Frame rate of the output video.
+        frame_size (tuple): (width, height) of the frames.
+        encoder_name (str): "ffmpeg" or "opencv", the backend in use.
+    """
+    def __init__(self, output_video_path, fps, frame_size, queue_size=32, crf=23, use_ffmpeg=True):
+        """
+        Create the output folder, start the encoder and its worker thread.
+
+        Args:
+            output_video_path (str): Path where the video should be saved.
+            fps (float): Frame rate of the output video, normally the source frame rate.
+            frame_size (tuple): (width, height) of the frames that will be written.
+            queue_size (int): Maximum number of frames waiting to be encoded.
+            crf (int): x264 constant rate factor used by the ffmpeg backend.
+            use_ffmpeg (bool): Whether to use ffmpeg when it is installed.
+        """
+        output_dir = os.path.dirname(output_video_path)
+        if output_dir and not os.path.exists(output_dir):
+            print("Creating folder for output video.")
+            os.makedirs(output_dir)
+
+        self.output_video_path = output_video_path
+        self.fps = fps
+        self.frame_size = frame_size
+
+        ffmpeg_path = shutil.which("ffmpeg") if use_ffmpeg else None
+        if ffmpeg_path is not None:
+            self.encoder = FFmpegEncoder(output_video_path, fps, frame_size, crf=crf, ffmpeg_path=ffmpeg_path)
+            self.encoder_name = "ffmpeg"
+        else:
+            self.encoder = OpenCVEncoder(output_video_path, fps, frame_size)
+            self.encoder_name = "opencv"
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.closed = False
+        self.thread = threading.Thread(target=self._encode_frames, name="video-encoder", daemon=True)
+        self.thread.start()
+
+    def _encode_frames(self):
+        while True:
+            frame = self.queue.get()
+            if frame is None:
+                break
+            if self.error is not None:
+                continue  # Keep draining so writers never block on a dead encoder
+            try:
+                self.encoder.write(frame)
+            except Exception as e:
+                self.error = e
+
+    def write(self, frame):
+        """
+        Queue one frame for encoding.
+
+        Args:
+            frame (numpy.ndarray): BGR frame of size frame_size.
+        """
+        if self.error is not None:
+            raise RuntimeError(f"Video encoding failed: {self.error}") from self.error
+        self.queue.put(frame)
+
+    def write_frames(self, frames):
+        """
+        Queue a sequence of frames for encoding.
+
+        Args:
+            frames (list): BGR frames of size frame_size.
+        """
+        for frame in frames:
+            self.write(frame)
+
+    def close(self):
+        """
+        Wait for every queued frame to be encoded and finalise the file.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.thread.join()
+        self.encoder.close()
+        if self.error is not None:
+            raise RuntimeError(f"Video encoding failed: {self.error}") from self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()